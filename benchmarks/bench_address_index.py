@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Startup and lookup micro-benchmark for the scam-address index.
+
+    python -m benchmarks.bench_address_index --sizes 1000000,10000000 [--bloom]
+
+For each size a synthetic blocklist is written to a temporary directory, then the
+script measures: compile time (first start), map time (a later worker start that
+reuses the compiled file), and lookup latency for listed and unlisted addresses.
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from server.address_index import AddressIndex  # noqa: E402
+
+
+def write_blocklist(path: str, size: int, rng: random.Random):
+    with open(path, 'w') as f:
+        for _ in range(size):
+            f.write(f"0x{rng.getrandbits(160):040x},bench,scam,2024-01-01\n")
+
+
+def time_lookups(index: AddressIndex, addresses) -> float:
+    started = time.perf_counter()
+    for address in addresses:
+        address in index
+    return (time.perf_counter() - started) / len(addresses) * 1e6
+
+
+def run(size: int, bloom: bool, lookups: int, workdir: str) -> dict:
+    rng = random.Random(size)
+    source = os.path.join(workdir, f"blocklist_{size}.csv")
+    write_blocklist(source, size, rng)
+
+    started = time.perf_counter()
+    index = AddressIndex(source_path=source, bloom=bloom, check_interval=3600)
+    compile_s = time.perf_counter() - started
+
+    started = time.perf_counter()
+    index = AddressIndex(source_path=source, bloom=bloom, check_interval=3600)
+    map_s = time.perf_counter() - started
+
+    # Re-read a sample of listed addresses from the source for hit lookups
+    listed = []
+    with open(source) as f:
+        for i, line in enumerate(f):
+            if i % max(1, size // lookups) == 0:
+                listed.append(line.split(',', 1)[0])
+    unlisted = [f"0x{rng.getrandbits(160):040x}" for _ in range(lookups)]
+
+    return {
+        'entries': size,
+        'bloom': bloom,
+        'index_bytes': os.path.getsize(f"{source}.idx"),
+        'compile_s': round(compile_s, 3),
+        'map_s': round(map_s, 6),
+        'hit_lookup_us': round(time_lookups(index, listed), 3),
+        'miss_lookup_us': round(time_lookups(index, unlisted), 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='1000000,10000000')
+    parser.add_argument('--lookups', type=int, default=100000)
+    parser.add_argument('--bloom', action='store_true')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in (int(s) for s in args.sizes.split(',')):
+            print(json.dumps(run(size, args.bloom, args.lookups, workdir)), flush=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Interaction graph at scale: bulk load and full compaction of a synthetic graph
+(heavy-tailed degrees, a few hundred scam seeds), then per-operation latency of
+what the request path does on top of it: incremental inserts, hop lookups,
+newly blocklisted addresses and shortest paths.
+
+    python -m benchmarks.bench_graph --edges 10000000
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import resource
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from server.interaction_graph import InteractionGraph  # noqa: E402
+
+
+def address(i: int) -> str:
+    return '0x%040x' % i
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--edges', type=int, default=10_000_000)
+    parser.add_argument('--nodes', type=int, default=0, help='default: edges / 5')
+    parser.add_argument('--scams', type=int, default=500)
+    parser.add_argument('--operations', type=int, default=20000)
+    args = parser.parse_args()
+
+    nodes = args.nodes or max(args.edges // 5, 10)
+    rng = np.random.default_rng(7)
+    sources = rng.integers(0, nodes, args.edges)
+    # Zipf-distributed recipients: a few contracts and exchanges take most of the traffic
+    targets = (rng.zipf(1.3, args.edges) - 1) % nodes
+    scams = set(address(i) for i in rng.choice(nodes, args.scams, replace=False).tolist())
+    graph = InteractionGraph(is_scam=scams.__contains__, compact_interval=0, max_edges=args.edges * 2)
+
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    addresses = [address(i) for i in range(nodes)]
+    started = time.perf_counter()
+    graph.load(addresses, sources, targets)
+    load_s = time.perf_counter() - started
+    started = time.perf_counter()
+    graph.compact()
+    compact_s = time.perf_counter() - started
+    stats = graph.stats()
+    rss_mb = (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before) / 1024
+    dist = np.frombuffer(graph._state.dist, dtype=np.uint8)
+    print(json.dumps({'mode': 'load', 'nodes': stats['nodes'], 'edges': stats['edges'],
+                      'load_s': round(load_s, 2), 'compact_s': round(compact_s, 2), 'peak_rss_mb_delta': round(rss_mb),
+                      'within_hops': {str(h): int((dist == h).sum()) for h in range(graph.max_hops + 1)}}), flush=True)
+    del dist
+
+    picks = random.Random(7)
+    fresh = [(address(nodes + i), address(picks.randrange(nodes))) for i in range(args.operations)]
+    started = time.perf_counter()
+    for a, b in fresh:
+        graph.add_interaction(a, b)
+    insert_s = time.perf_counter() - started
+    lookups = [address(picks.randrange(nodes)) for _ in range(args.operations)]
+    started = time.perf_counter()
+    found = sum(graph.hops_to_scam(a) is not None for a in lookups)
+    lookup_s = time.perf_counter() - started
+    started = time.perf_counter()
+    paths = [graph.path_to_scam(a) for a in lookups[:1000]]
+    path_s = time.perf_counter() - started
+    listed = [address(picks.randrange(nodes)) for _ in range(200)]
+    started = time.perf_counter()
+    for a in listed:
+        scams.add(a)
+        graph.mark_scam(a)
+    mark_s = time.perf_counter() - started
+    print(json.dumps({'mode': 'operations', 'insert_us': round(insert_s / len(fresh) * 1e6, 1),
+                      'lookup_us': round(lookup_s / len(lookups) * 1e6, 2),
+                      'path_us': round(path_s / 1000 * 1e6, 1), 'mark_scam_us': round(mark_s / len(listed) * 1e6, 1),
+                      'lookups_near_scam': found, 'paths_found': sum(p is not None for p in paths)}), flush=True)
+
+
+if __name__ == '__main__':
+    main()
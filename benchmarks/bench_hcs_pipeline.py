@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Sustained HCS submission throughput against the fake network of benchmarks.fake_hcs
+(precheck round trip, consensus a few seconds later, bulk receipts): one message at
+a time waiting for its receipt, as HederaClient's sync mode does, against the
+pipeline at several in-flight limits, optionally with a node down and BUSY answers.
+
+    python -m benchmarks.bench_hcs_pipeline --messages 5000 --in-flight 64,256,1024 \
+        --consensus lognormal:3000,0.3 [--faults]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_hcs import FakeHcsNetwork  # noqa: E402
+from server.hcs_pipeline import HcsPipeline  # noqa: E402
+
+
+def make_network(args, seed):
+    network = FakeHcsNetwork(precheck_latency=args.precheck, consensus_latency=args.consensus,
+                             receipt_latency=args.precheck, busy_rate=0.05 if args.faults else 0.0,
+                             timeout_rate=0.01 if args.faults else 0.0, seed=seed)
+    if args.faults:
+        network.down.add(network.nodes()[0])
+    return network
+
+
+def sequential(network, messages):
+    # Submit, then poll for the receipt like the SDK's getReceipt() does
+    started = time.perf_counter()
+    for i in range(messages):
+        transaction_id = f"0.0.1001@{int(time.time())}.{i:09d}"
+        network.submit(network.nodes()[-1], transaction_id, f"message-{i}")
+        while network.receipts([transaction_id])[transaction_id] is None:
+            time.sleep(0.05)
+    return time.perf_counter() - started
+
+
+def pipelined(network, messages, in_flight, senders):
+    pipeline = HcsPipeline(network, '0.0.1001', max_in_flight=in_flight, senders=senders)
+    started = time.perf_counter()
+    for i in range(messages):
+        pipeline.submit(f"message-{i}")
+    pipeline.flush()
+    elapsed = time.perf_counter() - started
+    stats = pipeline.stats()
+    pipeline.close()
+    return elapsed, stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--messages', type=int, default=5000)
+    parser.add_argument('--sequential-messages', type=int, default=5, help='the sync baseline is slow')
+    parser.add_argument('--in-flight', default='64,256,1024')
+    parser.add_argument('--senders', type=int, default=8)
+    parser.add_argument('--precheck', default='fixed:5', help='latency spec of a precheck or receipt round trip')
+    parser.add_argument('--consensus', default='lognormal:3000,0.3', help='latency spec from submit to consensus')
+    parser.add_argument('--faults', action='store_true', help='one node down, 5%% BUSY, 1%% timeouts')
+    args = parser.parse_args()
+
+    # The baseline runs without faults: it has no failover to survive them
+    elapsed = sequential(FakeHcsNetwork(precheck_latency=args.precheck, consensus_latency=args.consensus,
+                                        receipt_latency=args.precheck), args.sequential_messages)
+    print(json.dumps({'mode': 'sequential', 'messages': args.sequential_messages,
+                      'msgs_per_second': round(args.sequential_messages / elapsed, 2)}), flush=True)
+
+    for in_flight in (int(n) for n in args.in_flight.split(',')):
+        network = make_network(args, in_flight)
+        elapsed, stats = pipelined(network, args.messages, in_flight, args.senders)
+        print(json.dumps({'mode': 'pipelined', 'in_flight': in_flight, 'messages': args.messages,
+                          'msgs_per_second': round(args.messages / elapsed, 1),
+                          'confirmed': stats['confirmed'], 'failed': stats['failed'],
+                          'retried': stats['retried'], 'duplicates': stats['duplicates'],
+                          'receipt_queries': network.receipt_queries,
+                          'on_topic': len(network.messages)}), flush=True)
+
+
+if __name__ == '__main__':
+    main()
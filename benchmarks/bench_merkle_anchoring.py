@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Anchored records per second: one topic message per analysis versus Merkle batching.
+
+    python -m benchmarks.bench_merkle_anchoring --records 20000 --batch 1024 [--submit-latency-ms 5]
+
+Both paths run MockHederaClient in mock mode inside a temporary directory. With the
+default latency of 0 the numbers show only the local cost per anchored record
+(hashing, log writes, proof storage); --submit-latency-ms adds a simulated HCS
+round-trip to every topic submission, which the per-message path pays per record
+and the batched path once per window.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from server.hedera_mock import MockHederaClient  # noqa: E402
+from server.merkle import MerkleBatcher  # noqa: E402
+
+
+def with_latency(submit, latency_s: float):
+    def submit_with_latency(message):
+        time.sleep(latency_s)
+        return submit(message)
+    return submit_with_latency
+
+
+def run_direct(records: int, latency_s: float) -> dict:
+    client = MockHederaClient()
+    client._submit = with_latency(client._submit, latency_s)
+    started = time.perf_counter()
+    for i in range(records):
+        client.submit_message_to_topic(f"{i:064x}")
+    elapsed = time.perf_counter() - started
+    return {'mode': 'per-message', 'records': records, 'topic_messages': records,
+            'records_per_s': round(records / elapsed)}
+
+
+def run_batched(records: int, batch: int, latency_s: float) -> dict:
+    client = MockHederaClient()
+    client.batcher = MerkleBatcher(with_latency(client._submit, latency_s), store_path='proofs.db',
+                                   window_seconds=3600, max_batch=batch)
+    started = time.perf_counter()
+    for i in range(records):
+        client.submit_message_to_topic(f"{i:064x}")
+    client.batcher.flush()
+    elapsed = time.perf_counter() - started
+    assert client.verify_anchored(f"{records - 1:064x}")['verified']
+    return {'mode': 'merkle-batch', 'records': records, 'batch': batch,
+            'topic_messages': client.batcher.anchored_batches, 'records_per_s': round(records / elapsed)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--records', type=int, default=20000)
+    parser.add_argument('--batch', type=int, default=1024)
+    parser.add_argument('--submit-latency-ms', type=float, default=0.0)
+    args = parser.parse_args()
+
+    for var in ('HEDERA_ACCOUNT_ID', 'HEDERA_TOPIC_ID', 'HEDERA_BATCH_MODE'):
+        os.environ.pop(var, None)
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        latency_s = args.submit_latency_ms / 1000
+        print(json.dumps(run_direct(args.records, latency_s)), flush=True)
+        print(json.dumps(run_batched(args.records, args.batch, latency_s)), flush=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Reputation store: cost of recording a verdict on the request path, flush throughput,
+and bulk lookup latency for a page of counterparties against a populated store.
+
+    python -m benchmarks.bench_reputation --addresses 200000 --lookups 100,1000,5000
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from server.reputation import ReputationStore  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--addresses', type=int, default=200000, help='distinct addresses in the store')
+    parser.add_argument('--lookups', default='100,1000,5000', help='addresses per bulk lookup')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    addresses = ['0x%040x' % rng.getrandbits(160) for _ in range(args.addresses)]
+    with tempfile.TemporaryDirectory() as workdir:
+        store = ReputationStore(os.path.join(workdir, 'reputation.db'), flush_interval=0, max_pending=len(addresses) + 1)
+        started = time.perf_counter()
+        for address in addresses:
+            store.record('ethereum', address, rng.random(), ('high_risk',) if rng.random() < 0.1 else ())
+        record_s = time.perf_counter() - started
+        started = time.perf_counter()
+        store.flush()
+        flush_s = time.perf_counter() - started
+        print(json.dumps({'mode': 'record', 'addresses': len(addresses),
+                          'record_us': round(record_s / len(addresses) * 1e6, 2),
+                          'flush_rows_per_s': round(len(addresses) / flush_s)}), flush=True)
+
+        for size in (int(s) for s in args.lookups.split(',')):
+            timings = []
+            for _ in range(args.repeat):
+                # Half known, half never seen, as on a real portfolio page
+                batch = rng.sample(addresses, size // 2) + ['0x%040x' % rng.getrandbits(160) for _ in range(size - size // 2)]
+                started = time.perf_counter()
+                store.lookup_many('ethereum', batch)
+                timings.append(time.perf_counter() - started)
+            timings.sort()
+            print(json.dumps({'mode': 'bulk_lookup', 'addresses': size, 'store_size': len(addresses),
+                              'p50_ms': round(timings[len(timings) // 2] * 1000, 2),
+                              'max_ms': round(timings[-1] * 1000, 2)}), flush=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Local risk-model throughput: transactions scored per second in one vectorized batch,
+and the latency of scoring a single transaction.
+
+    python -m benchmarks.bench_risk_model --sizes 1000,100000,1000000
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from server.risk_model import RiskModel  # noqa: E402
+
+PAYLOADS = ('', '0xa9059cbb' + '00' * 64, '0x095ea7b3' + '00' * 32 + 'f' * 64)
+
+
+def random_transactions(count: int, rng: random.Random):
+    def address():
+        return '0x%040x' % rng.getrandbits(160)
+    return [{'chain': 'ethereum', 'to_address': address(), 'from_address': address(),
+             'value': rng.randrange(10 ** 21), 'data': rng.choice(PAYLOADS)} for _ in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='1000,100000')
+    parser.add_argument('--single', type=int, default=2000, help='transactions scored one at a time')
+    args = parser.parse_args()
+
+    model = RiskModel.from_env()
+    rng = random.Random(7)
+    for size in (int(s) for s in args.sizes.split(',')):
+        txs = random_transactions(size, rng)
+        started = time.perf_counter()
+        model.score_batch(txs)
+        elapsed = time.perf_counter() - started
+        print(json.dumps({'mode': 'batch', 'model_version': model.version, 'transactions': size,
+                          'tx_per_s': round(size / elapsed)}), flush=True)
+
+    txs = random_transactions(args.single, rng)
+    started = time.perf_counter()
+    for tx in txs:
+        model.score(tx)
+    elapsed = time.perf_counter() - started
+    print(json.dumps({'mode': 'single', 'model_version': model.version,
+                      'us_per_tx': round(elapsed / args.single * 1e6, 1)}), flush=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Throughput and tail latency of the sync (gunicorn + Flask) and async (uvicorn + ASGI)
+serving modes against a local stand-in for Comput3.
+
+    python -m benchmarks.bench_serving_modes --requests 2000 --concurrency 200 --latency-ms 50
+
+Both servers run with the verdict cache disabled so every request reaches the
+upstream stand-in. Prints one JSON line per mode.
+"""
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import argparse
+import tempfile
+import subprocess
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.loadgen import run_load, analysis_body  # noqa: E402
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def wait_until_up(url: str, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(url, timeout=1.0)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up")
+
+
+def start(cmd, env, cwd) -> subprocess.Popen:
+    return subprocess.Popen(cmd, env=env, cwd=cwd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=200)
+    parser.add_argument('--latency-ms', type=float, default=50)
+    parser.add_argument('--sync-workers', type=int, default=4)
+    args = parser.parse_args()
+
+    upstream_port, sync_port, async_port = free_port(), free_port(), free_port()
+    with tempfile.TemporaryDirectory() as workdir:
+        env = dict(os.environ, PYTHONPATH=ROOT, FAKE_LATENCY_MS=str(args.latency_ms),
+                   COMPUT3_API_KEY='bench', COMPUT3_BASE_URL=f"http://127.0.0.1:{upstream_port}",
+                   VERDICT_CACHE_SIZE='0', HEDERA_LOG_DIR=os.path.join(workdir, 'hedera_log'))
+        env.pop('HEDERA_TOPIC_ID', None)
+        processes = [
+            start([sys.executable, '-m', 'uvicorn', 'benchmarks.fake_upstream:app', '--port', str(upstream_port),
+                   '--log-level', 'warning'], env, ROOT),
+            start([sys.executable, '-m', 'gunicorn', '-c', os.path.join(ROOT, 'gunicorn.conf.py'), 'server.app:app',
+                   '-w', str(args.sync_workers),
+                   '-b', f"127.0.0.1:{sync_port}"], env, workdir),
+            start([sys.executable, '-m', 'uvicorn', 'server.asgi_app:app', '--port', str(async_port),
+                   '--log-level', 'warning'], env, workdir),
+        ]
+        try:
+            for port in (sync_port, async_port):
+                wait_until_up(f"http://127.0.0.1:{port}/")
+            for mode, port in (('sync', sync_port), ('async', async_port)):
+                result = asyncio.run(run_load(f"http://127.0.0.1:{port}/invoke", analysis_body,
+                                              args.requests, args.concurrency))
+                print(json.dumps({'mode': mode, 'upstream_latency_ms': args.latency_ms, **result}), flush=True)
+        finally:
+            for process in processes:
+                process.terminate()
+            for process in processes:
+                process.wait(10)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Shared cache tier: verdict hit rate of N forked workers with per-worker caches
+only vs. backed by the shared table (each worker sees a different slice of the
+same Zipf-distributed traffic, as behind a load balancer), then per-operation
+latency of a worker-local hit, a shared-table hit, a write and an invalidation.
+
+    python -m benchmarks.bench_shared_cache --workers 4 --transactions 20000 --keys 50000
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import multiprocessing
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from server.shared_cache import SharedCache, SharedTable  # noqa: E402
+from server.verdict_cache import VerdictCache  # noqa: E402
+
+VERDICT = {'risk_level': 'LOW', 'risk_score': 0.12, 'confidence': 0.8,
+           'details': {'stage': 'local_model', 'model_score': 0.12, 'velocity': {'sender': {'1m': {'count': 3}}}}}
+
+
+def run_worker(path, worker, args, results):
+    cache = VerdictCache(max_size=args.local_size, shared=SharedCache(SharedTable(path)) if path else None)
+    rng = np.random.default_rng(worker)
+    keys = (rng.zipf(1.2, args.transactions) - 1) % args.keys
+    started = time.perf_counter()
+    for key in keys.tolist():
+        k = f"tx{key}"
+        if cache.get(k) is None:
+            cache.put(k, VERDICT, addresses=(f"0x{key:040x}",))
+    elapsed = time.perf_counter() - started
+    stats = cache.stats()
+    results.put((stats['hits'], stats['misses'], stats['shared_hits'], elapsed))
+
+
+def serve(path, args):
+    ctx = multiprocessing.get_context('fork')
+    results = ctx.Queue()
+    workers = [ctx.Process(target=run_worker, args=(path, w, args, results)) for w in range(args.workers)]
+    for process in workers:
+        process.start()
+    totals = [results.get() for _ in workers]
+    for process in workers:
+        process.join()
+    hits, misses = sum(t[0] for t in totals), sum(t[1] for t in totals)
+    return {'mode': 'shared' if path else 'local', 'workers': args.workers, 'hit_rate': round(hits / (hits + misses), 4),
+            'analyses': misses, 'shared_hits': sum(t[2] for t in totals),
+            'lookup_us': round(sum(t[3] for t in totals) / (args.workers * args.transactions) * 1e6, 2)}
+
+
+def timed(operation, count):
+    started = time.perf_counter()
+    for i in range(count):
+        operation(i)
+    return round((time.perf_counter() - started) / count * 1e6, 2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--transactions', type=int, default=20000, help='per worker')
+    parser.add_argument('--keys', type=int, default=50000, help='distinct transactions in the traffic')
+    parser.add_argument('--local-size', type=int, default=2000, help='per-worker LRU entries')
+    parser.add_argument('--operations', type=int, default=20000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(dir='/dev/shm' if os.path.isdir('/dev/shm') else None) as directory:
+        print(json.dumps(serve(None, args)), flush=True)
+        print(json.dumps(serve(os.path.join(directory, 'tiers'), args)), flush=True)
+
+        shared = SharedCache(SharedTable(os.path.join(directory, 'ops')))
+        writer = VerdictCache(max_size=args.operations, shared=shared)
+        reader = VerdictCache(max_size=args.operations, shared=shared)
+        write_us = timed(lambda i: writer.put(f"k{i}", VERDICT, addresses=(f"0x{i:040x}",)), args.operations)
+        shared_hit_us = timed(lambda i: reader.get(f"k{i}"), args.operations)
+        local_hit_us = timed(lambda i: reader.get(f"k{i}"), args.operations)
+        invalidate_us = timed(lambda i: writer.invalidate_address(f"0x{i:040x}"), args.operations)
+        print(json.dumps({'mode': 'operations', 'put_us': write_us, 'shared_hit_us': shared_hit_us,
+                          'local_hit_us': local_hit_us, 'invalidate_us': invalidate_us,
+                          'stale_after_invalidate': sum(reader.get(f"k{i}") is not None for i in range(100))}), flush=True)
+
+
+if __name__ == '__main__':
+    main()
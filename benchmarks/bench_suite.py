@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+End-to-end benchmark suite. Starts the local Comput3 / mirror-node stand-in
+(benchmarks.fake_upstream) and the server in the chosen serving mode, drives
+`/invoke` (analysis and compute job) and `/api/scan/transaction` at a fixed
+concurrency, and times a full mirror-node topic sync.
+
+    python -m benchmarks.bench_suite --mode sync --requests 2000 --concurrency 100 \
+        --latency lognormal:40,0.5 --error-rate 0.01 --seed 7 --output bench.json
+
+Prints one JSON line per scenario; `--output` writes them, plus the run's
+configuration, to a file that can be diffed against a baseline run.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.bench_serving_modes import free_port, wait_until_up, start  # noqa: E402
+from benchmarks.loadgen import add_load_arguments, run_scenario, scenario_names, write_output  # noqa: E402
+from server.mirror_sync import MirrorMessageStore, MirrorNodeSynchronizer  # noqa: E402
+
+BENCH_TOPIC_ID = '0.0.9000'
+
+
+def server_command(mode: str, port: int, workers: int):
+    if mode == 'sync':
+        return [sys.executable, '-m', 'gunicorn', '-c', os.path.join(ROOT, 'gunicorn.conf.py'), 'server.app:app',
+                '-w', str(workers), '-b', f"127.0.0.1:{port}"]
+    return [sys.executable, '-m', 'uvicorn', 'server.asgi_app:app', '--port', str(port), '--log-level', 'warning']
+
+
+def bench_mirror_sync(mirror_url: str, messages: int, page_size: int, workdir: str):
+    store = MirrorMessageStore(os.path.join(workdir, 'mirror_bench.db'))
+    sync = MirrorNodeSynchronizer(BENCH_TOPIC_ID, mirror_url=mirror_url, store=store, page_size=page_size)
+    started = time.perf_counter()
+    try:
+        stored = sync.sync_once()
+    except Exception as e:
+        # An injected fault on any page aborts the sync, as it would against the real mirror node
+        return {'scenario': 'mirror_sync', 'error': str(e), 'messages': store.last_sequence(BENCH_TOPIC_ID)}
+    elapsed = time.perf_counter() - started
+    return {
+        'scenario': 'mirror_sync',
+        'messages': stored,
+        'pages': -(-messages // page_size),
+        'elapsed_s': round(elapsed, 3),
+        'throughput_msgs_per_s': round(stored / elapsed, 1) if elapsed else 0.0,
+    }
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, timeout=10).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return ''
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mode', choices=('sync', 'async'), default='sync')
+    parser.add_argument('--workers', type=int, default=4, help='gunicorn workers in sync mode')
+    parser.add_argument('--latency', default='fixed:50', help='upstream latency spec, see benchmarks/fake_upstream.py')
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--error-status', type=int, default=503)
+    parser.add_argument('--timeout-rate', type=float, default=0.0)
+    parser.add_argument('--timeout-s', type=float, default=5.0, help='how long an injected timeout hangs')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--mirror-messages', type=int, default=5000, help='0 skips the mirror sync scenario')
+    parser.add_argument('--mirror-page-size', type=int, default=100)
+    add_load_arguments(parser)
+    args = parser.parse_args()
+    scenarios = scenario_names(args.scenarios)
+
+    upstream_port, server_port = free_port(), free_port()
+    upstream_url = f"http://127.0.0.1:{upstream_port}"
+    server_url = f"http://127.0.0.1:{server_port}"
+    meta = {
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'cpus': os.cpu_count(),
+        'started_at': time.time(),
+        'config': vars(args),
+    }
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        env = dict(os.environ, PYTHONPATH=ROOT, FAKE_LATENCY=args.latency, FAKE_ERROR_RATE=str(args.error_rate),
+                   FAKE_ERROR_STATUS=str(args.error_status), FAKE_TIMEOUT_RATE=str(args.timeout_rate),
+                   FAKE_TIMEOUT_S=str(args.timeout_s), FAKE_SEED=str(args.seed),
+                   FAKE_TOPIC_MESSAGES=str(args.mirror_messages),
+                   COMPUT3_API_KEY='bench', COMPUT3_BASE_URL=upstream_url, HEDERA_MIRROR_URL=upstream_url,
+                   HEDERA_LOG_DIR=os.path.join(workdir, 'hedera_log'), METRICS_DIR=os.path.join(workdir, 'metrics'),
+                   AUDIT_SPILL_PATH=os.path.join(workdir, 'audit_spill.jsonl'))
+        env.pop('HEDERA_TOPIC_ID', None)
+        processes = [
+            start([sys.executable, '-m', 'uvicorn', 'benchmarks.fake_upstream:app', '--port', str(upstream_port),
+                   '--log-level', 'warning'], env, ROOT),
+            start(server_command(args.mode, server_port, args.workers), env, workdir),
+        ]
+        try:
+            wait_until_up(f"{server_url}/")
+            for scenario in scenarios:
+                result = {'mode': args.mode, 'upstream_latency': args.latency,
+                          **run_scenario(server_url, scenario, args.requests, args.concurrency,
+                                         args.unique, args.deadline_ms, args.timeout)}
+                print(json.dumps(result), flush=True)
+                results.append(result)
+            if args.mirror_messages > 0:
+                result = {'upstream_latency': args.latency,
+                          **bench_mirror_sync(upstream_url, args.mirror_messages, args.mirror_page_size, workdir)}
+                print(json.dumps(result), flush=True)
+                results.append(result)
+        finally:
+            for process in processes:
+                process.terminate()
+            for process in processes:
+                process.wait(10)
+    write_output(args.output, meta, results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Cost of the diagnostics on the request path: tracing bookkeeping per request
+(begin, a dozen observed steps, end) against the metrics alone, with tracing off,
+sampled and forced, and the throughput a CPU-bound loop keeps while the sampling
+profiler is running.
+
+    python -m benchmarks.bench_tracing --requests 20000 --steps 12
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from server import metrics  # noqa: E402
+from server.tracing import Tracer  # noqa: E402
+
+
+def per_request(tracer, headers, requests, steps):
+    started = time.perf_counter()
+    for _ in range(requests):
+        trace = tracer.begin(headers) if tracer else None
+        for step in range(steps):
+            metrics.observe('aya_analysis_stage_duration_seconds', 0.0001, stage='rules')
+        if tracer:
+            tracer.end(trace, '/invoke', 200)
+    return round((time.perf_counter() - started) / requests * 1e6, 2)
+
+
+def spin(seconds):
+    ends, loops = time.perf_counter() + seconds, 0
+    while time.perf_counter() < ends:
+        sum(i * i for i in range(200))
+        loops += 1
+    return loops
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=20000)
+    parser.add_argument('--steps', type=int, default=12, help='observed timings per request')
+    parser.add_argument('--seconds', type=float, default=3, help='length of each profiler run')
+    parser.add_argument('--interval-ms', type=float, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        tracer = Tracer(directory=directory, admin_token='bench')
+        metrics_only = per_request(None, {}, args.requests, args.steps)
+        off = per_request(tracer, {}, args.requests, args.steps)
+        forced = per_request(tracer, {'X-Aya-Trace': '1', 'X-Admin-Token': 'bench'}, args.requests, args.steps)
+        tracer.set_sampling(1, 600)
+        sampled = per_request(tracer, {}, args.requests, args.steps)
+        print(json.dumps({'mode': 'requests', 'steps': args.steps, 'metrics_only_us': metrics_only, 'off_us': off,
+                          'sampled_us': sampled, 'forced_us': forced}), flush=True)
+
+        # Idle pool threads, as in a worker, make every stack snapshot larger
+        stop = threading.Event()
+        for i in range(32):
+            threading.Thread(target=stop.wait, name=f"comput3_{i}", daemon=True).start()
+        baseline = spin(args.seconds)
+        profile = tracer.start_profile(args.seconds, args.interval_ms)
+        profiled = spin(args.seconds)
+        time.sleep(0.5)
+        _, folded = tracer.profile(profile['profile_id'])
+        stop.set()
+        print(json.dumps({'mode': 'profiler', 'interval_ms': args.interval_ms, 'threads': threading.active_count(),
+                          'samples': sum(int(line.rsplit(' ', 1)[1]) for line in folded.splitlines()),
+                          'throughput_loss': round(1 - profiled / baseline, 4)}), flush=True)
+
+
+if __name__ == '__main__':
+    main()
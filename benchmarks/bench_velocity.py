@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Velocity counters on the hot path: cost of recording a transaction and of reading
+both parties' 1m/10m/1h features, with the tables full (every new address evicts
+one) and memory per tracked address.
+
+    python -m benchmarks.bench_velocity --addresses 100000 --transactions 200000
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from server.velocity import VelocityTracker  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--addresses', type=int, default=100000, help='capacity per direction')
+    parser.add_argument('--transactions', type=int, default=200000)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    population = ['0x%040x' % rng.getrandbits(160) for _ in range(args.addresses * 3)]
+    txs = [(rng.choice(population), rng.choice(population), rng.random() * 10) for _ in range(args.transactions)]
+
+    tracker = VelocityTracker(max_addresses=args.addresses)
+    now = time.time()
+    started = time.perf_counter()
+    for i, (sender, recipient, value) in enumerate(txs):
+        tracker.record(sender, recipient, value, now=now + i * 0.01)
+    record_s = time.perf_counter() - started
+
+    # Memory on a separate fill: tracing allocations would distort the timings above
+    tracemalloc.start()
+    filled = VelocityTracker(max_addresses=args.addresses)
+    for i, (sender, recipient, value) in enumerate(txs[:args.addresses]):
+        filled.record(sender, recipient, value, now=now)
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    filled_stats = filled.stats()
+    filled_count = filled_stats['outbound']['addresses'] + filled_stats['inbound']['addresses']
+
+    started = time.perf_counter()
+    for i, (sender, recipient, _) in enumerate(txs[:50000]):
+        tracker.features(sender, recipient, now=now + args.transactions * 0.01)
+    read_s = time.perf_counter() - started
+    stats = tracker.stats()
+    tracked = stats['outbound']['addresses'] + stats['inbound']['addresses']
+    print(json.dumps({'transactions': len(txs), 'record_us': round(record_s / len(txs) * 1e6, 2),
+                      'features_us': round(read_s / min(len(txs), 50000) * 1e6, 2),
+                      'tracked': tracked, 'evicted': stats['outbound']['evicted'] + stats['inbound']['evicted'],
+                      'bytes_per_address': round(memory / max(filled_count, 1))}), flush=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""
+In-process stand-in for a Hedera network behind the HcsPipeline network interface
+(nodes / submit / receipts), with the behaviour that matters for pipelining:
+
+* `submit` costs one precheck round trip (`precheck_latency`) and a transaction
+  reaches consensus `consensus_latency` later, when it gets the topic's next
+  sequence number. Sequence numbers follow consensus order.
+* Transaction ids are deduplicated: a second submission of a known id is rejected
+  with DuplicateTransaction, exactly once per id reaching consensus.
+* Faults: nodes in `down` refuse everything, `busy_rate` of prechecks answer BUSY,
+  `timeout_rate` of accepted transactions time out on the client's side anyway
+  (so a retry is a duplicate), and `lose_rate` of accepted transactions are never
+  gossiped (no receipt, ever).
+* `receipts` answers for any number of ids in one `receipt_latency` round trip,
+  and only `mirror_lag` seconds after consensus, as receipts read from a mirror node do.
+
+Latencies use the specs of benchmarks.fake_upstream (fixed:<ms>, lognormal:<median>,<sigma>, ...).
+"""
+import time
+import heapq
+import random
+import threading
+from typing import Dict, Any, List, Optional, Iterable
+
+from benchmarks.fake_upstream import parse_latency
+from server.hcs_pipeline import NodeUnavailable, DuplicateTransaction, PermanentError
+
+
+class FakeHcsNetwork:
+    def __init__(self, nodes: Iterable[str] = ('0.0.3', '0.0.4', '0.0.5', '0.0.6'),
+                 precheck_latency: str = 'fixed:5', consensus_latency: str = 'fixed:3000',
+                 receipt_latency: str = 'fixed:5', busy_rate: float = 0.0, timeout_rate: float = 0.0,
+                 lose_rate: float = 0.0, max_message_bytes: int = 1024, mirror_lag: float = 0.0,
+                 seed: Optional[int] = None):
+        self._nodes = list(nodes)
+        self.precheck_latency = parse_latency(precheck_latency)
+        self.consensus_latency = parse_latency(consensus_latency)
+        self.receipt_latency = parse_latency(receipt_latency)
+        self.busy_rate = busy_rate
+        self.timeout_rate = timeout_rate
+        self.lose_rate = lose_rate
+        self.max_message_bytes = max_message_bytes
+        self.mirror_lag = mirror_lag
+        self.down = set()
+        self.rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._known = set()
+        # (consensus time, transaction id, message) not yet ordered
+        self._pending: List[tuple] = []
+        self.receipts_by_id: Dict[str, Dict[str, Any]] = {}
+        # transaction id -> monotonic time it reached consensus
+        self._reached: Dict[str, float] = {}
+        self.messages: List[str] = []
+        self.submits_per_node: Dict[str, int] = {node: 0 for node in self._nodes}
+        self.duplicates = 0
+        self.receipt_queries = 0
+
+    def nodes(self) -> List[str]:
+        return self._nodes
+
+    def submit(self, node: str, transaction_id: str, message: str):
+        with self._lock:
+            delay = self.precheck_latency(self.rng)
+            busy = self.rng.random() < self.busy_rate
+            timed_out = self.rng.random() < self.timeout_rate
+            lost = self.rng.random() < self.lose_rate
+            consensus_in = self.consensus_latency(self.rng)
+        time.sleep(delay)
+        if node in self.down:
+            raise NodeUnavailable(f"node {node} is unreachable")
+        if busy:
+            raise NodeUnavailable(f"node {node} answered BUSY")
+        if len(message.encode()) > self.max_message_bytes:
+            raise PermanentError("MESSAGE_SIZE_TOO_LARGE")
+        with self._lock:
+            self.submits_per_node[node] += 1
+            if transaction_id in self._known:
+                self.duplicates += 1
+                raise DuplicateTransaction(f"DUPLICATE_TRANSACTION {transaction_id}")
+            self._known.add(transaction_id)
+            if not lost:
+                heapq.heappush(self._pending, (time.monotonic() + consensus_in, transaction_id, message))
+        if timed_out:
+            raise NodeUnavailable(f"node {node} timed out")
+
+    def receipts(self, transaction_ids: List[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        with self._lock:
+            delay = self.receipt_latency(self.rng)
+        time.sleep(delay)
+        with self._lock:
+            self.receipt_queries += 1
+            self._reach_consensus()
+            visible = time.monotonic() - self.mirror_lag
+            return {transaction_id: self.receipts_by_id[transaction_id]
+                    if self._reached.get(transaction_id, visible + 1) <= visible else None
+                    for transaction_id in transaction_ids}
+
+    def _reach_consensus(self):
+        # Caller holds the lock
+        now = time.monotonic()
+        while self._pending and self._pending[0][0] <= now:
+            reached, transaction_id, message = heapq.heappop(self._pending)
+            self.messages.append(message)
+            self._reached[transaction_id] = reached
+            self.receipts_by_id[transaction_id] = {
+                'status': 'SUCCESS', 'sequence_number': len(self.messages),
+                'consensus_timestamp': f"{time.time():.9f}",
+            }
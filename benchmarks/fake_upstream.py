@@ -0,0 +1,176 @@
+"""
+Local stand-ins for the Comput3 API and the Hedera mirror node, served as a plain
+ASGI app so they can hold thousands of concurrent connections:
+
+    FAKE_LATENCY=lognormal:40,0.5 FAKE_ERROR_RATE=0.02 uvicorn benchmarks.fake_upstream:app --port 9100
+
+Routes:
+    POST /analysis/transaction              deterministic risk_score derived from the body
+    POST /jobs                              {"jobId": ...}
+    POST /jobs/status                       {"jobs": [...]} for {"jobIds": [...]}: 'running' until
+                                            FAKE_JOB_SECONDS after creation, then 'completed'
+    GET  /jobs/<id>                         the same status for one job, 404 if unknown
+    GET  /api/v1/topics/<id>/messages       FAKE_TOPIC_MESSAGES synthetic messages, paged with links.next
+                                            and honouring sequencenumber=gt:N, limit and order=asc
+
+Latency is drawn per request from FAKE_LATENCY, one of
+    fixed:<ms>   uniform:<lo_ms>,<hi_ms>   exponential:<mean_ms>   lognormal:<median_ms>,<sigma>
+(FAKE_LATENCY_MS=<ms> is still accepted as fixed:<ms>). Faults: FAKE_ERROR_RATE of requests answer
+FAKE_ERROR_STATUS (default 503) and FAKE_TIMEOUT_RATE of requests hang for FAKE_TIMEOUT_S before
+answering 504. FAKE_SEED makes the draws reproducible.
+"""
+import os
+import json
+import base64
+import random
+import asyncio
+import time
+import hashlib
+from collections import Counter
+from typing import Dict, Any, Optional, Tuple
+from urllib.parse import parse_qs
+
+
+def parse_latency(spec: str):
+    """Sampler (rng -> seconds) for a latency spec such as `lognormal:40,0.5`."""
+    kind, _, params = spec.partition(':')
+    try:
+        values = [float(v) for v in params.split(',')] if params else []
+    except ValueError:
+        raise ValueError(f"Bad latency spec {spec!r}")
+    if kind == 'fixed' and len(values) == 1:
+        return lambda rng: values[0] / 1000
+    if kind == 'uniform' and len(values) == 2:
+        return lambda rng: rng.uniform(values[0], values[1]) / 1000
+    if kind == 'exponential' and len(values) == 1:
+        return lambda rng: rng.expovariate(1 / values[0]) / 1000 if values[0] > 0 else 0.0
+    if kind == 'lognormal' and len(values) == 2:
+        median, sigma = values
+        return lambda rng: median * rng.lognormvariate(0, sigma) / 1000
+    raise ValueError(f"Bad latency spec {spec!r}; expected fixed:<ms>, uniform:<lo>,<hi>, "
+                     f"exponential:<mean>, or lognormal:<median>,<sigma>")
+
+
+def topic_message(topic_id: str, sequence: int) -> Dict[str, Any]:
+    """The mirror node's JSON for synthetic message `sequence` of `topic_id`."""
+    raw = json.dumps({'type': 'aya-audit', 'tx_hash': hashlib.sha256(f"{topic_id}:{sequence}".encode()).hexdigest()})
+    seconds, nanos = divmod(1_700_000_000_000_000_000 + sequence * 1_000_000, 1_000_000_000)
+    return {
+        'topic_id': topic_id,
+        'sequence_number': sequence,
+        'consensus_timestamp': f"{seconds}.{nanos:09d}",
+        'message': base64.b64encode(raw.encode()).decode(),
+        'running_hash': base64.b64encode(hashlib.sha384(raw.encode()).digest()).decode(),
+        'chunk_info': {'initial_transaction_id': {'account_id': '0.0.1001',
+                                                  'transaction_valid_start': f"{seconds}.{nanos:09d}"}},
+    }
+
+
+class FakeUpstream:
+    """ASGI app standing in for Comput3 and the mirror node; counts requests and injected faults."""
+
+    def __init__(self, latency: str = 'fixed:50', error_rate: float = 0.0, error_status: int = 503,
+                 timeout_rate: float = 0.0, timeout_s: float = 30.0, topic_messages: int = 1000,
+                 job_seconds: float = 2.0, seed: Optional[int] = None):
+        self.latency_spec = latency
+        self.sample_latency = parse_latency(latency)
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.timeout_rate = timeout_rate
+        self.timeout_s = timeout_s
+        self.topic_messages = topic_messages
+        self.job_seconds = job_seconds
+        # jobId -> when it was created (monotonic)
+        self.jobs: Dict[str, float] = {}
+        self.rng = random.Random(seed)
+        self.counters: Counter = Counter()
+
+    @classmethod
+    def from_env(cls) -> 'FakeUpstream':
+        latency = os.getenv('FAKE_LATENCY') or f"fixed:{os.getenv('FAKE_LATENCY_MS', '50')}"
+        seed = os.getenv('FAKE_SEED')
+        return cls(
+            latency=latency,
+            error_rate=float(os.getenv('FAKE_ERROR_RATE', '0')),
+            error_status=int(os.getenv('FAKE_ERROR_STATUS', '503')),
+            timeout_rate=float(os.getenv('FAKE_TIMEOUT_RATE', '0')),
+            timeout_s=float(os.getenv('FAKE_TIMEOUT_S', '30')),
+            topic_messages=int(os.getenv('FAKE_TOPIC_MESSAGES', '1000')),
+            job_seconds=float(os.getenv('FAKE_JOB_SECONDS', '2')),
+            seed=int(seed) if seed else None,
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            while True:
+                message = await receive()
+                await send({'type': message['type'] + '.complete'})
+                if message['type'] == 'lifespan.shutdown':
+                    return
+        body = b''
+        while True:
+            message = await receive()
+            body += message.get('body', b'')
+            if not message.get('more_body'):
+                break
+
+        # Draw everything up front so a seeded run is reproducible whatever the interleaving
+        delay = self.sample_latency(self.rng)
+        fault = self.rng.random()
+        if fault < self.timeout_rate:
+            self.counters['timeouts'] += 1
+            await asyncio.sleep(self.timeout_s)
+            status, payload = 504, {'error': 'injected timeout'}
+        elif fault < self.timeout_rate + self.error_rate:
+            self.counters['errors'] += 1
+            await asyncio.sleep(delay)
+            status, payload = self.error_status, {'error': 'injected failure'}
+        else:
+            await asyncio.sleep(delay)
+            status, payload = self.route(scope['method'], scope['path'], scope.get('query_string', b''), body)
+        self.counters[f"status_{status}"] += 1
+
+        data = json.dumps(payload).encode()
+        await send({'type': 'http.response.start', 'status': status,
+                    'headers': [(b'content-type', b'application/json'), (b'content-length', str(len(data)).encode())]})
+        await send({'type': 'http.response.body', 'body': data})
+
+    def route(self, method: str, path: str, query_string: bytes, body: bytes) -> Tuple[int, Dict[str, Any]]:
+        if method == 'POST' and path.endswith('/analysis/transaction'):
+            tx = json.loads(body or b'{}')
+            digest = hashlib.sha256(json.dumps(tx, sort_keys=True).encode()).digest()
+            return 200, {'result': {'risk_score': round(digest[0] / 255, 3), 'model': 'fake-upstream'}}
+        if method == 'POST' and path.endswith('/jobs/status'):
+            return 200, {'jobs': [self.job_status(job_id) for job_id in json.loads(body or b'{}').get('jobIds', [])
+                                  if job_id in self.jobs]}
+        if method == 'GET' and '/jobs/' in path:
+            job_id = path.rsplit('/', 1)[1]
+            return (200, self.job_status(job_id)) if job_id in self.jobs else (404, {'error': 'not found'})
+        if method == 'POST' and path.endswith('/jobs'):
+            job_id = hashlib.sha1(body + str(len(self.jobs)).encode()).hexdigest()[:12]
+            self.jobs[job_id] = time.monotonic()
+            return 200, {'jobId': job_id}
+        if method == 'GET' and path.startswith('/api/v1/topics/') and path.endswith('/messages'):
+            return 200, self.topic_page(path.split('/')[4], query_string.decode())
+        return 404, {'error': 'not found'}
+
+    def job_status(self, job_id: str) -> Dict[str, Any]:
+        if time.monotonic() - self.jobs[job_id] < self.job_seconds:
+            return {'jobId': job_id, 'status': 'running'}
+        return {'jobId': job_id, 'status': 'completed', 'result': {'exit_code': 0, 'stdout': f"job {job_id} done"}}
+
+    def topic_page(self, topic_id: str, query_string: str) -> Dict[str, Any]:
+        query = parse_qs(query_string)
+        after = 0
+        for condition in query.get('sequencenumber', []):
+            if condition.startswith('gt:'):
+                after = int(condition[3:])
+        limit = max(1, min(100, int(query.get('limit', ['25'])[0])))
+        last = min(self.topic_messages, after + limit)
+        messages = [topic_message(topic_id, seq) for seq in range(after + 1, last + 1)]
+        next_link = (f"/api/v1/topics/{topic_id}/messages?sequencenumber=gt:{last}&limit={limit}&order=asc"
+                     if last < self.topic_messages else None)
+        return {'messages': messages, 'links': {'next': next_link}}
+
+
+app = FakeUpstream.from_env()
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Closed-loop load generator: keeps `concurrency` requests in flight against one
+endpoint until `requests` have completed, then reports throughput, latency
+percentiles and a status-code histogram as a dict.
+
+Against a running server:
+
+    python -m benchmarks.loadgen --url http://127.0.0.1:8080 --scenarios analysis,compute_job,scan \
+        --requests 2000 --concurrency 100 --output loadgen.json
+
+Prints one JSON line per scenario; `--output` also writes them to a file.
+"""
+import sys
+import json
+import time
+import asyncio
+import argparse
+from collections import Counter
+from typing import Dict, Any, Callable, Optional
+
+import httpx
+
+
+def percentile(sorted_values, q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(q / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def analysis_body(i: int, unique: int = 0):
+    n = i % unique if unique else i
+    return {'tool': 'analyze_transaction_risk',
+            'arguments': {'chain': 'ethereum', 'to_address': f"0x{n:040x}", 'value': n % 1000}}
+
+
+def compute_job_body(i: int, unique: int = 0):
+    return {'tool': 'hedera_compute_job',
+            'arguments': {'docker_image': 'python:3.11-slim', 'command': f"python -c 'print({i})'"}}
+
+
+def scan_body(i: int, unique: int = 0):
+    n = i % unique if unique else i
+    return {'chain': 'ethereum', 'to_address': f"0x{n:040x}", 'value': n % 1000}
+
+
+# name -> (path, body factory)
+SCENARIOS: Dict[str, tuple] = {
+    'analysis': ('/invoke', analysis_body),
+    'compute_job': ('/invoke', compute_job_body),
+    'scan': ('/api/scan/transaction', scan_body),
+}
+
+
+async def run_load(url: str, make_body: Callable[[int], Dict[str, Any]], requests: int, concurrency: int,
+                   timeout: float = 60.0, headers: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    latencies, statuses = [], Counter()
+    counter = iter(range(requests))
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(timeout=timeout, limits=limits, headers=headers) as client:
+        async def worker():
+            for i in counter:
+                started = time.perf_counter()
+                try:
+                    response = await client.post(url, json=make_body(i))
+                    statuses[str(response.status_code)] += 1
+                except httpx.HTTPError as e:
+                    statuses[type(e).__name__] += 1
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'requests': requests,
+        'concurrency': concurrency,
+        'errors': sum(n for status, n in statuses.items() if not status.isdigit() or int(status) >= 400),
+        'statuses': dict(sorted(statuses.items())),
+        'elapsed_s': round(elapsed, 3),
+        'throughput_rps': round(requests / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+        'max_ms': round(latencies[-1] * 1000, 2) if latencies else 0.0,
+    }
+
+
+def run_scenario(base_url: str, scenario: str, requests: int, concurrency: int, unique: int = 0,
+                 deadline_ms: Optional[float] = None, timeout: float = 60.0) -> Dict[str, Any]:
+    """Runs one named scenario from SCENARIOS against `base_url` and labels the result."""
+    path, body = SCENARIOS[scenario]
+    headers = {'X-Deadline-Ms': str(deadline_ms)} if deadline_ms else None
+    result = asyncio.run(run_load(base_url.rstrip('/') + path, lambda i: body(i, unique), requests, concurrency,
+                                  timeout=timeout, headers=headers))
+    return {'scenario': scenario, **result}
+
+
+def add_load_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument('--scenarios', default='analysis,compute_job,scan',
+                        help=f"comma-separated, from {', '.join(SCENARIOS)}")
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=100)
+    parser.add_argument('--unique', type=int, default=0,
+                        help='distinct transactions to cycle through (0 = every request distinct, no cache hits)')
+    parser.add_argument('--deadline-ms', type=float, default=None, help='sent as X-Deadline-Ms')
+    parser.add_argument('--timeout', type=float, default=60.0, help='client-side timeout per request, seconds')
+    parser.add_argument('--output', default=None, help='also write the results to this JSON file')
+
+
+def scenario_names(value: str):
+    names = [name.strip() for name in value.split(',') if name.strip()]
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        raise SystemExit(f"Unknown scenario(s): {', '.join(unknown)}; choose from {', '.join(SCENARIOS)}")
+    return names
+
+
+def write_output(path: Optional[str], meta: Dict[str, Any], results):
+    if not path:
+        return
+    with open(path, 'w') as f:
+        json.dump({'meta': meta, 'results': results}, f, indent=2)
+        f.write('\n')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', required=True, help='base URL of a running AyaSentinel server')
+    add_load_arguments(parser)
+    args = parser.parse_args()
+
+    results = []
+    for scenario in scenario_names(args.scenarios):
+        result = {'target': args.url, **run_scenario(args.url, scenario, args.requests, args.concurrency,
+                                                     args.unique, args.deadline_ms, args.timeout)}
+        print(json.dumps(result), flush=True)
+        results.append(result)
+    write_output(args.output, {'argv': sys.argv[1:], 'started_at': time.time()}, results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+# gunicorn.conf.py
+# Picked up automatically by `gunicorn server.app:app` when started from the repository root.
+import os
+import shutil
+
+from server.tracing import scoped_tempdir
+
+# Import the app once in the master and fork workers from it. Clients are built lazily and
+# keep sockets, files and threads per process, so the workers share only read-only state
+# (blocklist pages, model weights) and start serving without repeating the warm-up.
+preload_app = os.getenv('GUNICORN_PRELOAD', '1') == '1'
+
+# Threaded workers: a job long-poll, an SSE job feed or an NDJSON scan stream holds one thread for
+# as long as it is open instead of the worker's only slot, and the worker keeps heartbeating to the
+# arbiter meanwhile, so `timeout` no longer cuts those requests off (it only catches hung workers).
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+threads = int(os.getenv('GUNICORN_THREADS', '32'))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '60'))
+# A long-poll must still answer well inside the timeout, should sync workers be chosen
+os.environ['JOB_MAX_WAIT'] = str(min(float(os.getenv('JOB_MAX_WAIT', '30')), timeout / 2))
+
+# Verdicts and reputation rows one worker computed are hits for the others through a table in
+# shared memory. Named after the master so a restart starts from an empty one; SHARED_CACHE_PATH
+# set to '' turns it off.
+_default_shared_cache = f"/dev/shm/aya-cache-{os.getpid()}" if os.path.isdir('/dev/shm') else ''
+os.environ.setdefault('SHARED_CACHE_PATH', _default_shared_cache)
+
+# Metrics snapshots and diagnostics files likewise: one directory per master, so two services on the
+# host never merge into one /metrics, and the directories of masters that are gone are cleared at start
+_default_dirs = {'METRICS_DIR': scoped_tempdir('aya-metrics'), 'TRACE_DIR': scoped_tempdir('aya-diagnostics')}
+for _name, _path in _default_dirs.items():
+    os.environ.setdefault(_name, _path)
+
+
+def when_ready(server):
+    # Master, after the preloaded import and before the first fork
+    if preload_app:
+        from server.app import server as mcp
+        mcp.warmup.start(wait=True)
+
+
+def post_worker_init(worker):
+    # Per-worker part of the warm-up (connection pools, call threads); GET /ready reports it
+    from server.app import server as mcp
+    mcp.warmup.start()
+
+
+def on_exit(server):
+    if _default_shared_cache and os.environ.get('SHARED_CACHE_PATH') == _default_shared_cache:
+        try:
+            os.unlink(_default_shared_cache)
+        except FileNotFoundError:
+            pass
+    for name, path in _default_dirs.items():
+        if os.environ.get(name) == path:
+            shutil.rmtree(path, ignore_errors=True)
@@ -0,0 +1,321 @@
+# server/address_index.py
+import os
+import json
+import mmap
+import time
+import fcntl
+import struct
+import logging
+import threading
+from datetime import date, timedelta
+from typing import Dict, Any, Optional, Iterable, Iterator, List, Tuple, Callable
+
+logger = logging.getLogger(__name__)
+
+# On-disk layout of a compiled index (all integers little-endian):
+#   header     HEADER_FORMAT, HEADER_SIZE bytes
+#   bloom      bloom_bits / 8 bytes (absent when bloom_bits == 0)
+#   slots      slot_count * SLOT_SIZE bytes, open addressing with linear probing
+#   metadata   JSON: source/category string tables and non-EVM addresses
+# A slot is 20 address bytes, u16 source id + 1 (0 marks an empty slot),
+# u16 category id and u32 days since 1970-01-01 the entry was added (0 = unknown).
+MAGIC = b'AYAIDX01'
+HEADER_FORMAT = '<8sQQQIQQqq'
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+SLOT_FORMAT = '<20sHHI'
+SLOT_SIZE = struct.calcsize(SLOT_FORMAT)
+MAX_LOAD_FACTOR = 0.75
+BLOOM_HASHES = 7
+BLOOM_BITS_PER_ENTRY = 10
+
+_M64 = (1 << 64) - 1
+_EPOCH = date(1970, 1, 1)
+
+Entry = Tuple[str, str, str, int]
+
+
+def normalize_address(address: str) -> Optional[bytes]:
+    """20 raw bytes for a 0x-prefixed EVM address, None for anything else."""
+    if not isinstance(address, str):
+        return None
+    hex_part = address[2:] if address[:2] in ('0x', '0X') else address
+    if len(hex_part) != 40:
+        return None
+    try:
+        return bytes.fromhex(hex_part)
+    except ValueError:
+        return None
+
+
+def _hashes(raw: bytes) -> Tuple[int, int]:
+    x = int.from_bytes(raw, 'little')
+    folded = (x ^ (x >> 64) ^ (x >> 128)) & _M64
+    h1 = (folded * 0x9E3779B97F4A7C15) & _M64
+    h2 = (((folded >> 29) ^ folded) * 0xC2B2AE3D27D4EB4F) & _M64 | 1
+    return h1, h2
+
+
+def _to_days(added: str) -> int:
+    try:
+        return (date.fromisoformat(added.strip()) - _EPOCH).days if added else 0
+    except ValueError:
+        return 0
+
+
+def _from_days(days: int) -> Optional[str]:
+    return (_EPOCH + timedelta(days=days)).isoformat() if days else None
+
+
+def parse_blocklist(path: str) -> Iterator[Entry]:
+    """
+    Reads a blocklist file with one entry per line: `address[,source[,category[,added]]]`.
+    Blank lines and lines starting with '#' are skipped; `added` is an ISO date.
+    """
+    default_source = os.path.basename(path)
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            fields = [part.strip() for part in line.split(',')]
+            fields += [''] * (4 - len(fields))
+            address, source, category, added = fields[:4]
+            yield address.lower(), source or default_source, category or 'scam', _to_days(added)
+
+
+def build_index(entries: Iterable[Entry], bloom: bool = False,
+                source_mtime_ns: int = 0, source_size: int = 0) -> bytes:
+    """Compiles blocklist entries into the binary index format."""
+    sources: Dict[str, int] = {}
+    categories: Dict[str, int] = {}
+    evm: Dict[bytes, Tuple[int, int, int]] = {}
+    other: Dict[str, List[Any]] = {}
+
+    for address, source, category, added in entries:
+        source_id = sources.setdefault(source, len(sources))
+        category_id = categories.setdefault(category, len(categories))
+        raw = normalize_address(address)
+        if raw is None:
+            other[address.lower()] = [source_id, category_id, added]
+        else:
+            evm[raw] = (source_id, category_id, added)
+    if len(sources) >= 0xFFFF or len(categories) > 0xFFFF:
+        raise ValueError("Too many distinct sources or categories for the index format")
+
+    slot_count = 8
+    while slot_count * MAX_LOAD_FACTOR < len(evm):
+        slot_count *= 2
+    shift = 64 - slot_count.bit_length() + 1
+    mask = slot_count - 1
+    bloom_bits = 0
+    if bloom and evm:
+        bloom_bits = 64
+        while bloom_bits < len(evm) * BLOOM_BITS_PER_ENTRY:
+            bloom_bits *= 2
+    bloom_array = bytearray(bloom_bits // 8)
+    slots = bytearray(slot_count * SLOT_SIZE)
+    pack_slot = struct.Struct(SLOT_FORMAT).pack_into
+
+    for raw, (source_id, category_id, added) in evm.items():
+        h1, h2 = _hashes(raw)
+        slot = h1 >> shift
+        while slots[slot * SLOT_SIZE + 20] or slots[slot * SLOT_SIZE + 21]:
+            slot = (slot + 1) & mask
+        pack_slot(slots, slot * SLOT_SIZE, raw, source_id + 1, category_id, added)
+        for i in range(BLOOM_HASHES if bloom_bits else 0):
+            bit = (h1 + i * h2) & (bloom_bits - 1)
+            bloom_array[bit >> 3] |= 1 << (bit & 7)
+
+    meta = json.dumps({
+        'sources': list(sources),
+        'categories': list(categories),
+        'other': other,
+    }).encode()
+    meta_offset = HEADER_SIZE + len(bloom_array) + len(slots)
+    header = struct.pack(HEADER_FORMAT, MAGIC, slot_count, len(evm) + len(other), bloom_bits,
+                         BLOOM_HASHES, meta_offset, len(meta), source_mtime_ns, source_size)
+    return b''.join((header, bloom_array, slots, meta))
+
+
+class _IndexView:
+    """Read-only lookups over one compiled index held in an mmap or a bytes buffer."""
+
+    def __init__(self, buffer):
+        self.buffer = buffer
+        (magic, self.slot_count, self.entry_count, self.bloom_bits, self.bloom_hashes,
+         meta_offset, meta_len, self.source_mtime_ns, self.source_size) = struct.unpack_from(HEADER_FORMAT, buffer, 0)
+        if magic != MAGIC:
+            raise ValueError("Not an address index file")
+        self.shift = 64 - self.slot_count.bit_length() + 1
+        self.mask = self.slot_count - 1
+        self.bloom_offset = HEADER_SIZE
+        self.slots_offset = HEADER_SIZE + self.bloom_bits // 8
+        meta = json.loads(bytes(buffer[meta_offset:meta_offset + meta_len]))
+        self.sources = meta['sources']
+        self.categories = meta['categories']
+        self.other = meta['other']
+        self._unpack_slot = struct.Struct(SLOT_FORMAT).unpack_from
+
+    def find(self, raw: bytes) -> Optional[Tuple[int, int, int]]:
+        h1, h2 = _hashes(raw)
+        buffer = self.buffer
+        if self.bloom_bits:
+            bloom_mask = self.bloom_bits - 1
+            for i in range(self.bloom_hashes):
+                bit = (h1 + i * h2) & bloom_mask
+                if not buffer[self.bloom_offset + (bit >> 3)] & (1 << (bit & 7)):
+                    return None
+        slot = h1 >> self.shift
+        while True:
+            offset = self.slots_offset + slot * SLOT_SIZE
+            address, source, category, added = self._unpack_slot(buffer, offset)
+            if not source:
+                return None
+            if address == raw:
+                return source - 1, category, added
+            slot = (slot + 1) & self.mask
+
+    def describe(self, source: int, category: int, added: int) -> Dict[str, Any]:
+        return {'source': self.sources[source], 'category': self.categories[category], 'added': _from_days(added)}
+
+    def lookup(self, address: str) -> Optional[Dict[str, Any]]:
+        raw = normalize_address(address)
+        if raw is None:
+            found = self.other.get(address.lower())
+        else:
+            found = self.find(raw)
+        return self.describe(*found) if found else None
+
+
+class AddressIndex:
+    """
+    Scam-address blocklist with O(1) membership. Entries come from a text source
+    file that is compiled once into a binary index next to it and memory-mapped,
+    so every worker on the host shares the same pages. The source is re-checked at
+    most every `check_interval` seconds and the index is rebuilt and remapped when
+    it changes. `add`/`remove` apply runtime overrides on top of the file.
+    """
+
+    def __init__(self, source_path: Optional[str] = None, index_path: Optional[str] = None,
+                 bloom: Optional[bool] = None, check_interval: Optional[float] = None,
+                 seed: Iterable[Any] = ()):
+        self.source_path = source_path
+        self.index_path = index_path or (f"{source_path}.idx" if source_path else None)
+        self.bloom = bloom if bloom is not None else os.getenv('SCAM_INDEX_BLOOM', '0') == '1'
+        self.check_interval = check_interval if check_interval is not None else float(os.getenv('SCAM_INDEX_CHECK_INTERVAL', '5'))
+        # Seed items are addresses (listed as builtin scams) or (address, source, category) tuples
+        self.seed = [(item.lower(), 'builtin', 'scam') if isinstance(item, str) else (item[0].lower(), item[1], item[2])
+                     for item in seed]
+        self._added: Dict[str, Dict[str, Any]] = {}
+        self._removed: set = set()
+        self._listeners: List[Callable[[], None]] = []
+        self._lock = threading.Lock()
+        self._next_check = 0.0
+        self._view = self._load()
+
+    @classmethod
+    def from_env(cls, seed: Iterable[str] = ()) -> 'AddressIndex':
+        return cls(source_path=os.getenv('SCAM_BLOCKLIST_PATH'), index_path=os.getenv('SCAM_INDEX_PATH'), seed=seed)
+
+    def on_reload(self, listener: Callable[[], None]):
+        """Registers a callback run after the index has been swapped for a new one."""
+        self._listeners.append(listener)
+
+    def __contains__(self, address: str) -> bool:
+        return self.lookup(address) is not None
+
+    def __len__(self) -> int:
+        return self._view.entry_count + len(self._added)
+
+    def lookup(self, address: str) -> Optional[Dict[str, Any]]:
+        """Metadata ({source, category, added}) for a blocklisted address, else None."""
+        if not address or not isinstance(address, str):
+            return None
+        self.maybe_reload()
+        address = address.lower()
+        if address in self._removed:
+            return None
+        if address in self._added:
+            return self._added[address]
+        return self._view.lookup(address)
+
+    def add(self, address: str, source: str = 'runtime', category: str = 'scam'):
+        address = address.lower()
+        self._removed.discard(address)
+        self._added[address] = {'source': source, 'category': category, 'added': date.today().isoformat()}
+
+    def remove(self, address: str):
+        address = address.lower()
+        self._added.pop(address, None)
+        self._removed.add(address)
+
+    def maybe_reload(self) -> bool:
+        if not self.source_path or time.monotonic() < self._next_check:
+            return False
+        with self._lock:
+            if time.monotonic() < self._next_check:
+                return False
+            self._next_check = time.monotonic() + self.check_interval
+            try:
+                stat = os.stat(self.source_path)
+            except OSError as e:
+                logger.error(f"Blocklist source unavailable, keeping current index: {e}")
+                return False
+            if (stat.st_mtime_ns, stat.st_size) == (self._view.source_mtime_ns, self._view.source_size):
+                return False
+            try:
+                view = self._load()
+            except (OSError, ValueError) as e:
+                logger.error(f"Blocklist reload failed, keeping current index: {e}")
+                return False
+            if view is None:
+                logger.error(f"Blocklist index {self.index_path} unreadable after compiling, keeping current index")
+                return False
+            # The old mapping is released once in-flight lookups drop their reference
+            self._view = view
+        logger.info(f"Blocklist reloaded from {self.source_path}: {self._view.entry_count} entries")
+        for listener in self._listeners:
+            listener()
+        return True
+
+    def _load(self) -> _IndexView:
+        if not self.source_path:
+            entries = ((address, source, category, 0) for address, source, category in self.seed)
+            return _IndexView(build_index(entries))
+        self._next_check = time.monotonic() + self.check_interval
+        stat = os.stat(self.source_path)
+        with open(f"{self.index_path}.lock", 'w') as lock:
+            # One worker compiles, the others wait and then map the finished file
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                view = self._map()
+                if view is not None and (view.source_mtime_ns, view.source_size) == (stat.st_mtime_ns, stat.st_size):
+                    return view
+                self._compile(stat)
+                return self._map()
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _compile(self, stat: os.stat_result):
+        started = time.perf_counter()
+        entries = parse_blocklist(self.source_path)
+        if self.seed:
+            entries = list(entries) + [(address, source, category, 0) for address, source, category in self.seed]
+        data = build_index(entries, bloom=self.bloom, source_mtime_ns=stat.st_mtime_ns, source_size=stat.st_size)
+        tmp_path = f"{self.index_path}.tmp.{os.getpid()}"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, self.index_path)
+        logger.info(f"Compiled blocklist index {self.index_path} in {time.perf_counter() - started:.2f}s")
+
+    def _map(self) -> Optional[_IndexView]:
+        try:
+            with open(self.index_path, 'rb') as f:
+                buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except FileNotFoundError:
+            return None
+        try:
+            return _IndexView(buffer)
+        except (ValueError, struct.error) as e:
+            logger.warning(f"Ignoring unreadable index {self.index_path}: {e}")
+            return None
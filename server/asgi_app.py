@@ -0,0 +1,379 @@
+# server/asgi_app.py
+"""
+Async (ASGI) serving mode. Exposes the same routes as the Flask app in mcp_server.py,
+but analyses await Comput3 on one event loop, so a single process can hold thousands
+of in-flight requests. Run with:
+
+    uvicorn server.asgi_app:app --host 0.0.0.0 --port $PORT
+"""
+import os
+import json
+import time
+import asyncio
+import hashlib
+import logging
+from pathlib import Path
+from urllib.parse import parse_qs
+from typing import Dict, Any, Tuple
+
+from dotenv import load_dotenv
+
+load_dotenv(Path(__file__).parent.parent / '.env')
+
+from .scam_detector import ScamDetector  # noqa: E402
+from .compute3_client import Comput3Client, AsyncComput3Client  # noqa: E402
+from .hedera_service import hedera_client  # noqa: E402
+from .audit_queue import AuditQueue  # noqa: E402
+from .lazy import Lazy  # noqa: E402
+from .resilience import Deadline, CircuitOpenError, DeadlineExceeded  # noqa: E402
+from .scan_stream import astream_verdicts, CONTENT_TYPE as NDJSON  # noqa: E402
+from .job_registry import JobRegistry, wait_query, SSE_CONTENT_TYPE  # noqa: E402
+from . import metrics  # noqa: E402
+from . import tracing  # noqa: E402
+from .mcp_server import (  # noqa: E402
+    TOOL_COMPUTE, TOOL_SCAN_DETECTION, TOOL_SAFE_TRANSACTION, TOOL_ADDRESS_REPUTATION,
+    TOOL_CONTENT_VERIFICATION, TOOL_SAFE_ALTERNATIVES, request_deadline, build_warmup,
+    reputation_query, compute_job_result, events_cursor, admin_denied, MAX_BATCH_SIZE, MAX_SCORE_BATCH_SIZE,
+)
+
+logger = logging.getLogger(__name__)
+
+MAX_BODY_BYTES = int(os.getenv('MAX_BODY_BYTES', str(10 * 1024 * 1024)))
+
+Response = Tuple[int, Any]
+
+
+class AsyncMCPServer:
+    def __init__(self):
+        self.comput3_client = Lazy(lambda: AsyncComput3Client(os.getenv('COMPUT3_API_KEY')), 'comput3_client')
+        self.audit_queue = AuditQueue(lambda message: hedera_client.submit_message_to_topic(message))
+        # Sync Comput3 client is never used on this path; analyses go through compute3_async
+        self.scam_detector = Lazy(lambda: ScamDetector(hedera_client, None, audit_queue=self.audit_queue,
+                                                       async_comput3_client=self.comput3_client), 'scam_detector')
+        # The job poller is a thread, so it polls through the sync client; waiting happens on the loop
+        self.job_status_client = Lazy(lambda: Comput3Client(os.getenv('COMPUT3_API_KEY')), 'job_status_client')
+        self.jobs = JobRegistry(lambda job_ids: self.job_status_client.job_statuses(job_ids))
+        self.warmup = build_warmup(self.comput3_client, self.scam_detector)
+        self.routes = {
+            ('GET', '/'): self.health_check,
+            ('GET', '/ready'): self.readiness,
+            ('GET', '/tools'): self.list_tools,
+            ('POST', '/invoke'): self.invoke_tool,
+            ('POST', '/invoke/batch'): self.invoke_batch,
+            ('POST', '/api/scan/transaction'): self.scan_transaction,
+            ('POST', '/api/score/batch'): self.score_batch,
+            ('GET', '/metrics'): self.metrics_endpoint,
+            ('POST', '/admin/profile'): self.start_profile,
+            ('GET', '/admin/traces'): self.slow_traces,
+            ('POST', '/admin/traces'): self.trace_sampling,
+        }
+        # These answer through `send` themselves and return the status they sent
+        self.stream_routes = {
+            ('POST', '/api/scan/stream'): self.scan_stream,
+        }
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            return
+
+        started = time.perf_counter()
+        headers = self._headers(scope)
+        trace = tracing.tracer.begin(headers)
+        path = route = scope['path']
+        handler = self.routes.get((scope['method'], path))
+        stream_handler = self.stream_routes.get((scope['method'], path))
+        if handler is None and scope['method'] == 'GET' and path.startswith('/jobs/') and path.endswith('/events'):
+            route, stream_handler = '/jobs/<job_id>/events', self.job_events
+        if stream_handler is not None:
+            status = await stream_handler(scope, receive, send)
+        elif handler is None and scope['method'] == 'GET' and path.startswith('/audit/'):
+            route = '/audit/<audit_id>'
+            status, body = self.audit_status(path[len('/audit/'):])
+        elif handler is None and scope['method'] == 'GET' and path.startswith('/api/verify/'):
+            route = '/api/verify/<log_hash>'
+            status, body = self.verify_log_hash(path[len('/api/verify/'):])
+        elif handler is None and scope['method'] == 'GET' and path.startswith('/api/graph/'):
+            route = '/api/graph/<address>'
+            status, body = self.graph_neighbourhood(path[len('/api/graph/'):])
+        elif handler is None and scope['method'] == 'GET' and path.startswith('/admin/profile/'):
+            route = '/admin/profile/<profile_id>'
+            status, body = self.profile_result(path[len('/admin/profile/'):], headers)
+        elif handler is None and scope['method'] == 'GET' and path.startswith('/jobs/'):
+            route = '/jobs/<job_id>'
+            try:
+                status, body = await self.job_status(scope)
+            except ValueError as e:
+                status, body = 400, {"error": str(e)}
+        elif handler is None:
+            route = 'unmatched'
+            status, body = 404, {"error": f"No route for {scope['method']} {path}"}
+        else:
+            try:
+                data = await self._read_json(receive) if scope['method'] == 'POST' else None
+                status, body = await handler(data, headers)
+            except ValueError as e:
+                status, body = 400, {"error": str(e)}
+            except Exception as e:
+                logger.error(f"Critical error in {path}: {e}", exc_info=True)
+                status, body = 500, {"error": "An unexpected server error occurred."}
+        timing = tracing.tracer.end(trace, route, status)
+        if stream_handler is None:
+            extra = [(b'server-timing', timing.encode())] if timing else []
+            if isinstance(body, bytes):
+                content_type = b'text/plain; version=0.0.4' if route == '/metrics' else b'text/plain; charset=utf-8'
+                await self._send(send, status, body, content_type, extra)
+            else:
+                await self._send(send, status, json.dumps(body).encode(), b'application/json', extra)
+        metrics.observe('aya_http_request_duration_seconds', time.perf_counter() - started, route=route)
+        metrics.inc('aya_http_requests_total', route=route, method=scope['method'], status=str(status))
+
+    async def health_check(self, data, headers) -> Response:
+        return 200, {"status": "AyaSentinel MCP Tool is running"}
+
+    async def readiness(self, data, headers) -> Response:
+        self.warmup.start()
+        status = self.warmup.status()
+        return 200 if status["ready"] else 503, status
+
+    async def metrics_endpoint(self, data, headers) -> Response:
+        return 200, metrics.registry.render().encode()
+
+    async def list_tools(self, data, headers) -> Response:
+        return 200, [
+            TOOL_COMPUTE,
+            TOOL_SCAN_DETECTION,
+            TOOL_SAFE_TRANSACTION,
+            TOOL_ADDRESS_REPUTATION,
+            TOOL_CONTENT_VERIFICATION,
+            TOOL_SAFE_ALTERNATIVES
+        ]
+
+    async def scan_transaction(self, data, headers) -> Response:
+        tx_hash = hashlib.sha256(json.dumps(data).encode()).hexdigest()
+        audit_id = self.audit_queue.submit(tx_hash)
+        return 202, {"txHash": tx_hash, "status": "pending", "audit_id": audit_id}
+
+    async def scan_stream(self, scope, receive, send) -> int:
+        deadline_ms = self._headers(scope).get('X-Deadline-Ms')
+        try:
+            Deadline.from_ms(deadline_ms)
+        except ValueError as e:
+            await self._send(send, 400, json.dumps({"error": str(e)}).encode(), b'application/json')
+            return 400
+
+        async def body():
+            while True:
+                message = await receive()
+                if message['type'] == 'http.disconnect':
+                    return
+                yield message.get('body', b'')
+                if not message.get('more_body'):
+                    return
+
+        async def emit(line: bytes):
+            await send({'type': 'http.response.body', 'body': line, 'more_body': True})
+
+        await send({'type': 'http.response.start', 'status': 200, 'headers': [(b'content-type', NDJSON.encode())]})
+        await astream_verdicts(self.scam_detector.analyze_transaction_async, body(), emit, deadline_ms)
+        await send({'type': 'http.response.body', 'body': b''})
+        return 200
+
+    async def job_status(self, scope) -> Response:
+        job_id = scope['path'][len('/jobs/'):]
+        query = parse_qs(scope.get('query_string', b'').decode())
+        wait, after = wait_query(query.get('wait', [None])[0], query.get('version', [None])[0])
+        job = self.jobs.follow(job_id)
+        if job is None:
+            return 404, {"error": f"Invalid job id '{job_id}'"}
+        if wait > 0:
+            # Long poll without holding a thread: the poller wakes this request on the loop
+            job = await self.jobs.wait_async(job_id, after, wait) or job
+        return 200, job
+
+    async def job_events(self, scope, receive, send) -> int:
+        job_id = scope['path'][len('/jobs/'):-len('/events')]
+        query = parse_qs(scope.get('query_string', b'').decode())
+        try:
+            after = events_cursor(self._headers(scope), query.get('version', [None])[0])
+        except ValueError as e:
+            await self._send(send, 400, json.dumps({"error": str(e)}).encode(), b'application/json')
+            return 400
+        if self.jobs.follow(job_id) is None:
+            await self._send(send, 404, json.dumps({"error": f"Invalid job id '{job_id}'"}).encode(), b'application/json')
+            return 404
+
+        async def disconnected():
+            while (await receive())['type'] != 'http.disconnect':
+                pass
+
+        await send({'type': 'http.response.start', 'status': 200,
+                    'headers': [(b'content-type', SSE_CONTENT_TYPE.encode()), (b'cache-control', b'no-cache')]})
+        # Stop following the job as soon as the client goes away
+        watcher = asyncio.ensure_future(disconnected())
+        try:
+            async for event in self.jobs.aevents(job_id, after):
+                if watcher.done():
+                    break
+                await send({'type': 'http.response.body', 'body': event, 'more_body': True})
+        finally:
+            watcher.cancel()
+        await send({'type': 'http.response.body', 'body': b''})
+        return 200
+
+    def audit_status(self, audit_id: str) -> Response:
+        status = self.audit_queue.status(audit_id)
+        if status is None:
+            return 404, {"error": f"Unknown audit id '{audit_id}'"}
+        return 200, status
+
+    def verify_log_hash(self, log_hash: str) -> Response:
+        result = hedera_client.verify_anchored(log_hash)
+        if result.get("error"):
+            return 400, result
+        return 200 if result.get("status") == "anchored" else 404, result
+
+    def graph_neighbourhood(self, address: str) -> Response:
+        found = self.scam_detector.graph.describe(address)
+        if found is None:
+            return 404, {"error": f"No interactions seen for '{address}'"}
+        return 200, found
+
+    async def start_profile(self, data, headers) -> Response:
+        denied = admin_denied(headers)
+        if denied:
+            return 403, denied
+        data = data or {}
+        # ValueError becomes a 400 in __call__
+        return 202, tracing.tracer.start_profile(data.get("seconds", 10), data.get("interval_ms", 10))
+
+    def profile_result(self, profile_id: str, headers) -> Response:
+        denied = admin_denied(headers)
+        if denied:
+            return 403, denied
+        found = tracing.tracer.profile(profile_id)
+        if found is None:
+            return 404, {"error": f"Unknown profile '{profile_id}'"}
+        finished, folded = found
+        if not finished:
+            return 202, {"profile_id": profile_id, "status": "running"}
+        return 200, folded.encode()
+
+    async def slow_traces(self, data, headers) -> Response:
+        denied = admin_denied(headers)
+        if denied:
+            return 403, denied
+        return 200, {"traces": tracing.tracer.slowest()}
+
+    async def trace_sampling(self, data, headers) -> Response:
+        denied = admin_denied(headers)
+        if denied:
+            return 403, denied
+        data = data or {}
+        return 200, tracing.tracer.set_sampling(data.get("sample_rate", 1), data.get("seconds", 60))
+
+    async def invoke_tool(self, data, headers) -> Response:
+        if not data or "tool" not in data:
+            return 400, {"error": "Invalid request, 'tool' is required"}
+
+        tool_name = data.get("tool")
+        arguments = data.get("arguments", {})
+        deadline = request_deadline(data, headers)
+
+        result = None
+        started = time.perf_counter()
+        if tool_name == "hedera_compute_job":
+            try:
+                job_id = await self.comput3_client.run_compute_job(arguments.get("docker_image"), arguments.get("command"),
+                                                                   deadline=deadline)
+            except CircuitOpenError as e:
+                return 503, {"error": "Upstream temporarily unavailable", "details": str(e)}
+            except DeadlineExceeded as e:
+                return 504, {"error": "Deadline exceeded", "details": str(e)}
+            result = compute_job_result(self.jobs.track(job_id))
+        elif tool_name == "analyze_transaction_risk":
+            result = await self.scam_detector.analyze_transaction_async(arguments, deadline=deadline)
+        elif tool_name == "address_reputation":
+            # ValueError becomes a 400 in __call__
+            chain, addresses = reputation_query(arguments)
+            result = {"chain": chain, "reputations": self.scam_detector.address_reputation(addresses, chain)}
+        else:
+            return 404, {"error": f"Tool '{tool_name}' not found"}
+
+        failed = not result or result.get("error")
+        metrics.observe('aya_tool_duration_seconds', time.perf_counter() - started, tool=tool_name)
+        metrics.inc('aya_tool_calls_total', tool=tool_name, outcome='error' if failed else 'success')
+        if failed:
+            return 500, {"error": "Analysis failed", "details": result}
+        return 200, {"result": result}
+
+    async def invoke_batch(self, data, headers) -> Response:
+        if not data or data.get("tool") != "analyze_transaction_risk":
+            return 400, {"error": "Invalid request, batch mode supports 'analyze_transaction_risk' only"}
+        transactions = data.get("arguments")
+        if not isinstance(transactions, list):
+            return 400, {"error": "Invalid request, 'arguments' must be a list of transactions"}
+        if len(transactions) > MAX_BATCH_SIZE:
+            return 413, {"error": f"Batch too large, at most {MAX_BATCH_SIZE} transactions are allowed"}
+        deadline = request_deadline(data, headers)
+        return 200, {"results": await self.scam_detector.analyze_batch_async(transactions, deadline=deadline)}
+
+    async def score_batch(self, data, headers) -> Response:
+        transactions = data.get("transactions") if isinstance(data, dict) else None
+        if not isinstance(transactions, list) or not all(isinstance(tx, dict) for tx in transactions):
+            return 400, {"error": "Invalid request, 'transactions' must be a list of JSON objects"}
+        if len(transactions) > MAX_SCORE_BATCH_SIZE:
+            return 413, {"error": f"Batch too large, at most {MAX_SCORE_BATCH_SIZE} transactions are allowed"}
+        # No I/O, but a large batch is CPU for a while: scored off the loop
+        scores = await asyncio.to_thread(self.scam_detector.score_local_batch, transactions)
+        return 200, {"model_version": self.scam_detector.local_model.version, "scores": scores}
+
+    @staticmethod
+    def _headers(scope) -> Dict[str, str]:
+        return {k.decode('latin-1').title(): v.decode('latin-1') for k, v in scope.get('headers', [])}
+
+    async def _read_json(self, receive) -> Dict[str, Any]:
+        chunks, size = [], 0
+        while True:
+            message = await receive()
+            chunk = message.get('body', b'')
+            size += len(chunk)
+            if size > MAX_BODY_BYTES:
+                raise ValueError("Request body too large")
+            chunks.append(chunk)
+            if not message.get('more_body'):
+                break
+        try:
+            with metrics.timer('aya_stage_duration_seconds', stage='json_parse'):
+                return json.loads(b''.join(chunks) or b'null')
+        except json.JSONDecodeError:
+            raise ValueError("Request body must be valid JSON")
+
+    async def _send(self, send, status: int, payload: bytes, content_type: bytes, extra_headers=()):
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [(b'content-type', content_type), (b'content-length', str(len(payload)).encode()),
+                        *extra_headers],
+        })
+        await send({'type': 'http.response.body', 'body': payload})
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                # Warm-up continues in the background; GET /ready reports when it is done
+                self.warmup.start()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                if self.comput3_client.peek() is not None:
+                    await self.comput3_client.aclose()
+                self.audit_queue.close()
+                self.jobs.close()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+
+app = AsyncMCPServer()
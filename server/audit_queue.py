@@ -0,0 +1,271 @@
+# server/audit_queue.py
+import os
+import json
+import time
+import uuid
+import fcntl
+import atexit
+import sqlite3
+import logging
+import threading
+from collections import deque
+from typing import Dict, Any, Optional, Callable
+
+logger = logging.getLogger(__name__)
+
+POLICIES = ('block', 'drop_oldest', 'spill')
+# Status rows beyond the retention limit are pruned every this many writes
+_PRUNE_EVERY = 1024
+
+
+class AuditStatusStore:
+    """
+    SQLite table of audit statuses. Workers share the spill file, so a message one
+    worker queued may be submitted by another; keeping statuses here lets any worker
+    answer for any audit id. A write older than the stored status (a worker catching
+    up on statuses another one has moved on) is ignored. All but the `retention`
+    most recently added rows are pruned.
+    """
+
+    def __init__(self, path: str, retention: int):
+        self.path = path
+        self.retention = retention
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+        self._writes = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        # One connection per process; a forked worker must not reuse the parent's
+        if self._conn is None or self._pid != os.getpid():
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            # Statuses are advisory: no fsync per write
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS statuses (audit_id TEXT PRIMARY KEY, entry TEXT, updated_at REAL)")
+            self._pid = os.getpid()
+        return self._conn
+
+    def put_many(self, entries: Dict[str, Dict[str, Any]]):
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.executemany("INSERT INTO statuses VALUES (?, ?, ?) ON CONFLICT (audit_id) DO UPDATE "
+                                 "SET entry = excluded.entry, updated_at = excluded.updated_at "
+                                 "WHERE excluded.updated_at >= statuses.updated_at",
+                                 [(audit_id, json.dumps(entry), entry['updated_at'])
+                                  for audit_id, entry in entries.items()])
+                writes, self._writes = self._writes, self._writes + len(entries)
+                if writes // _PRUNE_EVERY != self._writes // _PRUNE_EVERY:
+                    conn.execute("DELETE FROM statuses WHERE rowid <= (SELECT MAX(rowid) FROM statuses) - ?",
+                                 (self.retention,))
+
+    def get(self, audit_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._connection().execute("SELECT entry FROM statuses WHERE audit_id = ?", (audit_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+
+class AuditQueue:
+    """
+    Moves Hedera audit submissions off the request path. `submit` enqueues a message
+    and returns an audit id immediately; worker threads drain the queue into
+    `submit_fn` (e.g. `hedera_client.submit_message_to_topic`) and record the outcome,
+    which `status(audit_id)` reports later.
+
+    When the queue is full the backpressure policy decides what happens:
+      block       - the caller waits for room (at most `block_timeout` seconds, then spills)
+      drop_oldest - the oldest pending message is discarded and marked 'dropped'
+      spill       - the new message is appended to `spill_path` and re-queued once there is room
+
+    Statuses are kept in an AuditStatusStore at `status_path` (by default next to the
+    spill file), so every worker sharing the spill file reports the same status. The
+    request path only records them in memory; the audit threads write them out.
+    """
+
+    def __init__(self, submit_fn: Callable[[str], Dict[str, Any]], max_size: Optional[int] = None,
+                 workers: Optional[int] = None, policy: Optional[str] = None,
+                 spill_path: Optional[str] = None, retention: Optional[int] = None,
+                 block_timeout: float = 5.0, status_path: Optional[str] = None):
+        self.submit_fn = submit_fn
+        self.max_size = max_size or int(os.getenv('AUDIT_QUEUE_SIZE', '10000'))
+        self.workers = workers or int(os.getenv('AUDIT_WORKERS', '2'))
+        self.policy = policy or os.getenv('AUDIT_BACKPRESSURE', 'spill')
+        if self.policy not in POLICIES:
+            raise ValueError(f"AUDIT_BACKPRESSURE must be one of {', '.join(POLICIES)}")
+        self.spill_path = spill_path or os.getenv('AUDIT_SPILL_PATH', 'audit_spill.jsonl')
+        self.retention = retention or int(os.getenv('AUDIT_STATUS_RETENTION', '100000'))
+        self.block_timeout = block_timeout
+        self.status_path = (status_path or os.getenv('AUDIT_STATUS_DB')
+                            or os.path.splitext(self.spill_path)[0] + '_status.db')
+
+        self._queue: deque = deque()
+        self._statuses = AuditStatusStore(self.status_path, self.retention)
+        # Statuses set in this process and not yet in the store
+        self._unwritten: Dict[str, Dict[str, Any]] = {}
+        self._cond = threading.Condition()
+        self._threads = []
+        self._pid = None
+        self._closing = False
+        # Messages spilled by an earlier run are picked up again by the workers
+        self._spilled = self._count_spilled()
+        self.submitted = 0
+        self.failed = 0
+        self.dropped = 0
+        atexit.register(self.close)
+
+    def submit(self, message: str) -> str:
+        audit_id = uuid.uuid4().hex
+        self._ensure_workers()
+        with self._cond:
+            if len(self._queue) >= self.max_size:
+                if self.policy == 'drop_oldest':
+                    dropped_id, _ = self._queue.popleft()
+                    self._set_status(dropped_id, 'dropped')
+                    self.dropped += 1
+                elif self.policy == 'block':
+                    self._cond.wait_for(lambda: len(self._queue) < self.max_size, timeout=self.block_timeout)
+            if len(self._queue) >= self.max_size or self._closing:
+                self._spill([(audit_id, message)])
+                self._set_status(audit_id, 'spilled')
+                return audit_id
+            self._queue.append((audit_id, message))
+            self._set_status(audit_id, 'pending')
+            self._cond.notify()
+        return audit_id
+
+    def status(self, audit_id: str) -> Optional[Dict[str, Any]]:
+        with self._cond:
+            local = self._unwritten.get(audit_id)
+        # Another worker may have taken the message over from the spill file since
+        stored = self._statuses.get(audit_id)
+        status = max((s for s in (local, stored) if s), key=lambda s: s['updated_at'], default=None)
+        return dict(status, audit_id=audit_id) if status else None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {'queued': len(self._queue), 'spilled': self._spilled, 'submitted': self.submitted,
+                    'failed': self.failed, 'dropped': self.dropped, 'policy': self.policy}
+
+    def close(self, timeout: float = 10.0):
+        """Stops accepting work into memory and drains what is queued; leftovers are spilled."""
+        with self._cond:
+            if self._closing:
+                return
+            self._closing = True
+            self._cond.notify_all()
+        deadline = time.monotonic() + timeout
+        for thread in self._threads:
+            thread.join(max(0.0, deadline - time.monotonic()))
+        with self._cond:
+            if self._queue:
+                logger.warning(f"Audit queue closed with {len(self._queue)} messages left; spilling to {self.spill_path}")
+                self._spill(list(self._queue))
+                for audit_id, _ in self._queue:
+                    self._set_status(audit_id, 'spilled')
+                self._queue.clear()
+        self._write_statuses()
+
+    def _ensure_workers(self):
+        # Threads do not survive fork, so a worker process starts its own on first use
+        if self._pid == os.getpid():
+            return
+        with self._cond:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._threads = [threading.Thread(target=self._run, name=f"audit-{i}", daemon=True)
+                             for i in range(self.workers)]
+            for thread in self._threads:
+                thread.start()
+
+    def _run(self):
+        while True:
+            self._write_statuses()
+            with self._cond:
+                if not self._queue and self._spilled and not self._closing:
+                    self._reload_spill()
+                self._cond.wait_for(lambda: self._queue or self._closing, timeout=1.0)
+                if not self._queue:
+                    if self._closing:
+                        return
+                    continue
+                audit_id, message = self._queue.popleft()
+                self._cond.notify_all()
+            try:
+                result = self.submit_fn(message)
+            except Exception as e:
+                result = {'success': False, 'error': str(e)}
+            with self._cond:
+                if result.get('success'):
+                    self.submitted += 1
+                    self._set_status(audit_id, 'submitted', result)
+                else:
+                    self.failed += 1
+                    logger.error(f"Audit submission {audit_id} failed: {result.get('error')}")
+                    self._set_status(audit_id, 'failed', result)
+
+    def _write_statuses(self):
+        with self._cond:
+            if not self._unwritten:
+                return
+            batch = dict(self._unwritten)
+        try:
+            self._statuses.put_many(batch)
+        except sqlite3.Error as e:
+            logger.error(f"Writing {len(batch)} audit statuses to {self.status_path} failed: {e}")
+            return
+        with self._cond:
+            # Entries replaced meanwhile stay for the next write
+            for audit_id, entry in batch.items():
+                if self._unwritten.get(audit_id) is entry:
+                    del self._unwritten[audit_id]
+
+    def _set_status(self, audit_id: str, status: str, result: Optional[Dict[str, Any]] = None):
+        # Caller holds the condition's lock
+        entry = {'status': status, 'updated_at': time.time()}
+        if result is not None:
+            entry['result'] = result
+        self._unwritten[audit_id] = entry
+
+    def _spill(self, items):
+        with open(self.spill_path, 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            f.write(''.join(json.dumps({'audit_id': a, 'message': m}) + '\n' for a, m in items))
+            fcntl.flock(f, fcntl.LOCK_UN)
+        self._spilled += len(items)
+
+    def _count_spilled(self) -> int:
+        try:
+            with open(self.spill_path) as f:
+                return sum(1 for _ in f)
+        except FileNotFoundError:
+            return 0
+
+    def _reload_spill(self):
+        # Caller holds the condition's lock; takes back as much as fits in memory
+        try:
+            with open(self.spill_path, 'r+') as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                lines = f.readlines()
+                room = self.max_size - len(self._queue)
+                taken, rest = lines[:room], lines[room:]
+                f.seek(0)
+                f.truncate()
+                f.writelines(rest)
+                fcntl.flock(f, fcntl.LOCK_UN)
+        except FileNotFoundError:
+            self._spilled = 0
+            return
+        for line in taken:
+            # A torn write (crash mid-append) or a hand-edited file must not stop the audit threads
+            try:
+                item = json.loads(line)
+                audit_id, message = item['audit_id'], item['message']
+            except (ValueError, TypeError, KeyError) as e:
+                if line.strip():
+                    logger.error(f"Skipping unreadable line in {self.spill_path}: {e}: {line[:200]!r}")
+                continue
+            self._queue.append((audit_id, message))
+            self._set_status(audit_id, 'pending')
+        self._spilled = len(rest)
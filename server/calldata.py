@@ -0,0 +1,320 @@
+# server/calldata.py
+import os
+import json
+import logging
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Any, List, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+INDEX_FORMAT = 1
+DEFAULT_INDEX_PATH = Path(__file__).parent / 'models' / 'selectors.json'
+# Multicall wrappers are followed this many levels deep, and at most MAX_CALLS calls are decoded per transaction
+MAX_DEPTH = 3
+MAX_CALLS = 64
+# Longest dynamic array decoded; anything longer is treated as malformed
+MAX_ARRAY = 1024
+# bytes/string values copied out per transaction, as a multiple of its calldata length. A standard encoding
+# copies each byte once per multicall level; offsets aliasing one blob would copy it once per element.
+MAX_COPY_FACTOR = MAX_DEPTH + 1
+
+_ADDRESS_MASK = (1 << 160) - 1
+
+
+class DecodeError(ValueError):
+    pass
+
+
+class _Budget:
+    __slots__ = ('remaining',)
+
+    def __init__(self, remaining: int):
+        self.remaining = remaining
+
+    def take(self, size: int):
+        self.remaining -= size
+        if self.remaining < 0:
+            raise DecodeError("Calldata decodes to more bytes than it holds (aliased offsets?)")
+
+
+# ---- ABI types -----------------------------------------------------------
+# A parsed type is a tuple: ('address',), ('bool',), ('uint',), ('int',), ('fixed_bytes', n),
+# ('bytes',), ('string',), ('array', element, length or None) or ('tuple', (members...)).
+
+def _split(inner: str) -> List[str]:
+    parts, depth, start = [], 0, 0
+    for i, c in enumerate(inner):
+        if c == '(':
+            depth += 1
+        elif c == ')':
+            depth -= 1
+        elif c == ',' and depth == 0:
+            parts.append(inner[start:i])
+            start = i + 1
+    if inner:
+        parts.append(inner[start:])
+    return parts
+
+
+def parse_type(text: str) -> tuple:
+    text = text.strip()
+    if text.endswith(']'):
+        bracket = text.rindex('[')
+        size = text[bracket + 1:-1]
+        return ('array', parse_type(text[:bracket]), int(size) if size else None)
+    if text.startswith('('):
+        return ('tuple', tuple(parse_type(member) for member in _split(text[1:-1])))
+    if text in ('address', 'bool', 'bytes', 'string'):
+        return (text,)
+    if text.startswith('uint'):
+        return ('uint',)
+    if text.startswith('int'):
+        return ('int',)
+    if text.startswith('bytes') and text[5:].isdigit():
+        return ('fixed_bytes', int(text[5:]))
+    raise ValueError(f"Unsupported ABI type {text!r}")
+
+
+def parse_signature(signature: str) -> Tuple[str, tuple]:
+    """'approve(address,uint256)' -> ('approve', (('address',), ('uint',)))"""
+    name, _, rest = signature.partition('(')
+    if not name or not rest.endswith(')'):
+        raise ValueError(f"Malformed function signature {signature!r}")
+    return name, tuple(parse_type(arg) for arg in _split(rest[:-1]))
+
+
+@lru_cache(maxsize=None)
+def _dynamic(t: tuple) -> bool:
+    if t[0] in ('bytes', 'string'):
+        return True
+    if t[0] == 'array':
+        return t[2] is None or _dynamic(t[1])
+    if t[0] == 'tuple':
+        return any(_dynamic(member) for member in t[1])
+    return False
+
+
+@lru_cache(maxsize=None)
+def _head_size(t: tuple) -> int:
+    if _dynamic(t):
+        return 32
+    if t[0] == 'tuple':
+        return sum(_head_size(member) for member in t[1])
+    if t[0] == 'array':
+        return t[2] * _head_size(t[1])
+    return 32
+
+
+def _word(data: bytes, pos: int) -> int:
+    if pos + 32 > len(data):
+        raise DecodeError("Calldata ends in the middle of an argument")
+    return int.from_bytes(data[pos:pos + 32], 'big')
+
+
+def _decode(t: tuple, data: bytes, pos: int, budget: _Budget) -> Any:
+    kind = t[0]
+    if kind == 'tuple':
+        return _decode_sequence(t[1], data, pos, budget)
+    if kind == 'array':
+        length = t[2]
+        if length is None:
+            length = _word(data, pos)
+            pos += 32
+            if length > MAX_ARRAY or length * 32 > len(data) - pos:
+                raise DecodeError(f"Array of {length} elements does not fit the calldata")
+        return _decode_sequence((t[1],) * length, data, pos, budget)
+    if kind in ('bytes', 'string'):
+        size = _word(data, pos)
+        start = pos + 32
+        if start + size > len(data):
+            raise DecodeError(f"{kind} of {size} bytes does not fit the calldata")
+        budget.take(size)
+        raw = data[start:start + size]
+        return raw if kind == 'bytes' else raw.decode('utf-8', 'replace')
+    word = _word(data, pos)
+    if kind == 'address':
+        return '0x%040x' % (word & _ADDRESS_MASK)
+    if kind == 'bool':
+        return word != 0
+    if kind == 'int' and word >> 255:
+        return word - (1 << 256)
+    if kind == 'fixed_bytes':
+        return data[pos:pos + t[1]]
+    return word
+
+
+def _decode_sequence(types: tuple, data: bytes, base: int, budget: _Budget) -> list:
+    # Head/tail encoding: static values inline, dynamic ones behind an offset from `base`.
+    # Tails follow the heads in order, so an offset into the heads or not past the previous one is malformed.
+    values, head = [], base
+    previous = sum(_head_size(t) for t in types) - 1
+    for t in types:
+        if _dynamic(t):
+            offset = _word(data, head)
+            if offset >= len(data) - base:
+                raise DecodeError("Argument offset points past the calldata")
+            if offset <= previous:
+                raise DecodeError("Argument offset overlaps the heads or an earlier argument")
+            previous = offset
+            values.append(_decode(t, data, base + offset, budget))
+        else:
+            values.append(_decode(t, data, head, budget))
+        head += _head_size(t)
+    return values
+
+
+def decode_arguments(types: tuple, payload: bytes, budget: Optional[_Budget] = None) -> list:
+    """ABI-decodes the arguments that follow a selector; DecodeError if they are malformed."""
+    return _decode_sequence(types, payload, 0, budget or _Budget(MAX_COPY_FACTOR * len(payload)))
+
+
+# ---- selector index ------------------------------------------------------
+
+class Function(NamedTuple):
+    selector: str            # 8 lower-case hex digits
+    name: str
+    signature: str
+    kind: str                # approval, permit, transfer, multicall, ...
+    types: tuple
+    roles: Dict[str, tuple]  # role -> path of argument indexes
+
+
+class Call(NamedTuple):
+    function: Function
+    args: list
+    target: Optional[str]    # None: the transaction's own to_address
+    depth: int               # 0 for the top-level call, 1+ inside multicalls
+
+    def role(self, name: str) -> Any:
+        path = self.function.roles.get(name)
+        if path is None:
+            return None
+        value = self.args
+        for i in path:
+            if not isinstance(value, list) or i >= len(value):
+                return None
+            value = value[i]
+        return value
+
+
+class SelectorIndex:
+    """
+    4-byte selector -> Function, loaded from a versioned JSON file:
+
+        {"format": 1, "version": "...", "selectors": {"095ea7b3": {"signature": "approve(address,uint256)",
+                                                                  "kind": "approval", "roles": {"spender": 0}}}}
+
+    Signatures are parsed once at load time, so decoding a call is a dict lookup
+    plus the ABI walk over its arguments.
+    """
+
+    def __init__(self, functions: Dict[str, Function], version: str):
+        self.functions = functions
+        self.version = version
+
+    @classmethod
+    def from_spec(cls, spec: Dict[str, Any]) -> 'SelectorIndex':
+        if spec.get('format') != INDEX_FORMAT:
+            raise ValueError(f"Unsupported selector index format {spec.get('format')!r} (expected {INDEX_FORMAT})")
+        functions = {}
+        for selector, entry in spec['selectors'].items():
+            selector = selector.lower().removeprefix('0x')
+            if len(selector) != 8:
+                raise ValueError(f"Selector {selector!r} is not 4 bytes")
+            name, types = parse_signature(entry['signature'])
+            roles = {role: (path,) if isinstance(path, int) else tuple(path)
+                     for role, path in entry.get('roles', {}).items()}
+            functions[selector] = Function(selector, name, entry['signature'], entry.get('kind', 'other'), types, roles)
+        return cls(functions, str(spec.get('version', 'unversioned')))
+
+    @classmethod
+    def load(cls, path) -> 'SelectorIndex':
+        with open(path) as f:
+            index = cls.from_spec(json.load(f))
+        logger.info(f"Loaded selector index {index.version} ({len(index)} selectors) from {path}")
+        return index
+
+    @classmethod
+    def from_env(cls) -> 'SelectorIndex':
+        return cls.load(os.getenv('SELECTOR_INDEX_PATH') or DEFAULT_INDEX_PATH)
+
+    def __len__(self) -> int:
+        return len(self.functions)
+
+    def get(self, selector: str) -> Optional[Function]:
+        return self.functions.get(selector)
+
+    def of_kind(self, kind: str) -> List[str]:
+        return [selector for selector, function in self.functions.items() if function.kind == kind]
+
+
+# ---- decoder -------------------------------------------------------------
+
+class CalldataDecoder:
+    """
+    Decodes transaction calldata into a flat list of known calls, following
+    multicall wrappers (the `calls` role: bytes[] or (address, ..., bytes)[]) up to
+    MAX_DEPTH levels. Calls with selectors the index does not know are skipped
+    without being parsed. The same payloads (approvals of popular tokens, wallet
+    multicalls) recur constantly, so results are memoized per calldata string, up
+    to `memo_max_bytes` of calldata each.
+    """
+
+    def __init__(self, index: Optional[SelectorIndex] = None, memo_size: Optional[int] = None,
+                 memo_max_bytes: Optional[int] = None):
+        self.index = index if index is not None else SelectorIndex.from_env()
+        self.memo_size = memo_size if memo_size is not None else int(os.getenv('CALLDATA_MEMO_SIZE', '4096'))
+        self.memo_max_bytes = memo_max_bytes if memo_max_bytes is not None else int(os.getenv('CALLDATA_MEMO_MAX_BYTES', '8192'))
+        self._memo: "OrderedDict[str, Tuple[Call, ...]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def decode(self, data: Any) -> Tuple[Call, ...]:
+        if not isinstance(data, str) or len(data) < 8:
+            return ()
+        data = data.lower().removeprefix('0x')
+        if data[:8] not in self.index.functions:
+            return ()
+        with self._lock:
+            calls = self._memo.get(data)
+            if calls is not None:
+                self._memo.move_to_end(data)
+                return calls
+        try:
+            raw = bytes.fromhex(data)
+        except ValueError:
+            return ()
+        found: List[Call] = []
+        self._walk(raw, None, 0, found, _Budget(MAX_COPY_FACTOR * len(raw)))
+        calls = tuple(found)
+        if self.memo_size > 0 and len(raw) <= self.memo_max_bytes:
+            with self._lock:
+                self._memo[data] = calls
+                if len(self._memo) > self.memo_size:
+                    self._memo.popitem(last=False)
+        return calls
+
+    def _walk(self, raw: bytes, target: Optional[str], depth: int, found: List[Call], budget: _Budget):
+        if len(found) >= MAX_CALLS:
+            return
+        function = self.index.get(raw[:4].hex())
+        if function is None:
+            return
+        try:
+            args = decode_arguments(function.types, raw[4:], budget)
+        except DecodeError as e:
+            logger.debug(f"Malformed {function.name} calldata: {e}")
+            return
+        call = Call(function, args, target, depth)
+        found.append(call)
+        inner = call.role('calls')
+        if depth >= MAX_DEPTH or not isinstance(inner, list):
+            return
+        for item in inner:
+            if isinstance(item, bytes):
+                self._walk(item, target, depth + 1, found, budget)
+            elif isinstance(item, list) and item and isinstance(item[-1], bytes):
+                # (target, [allowFailure, value,] callData)
+                self._walk(item[-1], item[0] if isinstance(item[0], str) else target, depth + 1, found, budget)
@@ -0,0 +1,151 @@
+# server/calldata_rules.py
+import os
+import json
+import logging
+from pathlib import Path
+from typing import Dict, Any, Callable, List, NamedTuple, Optional, Sequence, Tuple
+
+from .calldata import CalldataDecoder, Call
+
+logger = logging.getLogger(__name__)
+
+RULES_FORMAT = 1
+DEFAULT_RULES_PATH = Path(__file__).parent / 'models' / 'calldata_rules.json'
+# No real token supply comes near 2**128; wallets request 2**256-1 (or 2**160-1 for Permit2)
+UNLIMITED = 1 << 128
+
+ADDRESS_ROLES = ('spender', 'owner', 'recipient')
+ADDRESS_CLASSES = ('blocklisted', 'trusted', 'unknown', 'sender', 'not_sender')
+
+# (call, sender, classify) -> bool
+Predicate = Callable[[Call, Optional[str], Callable[[str], str]], bool]
+
+
+class Rule(NamedTuple):
+    id: str
+    score: float
+    reason: str
+    predicates: Tuple[Predicate, ...]
+
+
+def combine_scores(model_score: float, rule_score: float) -> float:
+    """Risk once calldata rules have fired: independent evidence, 1 - (1 - model)(1 - rules)."""
+    return round(1 - (1 - model_score) * (1 - rule_score), 4)
+
+
+def _address_condition(role: str, expected: str) -> Predicate:
+    if expected not in ADDRESS_CLASSES:
+        raise ValueError(f"Rule condition {role!r} must be one of {', '.join(ADDRESS_CLASSES)}")
+
+    def check(call, sender, classify):
+        address = call.role(role)
+        if not isinstance(address, str):
+            return False
+        if expected == 'sender':
+            return address == sender
+        if expected == 'not_sender':
+            return sender is not None and address != sender
+        return classify(address) == expected
+    return check
+
+
+def _compile_condition(key: str, expected: Any) -> Predicate:
+    if key in ADDRESS_ROLES:
+        return _address_condition(key, expected)
+    if key == 'amount':
+        if expected == 'unlimited':
+            threshold = UNLIMITED
+        elif isinstance(expected, dict) and 'gte' in expected:
+            threshold = int(expected['gte'])
+        else:
+            raise ValueError("Rule condition 'amount' must be 'unlimited' or {\"gte\": n}")
+        return lambda call, sender, classify: type(call.role('amount')) is int and call.role('amount') >= threshold
+    if key == 'approved':
+        return lambda call, sender, classify: call.role('approved') is bool(expected)
+    if key == 'nested':
+        return lambda call, sender, classify: (call.depth > 0) is bool(expected)
+    raise ValueError(f"Unknown rule condition {key!r}")
+
+
+class RuleSet:
+    """
+    Declarative calldata rules from a versioned JSON file (see models/calldata_rules.json):
+
+        {"format": 1, "version": "...", "rules": [{"id": "...", "kinds": ["approval"],
+          "when": {"amount": "unlimited", "spender": "unknown"}, "score": 0.7, "reason": "..."}]}
+
+    Rules are compiled once into selector -> (rule, ...) with each condition turned
+    into a predicate, so a decoded call only meets the rules that can apply to its
+    selector. `evaluate` returns the calls found, the rules they hit and the
+    combined rule score (independent hits: 1 - prod(1 - score)).
+    """
+
+    def __init__(self, rules: Sequence[Dict[str, Any]], decoder: CalldataDecoder, version: str):
+        self.decoder = decoder
+        self.version = version
+        by_selector: Dict[str, List[Rule]] = {}
+        for spec in rules:
+            rule = Rule(spec['id'], float(spec['score']), spec.get('reason', spec['id']),
+                        tuple(_compile_condition(key, value) for key, value in spec.get('when', {}).items()))
+            selectors = [s.lower().removeprefix('0x') for s in spec.get('selectors', [])]
+            for kind in spec.get('kinds', []):
+                selectors.extend(decoder.index.of_kind(kind))
+            if not selectors:
+                raise ValueError(f"Rule {rule.id!r} applies to no known selector")
+            for selector in dict.fromkeys(selectors):
+                by_selector.setdefault(selector, []).append(rule)
+        # Highest score first, so the first hit of a call is its strongest reason
+        self.rules = {selector: tuple(sorted(found, key=lambda r: -r.score)) for selector, found in by_selector.items()}
+        self.rule_count = len(rules)
+
+    @classmethod
+    def load(cls, path, decoder: Optional[CalldataDecoder] = None) -> 'RuleSet':
+        with open(path) as f:
+            spec = json.load(f)
+        if spec.get('format') != RULES_FORMAT:
+            raise ValueError(f"Unsupported calldata rules format {spec.get('format')!r} in {path} (expected {RULES_FORMAT})")
+        rules = cls(spec['rules'], decoder or CalldataDecoder(), str(spec.get('version', 'unversioned')))
+        logger.info(f"Loaded calldata rules {rules.version} ({rules.rule_count} rules) from {path}")
+        return rules
+
+    @classmethod
+    def from_env(cls) -> 'RuleSet':
+        return cls.load(os.getenv('CALLDATA_RULES_PATH') or DEFAULT_RULES_PATH)
+
+    def evaluate(self, tx: Dict[str, Any], classify: Callable[[str], str]) -> Optional[Dict[str, Any]]:
+        """Findings for the transaction's calldata, or None if it holds no known call."""
+        return self._evaluate(tx, self._memoized(classify))
+
+    def evaluate_batch(self, txs: Sequence[Dict[str, Any]], classify: Callable[[str], str]) -> List[Optional[Dict[str, Any]]]:
+        # One classification per distinct address across the whole batch
+        classify = self._memoized(classify)
+        return [self._evaluate(tx, classify) for tx in txs]
+
+    @staticmethod
+    def _memoized(classify: Callable[[str], str]) -> Callable[[str], str]:
+        seen: Dict[str, str] = {}
+
+        def lookup(address: str) -> str:
+            found = seen.get(address)
+            if found is None:
+                found = seen[address] = classify(address)
+            return found
+        return lookup
+
+    def _evaluate(self, tx: Dict[str, Any], classify: Callable[[str], str]) -> Optional[Dict[str, Any]]:
+        calls = self.decoder.decode(tx.get('data'))
+        if not calls:
+            return None
+        sender = tx.get('from_address')
+        sender = sender.lower() if isinstance(sender, str) else None
+        hits, miss = [], 1.0
+        for call in calls:
+            for rule in self.rules.get(call.function.selector, ()):
+                if all(predicate(call, sender, classify) for predicate in rule.predicates):
+                    hit = {'rule': rule.id, 'function': call.function.name, 'reason': rule.reason, 'score': rule.score}
+                    for role in ADDRESS_ROLES:
+                        if isinstance(call.role(role), str):
+                            hit[role] = call.role(role)
+                    hits.append(hit)
+                    miss *= 1 - rule.score
+        return {'calls': [call.function.name for call in calls], 'hits': hits, 'score': round(1 - miss, 4)}
@@ -0,0 +1,74 @@
+# server/cascade.py
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Dict, Any, Callable, List, Optional, Tuple
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+# A stage inspects the transaction and either fills in `result` and returns True
+# (confident verdict, stop here) or returns False to pass it on to the next stage.
+StageFn = Callable[[Dict[str, Any], Dict[str, Any]], bool]
+
+
+class Cascade:
+    """
+    Runs analysis stages in order until one is confident. For every stage it records
+    how often it ran, how often it settled the verdict and the time spent in it, so
+    thresholds can be tuned from `stats()`. The remote stage is async-or-sync and is
+    timed by the caller through `timed()`.
+    """
+
+    def __init__(self, stages: List[Tuple[str, StageFn]]):
+        self.stages = stages
+        self._lock = threading.Lock()
+        self._stats: Dict[str, List[float]] = {}
+
+    def run(self, tx: Dict[str, Any], result: Dict[str, Any]) -> Optional[str]:
+        """Name of the stage that settled the verdict, or None if every stage passed."""
+        for name, stage in self.stages:
+            started = time.perf_counter()
+            resolved = stage(tx, result)
+            self.record(name, time.perf_counter() - started, resolved)
+            if resolved:
+                result['details']['stage'] = name
+                return name
+        return None
+
+    @contextmanager
+    def timed(self, name: str, result: Dict[str, Any]):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started, True)
+            result['details']['stage'] = name
+
+    def record(self, name: str, elapsed: float, resolved: bool):
+        with self._lock:
+            entry = self._stats.setdefault(name, [0, 0, 0.0])
+            entry[0] += 1
+            entry[1] += resolved
+            entry[2] += elapsed
+        metrics.observe('aya_analysis_stage_duration_seconds', elapsed, stage=name)
+        if resolved:
+            metrics.inc('aya_analysis_stage_resolved_total', stage=name)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            snapshot = {name: list(entry) for name, entry in self._stats.items()}
+        total = max((entry[0] for entry in snapshot.values()), default=0)
+        return {
+            name: {
+                'evaluated': evaluated,
+                'resolved': resolved,
+                'hit_rate': round(resolved / evaluated, 4) if evaluated else 0.0,
+                'share_of_traffic': round(resolved / total, 4) if total else 0.0,
+                'total_ms': round(seconds * 1000, 3),
+                'mean_ms': round(seconds * 1000 / evaluated, 4) if evaluated else 0.0,
+            }
+            for name, (evaluated, resolved, seconds) in snapshot.items()
+        }
@@ -1,17 +1,63 @@
 # server/compute3_client.py
 
 import os
+import time
+import asyncio
+import httpx
 import requests
 import logging
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from typing import Dict, Any, Optional
+from urllib.parse import quote
+from .http_session import get_session, default_timeout, MAX_RETRIES
+from .resilience import EndpointGuard, Deadline, CircuitOpenError, DeadlineExceeded
+from . import metrics
+from . import tracing
 
 logger = logging.getLogger(__name__)
 
+
+def build_analysis_payload(arguments: Dict[str, Any]) -> Dict[str, Any]:
+    """Maps analyze_transaction_risk arguments onto the Comput3 /analysis/transaction body."""
+    return {
+        "chain": arguments.get("chain"),
+        "to": arguments.get("to_address"),
+        "from": arguments.get("from_address"),
+        "value": str(arguments.get("value")),
+        "data": arguments.get("data", "")
+    }
+
+
+def _unavailable(e: Exception) -> Dict[str, Any]:
+    # Error dict for calls that were never answered; ScamDetector scores these locally
+    if isinstance(e, CircuitOpenError):
+        return {"error": True, "circuit_open": True,
+                "message": "The AI analysis service is failing; answering from the local fallback.", "details": str(e)}
+    return {"error": True, "deadline_exceeded": True,
+            "message": "The AI analysis service did not answer within the request's latency budget.", "details": str(e)}
+
+
+def _upstream_failed(status_code: int) -> bool:
+    # Only these count against the circuit; other 4xx mean the upstream is healthy
+    return status_code >= 500 or status_code == 429
+
+
+def _guards() -> Dict[str, EndpointGuard]:
+    # Job creation is not idempotent, so it is never hedged
+    return {'analysis': EndpointGuard('comput3.analysis'), 'jobs': EndpointGuard('comput3.jobs', hedge_percentile=0),
+            'job_status': EndpointGuard('comput3.job_status'), 'job': EndpointGuard('comput3.job')}
+
+
+# POST jobs/status (bulk) and GET jobs/<id> are assumed REST shapes, not documented Comput3 routes;
+# job_statuses falls back from the first to the second when the upstream answers 404
+_PATHS = {'analysis': 'analysis/transaction', 'jobs': 'jobs', 'job_status': 'jobs/status', 'job': 'jobs/{}'}
+
+
 class Comput3Client:
     """
     Client for making REAL API calls to the Comput3.ai service for transaction analysis.
     """
-    def __init__(self, api_key: Optional[str]):
+    def __init__(self, api_key: Optional[str], session: Optional[requests.Session] = None):
         if not api_key:
             logger.error("COMPUT3_API_KEY is required but was not provided.")
             raise ValueError("COMPUT3_API_KEY is required.")
@@ -22,30 +68,114 @@ class Comput3Client:
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json"
         }
+        self._session = session
+        self.read_timeout = float(os.getenv('COMPUT3_READ_TIMEOUT', '10'))
+        self.guards = _guards()
+        self.bulk_job_status = True
+        self._pool = None
+        self._pool_pid = None
+
+    @property
+    def session(self) -> requests.Session:
+        # Resolved per call so forked workers never share a parent's pooled sockets
+        return self._session or get_session()
+
+    def stats(self) -> Dict[str, Any]:
+        return {name: guard.stats() for name, guard in self.guards.items()}
+
+    def warm_up(self) -> Dict[str, Any]:
+        """Creates this process's connection pool and call threads ahead of the first request."""
+        self.session
+        self._executor()
+        return {'base_url': self.base_url}
+
+    def _executor(self) -> ThreadPoolExecutor:
+        if self._pool is None or self._pool_pid != os.getpid():
+            self._pool = ThreadPoolExecutor(max_workers=int(os.getenv('COMPUT3_MAX_IN_FLIGHT', '64')),
+                                            thread_name_prefix="comput3")
+            self._pool_pid = os.getpid()
+        return self._pool
+
+    def _post(self, endpoint: str, payload: Optional[Dict[str, Any]], deadline: Optional[Deadline],
+              *path_args: str) -> requests.Response:
+        """
+        POSTs (GETs without a payload) through the endpoint's guard: fails fast while its circuit is open, caps
+        the wait at the deadline, and once the first attempt has taken longer than the
+        endpoint's hedge percentile sends one duplicate and takes whichever answers first.
+        """
+        guard = self.guards[endpoint]
+        # Budget first: a half-open breaker's probe slot is only taken by a call that will report an outcome
+        budget = self.read_timeout if deadline is None else min(self.read_timeout, deadline.remaining())
+        if budget <= 0:
+            guard.count('deadline_exceeded')
+            raise DeadlineExceeded(f"No latency budget left for {guard.name}")
+        if not guard.breaker.allow():
+            raise CircuitOpenError(f"Circuit for {guard.name} is open")
+        guard.count('requests')
+
+        url = f"{self.base_url}/{_PATHS[endpoint].format(*path_args)}"
+        timeout = default_timeout(budget)
+
+        def attempt():
+            sent = time.perf_counter()
+            outcome = 'error'
+            try:
+                if payload is None:
+                    response = self.session.get(url, headers=self.headers, timeout=timeout)
+                else:
+                    response = self.session.post(url, headers=self.headers, json=payload, timeout=timeout)
+                outcome = str(response.status_code)
+                if _upstream_failed(response.status_code):
+                    response.raise_for_status()
+                return response
+            finally:
+                metrics.observe('aya_comput3_request_duration_seconds', time.perf_counter() - sent,
+                                endpoint=endpoint, outcome=outcome)
+
+        started = time.monotonic()
+        ends_at = started + budget
+        first = self._executor().submit(tracing.propagate(attempt))
+        pending = {first}
+        delay = guard.hedge_delay()
+        if delay is not None and delay < budget:
+            done, _ = wait(pending, timeout=delay)
+            if not done:
+                pending.add(self._executor().submit(tracing.propagate(attempt)))
+                guard.count('hedged')
+
+        error = None
+        while pending:
+            done, pending = wait(pending, timeout=max(0.0, ends_at - time.monotonic()), return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                try:
+                    response = future.result()
+                except Exception as e:
+                    error = e
+                    continue
+                if future is not first:
+                    guard.count('hedge_wins')
+                guard.record_success(time.monotonic() - started)
+                return response
+        if pending:
+            guard.count('deadline_exceeded')
+            error = DeadlineExceeded(f"{guard.name} did not answer within {budget:.3f}s")
+        guard.record_failure()
+        raise error
 
-    def analyze_transaction(self, arguments: Dict[str, Any]) -> Dict[str, Any]:
+    def analyze_transaction(self, arguments: Dict[str, Any], deadline: Optional[Deadline] = None) -> Dict[str, Any]:
         """
         Sends transaction data to the Comput3.ai API for real-time risk analysis.
         """
         try:
             # Prepare the payload for the API call.
-            payload = {
-                "chain": arguments.get("chain"),
-                "to": arguments.get("to_address"),
-                "from": arguments.get("from_address"),
-                "value": str(arguments.get("value")),
-                "data": arguments.get("data", "")
-            }
+            payload = build_analysis_payload(arguments)
             
             logger.info(f"Sending analysis request to Comput3.ai for address: {payload['to']}")
 
             # Make the actual API call to the transaction analysis endpoint.
-            response = requests.post(
-                f"{self.base_url}/analysis/transaction",
-                headers=self.headers,
-                json=payload,
-                timeout=30
-            )
+            response = self._post('analysis', payload, deadline)
             
             # Raise an HTTPError for bad responses (4xx or 5xx)
             response.raise_for_status()
@@ -55,6 +185,9 @@ class Comput3Client:
             # Return the 'result' part of the JSON response.
             return response.json().get('result', {})
 
+        except (CircuitOpenError, DeadlineExceeded) as e:
+            logger.warning(f"Comput3.ai analysis skipped: {e}")
+            return _unavailable(e)
         except requests.exceptions.RequestException as e:
             logger.error(f"Comput3.ai API call failed: {e}")
             # Return a clear error message if the service cannot be reached.
@@ -71,12 +204,163 @@ class Comput3Client:
                 "details": str(e)
             }
 
-    def run_compute_job(self, image: str, cmd: str):
+    def run_compute_job(self, image: str, cmd: str, deadline: Optional[Deadline] = None):
         payload = {"image": image, "cmd": cmd}
-        resp = requests.post(
-            f"{self.base_url}/jobs",
-            headers=self.headers,
-            json=payload, timeout=30
+        resp = self._post('jobs', payload, deadline)
+        resp.raise_for_status()
+        return resp.json()["jobId"]
+
+    def job_statuses(self, job_ids, deadline: Optional[Deadline] = None) -> Dict[str, Dict[str, Any]]:
+        """Status of many jobs in one call: {jobId: {"status", "result", "error"}}; unknown ids are left out."""
+        if self.bulk_job_status:
+            resp = self._post('job_status', {"jobIds": list(job_ids)}, deadline)
+            if resp.status_code != 404:
+                resp.raise_for_status()
+                return {job["jobId"]: job for job in resp.json().get("jobs", [])}
+            logger.warning("Comput3 has no bulk job status route (404); polling jobs one at a time")
+            self.bulk_job_status = False
+        statuses = {}
+        for job_id in job_ids:
+            resp = self._post('job', None, deadline, quote(job_id, safe=''))
+            if resp.status_code == 404:
+                continue
+            resp.raise_for_status()
+            statuses[job_id] = {**resp.json(), "jobId": job_id}
+        return statuses
+
+
+class AsyncComput3Client:
+    """
+    asyncio counterpart of Comput3Client for the ASGI serving mode. One pooled
+    httpx.AsyncClient is shared by every request handled in the event loop.
+    """
+    def __init__(self, api_key: Optional[str], client: Optional[httpx.AsyncClient] = None):
+        if not api_key:
+            logger.error("COMPUT3_API_KEY is required but was not provided.")
+            raise ValueError("COMPUT3_API_KEY is required.")
+
+        self.api_key = api_key
+        self.base_url = os.getenv('COMPUT3_BASE_URL', 'https://api.comput3.ai/v1')
+        self.headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
+        self.read_timeout = float(os.getenv('COMPUT3_READ_TIMEOUT', '10'))
+        connect_timeout, read_timeout = default_timeout(self.read_timeout)
+        max_connections = int(os.getenv('ASYNC_HTTP_MAX_CONNECTIONS', '1000'))
+        self.client = client or httpx.AsyncClient(
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            # Connection errors are retried by the transport, like the sync session's Retry
+            transport=httpx.AsyncHTTPTransport(
+                retries=MAX_RETRIES,
+                limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            ),
         )
+        self.guards = _guards()
+
+    def stats(self) -> Dict[str, Any]:
+        return {name: guard.stats() for name, guard in self.guards.items()}
+
+    def warm_up(self) -> Dict[str, Any]:
+        # The httpx pool opens connections on demand; building the client is the warm-up
+        return {'base_url': self.base_url}
+
+    async def _post(self, endpoint: str, payload: Dict[str, Any], deadline: Optional[Deadline]) -> httpx.Response:
+        """Same breaker / deadline / hedging rules as Comput3Client._post, with tasks instead of threads."""
+        guard = self.guards[endpoint]
+        # Budget first: a half-open breaker's probe slot is only taken by a call that will report an outcome
+        budget = self.read_timeout if deadline is None else min(self.read_timeout, deadline.remaining())
+        if budget <= 0:
+            guard.count('deadline_exceeded')
+            raise DeadlineExceeded(f"No latency budget left for {guard.name}")
+        if not guard.breaker.allow():
+            raise CircuitOpenError(f"Circuit for {guard.name} is open")
+        guard.count('requests')
+
+        url = f"{self.base_url}/{_PATHS[endpoint]}"
+
+        async def attempt():
+            sent = time.perf_counter()
+            outcome = 'error'
+            try:
+                response = await self.client.post(url, headers=self.headers, json=payload, timeout=budget)
+                outcome = str(response.status_code)
+                if _upstream_failed(response.status_code):
+                    response.raise_for_status()
+                return response
+            finally:
+                metrics.observe('aya_comput3_request_duration_seconds', time.perf_counter() - sent,
+                                endpoint=endpoint, outcome=outcome)
+
+        started = time.monotonic()
+        ends_at = started + budget
+        first = asyncio.ensure_future(attempt())
+        pending = {first}
+        try:
+            delay = guard.hedge_delay()
+            if delay is not None and delay < budget:
+                done, _ = await asyncio.wait(pending, timeout=delay)
+                if not done:
+                    pending.add(asyncio.ensure_future(attempt()))
+                    guard.count('hedged')
+
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, timeout=max(0.0, ends_at - time.monotonic()),
+                                                   return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    break
+                for task in done:
+                    if task.exception() is not None:
+                        error = task.exception()
+                        continue
+                    if task is not first:
+                        guard.count('hedge_wins')
+                    guard.record_success(time.monotonic() - started)
+                    return task.result()
+            if pending:
+                guard.count('deadline_exceeded')
+                error = DeadlineExceeded(f"{guard.name} did not answer within {budget:.3f}s")
+            guard.record_failure()
+            raise error
+        except asyncio.CancelledError:
+            # The caller gave up first: no outcome to report, so a half-open probe is handed back
+            guard.breaker.release()
+            raise
+        finally:
+            # Unlike threads, the losing attempt can actually be cancelled
+            for task in pending:
+                task.cancel()
+
+    async def analyze_transaction(self, arguments: Dict[str, Any], deadline: Optional[Deadline] = None) -> Dict[str, Any]:
+        try:
+            payload = build_analysis_payload(arguments)
+            response = await self._post('analysis', payload, deadline)
+            response.raise_for_status()
+            return response.json().get('result', {})
+        except (CircuitOpenError, DeadlineExceeded) as e:
+            logger.warning(f"Comput3.ai analysis skipped: {e}")
+            return _unavailable(e)
+        except httpx.HTTPError as e:
+            logger.error(f"Comput3.ai API call failed: {e}")
+            return {
+                "error": True,
+                "message": "Failed to connect to the AI analysis service. Please try again later.",
+                "details": str(e)
+            }
+        except Exception as e:
+            logger.error(f"An unexpected error occurred in AsyncComput3Client: {e}", exc_info=True)
+            return {
+                "error": True,
+                "message": "An unexpected internal error occurred.",
+                "details": str(e)
+            }
+
+    async def run_compute_job(self, image: str, cmd: str, deadline: Optional[Deadline] = None):
+        payload = {"image": image, "cmd": cmd}
+        resp = await self._post('jobs', payload, deadline)
         resp.raise_for_status()
         return resp.json()["jobId"]
+
+    async def aclose(self):
+        await self.client.aclose()
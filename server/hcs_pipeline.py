@@ -0,0 +1,339 @@
+# server/hcs_pipeline.py
+import os
+import time
+import uuid
+import logging
+import threading
+from collections import deque, OrderedDict
+from typing import Dict, Any, Callable, List, Optional
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+# A failing node is put aside for 0.25s, doubling with each consecutive failure up to `node_cooldown`
+_NODE_BACKOFF_BASE = 0.25
+
+# How a network reports a failed submission; anything else raised by `submit` counts as NodeUnavailable
+class HcsError(Exception):
+    pass
+
+
+class NodeUnavailable(HcsError):
+    """The node is down, busy or timed out: the same transaction can go to another node."""
+
+
+class DuplicateTransaction(HcsError):
+    """The network already has this transaction id, from an earlier attempt that did arrive."""
+
+
+class PermanentError(HcsError):
+    """Rejected for good (bad topic, payer balance, oversized message): retrying cannot help."""
+
+
+# A network is any object with:
+#   nodes() -> List[str]                                   node account ids to spread submissions over
+#   submit(node, transaction_id, message) -> None          precheck only; raises one of the errors above
+#   receipts(transaction_ids) -> Dict[str, Optional[dict]] {'status': 'SUCCESS', 'sequence_number': ...,
+#                                                          'consensus_timestamp': ...}, another status for a
+#                                                          failed transaction, or None while not yet known
+
+Callback = Callable[[Dict[str, Any]], None]
+
+
+class _Submission:
+    __slots__ = ('submission_id', 'message', 'callback', 'transaction_id', 'valid_until', 'attempts',
+                 'resubmissions', 'queued_at', 'sent_at', 'node')
+
+    def __init__(self, submission_id: str, message: str, callback: Optional[Callback]):
+        self.submission_id = submission_id
+        self.message = message
+        self.callback = callback
+        self.transaction_id = None
+        self.valid_until = 0.0
+        self.attempts = 0
+        self.resubmissions = 0
+        self.queued_at = time.monotonic()
+        self.sent_at = None
+        self.node = None
+
+
+class HcsPipeline:
+    """
+    Keeps up to `max_in_flight` topic messages between submission and consensus
+    instead of waiting for each receipt in turn. Sender threads only run the
+    precheck round trip; one collector thread asks for the receipts of everything
+    sent in bulk every `receipt_interval` seconds and completes the submissions
+    that reached consensus, through their callback and `status()`.
+
+    Failover and retries are idempotent: every message is given a transaction id
+    up front, a node that fails is put aside (backing off up to `node_cooldown`
+    seconds while it keeps failing) and the same id goes to the next node, and a DUPLICATE_TRANSACTION answer means an
+    earlier attempt got through. Only once an id's validity window has passed
+    without a receipt, so it can no longer reach consensus, and `mirror_lag` more
+    seconds have passed for a receipt read from a mirror node to show up, is the
+    message sent again under a new id. Sequence numbers follow consensus order, not submission order.
+    """
+
+    def __init__(self, network, account_id: str, max_in_flight: Optional[int] = None,
+                 senders: Optional[int] = None, receipt_interval: Optional[float] = None,
+                 receipt_batch: Optional[int] = None, max_attempts: Optional[int] = None,
+                 node_cooldown: Optional[float] = None, valid_duration: Optional[float] = None,
+                 retention: Optional[int] = None, mirror_lag: Optional[float] = None):
+        self.network = network
+        self.account_id = account_id
+        self.max_in_flight = max_in_flight or int(os.getenv('HEDERA_PIPELINE_IN_FLIGHT', '256'))
+        self.senders = senders or int(os.getenv('HEDERA_PIPELINE_SENDERS', '4'))
+        self.receipt_interval = receipt_interval or float(os.getenv('HEDERA_RECEIPT_INTERVAL', '0.25'))
+        self.receipt_batch = receipt_batch or int(os.getenv('HEDERA_RECEIPT_BATCH', '100'))
+        self.max_attempts = max_attempts or int(os.getenv('HEDERA_SUBMIT_ATTEMPTS', '5'))
+        self.node_cooldown = node_cooldown if node_cooldown is not None else float(os.getenv('HEDERA_NODE_COOLDOWN', '30'))
+        self.valid_duration = valid_duration or float(os.getenv('HEDERA_TX_VALID_DURATION', '120'))
+        self.retention = retention or int(os.getenv('HEDERA_STATUS_RETENTION', '100000'))
+        self.mirror_lag = mirror_lag if mirror_lag is not None else float(os.getenv('HEDERA_MIRROR_LAG', '10'))
+
+        self._cond = threading.Condition()
+        self._to_send: deque = deque()
+        # transaction id -> submission, for everything that passed precheck and awaits its receipt
+        self._sent: "OrderedDict[str, _Submission]" = OrderedDict()
+        self._in_flight = 0
+        self._statuses: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._cooling: Dict[str, float] = {}
+        self._next_node = 0
+        self._last_valid_start = 0
+        self._threads = []
+        self._pid = None
+        self._closing = False
+        self._confirmations: deque = deque()
+        self.counts = {'submitted': 0, 'confirmed': 0, 'failed': 0, 'retried': 0, 'resubmitted': 0, 'duplicates': 0}
+        self.node_failures: Dict[str, int] = {}
+        self._consecutive_failures: Dict[str, int] = {}
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        # What was in flight is the parent's to confirm; a forked worker starts empty
+        self._cond = threading.Condition()
+        self._to_send.clear()
+        self._sent.clear()
+        self._in_flight = 0
+        self._threads = []
+
+    # ---- public --------------------------------------------------------
+
+    def submit(self, message: str, callback: Optional[Callback] = None) -> str:
+        """Queues a message and returns its submission id; waits while `max_in_flight` are pending."""
+        submission = _Submission(uuid.uuid4().hex, message, callback)
+        self._ensure_threads()
+        with self._cond:
+            self._cond.wait_for(lambda: self._in_flight < self.max_in_flight or self._closing)
+            if self._closing:
+                raise RuntimeError("HCS pipeline is closed")
+            self._assign_transaction_id(submission)
+            self._in_flight += 1
+            self.counts['submitted'] += 1
+            self._to_send.append(submission)
+            self._set_status(submission, 'queued')
+            self._cond.notify_all()
+        return submission.submission_id
+
+    def status(self, submission_id: str) -> Optional[Dict[str, Any]]:
+        with self._cond:
+            status = self._statuses.get(submission_id)
+            return dict(status, submission_id=submission_id) if status else None
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Waits until every queued message is confirmed or failed; False on timeout."""
+        with self._cond:
+            return self._cond.wait_for(lambda: self._in_flight == 0, timeout=timeout)
+
+    def close(self, timeout: float = 30.0):
+        self.flush(timeout)
+        with self._cond:
+            self._closing = True
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join(timeout=1.0)
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        with self._cond:
+            while self._confirmations and self._confirmations[0] < now - 10:
+                self._confirmations.popleft()
+            return dict(self.counts, in_flight=self._in_flight, queued=len(self._to_send),
+                        awaiting_receipt=len(self._sent),
+                        confirmed_per_second_10s=round(len(self._confirmations) / 10, 1),
+                        nodes={node: {'failures': self.node_failures.get(node, 0),
+                                      'cooling_down': self._cooling.get(node, 0) > now}
+                               for node in self.network.nodes()})
+
+    # ---- sending -------------------------------------------------------
+
+    def _ensure_threads(self):
+        # Threads do not survive fork, so a worker process starts its own on first use
+        if self._pid == os.getpid():
+            return
+        with self._cond:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._threads = [threading.Thread(target=self._run_sender, name=f"hcs-send-{i}", daemon=True)
+                             for i in range(self.senders)]
+            self._threads.append(threading.Thread(target=self._run_collector, name="hcs-receipts", daemon=True))
+            for thread in self._threads:
+                thread.start()
+
+    def _assign_transaction_id(self, submission: _Submission):
+        # Caller holds the lock. Valid starts are unique per process: microseconds plus the pid in the
+        # nanoseconds, so two workers never mint the same id (the network would call it a duplicate)
+        valid_start = time.time_ns() // 1000 * 1000 + os.getpid() % 1000
+        if valid_start <= self._last_valid_start:
+            valid_start = self._last_valid_start + 1000
+        self._last_valid_start = valid_start
+        seconds, nanos = divmod(valid_start, 1_000_000_000)
+        submission.transaction_id = f"{self.account_id}@{seconds}.{nanos:09d}"
+        submission.valid_until = valid_start / 1e9 + self.valid_duration
+
+    def _pick_node(self) -> str:
+        # Caller holds the lock; round robin over the nodes that are not cooling down
+        nodes = self.network.nodes()
+        now = time.monotonic()
+        for _ in range(len(nodes)):
+            node = nodes[self._next_node % len(nodes)]
+            self._next_node += 1
+            if self._cooling.get(node, 0) <= now:
+                return node
+        return min(nodes, key=lambda n: self._cooling.get(n, 0))
+
+    def _run_sender(self):
+        pid = os.getpid()
+        while self._pid == pid:
+            with self._cond:
+                self._cond.wait_for(lambda: self._to_send or self._closing, timeout=1.0)
+                if not self._to_send:
+                    if self._closing:
+                        return
+                    continue
+                submission = self._to_send.popleft()
+                submission.node = node = self._pick_node()
+                submission.attempts += 1
+            started = time.perf_counter()
+            outcome = 'sent'
+            try:
+                self.network.submit(node, submission.transaction_id, submission.message)
+            except DuplicateTransaction:
+                outcome = 'duplicate'
+            except PermanentError as e:
+                outcome = 'rejected'
+                self._finish(submission, {'success': False, 'error': str(e)})
+            except Exception as e:
+                outcome = 'node_failure'
+                self._node_failed(submission, node, e)
+            metrics.observe('aya_hedera_submit_duration_seconds', time.perf_counter() - started,
+                            mode='pipelined', outcome=outcome)
+            if outcome in ('sent', 'duplicate'):
+                with self._cond:
+                    self._consecutive_failures.pop(node, None)
+                    self.counts['duplicates'] += outcome == 'duplicate'
+                    submission.sent_at = time.monotonic()
+                    self._sent[submission.transaction_id] = submission
+                    self._set_status(submission, 'sent')
+
+    def _node_failed(self, submission: _Submission, node: str, error: Exception):
+        logger.warning(f"HCS node {node} failed for {submission.transaction_id}: {error}")
+        with self._cond:
+            self.node_failures[node] = self.node_failures.get(node, 0) + 1
+            failures = self._consecutive_failures[node] = self._consecutive_failures.get(node, 0) + 1
+            backoff = min(self.node_cooldown, _NODE_BACKOFF_BASE * 2 ** min(failures - 1, 16))
+            self._cooling[node] = time.monotonic() + backoff
+            retry = submission.attempts < self.max_attempts
+            if retry:
+                # Same transaction id on the next node: if the failed one did take it, that is a duplicate
+                self.counts['retried'] += 1
+                self._to_send.appendleft(submission)
+                self._cond.notify()
+        if not retry:
+            self._finish(submission, {'success': False, 'error': f"No node accepted the message: {error}"})
+
+    # ---- receipts ------------------------------------------------------
+
+    def _run_collector(self):
+        pid = os.getpid()
+        while self._pid == pid:
+            with self._cond:
+                self._cond.wait_for(lambda: self._closing, timeout=self.receipt_interval)
+                if self._closing and not self._sent:
+                    return
+                waiting = list(self._sent)
+            for start in range(0, len(waiting), self.receipt_batch):
+                chunk = waiting[start:start + self.receipt_batch]
+                try:
+                    receipts = self.network.receipts(chunk)
+                except Exception as e:
+                    logger.warning(f"HCS receipt query for {len(chunk)} transactions failed: {e}")
+                    break
+                self._collect(chunk, receipts)
+
+    def _collect(self, transaction_ids: List[str], receipts: Dict[str, Optional[Dict[str, Any]]]):
+        now = time.time()
+        finished, resubmitted = [], []
+        with self._cond:
+            for transaction_id in transaction_ids:
+                submission = self._sent.get(transaction_id)
+                if submission is None:
+                    continue
+                receipt = receipts.get(transaction_id)
+                if receipt is None:
+                    # Unknown after its validity window and the mirror's lag: it never reached consensus and now never will
+                    if now > submission.valid_until + self.mirror_lag + self.receipt_interval:
+                        del self._sent[transaction_id]
+                        resubmitted.append(submission)
+                    continue
+                del self._sent[transaction_id]
+                if receipt.get('status') == 'SUCCESS':
+                    self.counts['confirmed'] += 1
+                    self._confirmations.append(time.monotonic())
+                    finished.append((submission, {'success': True, 'sequence_number': receipt.get('sequence_number'),
+                                                  'consensus_timestamp': receipt.get('consensus_timestamp'),
+                                                  'transaction_id': transaction_id, 'node': submission.node}))
+                else:
+                    finished.append((submission, {'success': False, 'transaction_id': transaction_id,
+                                                  'error': f"Transaction failed with status {receipt.get('status')}"}))
+            for submission in resubmitted:
+                if submission.resubmissions + 1 >= self.max_attempts:
+                    finished.append((submission, {'success': False, 'transaction_id': submission.transaction_id,
+                                                  'error': "Transaction expired without reaching consensus"}))
+                    continue
+                logger.warning(f"HCS transaction {submission.transaction_id} expired unconfirmed; resubmitting")
+                submission.resubmissions += 1
+                submission.attempts = 0
+                self.counts['resubmitted'] += 1
+                self._assign_transaction_id(submission)
+                self._to_send.append(submission)
+                self._set_status(submission, 'queued')
+            self._cond.notify_all()
+        for submission, result in finished:
+            self._finish(submission, result)
+
+    def _finish(self, submission: _Submission, result: Dict[str, Any]):
+        with self._cond:
+            if not result['success']:
+                self.counts['failed'] += 1
+                logger.error(f"HCS submission {submission.submission_id} failed: {result['error']}")
+            self._in_flight -= 1
+            self._set_status(submission, 'confirmed' if result['success'] else 'failed', result)
+            self._cond.notify_all()
+        if submission.callback is not None:
+            try:
+                submission.callback(dict(result, submission_id=submission.submission_id))
+            except Exception as e:
+                logger.error(f"HCS completion callback failed: {e}", exc_info=True)
+
+    def _set_status(self, submission: _Submission, status: str, result: Optional[Dict[str, Any]] = None):
+        # Caller holds the condition's lock
+        entry = {'status': status, 'transaction_id': submission.transaction_id, 'updated_at': time.time()}
+        if result is not None:
+            entry['result'] = result
+        self._statuses[submission.submission_id] = entry
+        self._statuses.move_to_end(submission.submission_id)
+        while len(self._statuses) > self.retention:
+            self._statuses.popitem(last=False)
@@ -1,22 +1,75 @@
 # server/hedera_client.py
 import os
 import json
+import hashlib
+import time
 import logging
 from datetime import datetime
 from dotenv import load_dotenv
-from hedera import (
-    Client,
-    PrivateKey,
-    TopicMessageSubmitTransaction,
-    TopicId,
-    AccountId
-)
+from .merkle import MerkleBatcher
+from .mirror_sync import MirrorNodeSynchronizer
+from .hcs_pipeline import HcsPipeline, NodeUnavailable, DuplicateTransaction, PermanentError
+from . import metrics
 
 load_dotenv()
 logger = logging.getLogger("AyaSentinel.HederaClient")
 
+# Precheck answers that another node (or a later attempt) can get past
+_RETRYABLE_PRECHECK = ('BUSY', 'PLATFORM_TRANSACTION_NOT_CREATED', 'PLATFORM_NOT_ACTIVE', 'UNKNOWN',
+                       'INVALID_NODE_ACCOUNT', 'TRANSACTION_EXPIRED')
+
+
+class SdkNetwork:
+    """
+    The HcsPipeline network interface over the Hedera SDK: `submit` pins the
+    pipeline's transaction id and node and only waits for the precheck, and
+    `receipts` answers from one incremental mirror-node sync of the topic instead of
+    a receipt query per transaction.
+    """
+
+    def __init__(self, client: "HederaClient"):
+        self.client = client
+        self._nodes = None
+
+    def nodes(self):
+        if self._nodes is None:
+            sdk_client = self.client._sdk()[0]
+            self._nodes = sorted(str(account) for account in sdk_client.getNetwork().values())
+        return self._nodes
+
+    def submit(self, node: str, transaction_id: str, message: str):
+        from hedera import AccountId, TransactionId, Duration
+        from jnius import autoclass
+
+        sdk_client, private_key, topic_id, TopicMessageSubmitTransaction = self.client._sdk()
+        node_ids = autoclass('java.util.Collections').singletonList(AccountId.fromString(node))
+        transaction = (TopicMessageSubmitTransaction().setTopicId(topic_id).setMessage(message)
+                       .setTransactionId(TransactionId.fromString(transaction_id))
+                       .setTransactionValidDuration(Duration.ofSeconds(self.client.pipeline.valid_duration))
+                       .setNodeAccountIds(node_ids).setMaxAttempts(1))
+        try:
+            transaction.freezeWith(sdk_client).sign(private_key).execute(sdk_client)
+        except Exception as e:
+            status = str(getattr(e, 'status', '') or e)
+            if 'DUPLICATE_TRANSACTION' in status:
+                raise DuplicateTransaction(status)
+            if any(code in status for code in _RETRYABLE_PRECHECK) or not hasattr(e, 'status'):
+                raise NodeUnavailable(status)
+            raise PermanentError(status)
+
+    def receipts(self, transaction_ids):
+        # Failed transactions never show up in the topic: they stay unknown until they expire
+        self.client.mirror_sync.sync_once()
+        found = {}
+        for transaction_id in transaction_ids:
+            record = self.client.mirror_sync.lookup(transaction_id)
+            found[transaction_id] = record and {'status': 'SUCCESS', 'sequence_number': record['sequence_number'],
+                                                'consensus_timestamp': record['consensus_timestamp']}
+        return found
+
+
 class HederaClient:
-    def __init__(self):
+    def __init__(self, network=None):
         self.account_id_str = os.getenv('HEDERA_ACCOUNT_ID')
         self.private_key_str = os.getenv('HEDERA_PRIVATE_KEY')
         self.topic_id_str = os.getenv('HEDERA_TOPIC_ID')
@@ -26,37 +79,94 @@ class HederaClient:
         if not all([self.account_id_str, self.private_key_str, self.topic_id_str]):
             raise Exception("FATAL: HEDERA_ACCOUNT_ID, HEDERA_PRIVATE_KEY, and HEDERA_TOPIC_ID must be set.")
 
-        if self.network == 'mainnet':
-            self.client = Client.forMainnet()
-        else:
-            self.client = Client.forTestnet()
-        
-        # --- THE CRITICAL FIX ---
-        # Use the ECDSA format for the raw private key, which we proved works.
-        self.private_key = PrivateKey.fromStringECDSA(self.private_key_str)
-        # ------------------------
-        
-        self.account_id = AccountId.fromString(self.account_id_str)
-        self.topic_id = TopicId.fromString(self.topic_id_str)
-        self.client.setOperator(self.account_id, self.private_key)
-        
-        logger.info(f"HederaClient initialized for account {self.account_id} on {self.network} in '{self.environment}' mode.")
-
-    def log_risk_analysis(self, analysis_data: dict) -> dict:
+        # The SDK runs inside a JVM, which does not survive a fork: it is started on the
+        # first submission in the process that makes it, never at import or in a
+        # preloading gunicorn master.
+        self._sdk_client = None
+        self._sdk_pid = None
+
+        self.mirror_sync = MirrorNodeSynchronizer(self.topic_id_str)
+
+        # HEDERA_BATCH_MODE=merkle anchors one Merkle root per window instead of one message per analysis
+        # (an anchor is stored with its sequence number, so it is always submitted directly)
+        self.batcher = MerkleBatcher(self._submit_direct) if os.getenv('HEDERA_BATCH_MODE') == 'merkle' else None
+
+        # HEDERA_SUBMIT_MODE=pipelined keeps many submissions in flight and collects their receipts in bulk;
+        # `network` replaces the SDK, e.g. with benchmarks.fake_hcs.FakeHcsNetwork
+        self.submit_mode = os.getenv('HEDERA_SUBMIT_MODE', 'sync')
+        self.pipeline = HcsPipeline(network or SdkNetwork(self), self.account_id_str) if self.submit_mode == 'pipelined' else None
+
+        logger.info(f"HederaClient initialized for account {self.account_id_str} on {self.network} in '{self.environment}' mode.")
+
+    def _sdk(self):
+        """(client, private key, topic id, TopicMessageSubmitTransaction) for this process."""
+        if self._sdk_client is None or self._sdk_pid != os.getpid():
+            from hedera import Client, PrivateKey, TopicMessageSubmitTransaction, TopicId, AccountId
+
+            client = Client.forMainnet() if self.network == 'mainnet' else Client.forTestnet()
+            # --- THE CRITICAL FIX ---
+            # Use the ECDSA format for the raw private key, which we proved works.
+            private_key = PrivateKey.fromStringECDSA(self.private_key_str)
+            # ------------------------
+            client.setOperator(AccountId.fromString(self.account_id_str), private_key)
+            self._sdk_client = (client, private_key, TopicId.fromString(self.topic_id_str), TopicMessageSubmitTransaction)
+            self._sdk_pid = os.getpid()
+        return self._sdk_client
+
+    def log_risk_analysis(self, analysis_data: dict, on_complete=None) -> dict:
+        """In pipelined mode answers `pending` at once; `on_complete` gets the sequence number on consensus."""
         if self.environment != 'production':
             logger.info(f"Skipping REAL HCS submission because ENVIRONMENT is '{self.environment}'.")
             return {"success": True, "message": "Simulated HCS submission (not in production mode)."}
             
         try:
+            if self.batcher is not None:
+                analysis_hash = hashlib.sha256(json.dumps(analysis_data, sort_keys=True).encode()).hexdigest()
+                return dict(self.batcher.add(analysis_hash), analysis_hash=analysis_hash)
+
             message_to_submit = json.dumps({
                 "timestamp": datetime.utcnow().isoformat(),
                 "analysis": analysis_data,
                 "version": "1.5.0-final", 
             })
+            return self._submit_message(message_to_submit, on_complete)
+
+        except Exception as e:
+            logger.error(f"FATAL ERROR: Failed to submit message to HCS: {e}", exc_info=True)
+            return {"success": False, "error": str(e)}
 
+    def verify_anchored(self, analysis_hash: str) -> dict:
+        """Checks a batched analysis hash's inclusion proof against its anchored Merkle root."""
+        if self.batcher is None:
+            return {"verified": False, "error": "Merkle batching is disabled (set HEDERA_BATCH_MODE=merkle)"}
+        return self.batcher.verify(analysis_hash)
+
+    def submission_status(self, submission_id: str) -> dict:
+        """queued, sent, confirmed (with the sequence number) or failed, for a pipelined submission."""
+        status = self.pipeline.status(submission_id) if self.pipeline is not None else None
+        return status or {"status": "unknown", "submission_id": submission_id}
+
+    def _submit_message(self, message_to_submit: str, on_complete=None) -> dict:
+        if self.pipeline is None:
+            return self._submit_direct(message_to_submit)
+        submission_id = self.pipeline.submit(message_to_submit, on_complete)
+        status = self.pipeline.status(submission_id) or {}
+        return {"success": True, "status": "pending", "submission_id": submission_id,
+                "transaction_id": status.get('transaction_id')}
+
+    def _submit_direct(self, message_to_submit: str) -> dict:
+        started = time.perf_counter()
+        result = self._execute_submit(message_to_submit)
+        metrics.observe('aya_hedera_submit_duration_seconds', time.perf_counter() - started,
+                        mode='direct', outcome='success' if result.get('success') else 'failure')
+        return result
+
+    def _execute_submit(self, message_to_submit: str) -> dict:
+        try:
             logger.info(f"Submitting REAL message to HCS Topic {self.topic_id_str}...")
-            transaction = TopicMessageSubmitTransaction().setTopicId(self.topic_id).setMessage(message_to_submit)
-            receipt = transaction.freezeWith(self.client).sign(self.private_key).execute(self.client).getReceipt()
+            client, private_key, topic_id, TopicMessageSubmitTransaction = self._sdk()
+            transaction = TopicMessageSubmitTransaction().setTopicId(topic_id).setMessage(message_to_submit)
+            receipt = transaction.freezeWith(client).sign(private_key).execute(client).getReceipt()
             sequence_number = receipt.topicSequenceNumber
             
             logger.info(f"SUCCESS! Message submitted to HCS. Sequence number: {sequence_number}")
@@ -67,6 +177,20 @@ class HederaClient:
             return {"success": False, "error": str(e)}
 
     def verify_transaction_onchain(self, tx_data: dict) -> dict:
-        # Placeholder for demo
-        return {"verified": True, "message": "Verification logic placeholder."}
+        """
+        Looks a submission up in the locally synced copy of the topic. `tx_data` names it by
+        any of: transaction_id, sequence_number, consensus_timestamp, message, message_hash, log_hash.
+        """
+        for field in ('transaction_id', 'sequence_number', 'consensus_timestamp', 'message', 'message_hash', 'log_hash'):
+            if tx_data.get(field) is not None:
+                key = tx_data[field]
+                break
+        else:
+            return {"verified": False, "message": "No transaction_id, sequence_number, timestamp or message given."}
+
+        self.mirror_sync.start()
+        record = self.mirror_sync.lookup(key)
+        if record is None:
+            return {"verified": False, "message": "Not found in the synced topic (yet).", **self.mirror_sync.status()}
+        return {"verified": True, "record": record}
 
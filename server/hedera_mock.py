@@ -1,13 +1,15 @@
 # server/hedera_mock.py - UPDATE this file
 import os
-import json
 import hashlib
 import time
-import requests
 import logging
 import base64
 from typing import Optional, Dict, Any
 from datetime import datetime
+from .merkle import MerkleBatcher
+from .tx_log import TransactionLog
+from .mirror_sync import MirrorNodeSynchronizer
+from . import metrics
 
 logger = logging.getLogger(__name__)
 
@@ -21,18 +23,44 @@ class MockHederaClient:
         self.network = os.getenv("HEDERA_NETWORK", "testnet")
         
         # For real submission
-        self.mirror_node_url = "https://testnet.mirrornode.hedera.com"
+        self.mirror_node_url = os.getenv("HEDERA_MIRROR_URL", "https://testnet.mirrornode.hedera.com")
         
         if not all([self.account_id, self.topic_id]):
             logger.warning("Hedera credentials not fully configured - running in mock mode")
             self.mock_mode = True
         else:
             self.mock_mode = False
+
+        # Status queries are answered from a local, incrementally synced copy of the topic
+        self.mirror_sync = MirrorNodeSynchronizer(self.topic_id, mirror_url=self.mirror_node_url) if self.topic_id else None
+
+        # Local source of truth for every submission (buffered, segmented, indexed by tx_hash)
+        self.tx_log = TransactionLog()
+
+        # HEDERA_BATCH_MODE=merkle anchors one Merkle root per window instead of one message per analysis
+        self.batcher = MerkleBatcher(self._submit) if os.getenv("HEDERA_BATCH_MODE") == "merkle" else None
             
         logger.info(f"HederaClient initialized for {self.account_id} on {self.network}")
     
     def submit_message_to_topic(self, message: str) -> Dict[str, Any]:
-        """Submit a message to Hedera topic"""
+        """Submit a message to Hedera topic (or queue it for the next Merkle anchor)"""
+        started = time.perf_counter()
+        if self.batcher is not None:
+            result = self.batcher.add(message)
+        else:
+            result = self._submit(message)
+        metrics.observe('aya_hedera_submit_duration_seconds', time.perf_counter() - started,
+                        mode='merkle-batch' if self.batcher is not None else 'direct',
+                        outcome='success' if result.get('success') else 'failure')
+        return result
+
+    def verify_anchored(self, message: str) -> Dict[str, Any]:
+        """Checks a batched message's inclusion proof against its anchored Merkle root"""
+        if self.batcher is None:
+            return {"verified": False, "error": "Merkle batching is disabled (set HEDERA_BATCH_MODE=merkle)"}
+        return self.batcher.verify(message)
+
+    def _submit(self, message: str) -> Dict[str, Any]:
         
         # Always log locally first
         timestamp = datetime.utcnow().isoformat()
@@ -46,9 +74,8 @@ class MockHederaClient:
             "account_id": self.account_id
         }
         
-        # Write to local log file
-        with open("hedera_transactions.log", "a") as f:
-            f.write(json.dumps(log_entry) + "\n")
+        # Write to local log
+        self.tx_log.append(tx_hash, log_entry)
         
         if self.mock_mode:
             # Mock response for local development
@@ -95,22 +122,24 @@ class MockHederaClient:
                 "mode": "error"
             }
     
+    def get_logged_transaction(self, tx_hash: str) -> Optional[Dict[str, Any]]:
+        """Look up a locally logged submission by its tx_hash"""
+        return self.tx_log.get(tx_hash)
+
     def check_transaction_status(self, tx_id: str) -> Dict[str, Any]:
-        """Check if a transaction exists on Hedera"""
+        """Check if a transaction exists on Hedera (by transaction id, sequence number, timestamp or message)"""
+        if self.mirror_sync is None:
+            return {"found": False, "error": "HEDERA_TOPIC_ID is not configured"}
         try:
-            # Query the mirror node
-            url = f"{self.mirror_node_url}/api/v1/topics/{self.topic_id}/messages"
-            response = requests.get(url, timeout=10)
-            
-            if response.status_code == 200:
+            self.mirror_sync.start()
+            record = self.mirror_sync.lookup(tx_id)
+            if record:
                 return {
                     "found": True,
-                    "topic_url": f"https://hashscan.io/testnet/topic/{self.topic_id}"
+                    **record,
+                    "topic_url": f"https://hashscan.io/{self.network}/topic/{self.topic_id}"
                 }
-            return {"found": False}
+            return {"found": False, **self.mirror_sync.status()}
         except Exception as e:
             logger.error(f"Error checking transaction: {e}")
             return {"found": False, "error": str(e)}
-
-# Global client instance
-hedera_client = MockHederaClient()
\ No newline at end of file
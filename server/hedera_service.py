@@ -2,13 +2,17 @@
 import os
 import logging
 
+from .lazy import Lazy
+
 logger = logging.getLogger(__name__)
 
-# Use the mock client that doesn't require Java
-from .hedera_mock import MockHederaClient
 
 def init_hedera():
     """Initialize the Hedera client (mock for now, no Java required)"""
+    # Use the mock client that doesn't require Java
+    from .hedera_mock import MockHederaClient
     return MockHederaClient()
 
-hedera_client = init_hedera()
+
+# Built on first use, so importing the app (e.g. in a preloading gunicorn master) stays cheap
+hedera_client = Lazy(init_hedera, 'hedera_client')
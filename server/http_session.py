@@ -0,0 +1,68 @@
+# server/http_session.py
+import os
+import logging
+import threading
+from typing import Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+POOL_CONNECTIONS = int(os.getenv('HTTP_POOL_CONNECTIONS', '10'))
+POOL_MAXSIZE = int(os.getenv('HTTP_POOL_MAXSIZE', '32'))
+CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', '3.05'))
+READ_TIMEOUT = float(os.getenv('HTTP_READ_TIMEOUT', '10'))
+MAX_RETRIES = int(os.getenv('HTTP_MAX_RETRIES', '3'))
+BACKOFF_FACTOR = float(os.getenv('HTTP_BACKOFF_FACTOR', '0.2'))
+RETRY_STATUSES = (429, 502, 503, 504)
+
+_lock = threading.Lock()
+_session = None
+_session_pid = None
+
+
+def default_timeout(read: float = READ_TIMEOUT) -> Tuple[float, float]:
+    """(connect, read) timeout tuple as accepted by requests."""
+    return (CONNECT_TIMEOUT, read)
+
+
+def build_session(pool_connections: int = POOL_CONNECTIONS, pool_maxsize: int = POOL_MAXSIZE,
+                  max_retries: int = MAX_RETRIES, backoff_factor: float = BACKOFF_FACTOR) -> requests.Session:
+    """
+    Builds a keep-alive session with a connection pool per host. Connection errors are
+    retried for every method (nothing reached the server yet); read errors and retryable
+    status codes are only retried for idempotent methods.
+    """
+    retry = Retry(
+        total=max_retries,
+        connect=max_retries,
+        read=max_retries,
+        status=max_retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=Retry.DEFAULT_ALLOWED_METHODS,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, max_retries=retry)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_session() -> requests.Session:
+    """
+    Returns the shared session for this process. A forked gunicorn worker gets its own
+    session instead of reusing sockets inherited from the parent.
+    """
+    global _session, _session_pid
+    pid = os.getpid()
+    if _session is None or _session_pid != pid:
+        with _lock:
+            if _session is None or _session_pid != pid:
+                _session = build_session()
+                _session_pid = pid
+                logger.info(f"HTTP session pool created (pool_maxsize={POOL_MAXSIZE}, retries={MAX_RETRIES})")
+    return _session
@@ -0,0 +1,409 @@
+# server/interaction_graph.py
+import os
+import time
+import logging
+import threading
+from array import array
+from collections import deque
+from typing import Dict, Any, Callable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Distance of nodes no known scam address reaches within max_hops
+UNREACHED = 255
+# Half-edges of the smaller endpoint checked for an existing edge before a new one is added;
+# a duplicate between two busy nodes slips through and is merged by the next compaction
+_SCAN_LIMIT = 32
+# Edges kept when max_edges is exceeded, as a share of it, so eviction does not rerun on the next insert
+_EVICT_TO = 0.9
+
+_DTYPES = {'i': np.int32, 'I': np.uint32, 'B': np.uint8}
+
+
+def _hop_scores() -> Tuple[float, ...]:
+    return tuple(float(s) for s in os.getenv('GRAPH_HOP_SCORES', '0.5,0.25,0.1').split(',') if s.strip())
+
+
+def _to_array(typecode: str, values: np.ndarray) -> array:
+    out = array(typecode)
+    out.frombytes(np.ascontiguousarray(values, dtype=_DTYPES[typecode]).tobytes())
+    return out
+
+
+def _from_array(values: array) -> np.ndarray:
+    # Copied: a live numpy view would pin the buffer and make later appends fail
+    return np.frombuffer(values, dtype=_DTYPES[values.typecode]).copy() if len(values) else np.zeros(0, _DTYPES[values.typecode])
+
+
+class _State:
+    """
+    One generation of the graph. Edge e is stored as half-edges 2e (source -> to[2e])
+    and 2e + 1 (the reverse), so the source of half-edge h is to[h ^ 1]. Each node's
+    half-edges form a linked list through `next`, newest first, starting at head[node].
+    """
+
+    __slots__ = ('ids', 'addresses', 'head', 'degree', 'dist', 'to', 'next', 'seen')
+
+    def __init__(self):
+        self.ids: Dict[str, int] = {}
+        self.addresses: List[str] = []
+        self.head = array('i')
+        self.degree = array('I')
+        self.dist = array('B')
+        self.to = array('i')
+        self.next = array('i')
+        self.seen = array('I')
+
+
+class InteractionGraph:
+    """
+    Undirected graph of which addresses transacted with which, built from the
+    traffic the detector sees. Addresses are interned to integer node ids and the
+    adjacency lives in flat arrays (about 20 bytes per edge), and every node keeps
+    its distance in hops to the nearest known scam address, up to max_hops.
+
+    Distances are maintained incrementally: a new edge or a newly blocklisted address
+    relaxes only the neighbourhood it brings closer. Nodes with more than
+    `hub_degree` counterparties (exchanges, token contracts) are never passed
+    through, since everyone is two hops from everyone via USDC. What cannot be done
+    incrementally (edges aging out after `edge_ttl`, eviction above `max_edges`,
+    blocklist removals) is done by a periodic vectorized compaction that rebuilds
+    the arrays and recomputes every distance, then swaps the new generation in.
+
+    Queries read the current generation without locking. Interactions are queued
+    and applied by whichever thread finds the lock free, so the request path never
+    waits on a compaction.
+    """
+
+    def __init__(self, is_scam: Callable[[str], bool] = lambda address: False,
+                 hop_scores: Optional[Sequence[float]] = None, hub_degree: Optional[int] = None,
+                 edge_ttl: Optional[float] = None, max_edges: Optional[int] = None,
+                 compact_interval: Optional[float] = None, inbox_size: Optional[int] = None):
+        self.is_scam = is_scam
+        # Proximity evidence for a recipient 1, 2, ... hops from a known scam; its length is max_hops
+        self.hop_scores = tuple(hop_scores) if hop_scores is not None else _hop_scores()
+        self.max_hops = len(self.hop_scores)
+        self.hub_degree = hub_degree or int(os.getenv('GRAPH_HUB_DEGREE', '1000'))
+        self.edge_ttl = edge_ttl or float(os.getenv('GRAPH_EDGE_TTL', str(30 * 86400)))
+        self.max_edges = max_edges or int(os.getenv('GRAPH_MAX_EDGES', '10000000'))
+        self.compact_interval = compact_interval if compact_interval is not None else float(os.getenv('GRAPH_COMPACT_INTERVAL', '60'))
+        # Interactions waiting for the lock; the oldest are dropped if a compaction falls far behind
+        self._inbox: deque = deque(maxlen=inbox_size or int(os.getenv('GRAPH_INBOX_SIZE', '100000')))
+        self._state = _State()
+        self._lock = threading.Lock()
+        self._rescan = False
+        self._wake = threading.Event()
+        self._compactor_pid = None
+        self.compactions = 0
+        self.last_compaction_ms = 0.0
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    # ---- writing -------------------------------------------------------
+
+    def add_interaction(self, from_address: Any, to_address: Any, seen: Optional[float] = None):
+        if not (isinstance(from_address, str) and isinstance(to_address, str) and from_address and to_address):
+            return
+        self._inbox.append((from_address.lower(), to_address.lower(), int(seen or time.time())))
+        self._ensure_compactor()
+        self.drain(blocking=False)
+
+    def drain(self, blocking: bool = True) -> int:
+        """Applies queued interactions; returns how many (0 if the lock was busy and not waited for)."""
+        if not self._lock.acquire(blocking=blocking):
+            return 0
+        try:
+            state, applied = self._state, 0
+            while self._inbox:
+                try:
+                    from_address, to_address, seen = self._inbox.popleft()
+                except IndexError:
+                    break
+                self._insert(state, from_address, to_address, seen)
+                applied += 1
+            if len(state.seen) > self.max_edges:
+                self._wake.set()
+            return applied
+        finally:
+            self._lock.release()
+
+    def mark_scam(self, address: str):
+        """A newly blocklisted address: it and its neighbourhood move closer at once."""
+        with self._lock:
+            state = self._state
+            node = state.ids.get(address.lower())
+            if node is not None and state.dist[node] != 0:
+                self._propagate(state, node, 0)
+
+    def rescan(self, *_):
+        """Blocklist removals or reloads: every node's listing is rechecked by the next compaction."""
+        self._rescan = True
+        self._wake.set()
+
+    def load(self, addresses: Sequence[str], sources: np.ndarray, targets: np.ndarray, seen: Any = None):
+        """
+        Bulk insert: an edge between addresses[sources[i]] and addresses[targets[i]] for
+        every i, seen at `seen` (a timestamp or one per edge, default now). Applied with a
+        single compaction instead of one incremental update per edge.
+        """
+        now = int(time.time())
+        seen = np.broadcast_to(np.asarray(now if seen is None else seen, dtype=np.uint32), (len(sources),))
+        with self._lock:
+            state = self._state
+            nodes = np.fromiter((self._intern(state, address.lower()) for address in addresses),
+                                dtype=np.int32, count=len(addresses))
+            a, b = nodes[np.asarray(sources)], nodes[np.asarray(targets)]
+            loops = a == b
+            a, b, seen = a[~loops], b[~loops], seen[~loops]
+            to = np.empty(2 * len(a), np.int32)
+            to[0::2], to[1::2] = b, a
+            # Links and degrees are rebuilt by the compaction right after
+            state.to.frombytes(to.tobytes())
+            state.next.frombytes(np.full(len(to), -1, np.int32).tobytes())
+            state.seen.frombytes(np.ascontiguousarray(seen).tobytes())
+            self._compact_locked(now)
+
+    def _intern(self, state: _State, address: str) -> int:
+        node = state.ids.get(address)
+        if node is None:
+            node = len(state.addresses)
+            state.addresses.append(address)
+            state.head.append(-1)
+            state.degree.append(0)
+            state.dist.append(0 if self.is_scam(address) else UNREACHED)
+            # Published last: lock-free readers never see an id without its arrays
+            state.ids[address] = node
+        return node
+
+    def _insert(self, state: _State, from_address: str, to_address: str, seen: int):
+        u, v = self._intern(state, from_address), self._intern(state, to_address)
+        if u == v:
+            return
+        # A repeat interaction refreshes its edge instead of adding another one
+        x, y = (u, v) if state.degree[u] <= state.degree[v] else (v, u)
+        h, scanned = state.head[x], 0
+        while h != -1 and scanned < _SCAN_LIMIT:
+            if state.to[h] == y:
+                state.seen[h >> 1] = max(state.seen[h >> 1], seen)
+                return
+            h, scanned = state.next[h], scanned + 1
+        edge = len(state.seen)
+        state.seen.append(seen)
+        state.to.append(v)
+        state.next.append(state.head[u])
+        state.to.append(u)
+        state.next.append(state.head[v])
+        state.head[u], state.head[v] = 2 * edge, 2 * edge + 1
+        state.degree[u] += 1
+        state.degree[v] += 1
+        du, dv = state.dist[u], state.dist[v]
+        if du + 1 < dv and du < self.max_hops and self._passes(state, u):
+            self._propagate(state, v, du + 1)
+        elif dv + 1 < du and dv < self.max_hops and self._passes(state, v):
+            self._propagate(state, u, dv + 1)
+
+    def _passes(self, state: _State, node: int) -> bool:
+        # Scam addresses always reach their counterparties; hubs relay nothing
+        return state.dist[node] == 0 or state.degree[node] <= self.hub_degree
+
+    def _propagate(self, state: _State, start: int, distance: int):
+        # Bounded BFS from a node whose distance just dropped
+        state.dist[start] = distance
+        frontier = [start]
+        while frontier and distance < self.max_hops:
+            closer = []
+            for node in frontier:
+                if not self._passes(state, node):
+                    continue
+                h = state.head[node]
+                while h != -1:
+                    neighbour = state.to[h]
+                    if state.dist[neighbour] > distance + 1:
+                        state.dist[neighbour] = distance + 1
+                        closer.append(neighbour)
+                    h = state.next[h]
+            frontier, distance = closer, distance + 1
+
+    # ---- compaction ----------------------------------------------------
+
+    def compact(self) -> Dict[str, Any]:
+        """Drops aged and excess edges, merges duplicates and recomputes every distance."""
+        with self._lock:
+            self._compact_locked(int(time.time()))
+        self.drain()
+        return self.stats()
+
+    def _needs_compaction(self, now: int) -> bool:
+        with self._lock:
+            state = self._state
+            if self._rescan or len(state.seen) > self.max_edges:
+                return True
+            if not len(state.seen):
+                return False
+            # A view is fine here: nothing appends while the lock is held, and it is dropped before release
+            oldest = int(np.frombuffer(state.seen, dtype=np.uint32).min())
+            return oldest < now - self.edge_ttl
+
+    def _compact_locked(self, now: int):
+        started = time.perf_counter()
+        rescan, self._rescan = self._rescan, False
+        self._state = self._rebuild(self._state, now, rescan)
+        self.compactions += 1
+        self.last_compaction_ms = round((time.perf_counter() - started) * 1000, 1)
+        logger.info(f"Interaction graph compacted to {len(self._state.addresses)} nodes and "
+                    f"{len(self._state.seen)} edges in {self.last_compaction_ms} ms")
+
+    def _rebuild(self, state: _State, now: int, rescan: bool) -> _State:
+        seen, to = _from_array(state.seen), _from_array(state.to)
+        a, b = to[1::2], to[0::2]
+        keep = np.flatnonzero(seen >= now - self.edge_ttl)
+        if len(keep) > self.max_edges:
+            newest = np.argsort(seen[keep], kind='stable')[len(keep) - int(self.max_edges * _EVICT_TO):]
+            keep = np.sort(keep[newest])
+        a, b, seen = a[keep], b[keep], seen[keep]
+
+        # Duplicates: keep the most recently seen copy of each pair
+        pair = (np.minimum(a, b).astype(np.int64) << 32) | np.maximum(a, b).astype(np.int64)
+        order = np.lexsort((seen, pair))
+        last = np.ones(len(order), bool)
+        last[:-1] = pair[order[:-1]] != pair[order[1:]]
+        order = order[last]
+        a, b, seen = a[order], b[order], seen[order]
+
+        # Nodes left without edges are forgotten; they are interned again (and rechecked) when seen
+        live = np.unique(np.concatenate([a, b]))
+        renumber = np.full(len(state.addresses), -1, np.int32)
+        renumber[live] = np.arange(len(live), dtype=np.int32)
+        a, b = renumber[a], renumber[b]
+        addresses = [state.addresses[i] for i in live.tolist()]
+        if rescan:
+            seeds = np.fromiter((bool(self.is_scam(address)) for address in addresses), dtype=bool, count=len(addresses))
+        else:
+            seeds = _from_array(state.dist)[live] == 0
+
+        nodes = len(addresses)
+        to = np.empty(2 * len(a), np.int32)
+        to[0::2], to[1::2] = b, a
+        source = np.empty_like(to)
+        source[0::2], source[1::2] = a, b
+        # Each node's list newest first, as the incremental path keeps it
+        order = np.lexsort((-np.repeat(seen, 2).astype(np.int64), source))
+        same = source[order[:-1]] == source[order[1:]]
+        following = np.full(len(to), -1, np.int32)
+        following[order[:-1][same]] = order[1:][same]
+        first = np.ones(len(order), bool)
+        first[1:] = ~same
+        head = np.full(nodes, -1, np.int32)
+        head[source[order[first]]] = order[first]
+        degree = np.bincount(source, minlength=nodes).astype(np.uint32)
+
+        new = _State()
+        new.addresses = addresses
+        new.ids = dict(zip(addresses, range(nodes)))
+        new.head, new.degree = _to_array('i', head), _to_array('I', degree)
+        new.to, new.next, new.seen = _to_array('i', to), _to_array('i', following), _to_array('I', seen)
+        new.dist = _to_array('B', self._distances(to[order], degree, seeds))
+        return new
+
+    def _distances(self, neighbours: np.ndarray, degree: np.ndarray, seeds: np.ndarray) -> np.ndarray:
+        # Multi-source BFS over the CSR view (neighbours grouped by node) of the rebuilt arrays
+        offsets = np.zeros(len(degree) + 1, np.int64)
+        np.cumsum(degree, out=offsets[1:])
+        dist = np.full(len(degree), UNREACHED, np.uint8)
+        dist[seeds] = 0
+        frontier = np.flatnonzero(seeds)
+        for distance in range(1, self.max_hops + 1):
+            if distance > 1:
+                frontier = frontier[degree[frontier] <= self.hub_degree]
+            counts = degree[frontier].astype(np.int64)
+            total = int(counts.sum())
+            if not total:
+                break
+            starts = np.repeat(offsets[frontier] - np.cumsum(counts) + counts, counts)
+            reached = neighbours[starts + np.arange(total)]
+            frontier = np.unique(reached[dist[reached] == UNREACHED])
+            dist[frontier] = distance
+        return dist
+
+    def _ensure_compactor(self):
+        if self._compactor_pid is not None:
+            return
+        with self._lock:
+            if self._compactor_pid is not None:
+                return
+            self._compactor_pid = os.getpid()
+        if self.compact_interval > 0:
+            threading.Thread(target=self._run_compactor, name="graph-compact", daemon=True).start()
+
+    def _after_fork(self):
+        # The child keeps the parent's graph but not its lock holders or compactor thread
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._compactor_pid = None
+
+    def _run_compactor(self):
+        pid = os.getpid()
+        while self._compactor_pid == pid:
+            self._wake.wait(self.compact_interval)
+            self._wake.clear()
+            try:
+                if self._needs_compaction(int(time.time())):
+                    self.compact()
+            except Exception as e:
+                logger.error(f"Interaction graph compaction failed: {e}")
+
+    # ---- reading -------------------------------------------------------
+
+    def hops_to_scam(self, address: Any) -> Optional[int]:
+        """Hops from the address to the nearest known scam address; None if unseen or further than max_hops."""
+        if not isinstance(address, str):
+            return None
+        state = self._state
+        node = state.ids.get(address.lower())
+        if node is None or state.dist[node] == UNREACHED:
+            return None
+        return state.dist[node]
+
+    def proximity_score(self, hops: Optional[int]) -> float:
+        if hops is None:
+            return 0.0
+        return 1.0 if hops == 0 else self.hop_scores[hops - 1]
+
+    def path_to_scam(self, address: str, scan_limit: int = 10000) -> Optional[List[str]]:
+        """One shortest path from the address to a known scam address, following decreasing distances."""
+        state = self._state
+        node = state.ids.get(address.lower())
+        if node is None or state.dist[node] == UNREACHED:
+            return None
+        path = [state.addresses[node]]
+        while state.dist[node] > 0:
+            wanted, h, scanned, step = state.dist[node] - 1, state.head[node], 0, None
+            while h != -1 and scanned < scan_limit:
+                neighbour = state.to[h]
+                if state.dist[neighbour] == wanted and (wanted == 0 or state.degree[neighbour] <= self.hub_degree):
+                    step = neighbour
+                    break
+                h, scanned = state.next[h], scanned + 1
+            if step is None:
+                # The edge that set this distance has aged out; the next compaction corrects it
+                break
+            node = step
+            path.append(state.addresses[node])
+        return path
+
+    def describe(self, address: str) -> Optional[Dict[str, Any]]:
+        state = self._state
+        node = state.ids.get(address.lower())
+        if node is None:
+            return None
+        hops = self.hops_to_scam(address)
+        return {'address': state.addresses[node], 'counterparties': state.degree[node],
+                'hub': state.degree[node] > self.hub_degree, 'hops_to_scam': hops,
+                'proximity_score': self.proximity_score(hops), 'path': self.path_to_scam(address)}
+
+    def stats(self) -> Dict[str, Any]:
+        state = self._state
+        return {'nodes': len(state.addresses), 'edges': len(state.seen), 'queued': len(self._inbox),
+                'max_hops': self.max_hops, 'compactions': self.compactions,
+                'last_compaction_ms': self.last_compaction_ms}
@@ -0,0 +1,354 @@
+# server/job_registry.py
+import os
+import re
+import json
+import time
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Callable, Iterable, Iterator, AsyncIterator, Optional, Tuple
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+TERMINAL = ('completed', 'failed', 'cancelled', 'not_found', 'expired')
+# Spellings the upstream may use for the terminal states
+_ALIASES = {'succeeded': 'completed', 'success': 'completed', 'done': 'completed',
+            'error': 'failed', 'canceled': 'cancelled'}
+
+JOB_ID = re.compile(r'^[A-Za-z0-9_.:-]{1,128}$')
+SSE_CONTENT_TYPE = 'text/event-stream'
+
+
+def max_wait() -> float:
+    return float(os.getenv('JOB_MAX_WAIT', '30'))
+
+
+def heartbeat_interval() -> float:
+    return float(os.getenv('JOB_SSE_HEARTBEAT', '15'))
+
+
+def wait_query(wait: Optional[str], version: Optional[str]) -> Tuple[float, int]:
+    """(seconds to wait, version to wait past) of a long-poll request; ValueError if malformed."""
+    try:
+        seconds = float(wait) if wait not in (None, '') else 0.0
+        after = int(version) if version not in (None, '') else 0
+    except ValueError:
+        raise ValueError("'wait' must be a number of seconds and 'version' an integer")
+    if seconds < 0 or after < 0:
+        raise ValueError("'wait' and 'version' must not be negative")
+    return min(seconds, max_wait()), after
+
+
+def sse_event(job: Dict[str, Any]) -> bytes:
+    return f"id: {job['version']}\nevent: status\ndata: {json.dumps(job)}\n\n".encode()
+
+
+SSE_HEARTBEAT = b': keep-alive\n\n'
+
+
+class JobRegistry:
+    """
+    Tracks the Comput3 jobs started through hedera_compute_job so callers can wait on
+    them here instead of polling Comput3 themselves.
+
+    One background thread polls every outstanding job in bulk through `status_fn`
+    (job ids -> {job_id: {'status', 'result', 'error'}}), at most `batch_size` ids
+    per call. Each job is checked every `poll_min` seconds at first; the interval
+    doubles up to `poll_max` while its status stays the same and drops back when it
+    changes. Finished jobs are kept for `ttl` seconds, at most `retention` of them;
+    jobs still running after `max_age` seconds are given up as 'expired'.
+
+    Ids adopted from a lookup cost an upstream poll each, so at most `max_adopted`
+    are outstanding at once, and one Comput3 does not know is dropped on its first
+    poll; only its 'not_found' answer is remembered, among the last `max_adopted`.
+
+    Every status change bumps the job's `version`; `wait` / `wait_async` block until
+    the version passes the one the caller has seen.
+    """
+
+    def __init__(self, status_fn: Callable[[list], Dict[str, Dict[str, Any]]], poll_min: Optional[float] = None,
+                 poll_max: Optional[float] = None, batch_size: Optional[int] = None,
+                 retention: Optional[int] = None, ttl: Optional[float] = None, max_age: Optional[float] = None,
+                 max_adopted: Optional[int] = None):
+        self.status_fn = status_fn
+        self.poll_min = poll_min or float(os.getenv('JOB_POLL_MIN', '1'))
+        self.poll_max = poll_max or float(os.getenv('JOB_POLL_MAX', '30'))
+        self.batch_size = batch_size or int(os.getenv('JOB_POLL_BATCH', '100'))
+        self.retention = retention or int(os.getenv('JOB_RETENTION', '10000'))
+        self.ttl = ttl or float(os.getenv('JOB_RESULT_TTL', '3600'))
+        self.max_age = max_age or float(os.getenv('JOB_MAX_AGE', '86400'))
+        self.max_adopted = max_adopted or int(os.getenv('JOB_MAX_ADOPTED', '1000'))
+
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        # Outstanding jobs: job_id -> [next check (monotonic), interval, adopted]
+        self._schedule: Dict[str, list] = {}
+        # Finished jobs in the order they finished: job_id -> finished at (monotonic)
+        self._finished: "OrderedDict[str, float]" = OrderedDict()
+        # Adopted ids Comput3 did not know: job_id -> their final 'not_found' record
+        self._unknown: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        # Event-loop waiters: job_id -> {(loop, wake)}
+        self._waiters: Dict[str, set] = {}
+        self._cond = threading.Condition()
+        self._wake = threading.Event()
+        self._pid = None
+        self._closing = False
+        self.polls = 0
+        self.poll_failures = 0
+
+    # ---- tracking ------------------------------------------------------
+
+    def track(self, job_id: str, adopted: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        Starts watching `job_id`. An adopted job was started elsewhere (another worker,
+        another client); if Comput3 does not know it either it ends as 'not_found'.
+        None if `max_adopted` adopted jobs are outstanding already.
+        """
+        now = time.time()
+        with self._cond:
+            job = self._lookup(job_id)
+            if job is None:
+                if adopted and sum(1 for schedule in self._schedule.values() if schedule[2]) >= self.max_adopted:
+                    logger.warning(f"Not adopting job '{job_id}': {self.max_adopted} adopted jobs are outstanding")
+                    return None
+                job = {'job_id': job_id, 'status': 'unknown' if adopted else 'submitted', 'result': None,
+                       'error': None, 'created_at': now, 'updated_at': now, 'version': 1}
+                self._jobs[job_id] = job
+                self._schedule[job_id] = [time.monotonic() + (0 if adopted else self.poll_min), self.poll_min, adopted]
+            snapshot = dict(job)
+        self._ensure_poller()
+        if adopted:
+            self._wake.set()
+        return snapshot
+
+    def follow(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        The job if it is tracked here. A well-formed id this process has not seen
+        (started through another worker, or before a restart) is adopted while fewer
+        than `max_adopted` are; None otherwise.
+        """
+        job = self.get(job_id)
+        if job is None and JOB_ID.match(job_id):
+            job = self.track(job_id, adopted=True)
+        return job
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._cond:
+            job = self._lookup(job_id)
+            return dict(job) if job else None
+
+    def _lookup(self, job_id: str) -> Optional[Dict[str, Any]]:
+        # Caller holds the lock
+        job = self._jobs.get(job_id)
+        return job if job is not None else self._unknown.get(job_id)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {'outstanding': len(self._schedule), 'finished': len(self._finished),
+                    'adopted': sum(1 for schedule in self._schedule.values() if schedule[2]),
+                    'unknown': len(self._unknown),
+                    'polls': self.polls, 'poll_failures': self.poll_failures}
+
+    def close(self):
+        self._closing = True
+        self._wake.set()
+
+    # ---- waiting -------------------------------------------------------
+
+    def _settled(self, job_id: str, after_version: int) -> bool:
+        # Caller holds the lock
+        job = self._lookup(job_id)
+        return job is None or job['version'] > after_version or job['status'] in TERMINAL
+
+    def wait(self, job_id: str, after_version: int = 0, timeout: float = 0.0) -> Optional[Dict[str, Any]]:
+        """The job once its version passes `after_version` (or it has finished), else after `timeout`."""
+        with self._cond:
+            self._cond.wait_for(lambda: self._settled(job_id, after_version), timeout=timeout)
+            job = self._lookup(job_id)
+            return dict(job) if job else None
+
+    async def wait_async(self, job_id: str, after_version: int = 0, timeout: float = 0.0) -> Optional[Dict[str, Any]]:
+        """Same as `wait` without blocking the event loop; the poller thread wakes it."""
+        loop = asyncio.get_running_loop()
+        woken = loop.create_future()
+
+        def wake():
+            if not woken.done():
+                woken.set_result(None)
+
+        waiter = (loop, wake)
+        with self._cond:
+            if self._settled(job_id, after_version) or timeout <= 0:
+                job = self._lookup(job_id)
+                return dict(job) if job else None
+            self._waiters.setdefault(job_id, set()).add(waiter)
+        try:
+            await asyncio.wait_for(woken, timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            with self._cond:
+                waiters = self._waiters.get(job_id)
+                if waiters is not None:
+                    waiters.discard(waiter)
+                    if not waiters:
+                        del self._waiters[job_id]
+        return self.get(job_id)
+
+    def events(self, job_id: str, after_version: int = 0) -> Iterator[bytes]:
+        """Server-sent events: one per status change, heartbeats in between, ending once the job has finished."""
+        while True:
+            job = self.wait(job_id, after_version, heartbeat_interval())
+            if job is None:
+                return
+            if job['version'] > after_version:
+                after_version = job['version']
+                yield sse_event(job)
+                if job['status'] in TERMINAL:
+                    return
+            else:
+                yield SSE_HEARTBEAT
+
+    async def aevents(self, job_id: str, after_version: int = 0) -> AsyncIterator[bytes]:
+        while True:
+            job = await self.wait_async(job_id, after_version, heartbeat_interval())
+            if job is None:
+                return
+            if job['version'] > after_version:
+                after_version = job['version']
+                yield sse_event(job)
+                if job['status'] in TERMINAL:
+                    return
+            else:
+                yield SSE_HEARTBEAT
+
+    # ---- polling -------------------------------------------------------
+
+    def _ensure_poller(self):
+        # Threads do not survive fork, so a worker process starts its own on first use
+        if self._pid == os.getpid():
+            return
+        with self._cond:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+        threading.Thread(target=self._run, name="job-poller", daemon=True).start()
+
+    def _run(self):
+        pid = os.getpid()
+        while self._pid == pid and not self._closing:
+            # Cleared before looking, so a job tracked meanwhile wakes the next wait
+            self._wake.clear()
+            due, next_check = self._due()
+            for start in range(0, len(due), self.batch_size):
+                self.poll(due[start:start + self.batch_size])
+            self._expire()
+            if not due:
+                self._wake.wait(max(0.0, next_check - time.monotonic()) if next_check is not None else self.poll_max)
+
+    def _due(self) -> Tuple[list, Optional[float]]:
+        now = time.monotonic()
+        due, next_check = [], None
+        with self._cond:
+            for job_id, (check_at, _, _) in self._schedule.items():
+                if check_at <= now:
+                    due.append(job_id)
+                elif next_check is None or check_at < next_check:
+                    next_check = check_at
+        return due, next_check
+
+    def poll(self, job_ids: Iterable[str]):
+        """Fetches the status of `job_ids` in one upstream call and applies it."""
+        job_ids = list(job_ids)
+        try:
+            answers = self.status_fn(job_ids)
+            outcome = 'success'
+        except Exception as e:
+            logger.warning(f"Polling {len(job_ids)} Comput3 jobs failed: {e}")
+            answers, outcome = None, 'error'
+        metrics.inc('aya_job_polls_total', outcome=outcome)
+        now, wall = time.monotonic(), time.time()
+        woken = []
+        with self._cond:
+            self.polls += 1
+            if answers is None:
+                self.poll_failures += 1
+            for job_id in job_ids:
+                schedule = self._schedule.get(job_id)
+                if schedule is None:
+                    continue
+                job = self._jobs[job_id]
+                answer = answers.get(job_id) if answers is not None else None
+                if answer is None:
+                    if answers is None or not schedule[2] or job['status'] != 'unknown':
+                        self._back_off(schedule, now)
+                        continue
+                    status = 'not_found'
+                else:
+                    status = str(answer.get('status') or 'unknown').lower()
+                    status = _ALIASES.get(status, status)
+                if status == 'not_found' and schedule[2]:
+                    self._forget_unknown(job, wall)
+                    woken.append(job_id)
+                elif status != job['status'] or answer.get('result') != job['result']:
+                    self._update(job, status, answer.get('result'), answer.get('error'), wall, now)
+                    schedule[0], schedule[1] = now + self.poll_min, self.poll_min
+                    woken.append(job_id)
+                else:
+                    self._back_off(schedule, now)
+            if woken:
+                self._cond.notify_all()
+                waiters = [w for job_id in woken for w in self._waiters.pop(job_id, ())]
+            else:
+                waiters = []
+        for loop, wake in waiters:
+            loop.call_soon_threadsafe(wake)
+
+    def _forget_unknown(self, job: Dict[str, Any], wall: float):
+        # Caller holds the lock. Neither tracked nor retained: only the answer is kept, among the last `max_adopted`
+        job_id = job['job_id']
+        del self._schedule[job_id]
+        del self._jobs[job_id]
+        job.update(status='not_found', result=None, error=f"Comput3 does not know job '{job_id}'",
+                   updated_at=wall, version=job['version'] + 1)
+        self._unknown[job_id] = job
+        while len(self._unknown) > self.max_adopted:
+            self._unknown.popitem(last=False)
+        metrics.inc('aya_jobs_finished_total', status='not_found')
+
+    def _back_off(self, schedule: list, now: float):
+        schedule[1] = min(schedule[1] * 2, self.poll_max)
+        schedule[0] = now + schedule[1]
+
+    def _update(self, job: Dict[str, Any], status: str, result: Any, error: Any, wall: float, now: float):
+        # Caller holds the lock
+        job.update(status=status, result=result, error=error, updated_at=wall, version=job['version'] + 1)
+        if status in TERMINAL:
+            self._schedule.pop(job['job_id'], None)
+            self._finished[job['job_id']] = now
+            metrics.inc('aya_jobs_finished_total', status=status)
+
+    def _expire(self):
+        now, wall = time.monotonic(), time.time()
+        woken = []
+        with self._cond:
+            for job_id in list(self._schedule):
+                job = self._jobs[job_id]
+                if wall - job['created_at'] > self.max_age:
+                    self._update(job, 'expired', None, f"No final status after {self.max_age:.0f}s", wall, now)
+                    woken.append(job_id)
+            while self._finished:
+                job_id, finished_at = next(iter(self._finished.items()))
+                if len(self._finished) <= self.retention and now - finished_at <= self.ttl:
+                    break
+                self._finished.popitem(last=False)
+                del self._jobs[job_id]
+                woken.append(job_id)
+            if woken:
+                self._cond.notify_all()
+                waiters = [w for job_id in woken for w in self._waiters.pop(job_id, ())]
+            else:
+                waiters = []
+        for loop, wake in waiters:
+            loop.call_soon_threadsafe(wake)
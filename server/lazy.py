@@ -0,0 +1,59 @@
+# server/lazy.py
+import os
+import time
+import logging
+import threading
+from typing import Any, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class Lazy:
+    """
+    Stands in for a client that is built on first use. Attribute reads and writes
+    are forwarded to the built object, so callers use it like the client itself.
+
+    By default the object is built once per process tree: one built in a preloading
+    gunicorn master is inherited by every worker, which is safe for clients that keep
+    their sockets, files and threads behind their own per-process checks. With
+    `per_process=True` a forked child builds its own instead.
+    """
+
+    def __init__(self, factory: Callable[[], Any], name: str, per_process: bool = False):
+        object.__setattr__(self, '_factory', factory)
+        object.__setattr__(self, '_name', name)
+        object.__setattr__(self, '_per_process', per_process)
+        object.__setattr__(self, '_lock', threading.Lock())
+        object.__setattr__(self, '_value', None)
+        object.__setattr__(self, '_pid', None)
+        object.__setattr__(self, 'build_seconds', None)
+
+    @property
+    def built(self) -> bool:
+        return self._value is not None and (not self._per_process or self._pid == os.getpid())
+
+    def get(self) -> Any:
+        if self.built:
+            return self._value
+        with self._lock:
+            if not self.built:
+                started = time.perf_counter()
+                value = self._factory()
+                object.__setattr__(self, 'build_seconds', time.perf_counter() - started)
+                object.__setattr__(self, '_pid', os.getpid())
+                object.__setattr__(self, '_value', value)
+                logger.info(f"Built {self._name} in {self.build_seconds * 1000:.1f} ms")
+        return self._value
+
+    def peek(self) -> Optional[Any]:
+        """The built object, or None without building it."""
+        return self._value if self.built else None
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.get(), name)
+
+    def __setattr__(self, name: str, value: Any):
+        setattr(self.get(), name, value)
+
+    def __repr__(self) -> str:
+        return f"<Lazy {self._name} ({'built' if self.built else 'not built'})>"
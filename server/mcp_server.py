@@ -3,17 +3,33 @@ import os
 import logging
 import hashlib
 import json
-from flask import Flask, jsonify, request
+import time
+from typing import Dict, Any, List, Optional, Tuple
+from flask import Flask, Response, g, jsonify, request
 from .scam_detector import ScamDetector
 from .compute3_client import Comput3Client
 from .hedera_service import hedera_client
+from .audit_queue import AuditQueue
+from .lazy import Lazy
+from .warmup import Warmup
+from .resilience import Deadline, CircuitOpenError, DeadlineExceeded
+from .scan_stream import stream_verdicts, CONTENT_TYPE as NDJSON, READ_CHUNK_BYTES
+from .job_registry import JobRegistry, wait_query, SSE_CONTENT_TYPE
+from . import metrics
+from . import tracing
 
 # Configure basic logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 
+MAX_BATCH_SIZE = int(os.getenv('MAX_BATCH_SIZE', '5000'))
+# Local scoring never leaves the process, so it accepts much larger batches
+MAX_SCORE_BATCH_SIZE = int(os.getenv('MAX_SCORE_BATCH_SIZE', '100000'))
+MAX_REPUTATION_ADDRESSES = int(os.getenv('MAX_REPUTATION_ADDRESSES', '10000'))
+
 TOOL_COMPUTE = {
     "name": "hedera_compute_job",
-    "description": "Spin-up an ephemeral GPU pod on Comput3.ai and return the jobId",
+    "description": "Spin-up an ephemeral GPU pod on Comput3.ai and return the jobId. "
+                   "Wait for its result with GET /jobs/<jobId>?wait=30 or GET /jobs/<jobId>/events.",
     "input_schema": {
         "type": "object",
         "properties": {
@@ -42,29 +58,159 @@ TOOL_SCAN_DETECTION = {
 
 # Placeholders for other tools
 TOOL_SAFE_TRANSACTION = {"name": "safe_transaction", "description": "Placeholder for safe transaction tool"}
-TOOL_ADDRESS_REPUTATION = {"name": "address_reputation", "description": "Placeholder for address reputation tool"}
+TOOL_ADDRESS_REPUTATION = {
+    "name": "address_reputation",
+    "description": "Reputation of one or many addresses (score, labels, first/last seen, evidence count) "
+                   "built up from every analyzed transaction, with blocklist and allowlist listings applied.",
+    "parameters": {
+        "type": "object",
+        "properties": {
+            "addresses": {"type": "array", "items": {"type": "string"},
+                          "description": "Addresses to look up in one call (or pass a single 'address')."},
+            "address": {"type": "string"},
+            "chain": {"type": "string", "description": "The blockchain name (default 'ethereum')."}
+        }
+    }
+}
 TOOL_CONTENT_VERIFICATION = {"name": "content_verification", "description": "Placeholder for content verification tool"}
 TOOL_SAFE_ALTERNATIVES = {"name": "safe_alternatives", "description": "Placeholder for safe alternatives tool"}
 
 
+def request_deadline(data, headers):
+    """Latency budget for this request: `deadline_ms` in the body, else the X-Deadline-Ms header."""
+    value = data.get("deadline_ms") if isinstance(data, dict) else None
+    return Deadline.from_ms(value if value is not None else headers.get("X-Deadline-Ms"))
+
+
+def reputation_query(arguments) -> Tuple[str, List[str]]:
+    """(chain, addresses) of an address_reputation call; ValueError if malformed."""
+    if not isinstance(arguments, dict):
+        raise ValueError("'arguments' must be an object")
+    addresses = arguments.get("addresses")
+    if addresses is None and arguments.get("address") is not None:
+        addresses = [arguments["address"]]
+    if not isinstance(addresses, list) or not addresses or not all(isinstance(a, str) for a in addresses):
+        raise ValueError("'addresses' must be a non-empty list of address strings")
+    if len(addresses) > MAX_REPUTATION_ADDRESSES:
+        raise ValueError(f"At most {MAX_REPUTATION_ADDRESSES} addresses are allowed per call")
+    return arguments.get("chain") or "ethereum", addresses
+
+
+def compute_job_result(job: Dict[str, Any]) -> Dict[str, Any]:
+    """hedera_compute_job result for a job the registry now tracks."""
+    job_id = job["job_id"]
+    return {"jobId": job_id, "status": job["status"],
+            "status_url": f"/jobs/{job_id}", "events_url": f"/jobs/{job_id}/events"}
+
+
+def events_cursor(headers, version) -> int:
+    """Version an SSE client has already seen: Last-Event-ID on reconnect, else ?version."""
+    _, after = wait_query(None, headers.get("Last-Event-Id") or version)
+    return after
+
+
+def admin_denied(headers) -> Optional[Dict[str, Any]]:
+    """Error body for a request that may not use the /admin endpoints, None if it may."""
+    if not tracing.tracer.admin_token:
+        return {"error": "Admin endpoints are disabled; set ADMIN_TOKEN to enable them"}
+    if not tracing.tracer.authorized(headers):
+        return {"error": "Invalid admin token"}
+    return None
+
+
+def warm_up_detector(scam_detector) -> Dict[str, Any]:
+    detector = scam_detector.get()
+    # One scoring pass loads the model's code paths before real traffic does
+    detector.local_model.score({"chain": "ethereum", "to_address": "0x" + "0" * 40, "value": 0})
+    return {
+        "blocklist_entries": len(detector.blocklist),
+        "allowlist_entries": len(detector.allowlist),
+        "model_version": detector.local_model.version,
+        "calldata_rules": detector.calldata_rules.version,
+        "selector_index": detector.calldata_rules.decoder.index.version,
+    }
+
+
+def build_warmup(comput3_client, scam_detector) -> Warmup:
+    """Warm-up steps shared by both serving modes; GET /ready reports their progress."""
+    return Warmup([
+        ("hedera_client", lambda: {"client": type(hedera_client.get()).__name__}),
+        ("scam_detector", lambda: warm_up_detector(scam_detector)),
+        ("comput3_client", lambda: comput3_client.warm_up()),
+    ])
+
+
 class MCPServer:
     def __init__(self):
         self.app = Flask(__name__)
-        # Initialize the clients
-        self.comput3_client = Comput3Client(os.getenv('COMPUT3_API_KEY'))
+        # Clients are built on first use (or by the warm-up), so importing the app is cheap
+        # and a preloading gunicorn master can build them once for all workers
+        self.comput3_client = Lazy(lambda: Comput3Client(os.getenv('COMPUT3_API_KEY')), 'comput3_client')
+        self.audit_queue = AuditQueue(lambda message: hedera_client.submit_message_to_topic(message))
         # Pass clients to ScamDetector
-        self.scam_detector = ScamDetector(hedera_client, self.comput3_client)
+        self.scam_detector = Lazy(lambda: ScamDetector(hedera_client, self.comput3_client, audit_queue=self.audit_queue),
+                                  'scam_detector')
+        # One poller per process follows every job started through hedera_compute_job
+        self.jobs = JobRegistry(lambda job_ids: self.comput3_client.job_statuses(job_ids))
+        self.warmup = build_warmup(self.comput3_client, self.scam_detector)
         self._register_routes()
 
     def _register_routes(self):
+        self.app.before_request(self._start_timer)
+        self.app.after_request(self._record_request)
+        self.app.teardown_request(self._drop_trace)
         self.app.route("/", methods=['GET'])(self.health_check)
+        self.app.route("/ready", methods=['GET'])(self.readiness)
         self.app.route("/tools", methods=['GET'])(self.list_tools)
         self.app.route("/invoke", methods=['POST'])(self.invoke_tool)
+        self.app.route("/invoke/batch", methods=['POST'])(self.invoke_batch)
         self.app.route("/api/scan/transaction", methods=["POST"])(self.scan_transaction)
+        self.app.route("/api/scan/stream", methods=["POST"])(self.scan_stream)
+        self.app.route("/api/score/batch", methods=["POST"])(self.score_batch)
+        self.app.route("/audit/<audit_id>", methods=["GET"])(self.audit_status)
+        self.app.route("/jobs/<job_id>", methods=["GET"])(self.job_status)
+        self.app.route("/jobs/<job_id>/events", methods=["GET"])(self.job_events)
+        self.app.route("/api/verify/<log_hash>", methods=["GET"])(self.verify_log_hash)
+        self.app.route("/api/graph/<address>", methods=["GET"])(self.graph_neighbourhood)
+        self.app.route("/metrics", methods=["GET"])(self.metrics_endpoint)
+        self.app.route("/admin/profile", methods=["POST"])(self.start_profile)
+        self.app.route("/admin/profile/<profile_id>", methods=["GET"])(self.profile_result)
+        self.app.route("/admin/traces", methods=["GET"])(self.slow_traces)
+        self.app.route("/admin/traces", methods=["POST"])(self.trace_sampling)
+
+    def _start_timer(self):
+        g.started = time.perf_counter()
+        g.trace = tracing.tracer.begin(request.headers)
+
+    def _record_request(self, response):
+        # The URL rule, not the raw path, so /audit/<audit_id> stays one series
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        metrics.observe('aya_http_request_duration_seconds', time.perf_counter() - g.started, route=route)
+        metrics.inc('aya_http_requests_total', route=route, method=request.method, status=str(response.status_code))
+        timing = tracing.tracer.end(g.pop('trace', None), route, response.status_code)
+        if timing:
+            response.headers['Server-Timing'] = timing
+        return response
+
+    def _drop_trace(self, error):
+        # A request that failed before after_request must not leave its trace on the thread
+        tracing.tracer.end(g.pop('trace', None), 'unmatched', 500)
+
+    def _json_body(self):
+        with metrics.timer('aya_stage_duration_seconds', stage='json_parse'):
+            return request.get_json()
+
+    def metrics_endpoint(self):
+        return Response(metrics.registry.render(), mimetype='text/plain; version=0.0.4')
 
     def health_check(self):
         return jsonify({"status": "AyaSentinel MCP Tool is running"}), 200
 
+    def readiness(self):
+        self.warmup.start()
+        status = self.warmup.status()
+        return jsonify(status), 200 if status["ready"] else 503
+
     def list_tools(self):
         return jsonify([
             TOOL_COMPUTE,
@@ -76,51 +222,195 @@ class MCPServer:
         ])
 
     def scan_transaction(self):
-        data = request.get_json()
+        data = self._json_body()
         tx_hash = hashlib.sha256(json.dumps(data).encode()).hexdigest()
         
         try:
-            # Use the mock client's method
-            result = hedera_client.submit_message_to_topic(tx_hash)
-            
-            if result["success"]:
-                return jsonify({
-                    "txHash": tx_hash, 
-                    "status": "submitted",
-                    "hedera_result": result
-                })
-            else:
-                return jsonify({"error": result.get("error", "Unknown error")}), 500
-                
+            # Submission happens in the background; poll /audit/<audit_id> for the Hedera result
+            audit_id = self.audit_queue.submit(tx_hash)
+            return jsonify({
+                "txHash": tx_hash,
+                "status": "pending",
+                "audit_id": audit_id
+            }), 202
+
         except Exception as e:
-            logging.error(f"Failed to submit to Hedera: {e}")
+            logging.error(f"Failed to queue Hedera submission: {e}")
             return jsonify({"error": str(e)}), 500
-    
+
+    def scan_stream(self):
+        deadline_ms = request.headers.get("X-Deadline-Ms")
+        try:
+            Deadline.from_ms(deadline_ms)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        # Read in chunks as the stream is consumed, never the whole body at once
+        stream = request.stream
+        body = iter(lambda: stream.read(READ_CHUNK_BYTES), b'')
+        return Response(stream_verdicts(self.scam_detector.analyze_transaction, body, deadline_ms), mimetype=NDJSON)
+
+    def audit_status(self, audit_id):
+        status = self.audit_queue.status(audit_id)
+        if status is None:
+            return jsonify({"error": f"Unknown audit id '{audit_id}'"}), 404
+        return jsonify(status)
+
+    def graph_neighbourhood(self, address):
+        found = self.scam_detector.graph.describe(address)
+        if found is None:
+            return jsonify({"error": f"No interactions seen for '{address}'"}), 404
+        return jsonify(found)
+
+    def start_profile(self):
+        denied = admin_denied(request.headers)
+        if denied:
+            return jsonify(denied), 403
+        data = request.get_json(silent=True) or {}
+        try:
+            return jsonify(tracing.tracer.start_profile(data.get("seconds", 10), data.get("interval_ms", 10))), 202
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+    def profile_result(self, profile_id):
+        denied = admin_denied(request.headers)
+        if denied:
+            return jsonify(denied), 403
+        found = tracing.tracer.profile(profile_id)
+        if found is None:
+            return jsonify({"error": f"Unknown profile '{profile_id}'"}), 404
+        finished, folded = found
+        if not finished:
+            return jsonify({"profile_id": profile_id, "status": "running"}), 202
+        return Response(folded, mimetype='text/plain')
+
+    def slow_traces(self):
+        denied = admin_denied(request.headers)
+        if denied:
+            return jsonify(denied), 403
+        return jsonify({"traces": tracing.tracer.slowest(request.args.get("limit", type=int))})
+
+    def trace_sampling(self):
+        denied = admin_denied(request.headers)
+        if denied:
+            return jsonify(denied), 403
+        data = request.get_json(silent=True) or {}
+        try:
+            return jsonify(tracing.tracer.set_sampling(data.get("sample_rate", 1), data.get("seconds", 60)))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+    def job_status(self, job_id):
+        try:
+            wait, after = wait_query(request.args.get("wait"), request.args.get("version"))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        job = self.jobs.follow(job_id)
+        if job is None:
+            return jsonify({"error": f"Invalid job id '{job_id}'"}), 404
+        if wait > 0:
+            # Long poll: answers as soon as the status moves past `version`
+            job = self.jobs.wait(job_id, after, wait) or job
+        return jsonify(job)
+
+    def job_events(self, job_id):
+        try:
+            after = events_cursor(request.headers, request.args.get("version"))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        if self.jobs.follow(job_id) is None:
+            return jsonify({"error": f"Invalid job id '{job_id}'"}), 404
+        return Response(self.jobs.events(job_id, after), mimetype=SSE_CONTENT_TYPE,
+                        headers={"Cache-Control": "no-cache"})
+
+    def verify_log_hash(self, log_hash):
+        result = hedera_client.verify_anchored(log_hash)
+        if result.get("error"):
+            return jsonify(result), 400
+        return jsonify(result), 200 if result.get("status") == "anchored" else 404
+
     def invoke_tool(self):
-        data = request.get_json()
+        data = self._json_body()
         if not data or "tool" not in data:
             return jsonify({"error": "Invalid request, 'tool' is required"}), 400
 
         tool_name = data.get("tool")
         arguments = data.get("arguments", {})
+        try:
+            deadline = request_deadline(data, request.headers)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
 
+        started = time.perf_counter()
+        outcome = 'error'
         try:
             result = None
             if tool_name == "hedera_compute_job":
                 image = arguments.get("docker_image")
                 command = arguments.get("command")
-                job_id = self.comput3_client.run_compute_job(image, command)
-                result = {"jobId": job_id}
+                job_id = self.comput3_client.run_compute_job(image, command, deadline=deadline)
+                result = compute_job_result(self.jobs.track(job_id))
             elif tool_name == "analyze_transaction_risk":
-                result = self.scam_detector.analyze_transaction(arguments)
+                result = self.scam_detector.analyze_transaction(arguments, deadline=deadline)
+            elif tool_name == "address_reputation":
+                try:
+                    chain, addresses = reputation_query(arguments)
+                except ValueError as e:
+                    return jsonify({"error": str(e)}), 400
+                result = {"chain": chain, "reputations": self.scam_detector.address_reputation(addresses, chain)}
             else:
                 return jsonify({"error": f"Tool '{tool_name}' not found"}), 404
 
             if not result or result.get("error"):
                 return jsonify({"error": "Analysis failed", "details": result}), 500
 
+            outcome = 'success'
             return jsonify({"result": result})
 
+        except CircuitOpenError as e:
+            return jsonify({"error": "Upstream temporarily unavailable", "details": str(e)}), 503
+        except DeadlineExceeded as e:
+            return jsonify({"error": "Deadline exceeded", "details": str(e)}), 504
         except Exception as e:
             logging.error(f"Critical error in invoke_tool: {e}", exc_info=True)
             return jsonify({"error": "An unexpected server error occurred."}), 500
+        finally:
+            if tool_name in ("hedera_compute_job", "analyze_transaction_risk", "address_reputation"):
+                metrics.observe('aya_tool_duration_seconds', time.perf_counter() - started, tool=tool_name)
+                metrics.inc('aya_tool_calls_total', tool=tool_name, outcome=outcome)
+
+    def invoke_batch(self):
+        data = self._json_body()
+        if not data or data.get("tool") != "analyze_transaction_risk":
+            return jsonify({"error": "Invalid request, batch mode supports 'analyze_transaction_risk' only"}), 400
+
+        transactions = data.get("arguments")
+        if not isinstance(transactions, list):
+            return jsonify({"error": "Invalid request, 'arguments' must be a list of transactions"}), 400
+        if len(transactions) > MAX_BATCH_SIZE:
+            return jsonify({"error": f"Batch too large, at most {MAX_BATCH_SIZE} transactions are allowed"}), 413
+        try:
+            deadline = request_deadline(data, request.headers)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        try:
+            results = self.scam_detector.analyze_batch(transactions, deadline=deadline)
+            return jsonify({"results": results})
+        except Exception as e:
+            logging.error(f"Critical error in invoke_batch: {e}", exc_info=True)
+            return jsonify({"error": "An unexpected server error occurred."}), 500
+
+    def score_batch(self):
+        data = self._json_body()
+        transactions = data.get("transactions") if isinstance(data, dict) else None
+        if not isinstance(transactions, list) or not all(isinstance(tx, dict) for tx in transactions):
+            return jsonify({"error": "Invalid request, 'transactions' must be a list of JSON objects"}), 400
+        if len(transactions) > MAX_SCORE_BATCH_SIZE:
+            return jsonify({"error": f"Batch too large, at most {MAX_SCORE_BATCH_SIZE} transactions are allowed"}), 413
+
+        try:
+            scores = self.scam_detector.score_local_batch(transactions)
+            return jsonify({"model_version": self.scam_detector.local_model.version, "scores": scores})
+        except Exception as e:
+            logging.error(f"Critical error in score_batch: {e}", exc_info=True)
+            return jsonify({"error": "An unexpected server error occurred."}), 500
@@ -0,0 +1,193 @@
+# server/merkle.py
+import os
+import json
+import time
+import atexit
+import sqlite3
+import hashlib
+import logging
+import threading
+from typing import Dict, Any, Optional, Callable, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Leaves and inner nodes are hashed with different prefixes so an inner node can
+# never be passed off as a leaf (second-preimage protection).
+LEAF_PREFIX = b'\x00'
+NODE_PREFIX = b'\x01'
+
+Proof = List[Tuple[str, str]]
+
+
+def leaf_hash(message: str) -> bytes:
+    return hashlib.sha256(LEAF_PREFIX + message.encode()).digest()
+
+
+def _node_hash(left: bytes, right: bytes) -> bytes:
+    return hashlib.sha256(NODE_PREFIX + left + right).digest()
+
+
+def build_tree(messages: List[str]) -> Tuple[str, List[Proof]]:
+    """
+    Builds a Merkle tree over `messages` and returns the hex root plus one inclusion
+    proof per message. A proof is a list of (side, sibling_hex) pairs from the leaf
+    upwards, where side says whether the sibling sits on the 'L' or 'R'. An odd node
+    at the end of a level is carried up unchanged.
+    """
+    if not messages:
+        raise ValueError("Cannot build a Merkle tree without leaves")
+    level = [leaf_hash(m) for m in messages]
+    positions = list(range(len(messages)))
+    proofs: List[Proof] = [[] for _ in messages]
+    while len(level) > 1:
+        for i, position in enumerate(positions):
+            sibling = position ^ 1
+            if sibling < len(level):
+                proofs[i].append(('L' if sibling < position else 'R', level[sibling].hex()))
+            positions[i] = position // 2
+        level = [_node_hash(level[j], level[j + 1]) if j + 1 < len(level) else level[j]
+                 for j in range(0, len(level), 2)]
+    return level[0].hex(), proofs
+
+
+def verify_proof(message: str, proof: Proof, root: str) -> bool:
+    """Checks that `message` is included under the anchored `root`."""
+    node = leaf_hash(message)
+    for side, sibling in proof:
+        sibling = bytes.fromhex(sibling)
+        node = _node_hash(sibling, node) if side == 'L' else _node_hash(node, sibling)
+    return node.hex() == root
+
+
+class ProofStore:
+    """SQLite store of anchored batches and per-message inclusion proofs."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+
+    def _connection(self) -> sqlite3.Connection:
+        # One connection per process; a forked worker must not reuse the parent's
+        if self._conn is None or self._pid != os.getpid():
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS batches (
+                    root TEXT PRIMARY KEY, size INTEGER, created_at REAL, anchor TEXT);
+                CREATE TABLE IF NOT EXISTS proofs (
+                    message TEXT PRIMARY KEY, root TEXT, leaf_index INTEGER, proof TEXT);
+            """)
+            self._pid = os.getpid()
+        return self._conn
+
+    def save_batch(self, root: str, messages: List[str], proofs: List[Proof], anchor: Dict[str, Any]):
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.execute("INSERT OR REPLACE INTO batches VALUES (?, ?, ?, ?)",
+                             (root, len(messages), time.time(), json.dumps(anchor)))
+                conn.executemany("INSERT OR REPLACE INTO proofs VALUES (?, ?, ?, ?)",
+                                 [(m, root, i, json.dumps(p)) for i, (m, p) in enumerate(zip(messages, proofs))])
+
+    def get(self, message: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT p.root, p.leaf_index, p.proof, b.size, b.created_at, b.anchor "
+                "FROM proofs p JOIN batches b ON b.root = p.root WHERE p.message = ?", (message,)).fetchone()
+        if row is None:
+            return None
+        root, index, proof, size, created_at, anchor = row
+        return {'root': root, 'leaf_index': index, 'proof': json.loads(proof), 'batch_size': size,
+                'anchored_at': created_at, 'anchor': json.loads(anchor)}
+
+
+class MerkleBatcher:
+    """
+    Accumulates message hashes over a time/size window and anchors only the Merkle
+    root of each window through `anchor_fn` (which submits one message and returns
+    the usual `{"success": ...}` dict). Proofs are kept in a ProofStore so any
+    single message can still be verified against its anchored root.
+    """
+
+    def __init__(self, anchor_fn: Callable[[str], Dict[str, Any]], store_path: Optional[str] = None,
+                 window_seconds: Optional[float] = None, max_batch: Optional[int] = None):
+        self.anchor_fn = anchor_fn
+        self.store = ProofStore(store_path or os.getenv('HEDERA_PROOF_DB', 'hedera_proofs.db'))
+        self.window_seconds = window_seconds if window_seconds is not None else float(os.getenv('HEDERA_BATCH_WINDOW', '5'))
+        self.max_batch = max_batch or int(os.getenv('HEDERA_BATCH_MAX', '1024'))
+        self._pending: List[str] = []
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._pid = None
+        self.anchored_batches = 0
+        self.anchored_messages = 0
+        atexit.register(self.flush)
+
+    def add(self, message: str) -> Dict[str, Any]:
+        self._ensure_timer()
+        with self._cond:
+            self._pending.append(message)
+            full = len(self._pending) >= self.max_batch
+        if full:
+            self.flush()
+        return {
+            "success": True,
+            "mode": "merkle-batch",
+            "status": "pending_anchor",
+            "leaf_hash": leaf_hash(message).hex(),
+            "message": "Queued for the next Merkle anchor - verify once the window closes",
+        }
+
+    def flush(self) -> Optional[Dict[str, Any]]:
+        """Anchors everything pending now. On failure the messages go back into the next window."""
+        with self._flush_lock:
+            with self._cond:
+                messages, self._pending = self._pending[:self.max_batch], self._pending[self.max_batch:]
+            if not messages:
+                return None
+            root, proofs = build_tree(messages)
+            try:
+                anchor = self.anchor_fn(json.dumps({"merkle_root": root, "leaves": len(messages)}))
+            except Exception as e:
+                anchor = {"success": False, "error": str(e)}
+            if not anchor.get("success"):
+                logger.error(f"Merkle anchor of {len(messages)} messages failed: {anchor.get('error')}")
+                with self._cond:
+                    self._pending[:0] = messages
+                return anchor
+            self.store.save_batch(root, messages, proofs, anchor)
+            self.anchored_batches += 1
+            self.anchored_messages += len(messages)
+            logger.info(f"Anchored Merkle root {root[:16]}... covering {len(messages)} messages")
+            return dict(anchor, merkle_root=root, leaves=len(messages))
+
+    def verify(self, message: str) -> Dict[str, Any]:
+        record = self.store.get(message)
+        if record is None:
+            with self._cond:
+                pending = message in self._pending
+            return {"verified": False, "status": "pending_anchor" if pending else "not_found"}
+        return {
+            "verified": verify_proof(message, record['proof'], record['root']),
+            "status": "anchored",
+            **record,
+        }
+
+    def _ensure_timer(self):
+        if self._pid == os.getpid():
+            return
+        with self._cond:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            threading.Thread(target=self._run, name="merkle-anchor", daemon=True).start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.window_seconds)
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Merkle anchoring failed: {e}", exc_info=True)
@@ -0,0 +1,221 @@
+# server/metrics.py
+import os
+import json
+import time
+import glob
+import bisect
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Dict, Any, Optional, Tuple
+
+from .tracing import current as current_trace, pid_alive, scoped_tempdir
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+HELP = {
+    'aya_http_requests_total': 'HTTP requests by route, method and status',
+    'aya_http_request_duration_seconds': 'HTTP request latency by route',
+    'aya_tool_calls_total': 'MCP tool invocations by tool and outcome',
+    'aya_tool_duration_seconds': 'MCP tool latency by tool',
+    'aya_stage_duration_seconds': 'Latency of request-path steps (json_parse, audit_enqueue, ...)',
+    'aya_analysis_stage_duration_seconds': 'Latency of each ScamDetector cascade stage',
+    'aya_analysis_stage_resolved_total': 'Verdicts settled by each ScamDetector cascade stage',
+    'aya_verdict_cache_lookups_total': 'Verdict cache lookups by result',
+    'aya_coalesced_calls_total': 'Analyses that joined an identical in-flight analysis',
+    'aya_comput3_request_duration_seconds': 'Comput3 HTTP attempts by endpoint and outcome',
+    'aya_circuit_transitions_total': 'Circuit breaker state transitions',
+    'aya_circuit_rejections_total': 'Calls refused because a circuit was open',
+    'aya_upstream_events_total': 'Upstream call events (requests, failures, hedged, hedge_wins, deadline_exceeded)',
+    'aya_stream_transactions_total': 'Verdicts written to NDJSON scan streams by outcome',
+    'aya_job_polls_total': 'Bulk Comput3 job status polls by outcome',
+    'aya_jobs_finished_total': 'Tracked Comput3 jobs that reached a final status, by status',
+    'aya_hedera_submit_duration_seconds': 'Hedera topic submissions by mode and outcome',
+}
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(str(v))}"' for k, v in pairs) + '}'
+
+
+class Registry:
+    """
+    In-process counters and fixed-bucket histograms, cheap enough for the request
+    path (a dict lookup and a bisect under one lock).
+
+    Every process periodically writes its own snapshot to `<directory>/<pid>.json`;
+    `render()` merges the snapshots of all live processes into one Prometheus text
+    exposition, so any gunicorn worker can answer a scrape for the whole server.
+    Files left by processes that no longer exist are removed, which Prometheus sees
+    as a counter reset.
+    """
+
+    def __init__(self, directory: Optional[str] = None, flush_interval: Optional[float] = None,
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.directory = directory or os.getenv('METRICS_DIR') or scoped_tempdir('aya-metrics')
+        self.flush_interval = flush_interval if flush_interval is not None else float(os.getenv('METRICS_FLUSH_INTERVAL', '1'))
+        self.buckets = buckets
+        self._counters: Dict[Tuple[str, LabelKey], float] = {}
+        self._histograms: Dict[Tuple[str, LabelKey], list] = {}
+        self._lock = threading.Lock()
+        self._flusher_pid = None
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def inc(self, name: str, value: float = 1, **labels):
+        # Keyword order is fixed per call site, so labels are only sorted when snapshotting
+        key = (name, tuple(labels.items()))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+        self._ensure_flusher()
+
+    def observe(self, name: str, seconds: float, **labels):
+        key = (name, tuple(labels.items()))
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                # per-bucket counts (last slot is +Inf), sum, count
+                histogram = self._histograms[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            histogram[0][index] += 1
+            histogram[1] += seconds
+            histogram[2] += 1
+        self._ensure_flusher()
+        # Every timed step of a traced request is also one of its spans
+        trace = current_trace()
+        if trace is not None:
+            trace.add(name, seconds, labels)
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'buckets': list(self.buckets),
+                'counters': [[name, sorted(map(list, labels)), value] for (name, labels), value in self._counters.items()],
+                'histograms': [[name, sorted(map(list, labels)), list(h[0]), h[1], h[2]]
+                               for (name, labels), h in self._histograms.items()],
+            }
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    # ---- multi-process -------------------------------------------------
+
+    def _ensure_flusher(self):
+        if self._flusher_pid is not None:
+            return
+        with self._lock:
+            if self._flusher_pid is not None:
+                return
+            self._flusher_pid = os.getpid()
+        if self.flush_interval > 0:
+            threading.Thread(target=self._run_flusher, name="metrics-flush", daemon=True).start()
+
+    def _after_fork(self):
+        # Forked worker: the parent's numbers stay the parent's, and its writer thread is gone.
+        # A hook instead of a pid check per call, because getpid() is a syscall.
+        self._lock = threading.Lock()
+        self._counters.clear()
+        self._histograms.clear()
+        self._flusher_pid = None
+
+    def _run_flusher(self):
+        pid = os.getpid()
+        while self._flusher_pid == pid:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Metrics snapshot failed: {e}")
+
+    def flush(self):
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"{os.getpid()}.json")
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.snapshot(), f)
+        os.replace(tmp_path, path)
+
+    def collect(self) -> Dict[str, Any]:
+        """Counters and histograms summed over every live process's snapshot."""
+        self.flush()
+        counters: Dict[Tuple[str, LabelKey], float] = {}
+        histograms: Dict[Tuple[str, LabelKey], list] = {}
+        for path in glob.glob(os.path.join(self.directory, '*.json')):
+            pid = int(os.path.basename(path).split('.')[0])
+            if pid != os.getpid() and not pid_alive(pid):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                continue
+            try:
+                with open(path) as f:
+                    snapshot = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if snapshot.get('buckets') != list(self.buckets):
+                continue
+            for name, labels, value in snapshot['counters']:
+                key = (name, tuple(map(tuple, labels)))
+                counters[key] = counters.get(key, 0) + value
+            for name, labels, bucket_counts, total, count in snapshot['histograms']:
+                key = (name, tuple(map(tuple, labels)))
+                merged = histograms.setdefault(key, [[0] * len(bucket_counts), 0.0, 0])
+                merged[0] = [a + b for a, b in zip(merged[0], bucket_counts)]
+                merged[1] += total
+                merged[2] += count
+        return {'counters': counters, 'histograms': histograms}
+
+    def render(self) -> str:
+        """Prometheus text exposition (version 0.0.4) of the merged metrics."""
+        collected = self.collect()
+        lines = []
+        by_name: Dict[str, list] = {}
+        for (name, labels), value in sorted(collected['counters'].items()):
+            by_name.setdefault(name, []).append((labels, value))
+        for name, series in by_name.items():
+            lines.append(f"# HELP {name} {HELP.get(name, name)}")
+            lines.append(f"# TYPE {name} counter")
+            lines.extend(f"{name}{_format_labels(labels)} {value:g}" for labels, value in series)
+
+        by_name = {}
+        for (name, labels), histogram in sorted(collected['histograms'].items()):
+            by_name.setdefault(name, []).append((labels, histogram))
+        for name, series in by_name.items():
+            lines.append(f"# HELP {name} {HELP.get(name, name)}")
+            lines.append(f"# TYPE {name} histogram")
+            for labels, (bucket_counts, total, count) in series:
+                cumulative = 0
+                for bound, bucket_count in zip(list(self.buckets) + ['+Inf'], bucket_counts):
+                    cumulative += bucket_count
+                    le = bound if bound == '+Inf' else f"{bound:g}"
+                    lines.append(f"{name}_bucket{_format_labels(labels, ('le', le))} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {total:.9g}")
+                lines.append(f"{name}_count{_format_labels(labels)} {count}")
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+inc = registry.inc
+observe = registry.observe
+timer = registry.timer
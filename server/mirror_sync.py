@@ -0,0 +1,187 @@
+# server/mirror_sync.py
+import os
+import re
+import time
+import base64
+import sqlite3
+import hashlib
+import logging
+import threading
+from typing import Dict, Any, Optional, List
+
+import requests
+
+from .http_session import get_session, default_timeout
+
+logger = logging.getLogger(__name__)
+
+MIRROR_URLS = {
+    'mainnet': 'https://mainnet-public.mirrornode.hedera.com',
+    'testnet': 'https://testnet.mirrornode.hedera.com',
+    'previewnet': 'https://previewnet.mirrornode.hedera.com',
+}
+_TIMESTAMP = re.compile(r'^\d+\.\d{1,9}$')
+_TRANSACTION_ID = re.compile(r'^\d+\.\d+\.\d+[-@]\d+[-.]\d+$')
+_COLUMNS = ('topic_id', 'sequence_number', 'consensus_timestamp', 'transaction_id',
+            'message_hash', 'message', 'running_hash')
+
+
+def format_transaction_id(chunk_info: Optional[Dict[str, Any]]) -> Optional[str]:
+    """Mirror-node style id (`0.0.1234-1700000000-000000001`) from a message's chunk_info."""
+    initial = (chunk_info or {}).get('initial_transaction_id') or {}
+    account, valid_start = initial.get('account_id'), initial.get('transaction_valid_start')
+    if not account or not valid_start:
+        return None
+    return normalize_transaction_id(f"{account}@{valid_start}")
+
+
+def normalize_transaction_id(tx_id: str) -> str:
+    """Accepts SDK style (`0.0.1234@1700000000.000000001`) or mirror style ids."""
+    if '@' not in tx_id:
+        return tx_id
+    account, _, valid_start = tx_id.partition('@')
+    seconds, _, nanos = valid_start.partition('.')
+    return f"{account}-{seconds}-{nanos.ljust(9, '0')}"
+
+
+class MirrorMessageStore:
+    """Local SQLite copy of topic messages, indexed by sequence number, consensus
+    timestamp, transaction id, message text and message hash."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None or self._pid != os.getpid():
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS messages (
+                    topic_id TEXT, sequence_number INTEGER, consensus_timestamp TEXT,
+                    transaction_id TEXT, message_hash TEXT, message TEXT, running_hash TEXT,
+                    PRIMARY KEY (topic_id, sequence_number));
+                CREATE INDEX IF NOT EXISTS messages_timestamp ON messages (consensus_timestamp);
+                CREATE INDEX IF NOT EXISTS messages_transaction ON messages (transaction_id);
+                CREATE INDEX IF NOT EXISTS messages_hash ON messages (message_hash);
+                CREATE INDEX IF NOT EXISTS messages_text ON messages (message);
+            """)
+            self._pid = os.getpid()
+        return self._conn
+
+    def last_sequence(self, topic_id: str) -> int:
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT MAX(sequence_number) FROM messages WHERE topic_id = ?", (topic_id,)).fetchone()
+        return row[0] or 0
+
+    def add(self, rows: List[tuple]):
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.executemany("INSERT OR REPLACE INTO messages VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+
+    def find(self, topic_id: str, key: str) -> Optional[Dict[str, Any]]:
+        """Finds a message by sequence number, consensus timestamp, transaction id, text or hash."""
+        key = str(key).strip()
+        if key.isdigit():
+            column, value = 'sequence_number', int(key)
+        elif _TIMESTAMP.match(key):
+            column, value = 'consensus_timestamp', key
+        elif _TRANSACTION_ID.match(key):
+            column, value = 'transaction_id', normalize_transaction_id(key)
+        else:
+            column, value = None, key
+        with self._lock:
+            conn = self._connection()
+            if column:
+                row = conn.execute(f"SELECT * FROM messages WHERE topic_id = ? AND {column} = ? LIMIT 1",
+                                   (topic_id, value)).fetchone()
+            else:
+                row = conn.execute("SELECT * FROM messages WHERE topic_id = ? AND message = ? LIMIT 1",
+                                   (topic_id, value)).fetchone() or \
+                      conn.execute("SELECT * FROM messages WHERE topic_id = ? AND message_hash = ? LIMIT 1",
+                                   (topic_id, value)).fetchone()
+        return dict(zip(_COLUMNS, row)) if row else None
+
+
+class MirrorNodeSynchronizer:
+    """
+    Pages through `/api/v1/topics/{topic_id}/messages` from the last stored sequence
+    number and keeps a MirrorMessageStore up to date, so status and verification
+    queries are answered locally instead of with a mirror-node call per query.
+    """
+
+    def __init__(self, topic_id: str, mirror_url: Optional[str] = None, store: Optional[MirrorMessageStore] = None,
+                 interval: Optional[float] = None, page_size: int = 100,
+                 session: Optional[requests.Session] = None):
+        self.topic_id = topic_id
+        network = os.getenv('HEDERA_NETWORK', 'testnet')
+        self.mirror_url = (mirror_url or os.getenv('HEDERA_MIRROR_URL') or MIRROR_URLS.get(network, MIRROR_URLS['testnet'])).rstrip('/')
+        self.store = store or MirrorMessageStore(os.getenv('HEDERA_MIRROR_DB', 'hedera_mirror.db'))
+        self.interval = interval if interval is not None else float(os.getenv('HEDERA_MIRROR_SYNC_INTERVAL', '5'))
+        self.page_size = page_size
+        self._session = session
+        self._pid = None
+        self._lock = threading.Lock()
+        self.last_sync = None
+        self.last_error = None
+
+    def sync_once(self) -> int:
+        """Fetches every message newer than the local copy; returns how many were stored."""
+        session = self._session or get_session()
+        last = self.store.last_sequence(self.topic_id)
+        url = (f"{self.mirror_url}/api/v1/topics/{self.topic_id}/messages"
+               f"?sequencenumber=gt:{last}&limit={self.page_size}&order=asc")
+        stored = 0
+        while url:
+            response = session.get(url, timeout=default_timeout())
+            response.raise_for_status()
+            page = response.json()
+            rows = []
+            for item in page.get('messages', []):
+                raw = base64.b64decode(item.get('message') or b'')
+                rows.append((
+                    self.topic_id,
+                    item['sequence_number'],
+                    item.get('consensus_timestamp'),
+                    format_transaction_id(item.get('chunk_info')),
+                    hashlib.sha256(raw).hexdigest(),
+                    raw.decode('utf-8', errors='replace'),
+                    item.get('running_hash'),
+                ))
+            self.store.add(rows)
+            stored += len(rows)
+            next_link = (page.get('links') or {}).get('next')
+            url = f"{self.mirror_url}{next_link}" if next_link and rows else None
+        self.last_sync = time.time()
+        self.last_error = None
+        return stored
+
+    def start(self):
+        """Starts the background sync loop once per process."""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            threading.Thread(target=self._run, name="mirror-sync", daemon=True).start()
+
+    def lookup(self, key: str) -> Optional[Dict[str, Any]]:
+        return self.store.find(self.topic_id, key)
+
+    def status(self) -> Dict[str, Any]:
+        return {'topic_id': self.topic_id, 'synced_to_sequence': self.store.last_sequence(self.topic_id),
+                'last_sync': self.last_sync, 'last_error': self.last_error}
+
+    def _run(self):
+        while True:
+            try:
+                self.sync_once()
+            except Exception as e:
+                self.last_error = str(e)
+                logger.error(f"Mirror node sync failed for topic {self.topic_id}: {e}")
+            time.sleep(self.interval)
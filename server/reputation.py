@@ -0,0 +1,286 @@
+# server/reputation.py
+import os
+import json
+import math
+import time
+import atexit
+import sqlite3
+import logging
+import threading
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+
+from .shared_cache import SharedCache
+
+logger = logging.getLogger(__name__)
+
+# Labels are stored as a bit set so concurrent updates merge with a single OR
+LABELS = ('blocklisted', 'trusted_contract', 'high_risk', 'medium_risk', 'flagged_by_rules')
+_LABEL_BITS = {label: 1 << i for i, label in enumerate(LABELS)}
+
+# SQLite's default limit on host parameters is 999 in older builds
+_LOOKUP_CHUNK = 900
+
+_UPSERT = """
+    INSERT INTO reputation VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (chain, address) DO UPDATE SET
+        evidence_count = evidence_count + excluded.evidence_count,
+        risk_sum = risk_sum + excluded.risk_sum,
+        max_risk = MAX(max_risk, excluded.max_risk),
+        labels = labels | excluded.labels,
+        first_seen = MIN(first_seen, excluded.first_seen),
+        last_seen = MAX(last_seen, excluded.last_seen)
+"""
+
+
+def label_bits(labels: Iterable[str]) -> int:
+    bits = 0
+    for label in labels:
+        bits |= _LABEL_BITS[label]
+    return bits
+
+
+def label_names(bits: int) -> List[str]:
+    return [label for label in LABELS if bits & _LABEL_BITS[label]]
+
+
+def labels_for(result: Dict[str, Any]) -> List[str]:
+    """Reputation labels a ScamDetector verdict earns its recipient."""
+    stage = result.get('details', {}).get('stage')
+    labels = []
+    if stage == 'blocklist':
+        labels.append('blocklisted')
+    elif stage == 'allowlist':
+        labels.append('trusted_contract')
+    elif stage == 'rules' and result.get('risk_level') == 'CRITICAL':
+        labels.append('flagged_by_rules')
+    if result.get('risk_level') in ('HIGH', 'CRITICAL'):
+        labels.append('high_risk')
+    elif result.get('risk_level') == 'MEDIUM':
+        labels.append('medium_risk')
+    return labels
+
+
+class ReputationStore:
+    """
+    Per (chain, address) evidence: how often the address was analyzed, the sum and
+    maximum of its risk scores, the labels its verdicts earned and when it was first
+    and last seen, in SQLite keyed on (chain, address).
+
+    `record` only folds the outcome into an in-memory delta; a background thread
+    upserts the deltas every `flush_interval` seconds (or once `max_pending`
+    addresses are waiting), so the request path never waits on the database and
+    several workers can share one file. Lookups merge the unflushed deltas in.
+    A batch the database rejects is retried up to `max_retries` times, then
+    dropped; rows that violate the schema are dropped on their own.
+
+    With a SharedCache, rows read from the database are kept there for
+    `cache_ttl` seconds (absent addresses too), so workers looking up the same hot
+    addresses hit SQLite once between them. A flush bumps the generation of each
+    key it wrote, and rows are stored under the generation seen before they were
+    read, so a row read just before another worker's flush is never served after it.
+    """
+
+    def __init__(self, path: Optional[str] = None, flush_interval: Optional[float] = None,
+                 max_pending: Optional[int] = None, shared: Optional[SharedCache] = None,
+                 cache_ttl: Optional[float] = None, max_retries: Optional[int] = None):
+        self.path = path or os.getenv('REPUTATION_DB', 'reputation.db')
+        self.flush_interval = flush_interval if flush_interval is not None else float(os.getenv('REPUTATION_FLUSH_INTERVAL', '1'))
+        self.max_pending = max_pending or int(os.getenv('REPUTATION_MAX_PENDING', '10000'))
+        self.shared = shared if shared is not None else SharedCache.from_env()
+        self.cache_ttl = cache_ttl if cache_ttl is not None else float(os.getenv('REPUTATION_CACHE_TTL', '30'))
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv('REPUTATION_MAX_RETRIES', '5'))
+        # (chain, address) -> [evidence_count, risk_sum, max_risk, label bits, first_seen, last_seen]
+        self._pending: Dict[Tuple[str, str], list] = {}
+        self._failed_flushes = 0
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+        self._flusher_pid = None
+        os.register_at_fork(after_in_child=self._after_fork)
+        atexit.register(self.flush)
+
+    def _connection(self) -> sqlite3.Connection:
+        # One connection per process; a forked worker must not reuse the parent's
+        if self._conn is None or self._pid != os.getpid():
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS reputation (
+                    chain TEXT NOT NULL, address TEXT NOT NULL,
+                    evidence_count INTEGER NOT NULL, risk_sum REAL NOT NULL, max_risk REAL NOT NULL,
+                    labels INTEGER NOT NULL, first_seen REAL NOT NULL, last_seen REAL NOT NULL,
+                    PRIMARY KEY (chain, address)) WITHOUT ROWID
+            """)
+            self._pid = os.getpid()
+        return self._conn
+
+    # ---- writing -------------------------------------------------------
+
+    def record(self, chain: str, address: str, risk_score: float, labels: Iterable[str] = (),
+               seen: Optional[float] = None):
+        if not address:
+            return
+        if not isinstance(risk_score, (int, float)) or not math.isfinite(risk_score):
+            # NaN fails the NOT NULL constraint and would take the rest of its batch with it
+            logger.warning(f"Ignoring non-finite risk score {risk_score!r} for {address}")
+            return
+        key = ((chain or 'unknown').lower(), address.lower())
+        seen = seen or time.time()
+        bits = label_bits(labels)
+        with self._lock:
+            self._merge(self._pending, key, [1, risk_score, risk_score, bits, seen, seen])
+            full = len(self._pending) >= self.max_pending
+        self._ensure_flusher()
+        if full:
+            self.flush()
+
+    def flush(self) -> int:
+        """Writes the pending deltas; returns how many addresses were updated."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+        rows = [(chain, address, *delta) for (chain, address), delta in pending.items()]
+        try:
+            with self._db_lock:
+                conn = self._connection()
+                with conn:
+                    conn.executemany(_UPSERT, rows)
+        except sqlite3.IntegrityError as e:
+            # One bad row fails the whole statement; the others are written one at a time
+            written = self._write_each(rows)
+            logger.error(f"Reputation flush dropped {len(rows) - len(written)} of {len(rows)} updates: {e}")
+            rows = written
+        except sqlite3.Error as e:
+            self._failed_flushes += 1
+            if self._failed_flushes > self.max_retries:
+                logger.error(f"Reputation flush failed {self._failed_flushes} times, dropping {len(rows)} updates: {e}")
+                self._failed_flushes = 0
+                return 0
+            logger.error(f"Reputation flush failed, keeping {len(rows)} updates for the next attempt: {e}")
+            with self._lock:
+                for key, delta in pending.items():
+                    self._merge(self._pending, key, delta)
+            return 0
+        self._failed_flushes = 0
+        if self.shared is not None:
+            for chain, address, *_ in rows:
+                key = self._shared_key(chain, address)
+                self.shared.invalidate_address(key)
+                self.shared.delete(key)
+        return len(rows)
+
+    def _write_each(self, rows: List[tuple]) -> List[tuple]:
+        written = []
+        with self._db_lock:
+            conn = self._connection()
+            for row in rows:
+                try:
+                    with conn:
+                        conn.execute(_UPSERT, row)
+                except sqlite3.Error as e:
+                    logger.warning(f"Dropping reputation update for {row[0]}:{row[1]}: {e}")
+                    continue
+                written.append(row)
+        return written
+
+    @staticmethod
+    def _merge(into: Dict[Tuple[str, str], list], key: Tuple[str, str], delta: list):
+        current = into.get(key)
+        if current is None:
+            into[key] = list(delta)
+            return
+        current[0] += delta[0]
+        current[1] += delta[1]
+        current[2] = max(current[2], delta[2])
+        current[3] |= delta[3]
+        current[4] = min(current[4], delta[4])
+        current[5] = max(current[5], delta[5])
+
+    def _ensure_flusher(self):
+        if self._flusher_pid is not None:
+            return
+        with self._lock:
+            if self._flusher_pid is not None:
+                return
+            self._flusher_pid = os.getpid()
+        if self.flush_interval > 0:
+            threading.Thread(target=self._run_flusher, name="reputation-flush", daemon=True).start()
+
+    def _after_fork(self):
+        # A forked worker records its own evidence; the parent flushes what it had
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._pending = {}
+        self._failed_flushes = 0
+        self._flusher_pid = None
+
+    def _run_flusher(self):
+        pid = os.getpid()
+        while self._flusher_pid == pid:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Reputation flush failed: {e}")
+
+    # ---- reading -------------------------------------------------------
+
+    def lookup_many(self, chain: str, addresses: Iterable[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        """Evidence for every address (lower-cased), None for addresses never seen on `chain`."""
+        chain = (chain or 'unknown').lower()
+        wanted = list(dict.fromkeys(a.lower() for a in addresses if isinstance(a, str) and a))
+        found: Dict[str, list] = {}
+        missing = wanted
+        if self.shared is not None and self.cache_ttl > 0:
+            missing = []
+            for address in wanted:
+                cached = self.shared.get(self._shared_key(chain, address))
+                if cached is None:
+                    missing.append(address)
+                elif cached[0] != b'null':
+                    found[address] = json.loads(cached[0])
+        stamps = {}
+        if self.shared is not None and self.cache_ttl > 0:
+            stamps = {address: self.shared.stamp([self._shared_key(chain, address)]) for address in missing}
+        # Sorted keys walk the primary-key B-tree in order, which reads each page once
+        ordered = sorted(missing)
+        with self._db_lock:
+            conn = self._connection()
+            for start in range(0, len(ordered), _LOOKUP_CHUNK):
+                chunk = ordered[start:start + _LOOKUP_CHUNK]
+                rows = conn.execute(
+                    "SELECT address, evidence_count, risk_sum, max_risk, labels, first_seen, last_seen "
+                    f"FROM reputation WHERE chain = ? AND address IN ({','.join('?' * len(chunk))})",
+                    (chain, *chunk)).fetchall()
+                for address, *delta in rows:
+                    found[address] = delta
+        if self.shared is not None and self.cache_ttl > 0:
+            for address in missing:
+                key = self._shared_key(chain, address)
+                self.shared.put(key, json.dumps(found.get(address)).encode(), self.cache_ttl, [key],
+                                stamp=stamps[address])
+        with self._lock:
+            for address in wanted:
+                delta = self._pending.get((chain, address))
+                if delta is not None:
+                    self._merge(found, address, delta)
+        return {address: self._entry(found[address]) if address in found else None for address in wanted}
+
+    @staticmethod
+    def _shared_key(chain: str, address: str) -> str:
+        return f"r:{chain}:{address}"
+
+    @staticmethod
+    def _entry(delta: list) -> Dict[str, Any]:
+        count, risk_sum, max_risk, bits, first_seen, last_seen = delta
+        return {
+            'score': round(risk_sum / count, 4) if count else None,
+            'max_score': round(max_risk, 4),
+            'labels': label_names(bits),
+            'evidence_count': count,
+            'first_seen': first_seen,
+            'last_seen': last_seen,
+        }
@@ -0,0 +1,171 @@
+# server/resilience.py
+import os
+import time
+import logging
+import threading
+from collections import Counter, deque
+from typing import Dict, Any, Optional
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+# Hedging needs this many latency samples before it trusts the percentile
+HEDGE_MIN_SAMPLES = 20
+
+
+class CircuitOpenError(Exception):
+    """The endpoint's circuit is open; the call was not attempted."""
+
+
+class DeadlineExceeded(Exception):
+    """The caller's latency budget ran out before the upstream answered."""
+
+
+class Deadline:
+    """A latency budget that travels with one request, measured on the monotonic clock."""
+
+    def __init__(self, budget_s: float):
+        self.budget_s = budget_s
+        self.expires_at = time.monotonic() + budget_s
+
+    @classmethod
+    def from_ms(cls, value: Any) -> Optional['Deadline']:
+        """Deadline from a `deadline_ms` style value; None when absent or not positive."""
+        if value is None or value == '':
+            return None
+        try:
+            budget_ms = float(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"deadline_ms must be a number, got {value!r}")
+        return cls(budget_ms / 1000) if budget_ms > 0 else None
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+
+
+class CircuitBreaker:
+    """
+    Classic three-state breaker. `failure_threshold` consecutive failures open it;
+    after `reset_timeout` seconds it lets `half_open_calls` probes through, and the
+    first probe's outcome closes or re-opens it. Transitions are counted by name
+    ('closed->open', ...).
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0,
+                 half_open_calls: int = 1):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_calls = half_open_calls
+        self.state = CLOSED
+        self.transitions: Counter = Counter()
+        self.rejected = 0
+        self._failures = 0
+        self._probes = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == OPEN:
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    self.rejected += 1
+                    metrics.inc('aya_circuit_rejections_total', circuit=self.name)
+                    return False
+                self._transition(HALF_OPEN)
+            if self.state == HALF_OPEN:
+                if self._probes >= self.half_open_calls:
+                    self.rejected += 1
+                    metrics.inc('aya_circuit_rejections_total', circuit=self.name)
+                    return False
+                self._probes += 1
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            if self.state != CLOSED:
+                self._transition(CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self.state == HALF_OPEN or (self.state == CLOSED and self._failures >= self.failure_threshold):
+                self._transition(OPEN)
+
+    def release(self):
+        """Gives back a half-open probe slot taken by a call that ended without an outcome."""
+        with self._lock:
+            if self.state == HALF_OPEN and self._probes > 0:
+                self._probes -= 1
+
+    def _transition(self, state: str):
+        # Caller holds the lock
+        logger.warning(f"Circuit '{self.name}': {self.state} -> {state}")
+        self.transitions[f"{self.state}->{state}"] += 1
+        metrics.inc('aya_circuit_transitions_total', circuit=self.name, transition=f"{self.state}->{state}")
+        self.state = state
+        self._probes = 0
+        if state == OPEN:
+            self._opened_at = time.monotonic()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'state': self.state, 'rejected': self.rejected, 'transitions': dict(self.transitions)}
+
+
+class EndpointGuard:
+    """
+    Per-endpoint breaker plus a window of recent successful latencies (for the hedge
+    delay) and outcome counters: requests, failures, hedged, hedge_wins,
+    deadline_exceeded.
+    """
+
+    def __init__(self, name: str, hedge_percentile: Optional[float] = None, window: int = 512):
+        self.name = name
+        self.breaker = CircuitBreaker(
+            name,
+            failure_threshold=int(os.getenv('COMPUT3_BREAKER_FAILURES', '5')),
+            reset_timeout=float(os.getenv('COMPUT3_BREAKER_RESET', '30')),
+        )
+        self.hedge_percentile = hedge_percentile if hedge_percentile is not None else float(os.getenv('COMPUT3_HEDGE_PERCENTILE', '95'))
+        self.hedge_min_delay = float(os.getenv('COMPUT3_HEDGE_MIN_DELAY_MS', '10')) / 1000
+        self.counters: Counter = Counter()
+        self._latencies: deque = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def count(self, name: str, n: int = 1):
+        with self._lock:
+            self.counters[name] += n
+        metrics.inc('aya_upstream_events_total', n, endpoint=self.name, event=name)
+
+    def hedge_delay(self) -> Optional[float]:
+        """Seconds to wait before sending a duplicate request, or None to not hedge."""
+        if self.hedge_percentile <= 0 or self.breaker.state != CLOSED:
+            return None
+        with self._lock:
+            if len(self._latencies) < HEDGE_MIN_SAMPLES:
+                return None
+            ordered = sorted(self._latencies)
+        index = min(len(ordered) - 1, int(len(ordered) * self.hedge_percentile / 100))
+        return max(self.hedge_min_delay, ordered[index])
+
+    def record_success(self, latency: float):
+        self.breaker.record_success()
+        with self._lock:
+            self._latencies.append(latency)
+
+    def record_failure(self):
+        self.breaker.record_failure()
+        self.count('failures')
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = dict(self.counters)
+        return {**self.breaker.stats(), **counters}
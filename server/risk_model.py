@@ -0,0 +1,175 @@
+# server/risk_model.py
+import os
+import json
+import math
+import logging
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MODEL_FORMAT = 1
+DEFAULT_MODEL_PATH = Path(__file__).parent / 'models' / 'risk_model.json'
+
+# Column order of the feature matrix built by extract_features
+FEATURES = (
+    'value_log10',         # log10(value + 1), value in the chain's base unit
+    'calldata_log_bytes',  # log1p(calldata length in bytes)
+    'contract_call',       # calldata present: the target is (almost certainly) a contract
+    'is_contract_hint',    # caller-supplied `is_contract` flag, if any
+    'approval_selector',   # approve / setApprovalForAll / increaseAllowance / permit / transferFrom
+    'transfer_selector',   # ERC-20 transfer
+    'unlimited_amount',    # calldata carries a max-uint256 amount
+    'to_entropy',          # Shannon entropy (bits) of the target's hex digits
+    'to_leading_zeros',    # leading zero nibbles of the target (vanity / burn-style addresses)
+    'self_transfer',       # to_address == from_address
+    'missing_to',          # no target: contract creation or malformed request
+    'sender_tx_1m',        # log1p(transactions the sender made in the last minute)
+    'sender_fanout_10m',   # log1p(distinct recipients of the sender in the last 10 minutes)
+    'recipient_fanin_10m', # log1p(distinct senders to the recipient in the last 10 minutes)
+)
+
+APPROVAL_SELECTORS = frozenset(('095ea7b3', 'a22cb465', '39509351', 'd505accf', '23b872dd'))
+TRANSFER_SELECTORS = frozenset(('a9059cbb',))
+_MAX_UINT256 = 'f' * 64
+# Typical entropy of a random 40-digit address; used for targets that are not EVM
+# addresses (Hedera ids, missing) so they get no address signal either way
+NEUTRAL_ENTROPY = 3.6
+
+# ASCII byte -> hex nibble; anything that is not a hex digit maps to 16 (invalid)
+_NIBBLES = np.full(256, 16, dtype=np.int64)
+for _i, _c in enumerate('0123456789abcdef'):
+    _NIBBLES[ord(_c)] = _i
+# -p*log2(p) for a digit that occurs c times out of 40, indexed by c
+_ENTROPY_TERMS = np.array([0.0] + [-(c / 40) * math.log2(c / 40) for c in range(1, 41)])
+
+
+def parse_amount(value: Any) -> float:
+    """Transaction value as a float from a number, decimal string or 0x-hex string; 0 if unparseable or not finite."""
+    if value is None or value == '':
+        return 0.0
+    try:
+        if isinstance(value, str):
+            value = value.strip()
+            amount = float(int(value, 16)) if value.lower().startswith('0x') else float(value)
+        else:
+            amount = float(value)
+    except (TypeError, ValueError, OverflowError):
+        return 0.0
+    # 'nan', 'inf' and '1e400' parse; as features or sums they would poison every score they touch
+    return amount if math.isfinite(amount) else 0.0
+
+
+def _evm_hex(address: Any) -> Optional[str]:
+    address = str(address or '').strip().lower()
+    if address.startswith('0x'):
+        address = address[2:]
+    return address if len(address) == 40 else None
+
+
+def _address_features(addresses: List[Optional[str]]) -> np.ndarray:
+    """Entropy and leading-zero count for a column of addresses, computed over all rows at once."""
+    n = len(addresses)
+    raw = ''.join(a if a is not None else '-' * 40 for a in addresses).encode('ascii', errors='replace')
+    nibbles = _NIBBLES[np.frombuffer(raw, dtype=np.uint8)].reshape(n, 40)
+    valid = (nibbles < 16).all(axis=1)
+    nibbles = np.where(valid[:, None], nibbles, 0)
+
+    counts = np.bincount((np.arange(n)[:, None] * 16 + nibbles).ravel(), minlength=n * 16).reshape(n, 16)
+    entropy = _ENTROPY_TERMS[counts].sum(axis=1)
+    nonzero = nibbles != 0
+    leading = np.where(nonzero.any(axis=1), nonzero.argmax(axis=1), 40)
+
+    out = np.zeros((n, 2))
+    out[:, 0] = np.where(valid, entropy, NEUTRAL_ENTROPY)
+    out[:, 1] = np.where(valid, leading, 0)
+    return out
+
+
+def _velocity_features(velocity: Optional[Dict[str, Any]]) -> tuple:
+    if not velocity:
+        return 0.0, 0.0, 0.0
+    return (math.log1p(velocity['sender']['1m']['count']),
+            math.log1p(velocity['sender']['10m']['counterparties']),
+            math.log1p(velocity['recipient']['10m']['counterparties']))
+
+
+def extract_features(txs: Sequence[Dict[str, Any]],
+                     velocity: Optional[Sequence[Optional[Dict[str, Any]]]] = None) -> np.ndarray:
+    """
+    Feature matrix (len(txs) x len(FEATURES)) for analyze_transaction_risk arguments.
+    `velocity` holds each transaction's VelocityTracker.features, if known.
+    """
+    rows, targets = [], []
+    velocity = velocity or [None] * len(txs)
+    for tx, activity in zip(txs, velocity):
+        data = str(tx.get('data') or '').lower()
+        if data.startswith('0x'):
+            data = data[2:]
+        selector = data[:8]
+        to_address = tx.get('to_address')
+        rows.append((
+            math.log10(max(parse_amount(tx.get('value')), 0.0) + 1.0),
+            math.log1p(len(data) // 2),
+            bool(data),
+            bool(tx.get('is_contract')),
+            selector in APPROVAL_SELECTORS,
+            selector in TRANSFER_SELECTORS,
+            _MAX_UINT256 in data[8:],
+            0.0,  # to_entropy and to_leading_zeros are filled in below, vectorized
+            0.0,
+            bool(to_address) and str(to_address).lower() == str(tx.get('from_address') or '').lower(),
+            not to_address,
+            *_velocity_features(activity),
+        ))
+        targets.append(_evm_hex(to_address))
+    if not rows:
+        return np.zeros((0, len(FEATURES)))
+    X = np.array(rows, dtype=np.float64)
+    X[:, 7:9] = _address_features(targets)
+    return X
+
+
+class RiskModel:
+    """
+    Logistic model over FEATURES, loaded from a versioned JSON file:
+
+        {"format": 1, "version": "...", "bias": -3.1, "weights": {"approval_selector": 1.6, ...}}
+
+    Features missing from `weights` count as 0. `score_batch` scores a whole list of
+    transactions in one vectorized pass.
+    """
+
+    def __init__(self, weights: Dict[str, float], bias: float, version: str):
+        unknown = set(weights) - set(FEATURES)
+        if unknown:
+            raise ValueError(f"Risk model has weights for unknown features: {', '.join(sorted(unknown))}")
+        self.weights = np.array([float(weights.get(name, 0.0)) for name in FEATURES])
+        self.bias = float(bias)
+        self.version = version
+
+    @classmethod
+    def load(cls, path) -> 'RiskModel':
+        with open(path) as f:
+            spec = json.load(f)
+        if spec.get('format') != MODEL_FORMAT:
+            raise ValueError(f"Unsupported risk model format {spec.get('format')!r} in {path} (expected {MODEL_FORMAT})")
+        model = cls(spec['weights'], spec.get('bias', 0.0), str(spec.get('version', 'unversioned')))
+        logger.info(f"Loaded local risk model {model.version} from {path}")
+        return model
+
+    @classmethod
+    def from_env(cls) -> 'RiskModel':
+        return cls.load(os.getenv('RISK_MODEL_PATH') or DEFAULT_MODEL_PATH)
+
+    def score_features(self, X: np.ndarray) -> np.ndarray:
+        return 1.0 / (1.0 + np.exp(-(X @ self.weights + self.bias)))
+
+    def score_batch(self, txs: Sequence[Dict[str, Any]],
+                    velocity: Optional[Sequence[Optional[Dict[str, Any]]]] = None) -> np.ndarray:
+        return self.score_features(extract_features(txs, velocity))
+
+    def score(self, tx: Dict[str, Any], velocity: Optional[Dict[str, Any]] = None) -> float:
+        return float(self.score_batch([tx], [velocity])[0])
@@ -1,9 +1,24 @@
 # server/scam_detector.py
+import asyncio
 import logging
-from typing import Dict, Any
+from contextvars import ContextVar
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Iterable, List, Optional, Tuple
 import json
 import hashlib
 import os
+from .verdict_cache import VerdictCache
+from .address_index import AddressIndex
+from .audit_queue import AuditQueue
+from .single_flight import SingleFlight
+from .risk_model import RiskModel, parse_amount
+from .resilience import Deadline
+from .cascade import Cascade
+from .reputation import ReputationStore, labels_for
+from .calldata_rules import RuleSet, combine_scores
+from .interaction_graph import InteractionGraph
+from .velocity import VelocityTracker, band
+from . import metrics
 logger = logging.getLogger(__name__)
 
 KNOWN_SCAM_ADDRESSES = [
@@ -11,102 +26,472 @@ KNOWN_SCAM_ADDRESSES = [
     '0x1234567890abcdef1234567890abcdef12345678',
 ]
 SAFE_PROTOCOLS = ['uniswap', 'aave', 'compound', 'curve', 'saucerswap', 'hashport']
+# Router / pool contracts of SAFE_PROTOCOLS on Ethereum mainnet; TRUSTED_CONTRACTS_PATH adds more
+TRUSTED_CONTRACTS = [
+    ('0x7a250d5630b4cf539739df2c5dacb4c659f2488d', 'uniswap', 'router'),   # Uniswap V2 Router02
+    ('0xe592427a0aece92de3edee1f18e0157c05861564', 'uniswap', 'router'),   # Uniswap V3 SwapRouter
+    ('0x3fc91a3afd70395cd496c647d5a6cc9d4b2b7fad', 'uniswap', 'router'),   # Uniswap Universal Router
+    ('0x87870bca3f3fd6335c3f4ce8392d69350b4fa4e2', 'aave', 'pool'),        # Aave V3 Pool
+    ('0xc3d688b66703497daa19211eedff47f25384cdc3', 'compound', 'market'),  # Compound V3 cUSDCv3
+    ('0xbebc44782c7db0a1a60cb6fe97d0b483032ff1c7', 'curve', 'pool'),       # Curve 3pool
+]
+# Analysis stages in the order they may run; every stage before 'remote' can settle the verdict
+# ('graph' and 'velocity' only annotate: what they find feeds the scores set later)
+STAGES = ('blocklist', 'allowlist', 'rules', 'graph', 'velocity', 'local_model', 'remote')
+
+# Calldata findings of the transaction being analyzed: the cache key and the rules stage
+# both need them, and decoding plus rule evaluation should run once per request
+_request_findings: ContextVar[Optional[Dict[int, Any]]] = ContextVar('request_findings', default=None)
+
 
 class ScamDetector:
-    def __init__(self, hedera_client, comput3_client):
+    def __init__(self, hedera_client, comput3_client, max_workers: Optional[int] = None,
+                 cache: Optional[VerdictCache] = None, blocklist: Optional[AddressIndex] = None,
+                 audit_queue: Optional[AuditQueue] = None, async_comput3_client=None,
+                 local_model: Optional[RiskModel] = None, allowlist: Optional[AddressIndex] = None,
+                 stages: Optional[List[str]] = None, reputation: Optional[ReputationStore] = None,
+                 calldata_rules: Optional[RuleSet] = None, graph: Optional[InteractionGraph] = None,
+                 velocity: Optional[VelocityTracker] = None):
         self.hedera = hedera_client
+        # Hedera logging happens in the background; the verdict never waits on the ledger
+        self.audit = audit_queue if audit_queue is not None else AuditQueue(hedera_client.submit_message_to_topic)
         self.compute3 = comput3_client
+        # Used by analyze_transaction_async (ASGI serving mode)
+        self.compute3_async = async_comput3_client
+        self.cache = cache if cache is not None else VerdictCache()
+        # Built-in addresses are always blocked; SCAM_BLOCKLIST_PATH adds a file-backed list on top
+        self.blocklist = blocklist if blocklist is not None else AddressIndex.from_env(seed=KNOWN_SCAM_ADDRESSES)
+        self.blocklist.on_reload(self.cache.clear)
+        self.allowlist = allowlist if allowlist is not None else AddressIndex(
+            source_path=os.getenv('TRUSTED_CONTRACTS_PATH'), seed=TRUSTED_CONTRACTS)
+        self.allowlist.on_reload(self.cache.clear)
+        # Concurrent misses for the same fingerprint share one upstream analysis
+        self.inflight = SingleFlight()
+        # In-process score: replaces the remote one when Comput3 fails or is not configured as
+        # a stage, and settles scores below LOCAL_MODEL_TRUST_BELOW / above LOCAL_MODEL_TRUST_ABOVE
+        self.local_model = local_model if local_model is not None else RiskModel.from_env()
+        self.local_trust_below = float(os.getenv('LOCAL_MODEL_TRUST_BELOW', '0'))
+        self.local_trust_above = float(os.getenv('LOCAL_MODEL_TRUST_ABOVE', '1'))
+        # Decoded calldata is matched against compiled rules in the 'rules' stage; a combined
+        # rule score of CALLDATA_SETTLE_ABOVE or more settles the verdict without Comput3
+        self.calldata_rules = calldata_rules if calldata_rules is not None else RuleSet.from_env()
+        self.calldata_settle_above = float(os.getenv('CALLDATA_SETTLE_ABOVE', '0.9'))
+        # Who transacted with whom, with every address's distance to the nearest known scam
+        self.graph = graph if graph is not None else InteractionGraph(is_scam=self.quick_scam_check)
+        self.blocklist.on_reload(self.graph.rescan)
+        # Sliding-window activity of senders and recipients; features of the local model
+        self.velocity = velocity if velocity is not None else VelocityTracker()
+        self.cascade, self.use_remote = self._build_cascade(stages)
+        # Every verdict adds evidence to its recipient's reputation (address_reputation tool)
+        self.reputation = reputation if reputation is not None else ReputationStore()
+        # Upper bound on concurrent Comput3 calls made by analyze_batch
+        self.max_workers = max_workers or int(os.getenv('ANALYSIS_MAX_WORKERS', '16'))
+
+    def analyze_transaction(self, tx: Dict[str, Any], deadline: Optional[Deadline] = None) -> Dict[str, Any]:
+        token = _request_findings.set({})
+        try:
+            key = self._cache_key(tx)
+            result = self._cached(key)
+            if result is None:
+                # Callers that join an in-flight analysis wait under the first caller's deadline
+                result, shared = self.inflight.do(key, lambda: self._score_and_remember(key, tx, deadline))
+                self._mark_coalesced(result, shared)
+        finally:
+            _request_findings.reset(token)
+        return self._record_evidence(tx, self._audit(tx, result))
+
+    async def analyze_transaction_async(self, tx: Dict[str, Any], deadline: Optional[Deadline] = None) -> Dict[str, Any]:
+        """Same as analyze_transaction, awaiting the async Comput3 client instead of blocking."""
+        token = _request_findings.set({})
+        try:
+            key = self._cache_key(tx)
+            result = self._cached(key)
+            if result is None:
+                result, shared = await self.inflight.do_async(key, lambda: self._score_and_remember_async(key, tx, deadline))
+                self._mark_coalesced(result, shared)
+        finally:
+            _request_findings.reset(token)
+        return self._record_evidence(tx, self._audit(tx, result))
+
+    def _record_evidence(self, tx: Dict[str, Any], result: Dict[str, Any]) -> Dict[str, Any]:
+        if result['risk_level'] not in ('ERROR', 'UNKNOWN') and isinstance(tx.get('to_address'), str):
+            self.reputation.record(tx.get('chain'), tx['to_address'], result['risk_score'], labels_for(result))
+        # Added after scoring, so a transaction's proximity never counts its own edge
+        if self.use_graph:
+            self.graph.add_interaction(tx.get('from_address'), tx.get('to_address'))
+        if self.use_velocity:
+            self.velocity.record(tx.get('from_address'), tx.get('to_address'), parse_amount(tx.get('value')))
+        return result
+
+    def _cache_key(self, tx: Dict[str, Any]) -> str:
+        key = self.cache.key_for(tx)
+        # The fingerprint only sees the selector; calldata arguments change the verdict
+        # through the rules they trigger, so those become part of the key
+        findings = self._calldata(tx) if self.use_rules else None
+        if findings and findings['hits']:
+            key += ':' + ','.join(sorted({hit['rule'] for hit in findings['hits']}))
+        # Likewise a recipient's distance to known scams, which changes as traffic arrives
+        hops = self.graph.hops_to_scam(tx.get('to_address')) if self.use_graph else None
+        if hops is not None:
+            key += f':hops={hops}'
+        # and a burst of new counterparties, by order of magnitude
+        if self.use_velocity:
+            activity = self.velocity.features(tx.get('from_address'), tx.get('to_address'))
+            fanout, fanin = (band(activity['sender']['10m']['counterparties']),
+                             band(activity['recipient']['10m']['counterparties']))
+            if fanout or fanin:
+                key += f':fan={fanout}.{fanin}'
+        return key
 
-    def analyze_transaction(self, tx: Dict[str, Any]) -> Dict[str, Any]:
+    def _score_and_remember(self, key: str, tx: Dict[str, Any], deadline: Optional[Deadline]) -> Dict[str, Any]:
+        result = self._score(tx, deadline)
+        self._remember(key, tx, result)
+        return result
+
+    async def _score_and_remember_async(self, key: str, tx: Dict[str, Any], deadline: Optional[Deadline]) -> Dict[str, Any]:
+        result = await self._score_async(tx, deadline)
+        self._remember(key, tx, result)
+        return result
+
+    @staticmethod
+    def _mark_coalesced(result: Dict[str, Any], shared: bool):
+        if shared:
+            result['details']['coalesced'] = True
+            metrics.inc('aya_coalesced_calls_total')
+
+    def _cached(self, key: str) -> Optional[Dict[str, Any]]:
+        result = self.cache.get(key)
+        metrics.inc('aya_verdict_cache_lookups_total', result='miss' if result is None else 'hit')
+        if result is not None:
+            result['details']['cached'] = True
+        return result
+
+    def _remember(self, key: str, tx: Dict[str, Any], result: Dict[str, Any]):
+        negative = result['risk_level'] == 'ERROR' or bool(result['details'].get('error'))
+        self.cache.put(key, result, addresses=(tx.get('to_address'), tx.get('from_address')), negative=negative)
+
+    def _audit(self, tx: Dict[str, Any], result: Dict[str, Any]) -> Dict[str, Any]:
+        try:
+            # Queue the Hedera log entry; its outcome is available under the audit id
+            with metrics.timer('aya_stage_duration_seconds', stage='audit_enqueue'):
+                log_data = {**tx, **result}
+                log_hash = hashlib.sha256(json.dumps(log_data).encode()).hexdigest()
+                result['audit'] = {'audit_id': self.audit.submit(log_hash), 'status': 'pending', 'log_hash': log_hash}
+
+        except Exception as e:
+            logger.error(f"analyze_transaction error: {e}")
+            result['risk_level'] = 'ERROR'
+            result['details']['error'] = str(e)
+        return result
+
+    def _score(self, tx: Dict[str, Any], deadline: Optional[Deadline] = None) -> Dict[str, Any]:
         result = {'risk_level': 'UNKNOWN', 'risk_score': 0.0, 'details': {}}
         try:
-            if tx.get('to_address', '').lower() in KNOWN_SCAM_ADDRESSES:
-                result['risk_level'] = 'CRITICAL'
-                result['risk_score'] = 1.0
-                result['details']['reason'] = 'Known scam address'
-            else:
-                ml_result = self.compute3.analyze_transaction(tx)
-                score = ml_result.get('risk_score', 0.5)
-                result['risk_score'] = score
-                if score > 0.8:
-                    result['risk_level'] = 'HIGH'
-                elif score > 0.5:
-                    result['risk_level'] = 'MEDIUM'
+            if self.cascade.run(tx, result) is None:
+                if not self.use_remote:
+                    self._finish_locally(tx, result)
                 else:
-                    result['risk_level'] = 'LOW'
-                result['details'].update(ml_result)
-            
-            # Log to Hedera
-            log_data = {**tx, **result}
-            log_hash = hashlib.sha256(json.dumps(log_data).encode()).hexdigest()
-
-            hedera_result = self.hedera.submit_message_to_topic(log_hash)
-            if hedera_result["success"]:
-                logger.info(f"Logged to Hedera: {hedera_result['transaction_id']}")
-            else:
-                logger.error(f"Failed to log to Hedera: {hedera_result.get('error')}")
-            
+                    with self.cascade.timed('remote', result):
+                        self._apply_ml_result(result, self.compute3.analyze_transaction(tx, deadline=deadline), tx)
         except Exception as e:
-            logger.error(f"analyze_transaction error: {e}")  # Changed from logging.error
+            logger.error(f"analyze_transaction error: {e}")
             result['risk_level'] = 'ERROR'
             result['details']['error'] = str(e)
         return result
-KNOWN_SCAM_ADDRESSES = [
-    '0x000000000000000000000000000000000000dead',
-    '0x1234567890abcdef1234567890abcdef12345678',
-]
-SAFE_PROTOCOLS = ['uniswap', 'aave', 'compound', 'curve', 'saucerswap', 'hashport']
-
-class ScamDetector:
-    def __init__(self, hedera_client, comput3_client):
-        self.hedera = hedera_client
-        self.compute3 = comput3_client
 
-    def analyze_transaction(self, tx: Dict[str, Any]) -> Dict[str, Any]:
+    async def _score_async(self, tx: Dict[str, Any], deadline: Optional[Deadline] = None) -> Dict[str, Any]:
         result = {'risk_level': 'UNKNOWN', 'risk_score': 0.0, 'details': {}}
         try:
-            if tx.get('to_address', '').lower() in KNOWN_SCAM_ADDRESSES:
-                result['risk_level'] = 'CRITICAL'
-                result['risk_score'] = 1.0
-                result['details']['reason'] = 'Known scam address'
-            else:
-                ml_result = self.compute3.analyze_transaction(tx)
-                score = ml_result.get('risk_score', 0.5)
-                result['risk_score'] = score
-                if score > 0.8:
-                    result['risk_level'] = 'HIGH'
-                elif score > 0.5:
-                    result['risk_level'] = 'MEDIUM'
+            if self.cascade.run(tx, result) is None:
+                if not self.use_remote:
+                    self._finish_locally(tx, result)
                 else:
-                    result['risk_level'] = 'LOW'
-                result['details'].update(ml_result)
-            
-            # Log to Hedera
-            log_data = {**tx, **result}
-            log_hash = hashlib.sha256(json.dumps(log_data).encode()).hexdigest()
-
-            hedera_result = self.hedera.submit_message_to_topic(log_hash)
-            if hedera_result["success"]:
-                logger.info(f"Logged to Hedera: {hedera_result['transaction_id']}")
-            else:
-                logger.error(f"Failed to log to Hedera: {hedera_result.get('error')}")
-            
+                    with self.cascade.timed('remote', result):
+                        self._apply_ml_result(result, await self.compute3_async.analyze_transaction(tx, deadline=deadline), tx)
         except Exception as e:
-            logging.error(f"analyze_transaction error: {e}")
+            logger.error(f"analyze_transaction error: {e}")
             result['risk_level'] = 'ERROR'
             result['details']['error'] = str(e)
         return result
-    
+
+    def _build_cascade(self, stages: Optional[List[str]]):
+        if stages is None:
+            stages = [s.strip() for s in os.getenv('ANALYSIS_STAGES', ','.join(STAGES)).split(',') if s.strip()]
+        unknown = [s for s in stages if s not in STAGES]
+        if unknown:
+            raise ValueError(f"Unknown analysis stages: {', '.join(unknown)} (choose from {', '.join(STAGES)})")
+        if 'remote' in stages and stages[-1] != 'remote':
+            raise ValueError("The 'remote' analysis stage must come last")
+        local = [(name, getattr(self, f"_check_{name}")) for name in stages if name != 'remote']
+        self.use_rules = 'rules' in stages
+        self.use_graph = 'graph' in stages
+        self.use_velocity = 'velocity' in stages
+        return Cascade(local), 'remote' in stages
+
+    def _finish_locally(self, tx: Dict[str, Any], result: Dict[str, Any]):
+        # No stage was confident and Comput3 is not configured: the local model decides
+        self._set_local_score(result, self._local_score(tx, result))
+        result['details']['stage'] = 'local_model'
+
+    def _check_blocklist(self, tx: Dict[str, Any], result: Dict[str, Any]) -> bool:
+        listing = self.blocklist.lookup(tx.get('to_address', ''))
+        if listing:
+            result['risk_level'] = 'CRITICAL'
+            result['risk_score'] = 1.0
+            result['details']['reason'] = 'Known scam address'
+            result['details']['blocklist'] = listing
+        return bool(listing)
+
+    def _check_allowlist(self, tx: Dict[str, Any], result: Dict[str, Any]) -> bool:
+        listing = self.allowlist.lookup(tx.get('to_address', ''))
+        if listing:
+            result['risk_level'] = 'LOW'
+            result['risk_score'] = 0.05
+            result['details']['reason'] = f"Trusted {listing['source']} contract"
+            result['details']['allowlist'] = listing
+        return bool(listing)
+
+    def _classify(self, address: str) -> str:
+        if address in self.blocklist:
+            return 'blocklisted'
+        return 'trusted' if address in self.allowlist else 'unknown'
+
+    def _calldata(self, tx: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        memo = _request_findings.get()
+        if memo is None:
+            return self.calldata_rules.evaluate(tx, self._classify)
+        if id(tx) not in memo:
+            memo[id(tx)] = self.calldata_rules.evaluate(tx, self._classify)
+        return memo[id(tx)]
+
+    def _check_rules(self, tx: Dict[str, Any], result: Dict[str, Any]) -> bool:
+        findings = self._calldata(tx)
+        if findings:
+            # Kept on the result; _set_score folds the rule score into later model scores
+            result['details']['calldata'] = findings
+            score = findings['score']
+            if findings['hits'] and score >= self.calldata_settle_above:
+                top = max(findings['hits'], key=lambda hit: hit['score'])
+                result['risk_score'] = score
+                result['risk_level'] = 'CRITICAL' if score >= 1.0 else self._risk_level(score)
+                result['details']['reason'] = top['reason']
+                if 'spender' in top:
+                    result['details']['spender'] = top['spender']
+                return True
+        if not tx.get('data') and not parse_amount(tx.get('value')):
+            result['risk_level'] = 'LOW'
+            result['risk_score'] = 0.0
+            result['details']['reason'] = 'Moves no value and calls no contract'
+            return True
+        return False
+
+    def _check_graph(self, tx: Dict[str, Any], result: Dict[str, Any]) -> bool:
+        hops = self.graph.hops_to_scam(tx.get('to_address'))
+        sender_hops = self.graph.hops_to_scam(tx.get('from_address'))
+        if hops is not None or sender_hops is not None:
+            # Only the recipient's proximity is scored; a sender near a scam is as likely its victim
+            result['details']['graph'] = {'hops_to_scam': hops, 'sender_hops_to_scam': sender_hops,
+                                          'score': self.graph.proximity_score(hops)}
+        return False
+
+    def _check_velocity(self, tx: Dict[str, Any], result: Dict[str, Any]) -> bool:
+        # Activity before this transaction; the local model reads it from the result
+        result['details']['velocity'] = self.velocity.features(tx.get('from_address'), tx.get('to_address'))
+        return False
+
+    def _local_score(self, tx: Dict[str, Any], result: Dict[str, Any]) -> float:
+        return self.local_model.score(tx, result['details'].get('velocity'))
+
+    def _check_local_model(self, tx: Dict[str, Any], result: Dict[str, Any]) -> bool:
+        if self.local_trust_below <= 0 and self.local_trust_above >= 1:
+            return False
+        score = self._local_score(tx, result)
+        if self.local_trust_below <= score <= self.local_trust_above:
+            return False
+        self._set_local_score(result, score)
+        return True
+
+    def _set_local_score(self, result: Dict[str, Any], score: float):
+        self._set_score(result, round(score, 4))
+        result['details'].update({'scored_by': 'local', 'model_version': self.local_model.version})
+
+    def _apply_ml_result(self, result: Dict[str, Any], ml_result: Dict[str, Any], tx: Dict[str, Any]):
+        if ml_result.get('error') or 'risk_score' not in ml_result:
+            # Comput3 unavailable or gave no score: use the local model rather than a flat guess
+            result['details'].update(ml_result)
+            self._set_local_score(result, self._local_score(tx, result))
+            return
+        self._set_score(result, ml_result['risk_score'])
+        result['details'].update(ml_result)
+
+    @staticmethod
+    def _risk_level(score: float) -> str:
+        if score > 0.8:
+            return 'HIGH'
+        if score > 0.5:
+            return 'MEDIUM'
+        return 'LOW'
+
+    @classmethod
+    def _set_score(cls, result: Dict[str, Any], score: float):
+        # Calldata rule hits and scam proximity are independent evidence on top of the model
+        findings = result['details'].get('calldata')
+        proximity = result['details'].get('graph')
+        evidence = [findings['score'] if findings and findings['hits'] else 0.0, proximity['score'] if proximity else 0.0]
+        if any(evidence):
+            result['details']['model_score'] = score
+            for extra in evidence:
+                if extra:
+                    score = combine_scores(score, extra)
+        result['risk_score'] = score
+        result['risk_level'] = cls._risk_level(score)
+
+    def analyze_batch(self, txs: List[Any], deadline: Optional[Deadline] = None) -> List[Dict[str, Any]]:
+        """
+        Analyzes many transactions in one call. Identical transactions are analyzed
+        once, blocklist hits are resolved in the calling thread and the remainder is
+        fanned out to Comput3 with at most `max_workers` requests in flight.
+        Returns one entry per input, in input order, holding either 'result' or 'error'.
+        """
+        items, local, remote = self._plan_batch(txs)
+        for indexes in local:
+            self._fill_batch(items, indexes, self.analyze_transaction(txs[indexes[0]], deadline))
+
+        if remote:
+            workers = min(self.max_workers, len(remote))
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="analyze-batch") as pool:
+                futures = [(indexes, pool.submit(self.analyze_transaction, txs[indexes[0]], deadline)) for indexes in remote]
+                for indexes, future in futures:
+                    self._fill_batch(items, indexes, future.result())
+
+        logger.info(f"Batch analysis: {len(txs)} items, {len(local) + len(remote)} unique, {len(local)} resolved locally")
+        return items
+
+    async def analyze_batch_async(self, txs: List[Any], deadline: Optional[Deadline] = None) -> List[Dict[str, Any]]:
+        """Same as analyze_batch, with at most `max_workers` Comput3 calls awaited at once on the loop."""
+        items, local, remote = self._plan_batch(txs)
+        for indexes in local:
+            self._fill_batch(items, indexes, await self.analyze_transaction_async(txs[indexes[0]], deadline))
+
+        slots = asyncio.Semaphore(self.max_workers)
+
+        async def analyze(indexes: List[int]):
+            async with slots:
+                self._fill_batch(items, indexes, await self.analyze_transaction_async(txs[indexes[0]], deadline))
+
+        await asyncio.gather(*(analyze(indexes) for indexes in remote))
+        logger.info(f"Batch analysis: {len(txs)} items, {len(local) + len(remote)} unique, {len(local)} resolved locally")
+        return items
+
+    def _plan_batch(self, txs: List[Any]) -> Tuple[List[Optional[Dict[str, Any]]], List[List[int]], List[List[int]]]:
+        # (entries with malformed items already filled in, index groups resolved locally, index groups for Comput3)
+        items: List[Optional[Dict[str, Any]]] = [None] * len(txs)
+        groups: Dict[str, List[int]] = {}
+        for index, tx in enumerate(txs):
+            if not isinstance(tx, dict):
+                items[index] = {"index": index, "error": "Each transaction must be a JSON object"}
+                continue
+            key = json.dumps(tx, sort_keys=True, default=str)
+            groups.setdefault(key, []).append(index)
+
+        # Blocklist hits and calldata the rules settle on their own never need a Comput3 call
+        unique = [txs[indexes[0]] for indexes in groups.values()]
+        findings = (self.calldata_rules.evaluate_batch(unique, self._classify) if self.use_rules
+                    else [None] * len(unique))
+        local, remote = [], []
+        for indexes, tx, found in zip(groups.values(), unique, findings):
+            if self.quick_scam_check(tx.get('to_address', '')) or (found and found['score'] >= self.calldata_settle_above):
+                local.append(indexes)
+            else:
+                remote.append(indexes)
+        return items, local, remote
+
+    @staticmethod
+    def _fill_batch(items: List[Optional[Dict[str, Any]]], indexes: List[int], result: Dict[str, Any]):
+        for index in indexes:
+            if result.get('risk_level') == 'ERROR':
+                items[index] = {"index": index, "error": "Analysis failed", "details": result}
+            else:
+                items[index] = {"index": index, "result": result}
+
+    def score_local_batch(self, txs: List[Dict[str, Any]]) -> List[float]:
+        """
+        Local model scores for many transactions in one vectorized pass (no Comput3, no
+        audit), raised by whatever calldata rules each transaction triggers and by its
+        recipient's proximity to known scams.
+        """
+        velocity = ([self.velocity.features(tx.get('from_address'), tx.get('to_address')) for tx in txs]
+                    if self.use_velocity else None)
+        scores = [round(float(score), 4) for score in self.local_model.score_batch(txs, velocity)]
+        if self.use_rules:
+            findings = self.calldata_rules.evaluate_batch(txs, self._classify)
+            scores = [combine_scores(score, found['score']) if found and found['hits'] else score
+                      for score, found in zip(scores, findings)]
+        if self.use_graph:
+            proximity = [self.graph.proximity_score(self.graph.hops_to_scam(tx.get('to_address'))) for tx in txs]
+            scores = [combine_scores(score, extra) if extra else score for score, extra in zip(scores, proximity)]
+        return scores
+
+    def stats(self) -> Dict[str, Any]:
+        stats = {'cache': self.cache.stats(), 'coalescing': self.inflight.stats(), 'stages': self.cascade.stats(),
+                 'graph': self.graph.stats(), 'velocity': self.velocity.stats()}
+        for client in (self.compute3, self.compute3_async):
+            if hasattr(client, 'stats'):
+                stats['comput3'] = client.stats()
+        return stats
+
+    def update_blocklist(self, added: Iterable[str] = (), removed: Iterable[str] = ()):
+        """Adds/removes known scam addresses and drops cached verdicts that involve them."""
+        for address in added:
+            self.blocklist.add(address)
+            self.cache.invalidate_address(address)
+            self.graph.mark_scam(address)
+        for address in removed:
+            self.blocklist.remove(address)
+            self.cache.invalidate_address(address)
+            self.graph.rescan()
+
     def quick_scam_check(self, address: str) -> bool:
-        return address and address.lower() in KNOWN_SCAM_ADDRESSES
+        return bool(address) and address in self.blocklist
+
+    def check_address(self, address: str, chain: str = 'ethereum') -> Dict[str, Any]:
+        entry = self.address_reputation([address], chain).get(address.lower()) if address else None
+        if entry is None:
+            return {'reputation': 'unknown', 'risk': 0.5}
+        return {'reputation': entry['reputation'], 'risk': entry['score'] if entry['score'] is not None else 0.5}
+
+    def address_reputation(self, addresses: Iterable[str], chain: str = 'ethereum') -> Dict[str, Dict[str, Any]]:
+        """
+        Reputation of many addresses in one pass: the stored evidence from earlier
+        verdicts (one indexed query per ~900 addresses), with current blocklist and
+        allowlist listings applied on top. Keys are the lower-cased addresses.
+        """
+        evidence = self.reputation.lookup_many(chain, addresses)
+        return {address: self._reputation_entry(address, entry) for address, entry in evidence.items()}
 
-    def check_address(self, address: str) -> Dict[str, Any]:
-        if self.quick_scam_check(address):
-            return {'reputation': 'scam', 'risk': 1.0}
-        return {'reputation': 'unknown', 'risk': 0.5}
+    def _reputation_entry(self, address: str, entry: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        entry = dict(entry) if entry else {'score': None, 'max_score': None, 'labels': [], 'evidence_count': 0,
+                                           'first_seen': None, 'last_seen': None}
+        listing = self.blocklist.lookup(address)
+        trusted = None if listing else self.allowlist.lookup(address)
+        if listing:
+            entry['reputation'], entry['score'], entry['blocklist'] = 'scam', 1.0, listing
+            label = 'blocklisted'
+        elif trusted:
+            entry['reputation'], entry['allowlist'] = 'trusted', trusted
+            label = 'trusted_contract'
+        else:
+            score = entry['score']
+            entry['reputation'] = ('unknown' if score is None else 'high_risk' if score > 0.8
+                                   else 'suspicious' if score > 0.5 else 'clean')
+            label = None
+        if label and label not in entry['labels']:
+            entry['labels'] = entry['labels'] + [label]
+        entry['hops_to_scam'] = self.graph.hops_to_scam(address)
+        return entry
 
     def verify_contract(self, contract_address: str) -> Dict[str, Any]:
-        if contract_address.lower() in KNOWN_SCAM_ADDRESSES:
+        if contract_address in self.blocklist:
             return {'verified': False, 'risk': 1.0, 'reason': 'Known scam contract'}
         return {'verified': True, 'risk': 0.1}
 
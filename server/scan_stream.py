@@ -0,0 +1,236 @@
+# server/scan_stream.py
+"""
+NDJSON scan streams: the request body is one transaction object per line, the
+response is one verdict per line, written as soon as that transaction is analyzed
+(so out of input order). A line's optional "id" member tags its verdict and is not
+analyzed; lines without one are tagged with their 0-based line number.
+
+At most `max_in_flight` transactions are being analyzed or waiting to be written
+at any time. Once that many are outstanding, no more of the body is read, so a
+producer that sends faster than verdicts are consumed is slowed down by TCP flow
+control rather than buffered in memory. The stream ends with one summary line,
+{"done": true, "count": ..., "errors": ...}.
+"""
+import os
+import json
+import queue
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Callable, Iterable, Iterator, AsyncIterator, List, Optional, Tuple
+
+from . import metrics
+from .resilience import Deadline
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = 'application/x-ndjson'
+READ_CHUNK_BYTES = 64 * 1024
+
+
+def max_in_flight() -> int:
+    return int(os.getenv('STREAM_MAX_IN_FLIGHT', '32'))
+
+
+def max_line_bytes() -> int:
+    return int(os.getenv('STREAM_MAX_LINE_BYTES', str(1024 * 1024)))
+
+
+class LineSplitter:
+    """Cuts a byte stream into lines without holding more than one partial line."""
+
+    def __init__(self, limit: Optional[int] = None):
+        self.limit = limit or max_line_bytes()
+        self._partial = b''
+
+    def feed(self, chunk: bytes) -> List[bytes]:
+        lines = (self._partial + chunk).split(b'\n')
+        self._partial = lines.pop()
+        if len(self._partial) > self.limit:
+            raise ValueError(f"Line longer than {self.limit} bytes")
+        return lines
+
+    def close(self) -> List[bytes]:
+        rest, self._partial = self._partial, b''
+        return [rest] if rest.strip() else []
+
+
+def parse_line(raw: bytes, line_no: int) -> Tuple[Any, Dict[str, Any]]:
+    """(client id, transaction) for one input line; ValueError if it is not a JSON object."""
+    try:
+        tx = json.loads(raw)
+    except ValueError:
+        raise ValueError(f"Line {line_no} is not valid JSON")
+    if not isinstance(tx, dict):
+        raise ValueError(f"Line {line_no} must be a JSON object")
+    return tx.pop('id', line_no), tx
+
+
+def verdict(client_id: Any, result: Dict[str, Any]) -> Dict[str, Any]:
+    if not result or result.get('risk_level') == 'ERROR':
+        return {'id': client_id, 'error': 'Analysis failed', 'details': result}
+    return {'id': client_id, 'result': result}
+
+
+def encode(record: Dict[str, Any]) -> bytes:
+    return json.dumps(record, default=str).encode() + b'\n'
+
+
+def _summary(count: int, errors: int, error: Optional[str] = None) -> Dict[str, Any]:
+    summary = {'done': True, 'count': count, 'errors': errors}
+    if error:
+        summary['error'] = error
+    return summary
+
+
+def _count(record: Dict[str, Any]) -> int:
+    failed = 'error' in record
+    metrics.inc('aya_stream_transactions_total', outcome='error' if failed else 'success')
+    return failed
+
+
+def _numbered_lines(chunks: Iterable[bytes], splitter: LineSplitter) -> Iterator[Tuple[int, bytes]]:
+    line_no = 0
+    for chunk in chunks:
+        for raw in splitter.feed(chunk):
+            if raw.strip():
+                yield line_no, raw
+            line_no += 1
+    for raw in splitter.close():
+        yield line_no, raw
+
+
+async def _anumbered_lines(chunks: AsyncIterator[bytes], splitter: LineSplitter) -> AsyncIterator[Tuple[int, bytes]]:
+    line_no = 0
+    async for chunk in chunks:
+        for raw in splitter.feed(chunk):
+            if raw.strip():
+                yield line_no, raw
+            line_no += 1
+    for raw in splitter.close():
+        yield line_no, raw
+
+
+def stream_verdicts(analyze: Callable[..., Dict[str, Any]], body: Iterable[bytes],
+                    deadline_ms: Any = None, in_flight: Optional[int] = None) -> Iterator[bytes]:
+    """
+    Thread-based stream for the WSGI app. A reader thread pulls lines from `body`
+    (an iterable of byte chunks) and hands transactions to a pool running
+    `analyze(tx, deadline=...)`; this generator yields each verdict as it lands.
+    `deadline_ms` is applied to every transaction separately.
+    """
+    in_flight = in_flight or max_in_flight()
+    slots = threading.BoundedSemaphore(in_flight)
+    results: "queue.Queue" = queue.Queue()
+    stop = threading.Event()
+    pool = ThreadPoolExecutor(max_workers=in_flight, thread_name_prefix="scan-stream")
+
+    def analyze_one(client_id, tx):
+        try:
+            return verdict(client_id, analyze(tx, deadline=Deadline.from_ms(deadline_ms)))
+        except Exception as e:
+            logger.error(f"Stream analysis failed for {client_id!r}: {e}")
+            return {'id': client_id, 'error': str(e)}
+
+    def acquire() -> bool:
+        while not stop.is_set():
+            if slots.acquire(timeout=0.5):
+                return True
+        return False
+
+    def read():
+        submitted, failure = 0, None
+        try:
+            for line_no, raw in _numbered_lines(body, LineSplitter()):
+                if not acquire():
+                    return
+                submitted += 1
+                try:
+                    client_id, tx = parse_line(raw, line_no)
+                except ValueError as e:
+                    results.put({'id': line_no, 'error': str(e)})
+                    continue
+                pool.submit(analyze_one, client_id, tx).add_done_callback(lambda f: results.put(f.result()))
+        except Exception as e:
+            failure = str(e)
+        finally:
+            results.put((submitted, failure))
+
+    reader = threading.Thread(target=read, name="scan-stream-reader", daemon=True)
+    reader.start()
+    written, errors, expected, failure = 0, 0, None, None
+    try:
+        while expected is None or written < expected:
+            item = results.get()
+            if isinstance(item, tuple):
+                expected, failure = item
+                continue
+            errors += _count(item)
+            written += 1
+            yield encode(item)
+            slots.release()
+        yield encode(_summary(written, errors, failure))
+    finally:
+        # Also reached when the client goes away mid-stream (the generator is closed)
+        stop.set()
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+async def astream_verdicts(analyze: Callable[..., Any], body: AsyncIterator[bytes],
+                           emit: Callable[[bytes], Any], deadline_ms: Any = None,
+                           in_flight: Optional[int] = None):
+    """
+    asyncio counterpart for the ASGI app: `analyze` is a coroutine function, `body`
+    yields byte chunks and `await emit(line)` writes one response line.
+    """
+    slots = asyncio.Semaphore(in_flight or max_in_flight())
+    write_lock = asyncio.Lock()
+    tasks = set()
+    totals = {'count': 0, 'errors': 0}
+
+    async def write(record):
+        async with write_lock:
+            totals['count'] += 1
+            totals['errors'] += _count(record)
+            await emit(encode(record))
+
+    async def analyze_one(client_id, tx):
+        try:
+            try:
+                record = verdict(client_id, await analyze(tx, deadline=Deadline.from_ms(deadline_ms)))
+            except Exception as e:
+                logger.error(f"Stream analysis failed for {client_id!r}: {e}")
+                record = {'id': client_id, 'error': str(e)}
+            await write(record)
+        finally:
+            slots.release()
+
+    async def dispatch(raw: bytes, line_no: int):
+        await slots.acquire()
+        try:
+            client_id, tx = parse_line(raw, line_no)
+        except ValueError as e:
+            try:
+                await write({'id': line_no, 'error': str(e)})
+            finally:
+                slots.release()
+            return
+        task = asyncio.create_task(analyze_one(client_id, tx))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+
+    failure = None
+    try:
+        async for line_no, raw in _anumbered_lines(body, LineSplitter()):
+            await dispatch(raw, line_no)
+    except ValueError as e:
+        failure = str(e)
+    try:
+        if tasks:
+            await asyncio.gather(*tasks)
+    except asyncio.CancelledError:
+        for task in tasks:
+            task.cancel()
+        raise
+    await emit(encode(_summary(totals['count'], totals['errors'], failure)))
@@ -0,0 +1,448 @@
+# server/shared_cache.py
+import os
+import mmap
+import time
+import zlib
+import fcntl
+import struct
+import hashlib
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# On-disk layout of the shared table (all integers little-endian):
+#   header       HEADER_FORMAT: magic, bucket count, ways per bucket, slot size, clear generation
+#   generations  ADDRESS_GENERATIONS u32 counters, bumped to invalidate every entry of an address
+#   buckets      bucket_count * WAYS slots of slot_size bytes
+# A slot is SLOT_FORMAT followed by the value: 16-byte key digest, expiry and last use (unix
+# seconds; expiry 0 marks an empty slot), the clear generation and up to two (address
+# generation index, generation) pairs it was written under, a flags byte and the value length.
+MAGIC = b'AYASHC01'
+HEADER_FORMAT = '<8sIIII'
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+CLEAR_OFFSET = HEADER_SIZE - 4
+ADDRESS_GENERATIONS = 65536
+GENERATIONS_OFFSET = HEADER_SIZE
+SLOT_FORMAT = '<16sddIIIIIBxxxI'
+SLOT_SIZE = struct.calcsize(SLOT_FORMAT)
+WAYS = 8
+NO_ADDRESS = 0xFFFFFFFF
+FLAG_NEGATIVE = 1
+FLAG_COMPRESSED = 2
+# Threads of one process serialize per stripe; fcntl range locks only exclude other processes
+_THREAD_STRIPES = 64
+
+_slot = struct.Struct(SLOT_FORMAT)
+_u32 = struct.Struct('<I')
+
+# (clear generation, ((generation index, generation), ...)) at the time an entry was written
+Stamp = Tuple[int, Tuple[Tuple[int, int], ...]]
+
+
+def digest(key: str) -> bytes:
+    return hashlib.blake2b(key.encode(), digest_size=16).digest()
+
+
+def generation_index(address: str) -> int:
+    # crc32, not hash(): every process must map an address to the same counter
+    return zlib.crc32(address.lower().encode()) % ADDRESS_GENERATIONS
+
+
+class SharedTable:
+    """
+    Set-associative hash table in a memory-mapped file that every worker on the
+    host maps (default under /dev/shm), so a value stored by one worker is a hit
+    for all of them. A key hashes to a bucket of WAYS slots; a write takes the
+    key's own slot, an empty or expired one, or else the least recently used one.
+
+    Every bucket operation holds an fcntl lock on the bucket's byte range (plus a
+    thread lock stripe), so updates are atomic across processes while different
+    buckets proceed in parallel. Invalidation is O(1): entries record the
+    generation of the addresses they involve, and bumping an address's counter
+    makes all of them stale at once.
+    """
+
+    def __init__(self, path: str, slots: Optional[int] = None, slot_bytes: Optional[int] = None):
+        self.path = path
+        slots = slots or int(os.getenv('SHARED_CACHE_SLOTS', '65536'))
+        self.buckets = max(1, slots // WAYS)
+        self.slot_bytes = slot_bytes or int(os.getenv('SHARED_CACHE_SLOT_BYTES', '1024'))
+        if self.slot_bytes <= SLOT_SIZE:
+            raise ValueError(f"SHARED_CACHE_SLOT_BYTES must be larger than the {SLOT_SIZE}-byte slot header")
+        self._fd = None
+        self._map = None
+        self._slots_offset = 0
+        self._open_lock = threading.Lock()
+        self._locks = [threading.Lock() for _ in range(_THREAD_STRIPES)]
+        self.hits = self.misses = self.writes = self.evictions = self.too_large = 0
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        # The mapping and descriptor are inherited and stay valid; the thread locks are not
+        self._open_lock = threading.Lock()
+        self._locks = [threading.Lock() for _ in range(_THREAD_STRIPES)]
+
+    def _mapping(self) -> mmap.mmap:
+        if self._map is not None:
+            return self._map
+        with self._open_lock:
+            if self._map is None:
+                self._open()
+        return self._map
+
+    def _open(self):
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        try:
+            header = os.pread(fd, HEADER_SIZE, 0)
+            if len(header) == HEADER_SIZE and header[:8] == MAGIC:
+                # The first process to create the file decides the geometry; later ones adopt it
+                _, self.buckets, _, self.slot_bytes, _ = struct.unpack(HEADER_FORMAT, header)
+            else:
+                os.ftruncate(fd, 0)
+                os.ftruncate(fd, self._file_size())
+                os.pwrite(fd, struct.pack(HEADER_FORMAT, MAGIC, self.buckets, WAYS, self.slot_bytes, 0), 0)
+                logger.info(f"Created shared cache {self.path} ({self.buckets * WAYS} slots of {self.slot_bytes} bytes)")
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        self._slots_offset = GENERATIONS_OFFSET + ADDRESS_GENERATIONS * 4
+        self._map = mmap.mmap(fd, self._file_size())
+        self._fd = fd
+
+    def _file_size(self) -> int:
+        return GENERATIONS_OFFSET + ADDRESS_GENERATIONS * 4 + self.buckets * WAYS * self.slot_bytes
+
+    @contextmanager
+    def _locked(self, offset: int, length: int, stripe: int):
+        with self._locks[stripe % _THREAD_STRIPES]:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, length, offset, os.SEEK_SET)
+            try:
+                yield
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, length, offset, os.SEEK_SET)
+
+    # ---- generations -----------------------------------------------------
+
+    def clear_generation(self) -> int:
+        return _u32.unpack_from(self._mapping(), CLEAR_OFFSET)[0]
+
+    def generation(self, index: int) -> int:
+        return _u32.unpack_from(self._mapping(), GENERATIONS_OFFSET + index * 4)[0]
+
+    def _bump(self, offset: int, stripe: int):
+        mapping = self._mapping()
+        with self._locked(offset, 4, stripe):
+            _u32.pack_into(mapping, offset, (_u32.unpack_from(mapping, offset)[0] + 1) & 0xFFFFFFFF)
+
+    def invalidate_address(self, address: str):
+        index = generation_index(address)
+        self._bump(GENERATIONS_OFFSET + index * 4, index)
+
+    def clear(self):
+        self._bump(CLEAR_OFFSET, 0)
+
+    def stamp(self, addresses: Iterable[str]) -> Stamp:
+        indexes = [generation_index(a) for a in addresses if isinstance(a, str) and a][:2]
+        return self.clear_generation(), tuple((index, self.generation(index)) for index in indexes)
+
+    def valid(self, stamp: Stamp) -> bool:
+        clear, pairs = stamp
+        return clear == self.clear_generation() and all(self.generation(i) == g for i, g in pairs)
+
+    # ---- entries ---------------------------------------------------------
+
+    def _bucket(self, key_digest: bytes) -> Tuple[int, int]:
+        bucket = int.from_bytes(key_digest[:8], 'little') % self.buckets
+        return bucket, self._slots_offset + bucket * WAYS * self.slot_bytes
+
+    def get(self, key_digest: bytes, now: Optional[float] = None) -> Optional[Tuple[bytes, float, int, Stamp]]:
+        """(value, expires_at, flags, stamp) of a live entry, or None."""
+        mapping = self._mapping()
+        now = now or time.time()
+        bucket, base = self._bucket(key_digest)
+        with self._locked(base, WAYS * self.slot_bytes, bucket):
+            for way in range(WAYS):
+                offset = base + way * self.slot_bytes
+                if mapping[offset:offset + 16] != key_digest:
+                    continue
+                _, expires, _, clear, index_a, gen_a, index_b, gen_b, flags, length = _slot.unpack_from(mapping, offset)
+                pairs = tuple((i, g) for i, g in ((index_a, gen_a), (index_b, gen_b)) if i != NO_ADDRESS)
+                stamp = (clear, pairs)
+                if expires <= now or not self.valid(stamp):
+                    mapping[offset + 16:offset + 24] = struct.pack('<d', 0.0)
+                    break
+                struct.pack_into('<d', mapping, offset + 24, now)
+                start = offset + SLOT_SIZE
+                self.hits += 1
+                return bytes(mapping[start:start + length]), expires, flags, stamp
+        self.misses += 1
+        return None
+
+    def put(self, key_digest: bytes, value: bytes, expires: float, flags: int = 0,
+            stamp: Optional[Stamp] = None, now: Optional[float] = None) -> bool:
+        """Stores the value unless it cannot fit a slot even compressed; returns whether it did."""
+        if len(value) > self.slot_bytes - SLOT_SIZE:
+            value, flags = zlib.compress(value, 1), flags | FLAG_COMPRESSED
+            if len(value) > self.slot_bytes - SLOT_SIZE:
+                self.too_large += 1
+                return False
+        mapping = self._mapping()
+        now = now or time.time()
+        clear, pairs = stamp if stamp is not None else (self.clear_generation(), ())
+        pairs = tuple(pairs) + ((NO_ADDRESS, 0),) * (2 - len(pairs))
+        bucket, base = self._bucket(key_digest)
+        with self._locked(base, WAYS * self.slot_bytes, bucket):
+            target, oldest = None, None
+            for way in range(WAYS):
+                offset = base + way * self.slot_bytes
+                if mapping[offset:offset + 16] == key_digest:
+                    target = offset
+                    break
+                slot_expires, used = struct.unpack_from('<dd', mapping, offset + 16)
+                if slot_expires <= now:
+                    target = target if target is not None else offset
+                elif oldest is None or used < oldest[1]:
+                    oldest = (offset, used)
+            if target is None:
+                target = oldest[0]
+                self.evictions += 1
+            _slot.pack_into(mapping, target, key_digest, expires, now, clear,
+                            pairs[0][0], pairs[0][1], pairs[1][0], pairs[1][1], flags, len(value))
+            mapping[target + SLOT_SIZE:target + SLOT_SIZE + len(value)] = value
+        self.writes += 1
+        return True
+
+    def delete(self, key_digest: bytes):
+        mapping = self._mapping()
+        bucket, base = self._bucket(key_digest)
+        with self._locked(base, WAYS * self.slot_bytes, bucket):
+            for way in range(WAYS):
+                offset = base + way * self.slot_bytes
+                if mapping[offset:offset + 16] == key_digest:
+                    mapping[offset + 16:offset + 24] = struct.pack('<d', 0.0)
+
+    def stats(self) -> Dict[str, Any]:
+        self._mapping()    # the geometry is the file's once mapped
+        return {'path': self.path, 'slots': self.buckets * WAYS, 'slot_bytes': self.slot_bytes,
+                'hits': self.hits, 'misses': self.misses, 'writes': self.writes,
+                'evictions': self.evictions, 'too_large': self.too_large}
+
+
+# ---- remote tier --------------------------------------------------------
+
+class LocalBackend:
+    """
+    In-process stand-in for a remote key-value store, with the interface a remote
+    backend implements: get / get_many / set (with a TTL) / delete / incr.
+    """
+
+    def __init__(self):
+        self._values: Dict[str, Tuple[bytes, float]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.get_many([key])[0]
+
+    def get_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        now = time.time()
+        with self._lock:
+            found = [self._values.get(key) for key in keys]
+        return [entry[0] if entry is not None and entry[1] > now else None for entry in found]
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None):
+        with self._lock:
+            self._values[key] = (value, time.time() + ttl if ttl else float('inf'))
+
+    def delete(self, key: str):
+        with self._lock:
+            self._values.pop(key, None)
+
+    def incr(self, key: str) -> int:
+        with self._lock:
+            value = int(self._values.get(key, (b'0', 0))[0]) + 1
+            self._values[key] = (str(value).encode(), float('inf'))
+            return value
+
+
+class RedisBackend:
+    """Redis as the remote tier; needs the `redis` package, which is only imported when configured."""
+
+    def __init__(self, url: str):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("SHARED_CACHE_REMOTE is a redis:// URL but the 'redis' package is not installed") from e
+        self.client = redis.Redis.from_url(url, socket_timeout=float(os.getenv('SHARED_CACHE_REMOTE_TIMEOUT', '0.05')))
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.client.get(key)
+
+    def get_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        return self.client.mget(keys) if keys else []
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None):
+        self.client.set(key, value, px=int(ttl * 1000) if ttl else None)
+
+    def delete(self, key: str):
+        self.client.delete(key)
+
+    def incr(self, key: str) -> int:
+        return self.client.incr(key)
+
+
+def remote_from_url(url: str):
+    if url.startswith('memory://'):
+        return LocalBackend()
+    if url.startswith(('redis://', 'rediss://', 'unix://')):
+        return RedisBackend(url)
+    raise ValueError(f"Unsupported SHARED_CACHE_REMOTE {url!r} (use memory:// or redis://)")
+
+
+# ---- tiers ----------------------------------------------------------------
+
+_REMOTE_HEADER = struct.Struct('<dBB')
+_REMOTE_PAIR = struct.Struct('<IQ')
+
+
+class SharedCache:
+    """
+    The tiers behind a worker's in-process caches: the host-wide SharedTable and,
+    optionally, a remote backend shared between hosts. Reads try the table first
+    and copy remote hits into it; writes go to both. Remote errors count as misses,
+    so an unreachable remote only costs its timeout.
+    """
+
+    _instances: Dict[Tuple[str, str], 'SharedCache'] = {}
+
+    def __init__(self, table: Optional[SharedTable] = None, remote=None, prefix: Optional[str] = None):
+        self.table = table
+        self.remote = remote
+        self.prefix = prefix if prefix is not None else os.getenv('SHARED_CACHE_REMOTE_PREFIX', 'aya:')
+        self.remote_hits = self.remote_errors = 0
+
+    @classmethod
+    def from_env(cls) -> Optional['SharedCache']:
+        """One instance per process for SHARED_CACHE_PATH / SHARED_CACHE_REMOTE; None if neither is set."""
+        path, url = os.getenv('SHARED_CACHE_PATH', ''), os.getenv('SHARED_CACHE_REMOTE', '')
+        if not path and not url:
+            return None
+        if (path, url) not in cls._instances:
+            cls._instances[(path, url)] = cls(SharedTable(path) if path else None, remote_from_url(url) if url else None)
+        return cls._instances[(path, url)]
+
+    def stamp(self, addresses: Iterable[str]) -> Optional[Stamp]:
+        return self.table.stamp(addresses) if self.table is not None else None
+
+    def valid(self, stamp: Optional[Stamp]) -> bool:
+        return stamp is None or self.table is None or self.table.valid(stamp)
+
+    def get(self, key: str) -> Optional[Tuple[bytes, float, bool, Optional[Stamp]]]:
+        """(value, expires_at as unix time, negative, stamp) or None."""
+        key_digest = digest(key)
+        if self.table is not None:
+            found = self.table.get(key_digest)
+            if found is not None:
+                value, expires, flags, stamp = found
+                return (zlib.decompress(value) if flags & FLAG_COMPRESSED else value), expires, bool(flags & FLAG_NEGATIVE), stamp
+        if self.remote is None:
+            return None
+        found = self._remote_get(key)
+        if found is None:
+            return None
+        value, expires, negative, addresses = found
+        stamp = None
+        if self.table is not None:
+            stamp = self.table.stamp(addresses)
+            self.table.put(key_digest, value, expires, FLAG_NEGATIVE if negative else 0, stamp)
+        self.remote_hits += 1
+        return value, expires, negative, stamp
+
+    def put(self, key: str, value: bytes, ttl: float, addresses: Iterable[str] = (),
+            negative: bool = False, stamp: Optional[Stamp] = None) -> Optional[Stamp]:
+        """
+        Stores the value under the current generations of its addresses, or under `stamp`
+        (taken before the value was read) so an invalidation in between leaves it stale.
+        """
+        addresses = [a.lower() for a in addresses if isinstance(a, str) and a][:2]
+        expires = time.time() + ttl
+        if self.table is not None:
+            if stamp is None:
+                stamp = self.table.stamp(addresses)
+            elif not self.table.valid(stamp):
+                return stamp
+            self.table.put(digest(key), value, expires, FLAG_NEGATIVE if negative else 0, stamp)
+        if self.remote is not None:
+            self._remote_put(key, value, ttl, expires, addresses, negative)
+        return stamp
+
+    def delete(self, key: str):
+        if self.table is not None:
+            self.table.delete(digest(key))
+        if self.remote is not None:
+            self._remote(lambda: self.remote.delete(self.prefix + key))
+
+    def invalidate_address(self, address: str):
+        if self.table is not None:
+            self.table.invalidate_address(address)
+        if self.remote is not None:
+            self._remote(lambda: self.remote.incr(self._generation_key(generation_index(address))))
+
+    def clear(self):
+        if self.table is not None:
+            self.table.clear()
+        if self.remote is not None:
+            self._remote(lambda: self.remote.incr(self.prefix + 'clear'))
+
+    def stats(self) -> Dict[str, Any]:
+        stats = {'table': self.table.stats() if self.table is not None else None}
+        if self.remote is not None:
+            stats['remote'] = {'backend': type(self.remote).__name__, 'hits': self.remote_hits,
+                               'errors': self.remote_errors}
+        return stats
+
+    # Remote records: expiry, negative flag and the generations of the clear counter and
+    # of each address at write time, then the value; a bumped counter makes them stale
+
+    def _generation_key(self, index: int) -> str:
+        return f"{self.prefix}gen:{index}"
+
+    def _remote_generations(self, indexes: List[int]) -> Optional[List[int]]:
+        keys = [self.prefix + 'clear'] + [self._generation_key(i) for i in indexes]
+        values = self._remote(lambda: self.remote.get_many(keys))
+        return None if values is None else [int(v or 0) for v in values]
+
+    def _remote_put(self, key: str, value: bytes, ttl: float, expires: float, addresses: List[str], negative: bool):
+        indexes = [generation_index(a) for a in addresses]
+        generations = self._remote_generations(indexes)
+        if generations is None:
+            return
+        record = (_REMOTE_HEADER.pack(expires, negative, len(indexes)) + _u32.pack(generations[0]) +
+                  b''.join(_REMOTE_PAIR.pack(i, g) for i, g in zip(indexes, generations[1:])) + value)
+        self._remote(lambda: self.remote.set(self.prefix + key, record, ttl))
+
+    def _remote_get(self, key: str) -> Optional[Tuple[bytes, float, bool, List[str]]]:
+        record = self._remote(lambda: self.remote.get(self.prefix + key))
+        if not record:
+            return None
+        expires, negative, count = _REMOTE_HEADER.unpack_from(record)
+        position = _REMOTE_HEADER.size
+        clear = _u32.unpack_from(record, position)[0]
+        position += 4
+        pairs = [_REMOTE_PAIR.unpack_from(record, position + i * _REMOTE_PAIR.size) for i in range(count)]
+        position += count * _REMOTE_PAIR.size
+        current = self._remote_generations([i for i, _ in pairs])
+        if expires <= time.time() or current is None or current != [clear] + [g for _, g in pairs]:
+            return None
+        # The remote keeps generation indexes, not addresses; the table entry is stamped with none
+        return record[position:], expires, bool(negative), []
+
+    def _remote(self, operation):
+        try:
+            return operation()
+        except Exception as e:
+            self.remote_errors += 1
+            logger.warning(f"Shared cache remote failed: {e}")
+            return None
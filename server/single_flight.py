@@ -0,0 +1,71 @@
+# server/single_flight.py
+import copy
+import asyncio
+import logging
+import threading
+from concurrent.futures import Future
+from typing import Dict, Any, Callable, Awaitable, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """
+    Collapses concurrent calls with the same key into one: the first caller runs the
+    function, callers arriving while it is in flight wait for that result (or its
+    exception) instead of starting their own. Every caller gets its own deep copy, so
+    callers may annotate what they receive.
+
+    `do` is for threads, `do_async` for coroutines on one event loop; the two keep
+    separate in-flight tables.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, Future] = {}
+        self._tasks: Dict[str, asyncio.Future] = {}
+        self.leaders = 0
+        self.collapsed = 0
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """Returns (result, shared) where `shared` is True if another caller did the work."""
+        with self._lock:
+            future = self._calls.get(key)
+            shared = future is not None
+            if shared:
+                self.collapsed += 1
+            else:
+                future = self._calls[key] = Future()
+                self.leaders += 1
+        if shared:
+            return copy.deepcopy(future.result()), True
+
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+        finally:
+            with self._lock:
+                del self._calls[key]
+        return copy.deepcopy(result), False
+
+    async def do_async(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        # The shared call runs as its own task, so a cancelled caller (e.g. a client
+        # that disconnected) does not cancel it for everyone else
+        task = self._tasks.get(key)
+        shared = task is not None
+        if shared:
+            self.collapsed += 1
+        else:
+            task = self._tasks[key] = asyncio.ensure_future(fn())
+            task.add_done_callback(lambda done: self._tasks.pop(key, None) if self._tasks.get(key) is done else None)
+            self.leaders += 1
+        return copy.deepcopy(await asyncio.shield(task)), shared
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            in_flight = len(self._calls) + len(self._tasks)
+        return {'in_flight': in_flight, 'leaders': self.leaders, 'collapsed': self.collapsed}
@@ -0,0 +1,362 @@
+# server/tracing.py
+"""
+On-demand diagnostics that are safe to switch on in production:
+
+* Trace spans. A traced request collects every timing the metrics module
+  observes while it runs (JSON parsing, each ScamDetector stage, Comput3 attempts,
+  Hedera submissions, ...) as spans. Admins get them back in a `Server-Timing`
+  header by sending `X-Aya-Trace: 1`, and a sampled share of all requests feeds a
+  buffer of the slowest recent ones.
+* A wall-clock sampling profiler that snapshots every thread's stack for N seconds
+  and writes folded stacks (`frame;frame;frame count`), the input format of
+  flamegraph.pl and speedscope.
+
+Commands from the admin endpoints are written to a control file that every worker
+checks at most once a second, and results are files in TRACE_DIR, so any worker
+can start a profile or collect the traces of all of them. Untraced requests pay a
+clock comparison and a context-variable read per observed timing.
+"""
+import os
+import re
+import sys
+import json
+import glob
+import hmac
+import time
+import uuid
+import heapq
+import random
+import shutil
+import logging
+import tempfile
+import threading
+import functools
+import contextvars
+from typing import Dict, Any, Callable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_current: contextvars.ContextVar = contextvars.ContextVar('aya_trace', default=None)
+
+
+def pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def scoped_tempdir(name: str) -> str:
+    """
+    `<tmp>/<name>-<pid>` for this process (gunicorn.conf.py sets the master's for its workers),
+    so deployments sharing a host never merge their files. Directories of processes that are
+    gone are removed on the way.
+    """
+    for path in glob.glob(os.path.join(tempfile.gettempdir(), f'{name}-*')):
+        suffix = path.rsplit('-', 1)[1]
+        if suffix.isdigit() and int(suffix) != os.getpid() and not pid_alive(int(suffix)):
+            shutil.rmtree(path, ignore_errors=True)
+    return os.path.join(tempfile.gettempdir(), f'{name}-{os.getpid()}')
+
+# Metric name -> span prefix; the first label's value completes the span name (stage.rules)
+SPAN_NAMES = {
+    'aya_http_request_duration_seconds': 'request',
+    'aya_tool_duration_seconds': 'tool',
+    'aya_stage_duration_seconds': 'step',
+    'aya_analysis_stage_duration_seconds': 'stage',
+    'aya_comput3_request_duration_seconds': 'comput3',
+    'aya_hedera_submit_duration_seconds': 'hedera',
+}
+_CONTROL_CHECK = 1.0
+# Pool threads (comput3_0, comput3_1, ...) share one root in the flame graph
+_THREAD_SUFFIX = re.compile(r'[-_]?\d+$')
+
+
+def _number(value: Any, name: str) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"'{name}' must be a number") from None
+
+
+def current():
+    """The trace of the request running in this context, or None."""
+    return _current.get()
+
+
+def propagate(fn: Callable) -> Callable:
+    """`fn` bound to the caller's trace, for work handed to a thread pool; `fn` itself when untraced."""
+    if _current.get() is None:
+        return fn
+    return functools.partial(contextvars.copy_context().run, fn)
+
+
+class Trace:
+    __slots__ = ('route', 'started', 'started_at', 'spans', 'forced')
+
+    def __init__(self, forced: bool = False):
+        self.route = None
+        self.started = time.perf_counter()
+        self.started_at = time.time()
+        self.spans: List[Tuple[str, Dict[str, str], float, float]] = []
+        self.forced = forced
+
+    def add(self, name: str, seconds: float, labels: Dict[str, Any]):
+        prefix = SPAN_NAMES.get(name, name)
+        values = list(labels.values())
+        span = f"{prefix}.{values[0]}" if values else prefix
+        # list.append is atomic, so pool threads can add spans to the request's trace
+        self.spans.append((span, labels, time.perf_counter() - seconds - self.started, seconds))
+
+    def summary(self, duration: float, status: int) -> Dict[str, Any]:
+        return {
+            'route': self.route, 'status': status, 'pid': os.getpid(), 'started_at': self.started_at,
+            'duration_ms': round(duration * 1000, 3),
+            'spans': [{'name': name, 'labels': {k: str(v) for k, v in labels.items()},
+                       'start_ms': round(start * 1000, 3), 'duration_ms': round(seconds * 1000, 3)}
+                      for name, labels, start, seconds in sorted(self.spans, key=lambda s: s[2])],
+        }
+
+    def server_timing(self, duration: float) -> str:
+        """Value of a `Server-Timing` response header: one entry per span, then the total."""
+        entries = [f'{name};dur={seconds * 1000:.3f}' for name, _, _, seconds in sorted(self.spans, key=lambda s: s[2])
+                   if not name.startswith('request')]
+        entries.append(f'total;dur={duration * 1000:.3f}')
+        return ', '.join(entries)
+
+
+class Tracer:
+    def __init__(self, directory: Optional[str] = None, sample_rate: Optional[float] = None,
+                 slowest: Optional[int] = None, admin_token: Optional[str] = None):
+        self.directory = directory or os.getenv('TRACE_DIR') or scoped_tempdir('aya-diagnostics')
+        self.default_rate = sample_rate if sample_rate is not None else float(os.getenv('TRACE_SAMPLE_RATE', '0'))
+        self.keep = slowest or int(os.getenv('TRACE_SLOWEST', '50'))
+        self.admin_token = admin_token if admin_token is not None else os.getenv('ADMIN_TOKEN', '')
+        self.max_profile_seconds = float(os.getenv('PROFILE_MAX_SECONDS', '60'))
+        self.sample_rate = self.default_rate
+        self._rate_until = 0.0
+        self._control_version = None
+        self._next_check = 0.0
+        # Min-heap on duration, so the fastest of the kept traces is the one replaced
+        self._slowest: List[Tuple[float, int, Dict[str, Any]]] = []
+        self._sequence = 0
+        self._dirty = False
+        self._lock = threading.Lock()
+        self._writer_pid = None
+        self._profile_id = None
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        self._lock = threading.Lock()
+        self._slowest = []
+        self._dirty = False
+        self._writer_pid = None
+        self._profile_id = None
+        self._next_check = 0.0
+
+    # ---- requests ------------------------------------------------------
+
+    def authorized(self, headers) -> bool:
+        if not self.admin_token:
+            return False
+        token = headers.get('X-Admin-Token') or ''
+        authorization = headers.get('Authorization') or ''
+        if authorization.startswith('Bearer '):
+            token = token or authorization[len('Bearer '):]
+        return hmac.compare_digest(token.encode(), self.admin_token.encode())
+
+    def begin(self, headers) -> Optional[Trace]:
+        """Starts tracing the current request if an admin asked for it or it is sampled."""
+        if time.monotonic() >= self._next_check:
+            self._refresh()
+        forced = headers.get('X-Aya-Trace') == '1' and self.authorized(headers)
+        if not forced and not (self.sample_rate > 0 and random.random() < self.sample_rate):
+            return None
+        trace = Trace(forced)
+        _current.set(trace)
+        return trace
+
+    def end(self, trace: Optional[Trace], route: str, status: int) -> Optional[str]:
+        """Files the trace; returns the Server-Timing header value for an admin's request."""
+        if trace is None:
+            return None
+        _current.set(None)
+        duration = time.perf_counter() - trace.started
+        trace.route = route
+        with self._lock:
+            self._sequence += 1
+            if len(self._slowest) < self.keep or duration > self._slowest[0][0]:
+                entry = (duration, self._sequence, trace.summary(duration, status))
+                if len(self._slowest) < self.keep:
+                    heapq.heappush(self._slowest, entry)
+                else:
+                    heapq.heapreplace(self._slowest, entry)
+                self._dirty = True
+        self._ensure_writer()
+        return trace.server_timing(duration) if trace.forced else None
+
+    def slowest(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """The slowest traced requests of every live worker, slowest first."""
+        self._write()
+        traces = []
+        for path in glob.glob(os.path.join(self.directory, 'traces-*.json')):
+            if not pid_alive(int(os.path.basename(path)[len('traces-'):-len('.json')])):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                continue
+            try:
+                with open(path) as f:
+                    traces.extend(json.load(f))
+            except (OSError, ValueError):
+                continue
+        traces.sort(key=lambda t: t['duration_ms'], reverse=True)
+        return traces[:limit or self.keep]
+
+    def set_sampling(self, rate: Any, seconds: Any) -> Dict[str, Any]:
+        """Samples `rate` of all requests on every worker for `seconds`."""
+        rate, seconds = _number(rate, 'sample_rate'), _number(seconds, 'seconds')
+        if not 0 <= rate <= 1 or seconds <= 0:
+            raise ValueError("sample_rate must be between 0 and 1 and seconds positive")
+        until = time.time() + seconds
+        self._update_control(sample_rate=rate, sample_until=until)
+        return {'sample_rate': rate, 'until': until}
+
+    # ---- profiler ------------------------------------------------------
+
+    def start_profile(self, seconds: Any = 10, interval_ms: Any = 10) -> Dict[str, Any]:
+        """Profiles every worker for `seconds`, one stack snapshot per thread each `interval_ms`."""
+        seconds, interval = _number(seconds, 'seconds'), _number(interval_ms, 'interval_ms') / 1000
+        if not 0 < seconds <= self.max_profile_seconds:
+            raise ValueError(f"seconds must be between 0 and {self.max_profile_seconds:g}")
+        if interval < 0.001:
+            raise ValueError("interval_ms must be at least 1")
+        profile_id = uuid.uuid4().hex[:16]
+        until = time.time() + seconds
+        self._update_control(profile={'id': profile_id, 'until': until, 'interval': interval})
+        return {'profile_id': profile_id, 'seconds': seconds, 'until': until, 'url': f"/admin/profile/{profile_id}"}
+
+    def profile(self, profile_id: str) -> Optional[Tuple[bool, str]]:
+        """(finished, folded stacks merged over the workers) or None for an unknown id."""
+        if not re.fullmatch(r'[0-9a-f]{16}', profile_id or ''):
+            return None
+        control = self._read_control()
+        running = control.get('profile', {}).get('id') == profile_id and time.time() < control['profile']['until'] + 2
+        counts: Dict[str, int] = {}
+        paths = glob.glob(os.path.join(self.directory, f'profile-{profile_id}-*.folded'))
+        if not paths and not running:
+            return None
+        for path in paths:
+            with open(path) as f:
+                for line in f:
+                    stack, _, count = line.rstrip('\n').rpartition(' ')
+                    counts[stack] = counts.get(stack, 0) + int(count)
+        return not running, ''.join(f"{stack} {count}\n" for stack, count in sorted(counts.items()))
+
+    def _run_profile(self, profile_id: str, until: float, interval: float):
+        own = threading.get_ident()
+        counts: Dict[str, int] = {}
+        while time.time() < until and self._profile_id == profile_id:
+            names = {t.ident: _THREAD_SUFFIX.sub('', t.name) for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_qualname}")
+                    frame = frame.f_back
+                stack.append(names.get(ident, 'thread'))
+                folded = ';'.join(reversed(stack))
+                counts[folded] = counts.get(folded, 0) + 1
+            time.sleep(interval)
+        path = os.path.join(self.directory, f'profile-{profile_id}-{os.getpid()}.folded')
+        self._write_file(path, ''.join(f"{stack} {count}\n" for stack, count in counts.items()))
+        logger.info(f"Profile {profile_id} written to {path} ({sum(counts.values())} samples)")
+
+    # ---- control file and per-worker files -----------------------------
+
+    def _control_path(self) -> str:
+        return os.path.join(self.directory, 'control.json')
+
+    def _read_control(self) -> Dict[str, Any]:
+        try:
+            with open(self._control_path()) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _update_control(self, **changes):
+        os.makedirs(self.directory, exist_ok=True)
+        control = self._read_control()
+        control.update(changes)
+        self._write_file(self._control_path(), json.dumps(control))
+        self._next_check = 0.0
+        self._refresh()
+
+    def _refresh(self):
+        self._next_check = time.monotonic() + _CONTROL_CHECK
+        if time.time() >= self._rate_until:
+            self.sample_rate = self.default_rate
+        try:
+            stat = os.stat(self._control_path())
+        except OSError:
+            return
+        version = (stat.st_ino, stat.st_mtime_ns)
+        if version == self._control_version:
+            return
+        self._control_version = version
+        control = self._read_control()
+        now = time.time()
+        if control.get('sample_until', 0) > now:
+            self.sample_rate, self._rate_until = control['sample_rate'], control['sample_until']
+        profile = control.get('profile')
+        if not profile or profile['until'] <= now:
+            return
+        with self._lock:
+            if profile['id'] == self._profile_id:
+                return
+            self._profile_id = profile['id']
+        threading.Thread(target=self._run_profile, args=(profile['id'], profile['until'], profile['interval']),
+                             name="profiler", daemon=True).start()
+
+    def _ensure_writer(self):
+        if self._writer_pid is not None:
+            return
+        with self._lock:
+            if self._writer_pid is not None:
+                return
+            self._writer_pid = os.getpid()
+        threading.Thread(target=self._run_writer, name="trace-writer", daemon=True).start()
+
+    def _run_writer(self):
+        pid = os.getpid()
+        while self._writer_pid == pid:
+            time.sleep(_CONTROL_CHECK)
+            try:
+                self._write()
+            except Exception as e:
+                logger.error(f"Writing traces failed: {e}")
+
+    def _write(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            self._dirty = False
+            traces = [summary for _, _, summary in sorted(self._slowest, reverse=True)]
+        os.makedirs(self.directory, exist_ok=True)
+        self._write_file(os.path.join(self.directory, f'traces-{os.getpid()}.json'), json.dumps(traces))
+
+    @staticmethod
+    def _write_file(path: str, content: str):
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+
+
+tracer = Tracer()
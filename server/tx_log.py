@@ -0,0 +1,277 @@
+# server/tx_log.py
+import os
+import json
+import mmap
+import time
+import fcntl
+import atexit
+import struct
+import logging
+import threading
+from typing import Dict, Any, Optional, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+FSYNC_POLICIES = ('always', 'interval', 'never')
+
+# index.bin is an open-addressing hash table shared by every process:
+#   header  INDEX_HEADER: magic, slot count, entry count, retired flag
+#   slots   INDEX_SLOT: first 16 bytes of tx_hash, segment + 1 (0 = empty), offset, length
+# It is only modified under the directory lock. When it fills up it is rebuilt at twice
+# the size and swapped in; the old file is flagged as retired so readers remap.
+INDEX_MAGIC = b'AYATXI01'
+INDEX_HEADER = struct.Struct('<8sQQQ')
+INDEX_SLOT = struct.Struct('<16sIQI')
+INDEX_MAX_LOAD = 0.7
+_M64 = (1 << 64) - 1
+
+
+def _slot_for(key: bytes, slot_count: int) -> int:
+    return ((int.from_bytes(key[:8], 'little') * 0x9E3779B97F4A7C15) & _M64) >> (64 - slot_count.bit_length() + 1)
+
+
+class TransactionLog:
+    """
+    Append-only JSON-lines log split into size-bounded segments, with an on-disk
+    tx_hash index for O(1) lookups. Writes are buffered in memory and appended in
+    batches under an exclusive file lock, so several gunicorn workers can share one
+    directory. `fsync` is 'always' (every batch), 'interval' (at most every
+    `fsync_interval` seconds) or 'never' (leave it to the OS).
+    """
+
+    def __init__(self, directory: Optional[str] = None, segment_bytes: Optional[int] = None,
+                 buffer_entries: Optional[int] = None, flush_interval: Optional[float] = None,
+                 fsync: Optional[str] = None, fsync_interval: Optional[float] = None):
+        self.directory = directory or os.getenv('HEDERA_LOG_DIR', 'hedera_log')
+        self.segment_bytes = segment_bytes or int(os.getenv('HEDERA_LOG_SEGMENT_BYTES', str(64 * 1024 * 1024)))
+        self.buffer_entries = buffer_entries or int(os.getenv('HEDERA_LOG_BUFFER_ENTRIES', '256'))
+        self.flush_interval = flush_interval if flush_interval is not None else float(os.getenv('HEDERA_LOG_FLUSH_INTERVAL', '0.2'))
+        self.fsync = fsync or os.getenv('HEDERA_LOG_FSYNC', 'interval')
+        if self.fsync not in FSYNC_POLICIES:
+            raise ValueError(f"HEDERA_LOG_FSYNC must be one of {', '.join(FSYNC_POLICIES)}")
+        self.fsync_interval = fsync_interval if fsync_interval is not None else float(os.getenv('HEDERA_LOG_FSYNC_INTERVAL', '1.0'))
+
+        self._buffer: List[Tuple[str, bytes]] = []
+        self._pending: Dict[str, bytes] = {}
+        self._lock = threading.Lock()
+        self._io_lock = threading.Lock()
+        self._pid = None
+        self._segment = None
+        self._segment_fd = None
+        self._lock_fd = None
+        self._index = None
+        self._read_fds: Dict[int, int] = {}
+        self._last_fsync = 0.0
+        atexit.register(self.flush)
+
+    # ---- writing -------------------------------------------------------
+
+    def append(self, tx_hash: str, entry: Dict[str, Any]):
+        self._ensure_open()
+        line = (json.dumps(entry) + '\n').encode()
+        with self._lock:
+            self._buffer.append((tx_hash, line))
+            self._pending[tx_hash] = line
+            full = len(self._buffer) >= self.buffer_entries
+        if full:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            batch, self._buffer = self._buffer, []
+        if not batch or self._pid != os.getpid():
+            return
+        with self._io_lock:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_EX)
+            try:
+                self._write_batch(batch)
+            finally:
+                fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+        with self._lock:
+            for tx_hash, _ in batch:
+                self._pending.pop(tx_hash, None)
+
+    def _write_batch(self, batch: List[Tuple[str, bytes]]):
+        # Caller holds the directory lock
+        self._sync_segment()
+        offset = os.fstat(self._segment_fd).st_size
+        data = b''.join(line for _, line in batch)
+        view = memoryview(data)
+        while view:
+            written = os.write(self._segment_fd, view)
+            view = view[written:]
+
+        index = self._writable_index(len(batch))
+        for tx_hash, line in batch:
+            index.insert(bytes.fromhex(tx_hash[:32]), self._segment, offset, len(line))
+            offset += len(line)
+
+        now = time.monotonic()
+        if self.fsync == 'always' or (self.fsync == 'interval' and now - self._last_fsync >= self.fsync_interval):
+            os.fsync(self._segment_fd)
+            index.sync()
+            self._last_fsync = now
+        if offset >= self.segment_bytes:
+            self._open_segment(self._segment + 1)
+
+    # ---- reading -------------------------------------------------------
+
+    def get(self, tx_hash: str) -> Optional[Dict[str, Any]]:
+        """The logged entry for `tx_hash` (including unflushed ones), or None."""
+        with self._lock:
+            line = self._pending.get(tx_hash)
+        if line is not None:
+            return json.loads(line)
+        if not os.path.exists(os.path.join(self.directory, 'index.bin')):
+            return None
+        self._ensure_open()
+        with self._io_lock:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_SH)
+            try:
+                found = self._readable_index().find(bytes.fromhex(tx_hash[:32]))
+            finally:
+                fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+        if found is None:
+            return None
+        segment, offset, length = found
+        fd = self._read_fds.get(segment)
+        if fd is None:
+            fd = self._read_fds[segment] = os.open(self._segment_path(segment), os.O_RDONLY)
+        entry = json.loads(os.pread(fd, length, offset))
+        return entry if entry.get('tx_hash') == tx_hash else None
+
+    # ---- files ---------------------------------------------------------
+
+    def _ensure_open(self):
+        # File descriptors are per process; a forked worker opens its own
+        if self._pid == os.getpid():
+            return
+        with self._io_lock:
+            if self._pid == os.getpid():
+                return
+            os.makedirs(self.directory, exist_ok=True)
+            self._lock_fd = os.open(os.path.join(self.directory, 'HEAD'), os.O_RDWR | os.O_CREAT, 0o644)
+            self._segment = None
+            self._segment_fd = None
+            self._index = None
+            self._read_fds = {}
+            self._buffer, self._pending = [], {}
+            self._pid = os.getpid()
+            if self.flush_interval > 0:
+                threading.Thread(target=self._run_flusher, name="tx-log-flush", daemon=True).start()
+
+    def _run_flusher(self):
+        pid = os.getpid()
+        while self._pid == pid:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Transaction log flush failed: {e}", exc_info=True)
+
+    def _segment_path(self, segment: int) -> str:
+        return os.path.join(self.directory, f"segment-{segment:06d}.log")
+
+    def _sync_segment(self):
+        # HEAD holds the number of the segment currently being appended to
+        raw = os.pread(self._lock_fd, 16, 0).strip()
+        current = int(raw) if raw else 1
+        if current != self._segment or self._segment_fd is None:
+            self._open_segment(current)
+
+    def _open_segment(self, segment: int):
+        if self._segment_fd is not None:
+            os.close(self._segment_fd)
+        self._segment_fd = os.open(self._segment_path(segment), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        self._segment = segment
+        os.ftruncate(self._lock_fd, 0)
+        os.pwrite(self._lock_fd, str(segment).encode(), 0)
+
+    def _readable_index(self) -> '_HashIndex':
+        if self._index is None or self._index.retired():
+            self._index = _HashIndex.open(os.path.join(self.directory, 'index.bin'))
+        return self._index
+
+    def _writable_index(self, incoming: int) -> '_HashIndex':
+        path = os.path.join(self.directory, 'index.bin')
+        if not os.path.exists(path):
+            _HashIndex.create(path, 1024)
+        index = self._readable_index()
+        index.refresh()  # other processes may have inserted since we last looked
+        if index.entry_count + incoming > index.slot_count * INDEX_MAX_LOAD:
+            self._index = index = index.grow(incoming)
+        return index
+
+
+class _HashIndex:
+    def __init__(self, path: str, mapping: mmap.mmap):
+        self.path = path
+        self.map = mapping
+        _, self.slot_count, self.entry_count, _ = INDEX_HEADER.unpack_from(mapping, 0)
+        self.mask = self.slot_count - 1
+
+    @classmethod
+    def create(cls, path: str, slot_count: int, entries=()) -> '_HashIndex':
+        tmp_path = f"{path}.tmp.{os.getpid()}"
+        with open(tmp_path, 'wb') as f:
+            f.truncate(INDEX_HEADER.size + slot_count * INDEX_SLOT.size)
+        index = cls.open(tmp_path)
+        INDEX_HEADER.pack_into(index.map, 0, INDEX_MAGIC, slot_count, 0, 0)
+        index.slot_count, index.mask = slot_count, slot_count - 1
+        for key, segment, offset, length in entries:
+            index.insert(key, segment, offset, length)
+        index.map.flush()
+        os.replace(tmp_path, path)
+        index.path = path
+        return index
+
+    @classmethod
+    def open(cls, path: str) -> '_HashIndex':
+        with open(path, 'r+b') as f:
+            return cls(path, mmap.mmap(f.fileno(), 0))
+
+    def refresh(self):
+        self.entry_count = INDEX_HEADER.unpack_from(self.map, 0)[2]
+
+    def retired(self) -> bool:
+        return INDEX_HEADER.unpack_from(self.map, 0)[3] != 0
+
+    def find(self, key: bytes) -> Optional[Tuple[int, int, int]]:
+        slot = _slot_for(key, self.slot_count)
+        while True:
+            stored, segment, offset, length = INDEX_SLOT.unpack_from(self.map, INDEX_HEADER.size + slot * INDEX_SLOT.size)
+            if not segment:
+                return None
+            if stored == key:
+                return segment - 1, offset, length
+            slot = (slot + 1) & self.mask
+
+    def insert(self, key: bytes, segment: int, offset: int, length: int):
+        slot = _slot_for(key, self.slot_count)
+        while True:
+            position = INDEX_HEADER.size + slot * INDEX_SLOT.size
+            stored, used, _, _ = INDEX_SLOT.unpack_from(self.map, position)
+            if not used or stored == key:
+                break
+            slot = (slot + 1) & self.mask
+        INDEX_SLOT.pack_into(self.map, position, key, segment + 1, offset, length)
+        if not used:
+            self.entry_count += 1
+            struct.pack_into('<Q', self.map, 16, self.entry_count)
+
+    def entries(self):
+        for slot in range(self.slot_count):
+            key, segment, offset, length = INDEX_SLOT.unpack_from(self.map, INDEX_HEADER.size + slot * INDEX_SLOT.size)
+            if segment:
+                yield key, segment - 1, offset, length
+
+    def grow(self, incoming: int) -> '_HashIndex':
+        slot_count = self.slot_count * 2
+        while (self.entry_count + incoming) > slot_count * INDEX_MAX_LOAD:
+            slot_count *= 2
+        grown = _HashIndex.create(self.path, slot_count, self.entries())
+        struct.pack_into('<Q', self.map, 24, 1)  # tell other processes to remap
+        return grown
+
+    def sync(self):
+        self.map.flush()
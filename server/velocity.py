@@ -0,0 +1,175 @@
+# server/velocity.py
+import os
+import math
+import time
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+
+# Sliding windows every address is counted over
+WINDOWS = (('1m', 60.0), ('10m', 600.0), ('1h', 3600.0))
+# Counterparties are hashed into a 128-bit bitmap per bucket (linear counting): a few percent
+# error up to a few hundred distinct counterparties, saturating around BITS * ln(BITS)
+BITS = 128
+SATURATED = round(BITS * math.log(BITS))
+# Per slot and window: bucket start, count, previous count, value, previous value ...
+_FLOATS = 5
+# ... and the current and previous bitmaps, two 64-bit words each
+_WORDS = 4
+# Slots recycled per update at most, so eviction never costs more than a constant
+_EVICT_PER_UPDATE = 2
+# (float offset, word offset, width) of each window within a slot
+_LAYOUT = tuple((w * _FLOATS, w * _WORDS, width) for w, (_, width) in enumerate(WINDOWS))
+_SLOT_FLOATS, _SLOT_WORDS = len(WINDOWS) * _FLOATS, len(WINDOWS) * _WORDS
+
+
+def distinct_estimate(ones: int) -> float:
+    zeros = BITS - ones
+    return SATURATED if zeros == 0 else -BITS * math.log(zeros / BITS)
+
+
+def band(value: float) -> int:
+    """Order of magnitude of a counter, 0 below 4, so small everyday numbers do not split cache keys."""
+    return 0 if value < 4 else int(math.log2(value))
+
+
+class _Table:
+    """
+    Sliding-window counters for one direction (senders' outbound or recipients'
+    inbound traffic), in flat arrays indexed by slot; addresses map to slots through
+    an LRU ordered by last update.
+
+    Each window is a ring of two aligned buckets, the current one and the one before.
+    A read weighs the previous bucket by the share of it still inside the window,
+    which is exact for evenly spread traffic and O(1) for both updates and reads.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.idle_after = max(width for _, width in WINDOWS) * 2
+        self.slots: "OrderedDict[str, int]" = OrderedDict()
+        self.free = []
+        self.floats = array('d')
+        self.words = array('Q')
+        self.last = array('d')
+        self.evicted = 0
+        self.lock = threading.Lock()
+
+    def update(self, address: str, counterparty: str, value: float, now: float):
+        bit = hash(counterparty) % BITS
+        word, mask = bit >> 6, 1 << (bit & 63)
+        with self.lock:
+            slot = self.slots.get(address)
+            if slot is None:
+                slot = self._allocate(address, now)
+            else:
+                self.slots.move_to_end(address)
+            self.last[slot] = now
+            floats, words = self.floats, self.words
+            slot_f, slot_b = slot * _SLOT_FLOATS, slot * _SLOT_WORDS
+            for f, b, width in _LAYOUT:
+                f += slot_f
+                b += slot_b
+                start = now - now % width
+                if floats[f] != start:
+                    if start - floats[f] == width:
+                        floats[f + 2], floats[f + 4] = floats[f + 1], floats[f + 3]
+                        words[b + 2], words[b + 3] = words[b], words[b + 1]
+                    else:
+                        floats[f + 2] = floats[f + 4] = 0.0
+                        words[b + 2] = words[b + 3] = 0
+                    floats[f], floats[f + 1], floats[f + 3] = start, 0.0, 0.0
+                    words[b] = words[b + 1] = 0
+                floats[f + 1] += 1
+                floats[f + 3] += value
+                words[b + word] |= mask
+
+    def _allocate(self, address: str, now: float) -> int:
+        # Addresses idle for two of the longest windows hold nothing; when full, the least recently updated goes
+        for _ in range(_EVICT_PER_UPDATE):
+            if not self.slots:
+                break
+            oldest = next(iter(self.slots))
+            if len(self.slots) < self.capacity and now - self.last[self.slots[oldest]] < self.idle_after:
+                break
+            self.free.append(self.slots.pop(oldest))
+            self.evicted += 1
+        if self.free:
+            slot = self.free.pop()
+        else:
+            slot = len(self.last)
+            self.last.append(0.0)
+            self.floats.extend([0.0] * _SLOT_FLOATS)
+            self.words.extend([0] * _SLOT_WORDS)
+        for f, _, _ in _LAYOUT:
+            # A bucket that started at -inf reads as empty: both buckets are cleared on first update
+            self.floats[slot * _SLOT_FLOATS + f] = -math.inf
+        self.slots[address] = slot
+        return slot
+
+    def read(self, address: str, now: float) -> Dict[str, Dict[str, float]]:
+        with self.lock:
+            slot = self.slots.get(address)
+            if slot is None:
+                return {name: {'count': 0, 'value': 0.0, 'counterparties': 0} for name, _ in WINDOWS}
+            found = {}
+            for (name, _), (f, b, width) in zip(WINDOWS, _LAYOUT):
+                f += slot * _SLOT_FLOATS
+                b += slot * _SLOT_WORDS
+                start = now - now % width
+                count, previous_count, value, previous_value = (self.floats[f + 1], self.floats[f + 2],
+                                                                self.floats[f + 3], self.floats[f + 4])
+                current_bits, previous_bits = self.words[b:b + 2], self.words[b + 2:b + 4]
+                if self.floats[f] != start:
+                    # Nothing recorded in this bucket yet: the stored current bucket is now the previous one, or gone
+                    recent = start - self.floats[f] == width
+                    previous_count, previous_value = (count, value) if recent else (0.0, 0.0)
+                    previous_bits = current_bits if recent else (0, 0)
+                    count, value, current_bits = 0.0, 0.0, (0, 0)
+                weight = 1 - (now - start) / width
+                distinct = distinct_estimate(current_bits[0].bit_count() + current_bits[1].bit_count())
+                union = distinct_estimate((current_bits[0] | previous_bits[0]).bit_count() +
+                                          (current_bits[1] | previous_bits[1]).bit_count())
+                found[name] = {'count': round(count + previous_count * weight),
+                               'value': round(value + previous_value * weight, 6),
+                               'counterparties': round(distinct + (union - distinct) * weight)}
+            return found
+
+
+class VelocityTracker:
+    """
+    Per-address activity over the last minute, ten minutes and hour: transaction
+    count, summed value and distinct counterparties, kept separately for what an
+    address sends (fan-out) and what it receives (fan-in). Memory is bounded by
+    `max_addresses` per direction (about 450 bytes each, key included); addresses
+    idle for longer than two hours, or the least recently active once full, are
+    evicted. Updates and reads cost the same whatever the traffic.
+    """
+
+    def __init__(self, max_addresses: Optional[int] = None):
+        capacity = max_addresses or int(os.getenv('VELOCITY_MAX_ADDRESSES', '100000'))
+        self.outbound = _Table(capacity)
+        self.inbound = _Table(capacity)
+
+    def record(self, from_address: Any, to_address: Any, value: float = 0.0, now: Optional[float] = None):
+        now = now or time.time()
+        # The transaction still counts; a NaN or inf value would stay in its slot's sums for good
+        value = value if math.isfinite(value) else 0.0
+        sender = from_address.lower() if isinstance(from_address, str) and from_address else None
+        recipient = to_address.lower() if isinstance(to_address, str) and to_address else None
+        if sender:
+            self.outbound.update(sender, recipient or '', value, now)
+        if recipient:
+            self.inbound.update(recipient, sender or '', value, now)
+
+    def features(self, from_address: Any, to_address: Any, now: Optional[float] = None) -> Dict[str, Any]:
+        """{'sender': {window: {count, value, counterparties}}, 'recipient': {...}} before this transaction."""
+        now = now or time.time()
+        sender = from_address.lower() if isinstance(from_address, str) else ''
+        recipient = to_address.lower() if isinstance(to_address, str) else ''
+        return {'sender': self.outbound.read(sender, now), 'recipient': self.inbound.read(recipient, now)}
+
+    def stats(self) -> Dict[str, Any]:
+        return {direction: {'addresses': len(table.slots), 'evicted': table.evicted, 'capacity': table.capacity}
+                for direction, table in (('outbound', self.outbound), ('inbound', self.inbound))}
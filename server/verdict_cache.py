@@ -0,0 +1,193 @@
+# server/verdict_cache.py
+import os
+import copy
+import json
+import math
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Iterable, List
+
+from .shared_cache import SharedCache
+
+DEFAULT_FIELDS = ['chain', 'to_address', 'from_address', 'value_bucket', 'selector']
+
+
+def value_bucket(value: Any) -> str:
+    """Buckets a transaction value by order of magnitude so 1.01 and 1.02 share a verdict."""
+    try:
+        value = float(value)
+    except (TypeError, ValueError, OverflowError):
+        return 'nan'
+    if value <= 0 or math.isnan(value):
+        return '0'
+    if math.isinf(value):
+        return 'inf'
+    return f"e{math.floor(math.log10(value))}"
+
+
+def calldata_selector(data: Any) -> str:
+    """The 4-byte function selector of the calldata, or '' for plain transfers."""
+    if not isinstance(data, str) or len(data) < 10 or data[:2].lower() != '0x':
+        return ''
+    return data[:10].lower()
+
+
+def fingerprint(tx: Dict[str, Any], fields: Iterable[str] = DEFAULT_FIELDS) -> str:
+    """Canonical cache key of a transaction restricted to `fields`."""
+    parts = []
+    for field in fields:
+        if field == 'value_bucket':
+            parts.append(value_bucket(tx.get('value')))
+        elif field == 'selector':
+            parts.append(calldata_selector(tx.get('data')))
+        else:
+            value = tx.get(field)
+            parts.append(value.lower() if isinstance(value, str) else json.dumps(value, default=str))
+    return hashlib.sha1('|'.join(parts).encode()).hexdigest()
+
+
+class VerdictCache:
+    """
+    Bounded, thread-safe LRU of analysis verdicts with a TTL per entry. Upstream
+    errors are cached under a much shorter TTL (negative caching) so a failing
+    upstream is not hammered, but recovers quickly once it is healthy again.
+    Entries are indexed by address so they can be dropped when the blocklist changes.
+
+    With a SharedCache (SHARED_CACHE_PATH / SHARED_CACHE_REMOTE) the LRU is the
+    first of several tiers: a local miss reads through to the host-wide table, and
+    every verdict and invalidation is written through, so one worker's analysis is
+    a hit for all of them. Local entries remember the shared generations they were
+    stored under and are dropped once another worker invalidates their addresses.
+    """
+
+    def __init__(self, max_size: Optional[int] = None, ttl: Optional[float] = None,
+                 negative_ttl: Optional[float] = None, fields: Optional[List[str]] = None,
+                 shared: Optional[SharedCache] = None):
+        self.max_size = max_size if max_size is not None else int(os.getenv('VERDICT_CACHE_SIZE', '10000'))
+        self.ttl = ttl if ttl is not None else float(os.getenv('VERDICT_CACHE_TTL', '300'))
+        self.negative_ttl = negative_ttl if negative_ttl is not None else float(os.getenv('VERDICT_CACHE_NEGATIVE_TTL', '5'))
+        env_fields = os.getenv('VERDICT_CACHE_FIELDS')
+        self.fields = fields or ([f.strip() for f in env_fields.split(',') if f.strip()] if env_fields else DEFAULT_FIELDS)
+        self.shared = shared if shared is not None else SharedCache.from_env()
+
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._by_address: Dict[str, set] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.negative_hits = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.shared_hits = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0
+
+    def key_for(self, tx: Dict[str, Any]) -> str:
+        return fingerprint(tx, self.fields)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, verdict, negative, _, stamp = entry
+                if expires_at > time.monotonic() and (self.shared is None or self.shared.valid(stamp)):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    if negative:
+                        self.negative_hits += 1
+                    return copy.deepcopy(verdict)
+                self._remove(key)
+        found = self.shared.get('v:' + key) if self.shared is not None else None
+        if found is None:
+            with self._lock:
+                self.misses += 1
+            return None
+        value, expires, negative, stamp = found
+        payload = json.loads(value)
+        verdict = payload['verdict']
+        self._store(key, (time.monotonic() + expires - time.time(), verdict, negative, tuple(payload['addresses']), stamp))
+        with self._lock:
+            self.hits += 1
+            self.shared_hits += 1
+            if negative:
+                self.negative_hits += 1
+        return copy.deepcopy(verdict)
+
+    def put(self, key: str, verdict: Dict[str, Any], addresses: Iterable[str] = (), negative: bool = False):
+        if not self.enabled:
+            return
+        ttl = self.negative_ttl if negative else self.ttl
+        if ttl <= 0:
+            return
+        addresses = tuple(a.lower() for a in addresses if isinstance(a, str) and a)
+        stamp = None
+        if self.shared is not None:
+            payload = json.dumps({'verdict': verdict, 'addresses': addresses}, default=str).encode()
+            stamp = self.shared.put('v:' + key, payload, ttl, addresses, negative)
+        self._store(key, (time.monotonic() + ttl, copy.deepcopy(verdict), negative, addresses, stamp))
+
+    def _store(self, key: str, entry: tuple):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            for address in entry[3]:
+                self._by_address.setdefault(address, set()).add(key)
+            while len(self._entries) > self.max_size:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def invalidate_address(self, address: str) -> int:
+        """Drops every verdict involving `address`; returns how many were removed."""
+        with self._lock:
+            keys = self._by_address.pop(address.lower(), set())
+            for key in list(keys):
+                self._remove(key)
+            self.invalidations += len(keys)
+        if self.shared is not None:
+            self.shared.invalidate_address(address)
+        return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+            self._by_address.clear()
+        if self.shared is not None:
+            self.shared.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            size = len(self._entries)
+        lookups = self.hits + self.misses
+        return {
+            'size': size,
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'negative_hits': self.negative_hits,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            'shared_hits': self.shared_hits,
+            'shared': self.shared.stats() if self.shared is not None else None,
+        }
+
+    def _remove(self, key: str):
+        # Caller holds the lock
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for address in entry[3]:
+            keys = self._by_address.get(address)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_address[address]
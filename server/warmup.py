@@ -0,0 +1,76 @@
+# server/warmup.py
+import os
+import time
+import logging
+import threading
+from typing import Dict, Any, Callable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+PENDING, RUNNING, DONE, FAILED = 'pending', 'running', 'done', 'failed'
+
+
+class Warmup:
+    """
+    Named warm-up steps (build clients, map the blocklist, load the model, open
+    connection pools) run once per process, in order, on a background thread.
+    A step may return a dict of details for the readiness report.
+
+    Steps are idempotent: after a fork the worker runs them again, and whatever the
+    preloading master already built is reused, so only per-process work (pools,
+    threads) is repeated.
+    """
+
+    def __init__(self, steps: Optional[List[Tuple[str, Callable[[], Optional[Dict[str, Any]]]]]] = None):
+        self.steps = list(steps or [])
+        self._status: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._pid = None
+        self._finished = threading.Event()
+
+    def add(self, name: str, fn: Callable[[], Optional[Dict[str, Any]]]):
+        self.steps.append((name, fn))
+
+    def start(self, wait: bool = False):
+        """Starts the steps in this process unless already started; `wait` runs them inline."""
+        pid = os.getpid()
+        if self._pid != pid:
+            with self._lock:
+                if self._pid != pid:
+                    self._pid = pid
+                    self._finished = threading.Event()
+                    self._status = {name: {'state': PENDING} for name, _ in self.steps}
+                    if wait:
+                        self._run()
+                    else:
+                        threading.Thread(target=self._run, name="warmup", daemon=True).start()
+        if wait:
+            self._finished.wait()
+
+    def _run(self):
+        started = time.perf_counter()
+        for name, fn in self.steps:
+            self._status[name] = {'state': RUNNING}
+            step_started = time.perf_counter()
+            try:
+                details = fn() or {}
+                self._status[name] = {'state': DONE, **details}
+            except Exception as e:
+                logger.error(f"Warm-up step '{name}' failed: {e}")
+                self._status[name] = {'state': FAILED, 'error': str(e)}
+            self._status[name]['elapsed_ms'] = round((time.perf_counter() - step_started) * 1000, 2)
+        logger.info(f"Warm-up finished in {time.perf_counter() - started:.2f}s")
+        self._finished.set()
+
+    def ready(self) -> bool:
+        return self._pid == os.getpid() and self._finished.is_set() and \
+            all(step['state'] == DONE for step in self._status.values())
+
+    def status(self) -> Dict[str, Any]:
+        started = self._pid == os.getpid()
+        return {
+            'ready': self.ready(),
+            'pid': os.getpid(),
+            'steps': {name: dict(self._status.get(name, {'state': PENDING})) if started else {'state': PENDING}
+                      for name, _ in self.steps},
+        }
@@ -0,0 +1,23 @@
+import threading
+
+
+class FakeHedera:
+    def __init__(self):
+        self.messages = []
+
+    def submit_message_to_topic(self, message):
+        self.messages.append(message)
+        return {"success": True, "transaction_id": "fake"}
+
+
+class FakeComput3:
+    def __init__(self):
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def analyze_transaction(self, arguments, deadline=None):
+        with self.lock:
+            self.calls += 1
+        if arguments.get("to_address") == "0xboom":
+            raise RuntimeError("upstream exploded")
+        return {"risk_score": 0.9 if arguments.get("value", 0) > 1000 else 0.1}
@@ -0,0 +1,58 @@
+import os
+import random
+
+from server.address_index import AddressIndex, build_index, _IndexView
+
+
+def random_address(rng):
+    return "0x" + "".join(rng.choice("0123456789abcdef") for _ in range(40))
+
+
+def test_in_memory_index_membership():
+    rng = random.Random(7)
+    listed = [random_address(rng) for _ in range(500)]
+    view = _IndexView(build_index(((a, "feed", "phishing", 0) for a in listed), bloom=True))
+    assert all(view.lookup(a) for a in listed)
+    assert not any(view.lookup(random_address(rng)) for _ in range(500))
+
+
+def test_file_index_metadata_and_hot_reload(tmp_path):
+    source = tmp_path / "blocklist.csv"
+    source.write_text(
+        "# address,source,category,added\n"
+        "0xAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAA,chainabuse,drainer,2024-03-01\n"
+        "0.0.4242,hashscan,impersonation\n"
+    )
+    index = AddressIndex(source_path=str(source), check_interval=0, bloom=True,
+                         seed=["0x000000000000000000000000000000000000dead"])
+    reloads = []
+    index.on_reload(lambda: reloads.append(True))
+
+    assert os.path.exists(f"{source}.idx")
+    assert index.lookup("0xaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaa") == {
+        "source": "chainabuse", "category": "drainer", "added": "2024-03-01"}
+    assert index.lookup("0.0.4242")["category"] == "impersonation"
+    assert "0x000000000000000000000000000000000000dead" in index
+    assert "0xbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbb" not in index
+
+    source.write_text("0xbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbb,manual\n")
+    assert "0xbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbb" in index
+    assert "0xaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaa" not in index
+    assert reloads == [True]
+
+    # Another worker opening the same source maps the already compiled file (seed included)
+    assert len(AddressIndex(source_path=str(source), check_interval=60)) == 2
+
+    # A source that fails to parse leaves the current index serving
+    source.write_bytes(b"0xcccccccccccccccccccccccccccccccccccccccc,\xff\xfe\n")
+    assert "0xbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbb" in index
+    assert "0xcccccccccccccccccccccccccccccccccccccccc" not in index
+    assert reloads == [True]
+
+
+def test_runtime_overrides():
+    index = AddressIndex(seed=["0x000000000000000000000000000000000000dead"])
+    index.add("0xCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCC")
+    index.remove("0x000000000000000000000000000000000000dead")
+    assert "0xcccccccccccccccccccccccccccccccccccccccc" in index
+    assert "0x000000000000000000000000000000000000dead" not in index
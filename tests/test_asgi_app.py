@@ -0,0 +1,75 @@
+import asyncio
+import importlib
+import json
+
+import httpx
+
+
+def load_app(monkeypatch, tmp_path):
+    monkeypatch.setenv("COMPUT3_API_KEY", "test-key")
+    monkeypatch.setenv("AUDIT_SPILL_PATH", str(tmp_path / "spill.jsonl"))
+    monkeypatch.setenv("VERDICT_CACHE_SIZE", "0")
+    return importlib.import_module("server.asgi_app").AsyncMCPServer()
+
+
+def fake_comput3(request):
+    body = json.loads(request.content)
+    return httpx.Response(200, json={"result": {"risk_score": 0.9 if body["to"] == "0xrisky" else 0.2}})
+
+
+async def call(server, method, path, payload=None):
+    transport = httpx.ASGITransport(app=server)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        return await client.request(method, path, json=payload)
+
+
+def test_async_routes(monkeypatch, tmp_path):
+    server = load_app(monkeypatch, tmp_path)
+    server.comput3_client.client = httpx.AsyncClient(transport=httpx.MockTransport(fake_comput3))
+
+    async def scenario():
+        health = await call(server, "GET", "/")
+        tools = await call(server, "GET", "/tools")
+        risky, safe, scam = await asyncio.gather(*(
+            call(server, "POST", "/invoke", {"tool": "analyze_transaction_risk",
+                                             "arguments": {"chain": "ethereum", "to_address": to, "value": 1}})
+            for to in ("0xrisky", "0xsafe", "0x000000000000000000000000000000000000dead")))
+        scan = await call(server, "POST", "/api/scan/transaction", {"foo": "bar"})
+        missing = await call(server, "POST", "/invoke", {"tool": "nope"})
+        return health, tools, risky, safe, scam, scan, missing
+
+    health, tools, risky, safe, scam, scan, missing = asyncio.run(scenario())
+    assert health.json()["status"] == "AyaSentinel MCP Tool is running"
+    assert len(tools.json()) == 6
+    assert risky.json()["result"]["risk_level"] == "HIGH"
+    assert safe.json()["result"]["risk_level"] == "LOW"
+    assert scam.json()["result"]["risk_level"] == "CRITICAL"
+    assert scan.status_code == 202 and scan.json()["status"] == "pending"
+    assert missing.status_code == 404
+    server.audit_queue.close()
+
+
+def test_async_batch_and_verify_routes(monkeypatch, tmp_path):
+    server = load_app(monkeypatch, tmp_path)
+    server.comput3_client.client = httpx.AsyncClient(transport=httpx.MockTransport(fake_comput3))
+
+    async def scenario():
+        batch = await call(server, "POST", "/invoke/batch", {
+            "tool": "analyze_transaction_risk",
+            "arguments": [{"chain": "ethereum", "to_address": to, "value": 1} for to in ("0xrisky", "0xsafe")] + ["nope"]})
+        wrong_tool = await call(server, "POST", "/invoke/batch", {"tool": "nope", "arguments": []})
+        scores = await call(server, "POST", "/api/score/batch",
+                            {"transactions": [{"chain": "ethereum", "to_address": "0xsafe", "value": 1}]})
+        bad_scores = await call(server, "POST", "/api/score/batch", {"transactions": ["nope"]})
+        verify = await call(server, "GET", "/api/verify/abc")
+        return batch, wrong_tool, scores, bad_scores, verify
+
+    batch, wrong_tool, scores, bad_scores, verify = asyncio.run(scenario())
+    results = batch.json()["results"]
+    assert [r["result"]["risk_level"] for r in results[:2]] == ["HIGH", "LOW"] and "error" in results[2]
+    assert wrong_tool.status_code == 400
+    assert scores.status_code == 200 and len(scores.json()["scores"]) == 1
+    assert bad_scores.status_code == 400
+    # Merkle batching is off in the test environment, as it is for the Flask route
+    assert verify.status_code == 400 and "error" in verify.json()
+    server.audit_queue.close()
@@ -0,0 +1,105 @@
+import threading
+
+from server.audit_queue import AuditQueue
+
+
+def wait_for(queue, audit_id, status, timeout=2.0):
+    event = threading.Event()
+    for _ in range(int(timeout / 0.01)):
+        current = queue.status(audit_id)
+        if current and current["status"] == status:
+            return current
+        event.wait(0.01)
+    raise AssertionError(f"{audit_id} never reached {status}: {queue.status(audit_id)}")
+
+
+def test_submit_returns_immediately_and_completes_in_background(tmp_path):
+    release = threading.Event()
+
+    def slow_submit(message):
+        release.wait(2)
+        return {"success": True, "transaction_id": f"tx-{message}"}
+
+    queue = AuditQueue(slow_submit, workers=1, spill_path=str(tmp_path / "spill.jsonl"))
+    audit_id = queue.submit("abc")
+    assert queue.status(audit_id)["status"] == "pending"
+    release.set()
+    assert wait_for(queue, audit_id, "submitted")["result"]["transaction_id"] == "tx-abc"
+    queue.close()
+
+
+def test_drop_oldest_policy(tmp_path):
+    release = threading.Event()
+    queue = AuditQueue(lambda m: release.wait(2) and {"success": True}, max_size=1, workers=1,
+                       policy="drop_oldest", spill_path=str(tmp_path / "spill.jsonl"))
+    queue.submit("in-flight")
+    wait_for(queue, queue.submit("second"), "pending")  # worker is busy with the first one
+    first_queued = queue.submit("third")
+    assert queue.stats()["dropped"] >= 1
+    release.set()
+    wait_for(queue, first_queued, "submitted")
+    queue.close()
+
+
+def test_spill_and_reingest(tmp_path):
+    spill = tmp_path / "spill.jsonl"
+    seen = []
+    release = threading.Event()
+
+    def submit(message):
+        release.wait(2)
+        seen.append(message)
+        return {"success": True}
+
+    queue = AuditQueue(submit, max_size=1, workers=1, policy="spill", spill_path=str(spill))
+    ids = [queue.submit(str(i)) for i in range(5)]
+    assert any(queue.status(i)["status"] == "spilled" for i in ids)
+    assert spill.read_text()
+    # A torn line (a worker that crashed mid-append) ahead of the spilled messages is skipped,
+    # not fatal to the audit thread that reads it
+    spill.write_text('{"audit_id": "torn", "mess\n' + spill.read_text())
+    release.set()
+    for audit_id in ids:
+        wait_for(queue, audit_id, "submitted")
+    assert sorted(seen) == ["0", "1", "2", "3", "4"]
+    queue.close()
+
+
+def test_failures_are_recorded(tmp_path):
+    def broken(message):
+        raise RuntimeError("ledger down")
+
+    queue = AuditQueue(broken, workers=1, spill_path=str(tmp_path / "spill.jsonl"))
+    assert wait_for(queue, queue.submit("x"), "failed")["result"]["error"] == "ledger down"
+    queue.close()
+
+
+def test_status_is_shared_by_workers_on_one_spill_file(tmp_path):
+    spill = tmp_path / "spill.jsonl"
+    started, release = threading.Event(), threading.Event()
+
+    def stuck(message):
+        started.set()
+        release.wait(5)
+        return {"success": True}
+
+    busy = AuditQueue(stuck, max_size=1, workers=1, spill_path=str(spill))
+    busy.submit("in-flight")
+    started.wait(2)
+    wait_for(busy, busy.submit("queued"), "pending")
+    spilled = busy.submit("spilled")
+    assert busy.status(spilled)["status"] == "spilled"
+
+    # Another worker on the same spill file takes the message over and submits it
+    seen = []
+    other = AuditQueue(lambda m: seen.append(m) or {"success": True, "transaction_id": "tx"}, workers=1,
+                       spill_path=str(spill))
+    own = other.submit("own")
+    assert wait_for(busy, spilled, "submitted")["result"]["transaction_id"] == "tx"
+    wait_for(other, own, "submitted")
+    assert sorted(seen) == ["own", "spilled"] and other.stats()["spilled"] == 0
+    release.set()
+    busy.close()
+    other.close()
+    # The first worker's stale 'spilled' is written out on close, but does not replace the newer status
+    assert other.status(spilled)["status"] == "submitted"
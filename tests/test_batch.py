@@ -0,0 +1,36 @@
+from server.scam_detector import ScamDetector
+from tests.fakes import FakeHedera, FakeComput3
+
+
+def test_batch_preserves_order_and_dedupes():
+    comput3 = FakeComput3()
+    detector = ScamDetector(FakeHedera(), comput3, max_workers=4)
+    txs = [
+        {"chain": "ethereum", "to_address": "0xabc", "value": 1},
+        {"chain": "ethereum", "to_address": "0x000000000000000000000000000000000000dead", "value": 5},
+        {"chain": "ethereum", "to_address": "0xabc", "value": 1},
+        {"chain": "ethereum", "to_address": "0xdef", "value": 5000},
+    ]
+    results = detector.analyze_batch(txs)
+
+    assert [item["index"] for item in results] == [0, 1, 2, 3]
+    assert results[0]["result"]["risk_level"] == "LOW"
+    assert results[1]["result"]["risk_level"] == "CRITICAL"
+    assert results[2]["result"] == results[0]["result"]
+    assert results[3]["result"]["risk_level"] == "HIGH"
+    # Duplicate and blocklisted transactions never reach Comput3
+    assert comput3.calls == 2
+
+
+def test_batch_reports_per_item_errors():
+    detector = ScamDetector(FakeHedera(), FakeComput3())
+    results = detector.analyze_batch([
+        "not-a-transaction",
+        {"chain": "ethereum", "to_address": "0xboom", "value": 1},
+        {"chain": "ethereum", "to_address": "0xok", "value": 1},
+    ])
+
+    assert "error" in results[0]
+    assert results[1]["error"] == "Analysis failed"
+    assert results[1]["details"]["details"]["error"] == "upstream exploded"
+    assert results[2]["result"]["risk_level"] == "LOW"
@@ -0,0 +1,144 @@
+import pytest
+
+from server.calldata import CalldataDecoder, SelectorIndex, parse_signature
+from server.calldata_rules import RuleSet
+from server.scam_detector import ScamDetector
+from server.verdict_cache import VerdictCache
+from tests.fakes import FakeHedera, FakeComput3
+
+SCAM = "0x000000000000000000000000000000000000dead"
+UNKNOWN = "0x8ba1f109551bd432803012645ac136ddd64dba72"
+UNISWAP_V2_ROUTER = "0x7a250d5630b4cf539739df2c5dacb4c659f2488d"
+USDC = "0xa0b86991c6218b36c1d19d4a2e9eb0ce3606eb48"
+MAX = 2 ** 256 - 1
+
+
+def word(value):
+    if isinstance(value, str):
+        value = int(value, 16)
+    return int(value).to_bytes(32, "big")
+
+
+def dynamic_bytes(raw):
+    return word(len(raw)) + raw + b"\0" * (-len(raw) % 32)
+
+
+def call(selector, *words):
+    return bytes.fromhex(selector) + b"".join(word(w) for w in words)
+
+
+def multicall(calls):
+    # multicall(bytes[]): offset, length, element offsets, elements
+    tails = [dynamic_bytes(c) for c in calls]
+    offsets, position = [], 32 * len(calls)
+    for tail in tails:
+        offsets.append(word(position))
+        position += len(tail)
+    return bytes.fromhex("ac9650d8") + word(32) + word(len(calls)) + b"".join(offsets) + b"".join(tails)
+
+
+def aggregate3(calls):
+    # aggregate3((address,bool,bytes)[]): each tuple is dynamic, so it sits behind its own offset
+    tuples = [word(target) + word(1) + word(96) + dynamic_bytes(data) for target, data in calls]
+    offsets, position = [], 32 * len(calls)
+    for encoded in tuples:
+        offsets.append(word(position))
+        position += len(encoded)
+    return bytes.fromhex("82ad56cb") + word(32) + word(len(calls)) + b"".join(offsets) + b"".join(tuples)
+
+
+def test_decoder_follows_multicalls_and_nested_tuples():
+    decoder = CalldataDecoder()
+    assert parse_signature("aggregate3((address,bool,bytes)[])")[1] == (
+        ("array", ("tuple", (("address",), ("bool",), ("bytes",))), None),)
+
+    approve = call("095ea7b3", UNKNOWN, MAX)
+    [only] = decoder.decode("0x" + approve.hex())
+    assert (only.function.name, only.role("spender"), only.role("amount"), only.depth) == ("approve", UNKNOWN, MAX, 0)
+
+    # Permit2 permit(owner, ((token, amount, expiration, nonce), spender, sigDeadline), signature)
+    permit2 = call("2b67b570", UNKNOWN, USDC, 2 ** 160 - 1, 0, 0, SCAM, 0, 256) + dynamic_bytes(b"\x01" * 65)
+    [permit] = decoder.decode("0x" + permit2.hex())
+    assert (permit.function.kind, permit.role("spender"), permit.role("amount")) == ("permit", SCAM, 2 ** 160 - 1)
+
+    nested = aggregate3([(USDC, approve), (UNKNOWN, multicall([call("a22cb465", SCAM, 1)]))])
+    calls = decoder.decode("0x" + nested.hex())
+    assert [(c.function.name, c.target, c.depth) for c in calls] == [
+        ("aggregate3", None, 0), ("approve", USDC, 1), ("multicall", UNKNOWN, 1), ("setApprovalForAll", UNKNOWN, 2)]
+
+    assert decoder.decode("0xdeadbeef" + "00" * 64) == ()     # unknown selector: not parsed at all
+    assert decoder.decode("0x095ea7b3" + "00" * 10) == ()     # truncated arguments
+    assert decoder.decode("0x" + multicall([approve]).hex()[:-64]) == ()
+
+
+def test_rules_compile_once_and_combine_hits():
+    decoder = CalldataDecoder()
+    with pytest.raises(ValueError):
+        RuleSet([{"id": "x", "kinds": ["approval"], "when": {"colour": "red"}, "score": 1}], decoder, "t")
+    with pytest.raises(ValueError):
+        RuleSet([{"id": "x", "kinds": ["teleport"], "score": 1}], decoder, "t")
+
+    rules = RuleSet.from_env()
+    classify = {SCAM: "blocklisted", UNISWAP_V2_ROUTER: "trusted"}.get
+    classify_or_unknown = lambda address: classify(address) or "unknown"  # noqa: E731
+    trusted, drainer, plain = rules.evaluate_batch([
+        {"data": "0x" + call("095ea7b3", UNISWAP_V2_ROUTER, MAX).hex()},
+        {"data": "0x" + multicall([call("a22cb465", UNKNOWN, 1), call("095ea7b3", UNKNOWN, MAX)]).hex()},
+        {"data": ""},
+    ], classify_or_unknown)
+    assert trusted == {"calls": ["approve"], "hits": [], "score": 0.0}
+    assert sorted(hit["rule"] for hit in drainer["hits"]) == [
+        "approval_inside_batch", "approval_inside_batch",
+        "operator_approval_to_unknown", "unlimited_allowance_to_unknown_spender"]
+    assert drainer["score"] == round(1 - 0.3 * 0.5 * 0.3 * 0.5, 4)
+    assert plain is None
+
+
+def test_detector_settles_drainer_calldata_without_comput3():
+    comput3 = FakeComput3()
+    detector = ScamDetector(FakeHedera(), comput3, cache=VerdictCache(max_size=100))
+    base = {"chain": "ethereum", "to_address": USDC, "from_address": UNKNOWN, "value": 0}
+    drainer = detector.analyze_transaction(
+        dict(base, data="0x" + multicall([call("a22cb465", "0x" + "ab" * 20, 1), call("095ea7b3", "0x" + "ab" * 20, MAX)]).hex()))
+    assert (drainer["risk_level"], drainer["details"]["stage"]) == ("HIGH", "rules")
+    assert drainer["details"]["spender"] == "0x" + "ab" * 20
+    theft = detector.analyze_transaction(dict(base, data="0x" + call("a9059cbb", SCAM, 10 ** 6).hex()))
+    assert (theft["risk_level"], theft["details"]["reason"]) == ("CRITICAL", "Tokens sent to a known scam address")
+    assert comput3.calls == 0
+
+    # Same token, sender and selector: only the spender differs, and so does the verdict
+    benign = detector.analyze_transaction(dict(base, data="0x" + call("095ea7b3", UNISWAP_V2_ROUTER, MAX).hex()))
+    risky = detector.analyze_transaction(dict(base, data="0x" + call("095ea7b3", "0x" + "cd" * 20, MAX).hex()))
+    assert "cached" not in risky["details"] and comput3.calls == 2
+    assert risky["risk_score"] > benign["risk_score"]
+    assert risky["details"]["calldata"]["hits"][0]["rule"] == "unlimited_allowance_to_unknown_spender"
+
+    scores = detector.score_local_batch([dict(base, data="0x" + call("095ea7b3", UNISWAP_V2_ROUTER, MAX).hex()),
+                                         dict(base, data="0x" + call("095ea7b3", "0x" + "cd" * 20, MAX).hex())])
+    assert scores[1] > scores[0]
+
+    # The cache key and the rules stage share one evaluation per request
+    evaluate, evaluations = detector.calldata_rules.evaluate, []
+    detector.calldata_rules.evaluate = lambda tx, classify: evaluations.append(tx) or evaluate(tx, classify)
+    fresh = detector.analyze_transaction(dict(base, from_address="0x" + "12" * 20,
+                                              data="0x" + call("095ea7b3", "0x" + "ef" * 20, MAX).hex()))
+    assert "cached" not in fresh["details"] and len(evaluations) == 1
+
+
+def test_aliased_offsets_are_rejected_instead_of_copied():
+    decoder = CalldataDecoder(memo_max_bytes=4096)
+    blob = dynamic_bytes(call("095ea7b3", UNKNOWN, MAX) + b"\0" * 8192)
+
+    # 1024 element offsets that all point at the same blob
+    aliased = bytes.fromhex("ac9650d8") + word(32) + word(1024) + word(32 * 1024) * 1024 + blob
+    assert decoder.decode("0x" + aliased.hex()) == ()
+    # Offsets that do advance, but by one word each, so every element still spans most of the blob
+    shifted = bytes.fromhex("ac9650d8") + word(32) + word(1024) + b"".join(
+        word(32 * 1024 + 32 * i) for i in range(1024)) + blob + b"\0" * 32 * 1024
+    assert decoder.decode("0x" + shifted.hex()) == ()
+    assert decoder._memo == {}                            # above memo_max_bytes: never remembered
+
+    # A standard encoding of the same calls still decodes, and small payloads are memoized
+    honest = multicall([call("095ea7b3", UNKNOWN, MAX)] * 4)
+    assert [c.function.name for c in decoder.decode("0x" + honest.hex())] == ["multicall"] + ["approve"] * 4
+    assert len(decoder._memo) == 1
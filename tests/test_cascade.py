@@ -0,0 +1,61 @@
+import pytest
+from server.verdict_cache import VerdictCache
+from server.scam_detector import ScamDetector
+from tests.fakes import FakeHedera, FakeComput3
+
+UNISWAP_V2_ROUTER = "0x7a250d5630b4cf539739df2c5dacb4c659f2488d"
+SCAM = "0x000000000000000000000000000000000000dead"
+USDC = "0xa0b86991c6218b36c1d19d4a2e9eb0ce3606eb48"
+
+
+def _detector(**kwargs):
+    comput3 = FakeComput3()
+    return ScamDetector(FakeHedera(), comput3, cache=VerdictCache(max_size=0), **kwargs), comput3
+
+
+def test_local_stages_settle_verdicts_before_comput3():
+    detector, comput3 = _detector()
+    trusted = detector.analyze_transaction({"chain": "ethereum", "to_address": UNISWAP_V2_ROUTER, "value": 10 ** 18})
+    drainer_approval = detector.analyze_transaction({
+        "chain": "ethereum", "to_address": USDC, "value": 0,
+        "data": "0x095ea7b3" + "00" * 12 + SCAM[2:] + "f" * 64})
+    empty = detector.analyze_transaction({"chain": "ethereum", "to_address": "0xabc", "value": 0})
+    remote = detector.analyze_transaction({"chain": "ethereum", "to_address": "0xabc", "value": 5})
+
+    assert (trusted["risk_level"], trusted["details"]["stage"]) == ("LOW", "allowlist")
+    assert trusted["details"]["allowlist"]["source"] == "uniswap"
+    assert (drainer_approval["risk_level"], drainer_approval["details"]["stage"]) == ("CRITICAL", "rules")
+    assert (empty["risk_level"], empty["details"]["stage"]) == ("LOW", "rules")
+    assert remote["details"]["stage"] == "remote"
+    assert comput3.calls == 1
+
+    stages = detector.stats()["stages"]
+    assert (stages["allowlist"]["evaluated"], stages["allowlist"]["resolved"], stages["allowlist"]["hit_rate"]) == (4, 1, 0.25)
+    assert stages["rules"]["resolved"] == 2
+    assert stages["remote"]["evaluated"] == 1
+    assert stages["remote"]["share_of_traffic"] == 0.25
+
+
+def test_stage_list_is_configurable(monkeypatch):
+    monkeypatch.setenv("ANALYSIS_STAGES", "blocklist,local_model")
+    detector, comput3 = _detector()
+    result = detector.analyze_transaction({"chain": "ethereum", "to_address": UNISWAP_V2_ROUTER, "value": 5})
+    assert result["details"]["stage"] == "local_model"
+    assert result["details"]["scored_by"] == "local"
+    assert comput3.calls == 0
+
+
+def test_confident_local_model_scores_skip_comput3(monkeypatch):
+    monkeypatch.setenv("LOCAL_MODEL_TRUST_ABOVE", "0.95")
+    detector, comput3 = _detector()
+    vanity = "0x0000000000000000" + "ab" * 12
+    result = detector.analyze_transaction({"chain": "ethereum", "to_address": vanity, "value": 1,
+                                           "data": "0x095ea7b3" + "00" * 12 + "cd" * 20 + "f" * 64})
+    assert (result["risk_level"], result["details"]["stage"]) == ("HIGH", "local_model")
+    assert comput3.calls == 0
+
+
+@pytest.mark.parametrize("stages", [["blocklist", "remote", "rules"], ["blocklist", "magic"]])
+def test_invalid_stage_lists_are_rejected(stages):
+    with pytest.raises(ValueError):
+        _detector(stages=stages)
@@ -0,0 +1,43 @@
+import random
+import asyncio
+
+import httpx
+import pytest
+
+from benchmarks.fake_upstream import FakeUpstream, parse_latency
+
+
+def request(app, method, path):
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://fake") as client:
+            return await client.request(method, path, json={} if method == "POST" else None)
+    return asyncio.run(scenario())
+
+
+def test_latency_specs_are_seeded_and_validated():
+    for spec in ("fixed:5", "uniform:1,3", "exponential:2", "lognormal:2,0.5"):
+        sample = parse_latency(spec)
+        first = [sample(random.Random(7)) for _ in range(3)]
+        assert first == [sample(random.Random(7)) for _ in range(3)]
+        assert all(s >= 0 for s in first)
+    assert parse_latency("fixed:5")(random.Random()) == 0.005
+    with pytest.raises(ValueError):
+        parse_latency("gaussian:5")
+
+
+def test_mirror_pages_follow_links_next():
+    app = FakeUpstream(latency="fixed:0", topic_messages=250)
+    path, seen = "/api/v1/topics/0.0.9000/messages?sequencenumber=gt:0&limit=100&order=asc", []
+    while path:
+        page = request(app, "GET", path).json()
+        seen.extend(m["sequence_number"] for m in page["messages"])
+        path = page["links"]["next"]
+    assert seen == list(range(1, 251))
+
+
+def test_injected_errors():
+    app = FakeUpstream(latency="fixed:0", error_rate=1.0, error_status=429, seed=1)
+    responses = [request(app, "POST", path) for path in ("/analysis/transaction", "/jobs")]
+    assert [r.status_code for r in responses] == [429, 429]
+    assert app.counters["errors"] == 2
@@ -0,0 +1,108 @@
+import json
+import threading
+
+from benchmarks.fake_hcs import FakeHcsNetwork
+from server.hcs_pipeline import HcsPipeline
+
+
+def collect():
+    results, lock = [], threading.Lock()
+
+    def callback(result):
+        with lock:
+            results.append(result)
+    return results, callback
+
+
+def test_pipelined_messages_are_confirmed_in_consensus_order(tmp_path):
+    network = FakeHcsNetwork(consensus_latency='fixed:200', seed=1)
+    pipeline = HcsPipeline(network, '0.0.1001', max_in_flight=64, receipt_interval=0.05)
+    results, callback = collect()
+    ids = [pipeline.submit(f"message-{i}", callback) for i in range(300)]
+    assert pipeline.flush(timeout=20)
+
+    assert len(results) == 300 and all(r['success'] for r in results)
+    by_id = {r['submission_id']: r for r in results}
+    # Every message reached the topic once, and each submission got the sequence number it was given there
+    assert sorted(network.messages) == sorted(f"message-{i}" for i in range(300))
+    for i, submission_id in enumerate(ids):
+        assert network.messages[by_id[submission_id]['sequence_number'] - 1] == f"message-{i}"
+        status = pipeline.status(submission_id)
+        assert status['status'] == 'confirmed' and status['result']['sequence_number'] == by_id[submission_id]['sequence_number']
+    # Receipts were asked for in bulk, not once per message
+    assert network.receipt_queries < 100
+    assert max(network.submits_per_node.values()) - min(network.submits_per_node.values()) <= 1
+    stats = pipeline.stats()
+    assert stats['confirmed'] == 300 and stats['in_flight'] == 0 and stats['failed'] == 0
+    pipeline.close()
+
+
+def test_failover_retries_the_same_transaction_id(tmp_path):
+    network = FakeHcsNetwork(consensus_latency='fixed:50', busy_rate=0.1, timeout_rate=0.2, seed=7)
+    network.down.add('0.0.3')
+    pipeline = HcsPipeline(network, '0.0.1001', max_in_flight=32, receipt_interval=0.05,
+                           node_cooldown=60, max_attempts=10)
+    results, callback = collect()
+    for i in range(200):
+        pipeline.submit(f"message-{i}", callback)
+    assert pipeline.flush(timeout=20)
+
+    assert len(results) == 200 and all(r['success'] for r in results)
+    # Timed-out attempts that did arrive were retried under their id: duplicates, never a second copy
+    assert len(network.messages) == 200 and len(set(network.messages)) == 200
+    assert network.duplicates > 0 and pipeline.counts['duplicates'] == network.duplicates
+    assert pipeline.counts['retried'] > 0 and pipeline.counts['resubmitted'] == 0
+    # The dead node was put aside, for longer after each failure, instead of being tried for every message
+    assert pipeline.node_failures['0.0.3'] <= 10
+    assert network.submits_per_node['0.0.3'] == 0
+    assert pipeline.stats()['nodes']['0.0.3']['cooling_down']
+    pipeline.close()
+
+
+
+def test_receipts_behind_the_mirror_lag_are_not_resubmitted():
+    # Consensus lands inside the validity window, but the receipt only shows up after it has passed
+    network = FakeHcsNetwork(consensus_latency='fixed:200', mirror_lag=0.5, seed=5)
+    pipeline = HcsPipeline(network, '0.0.1001', receipt_interval=0.05, valid_duration=0.3, mirror_lag=1.0)
+    results, callback = collect()
+    for i in range(50):
+        pipeline.submit(f"message-{i}", callback)
+    assert pipeline.flush(timeout=20)
+
+    assert len(results) == 50 and all(r['success'] for r in results)
+    assert pipeline.counts['resubmitted'] == 0
+    assert sorted(network.messages) == sorted(f"message-{i}" for i in range(50))
+    pipeline.close()
+
+def test_lost_transactions_are_resubmitted_and_client_reports_pending(monkeypatch, tmp_path):
+    network = FakeHcsNetwork(consensus_latency='fixed:20', lose_rate=0.2, max_message_bytes=64, seed=3)
+    pipeline = HcsPipeline(network, '0.0.1001', receipt_interval=0.05, valid_duration=0.3, max_attempts=10,
+                           mirror_lag=0)
+    results, callback = collect()
+    ids = [pipeline.submit(f"message-{i}", callback) for i in range(100)]
+    oversized = pipeline.submit("x" * 100, callback)
+    assert pipeline.flush(timeout=20)
+
+    assert pipeline.counts['resubmitted'] > 0
+    assert sorted(network.messages) == sorted(f"message-{i}" for i in range(100))
+    assert all(pipeline.status(i)['status'] == 'confirmed' for i in ids)
+    rejected = pipeline.status(oversized)
+    assert rejected['status'] == 'failed' and 'MESSAGE_SIZE_TOO_LARGE' in rejected['result']['error']
+    pipeline.close()
+
+    from server.hedera_client import HederaClient
+    for name, value in {"HEDERA_ACCOUNT_ID": "0.0.1001", "HEDERA_PRIVATE_KEY": "key", "HEDERA_TOPIC_ID": "0.0.2002",
+                        "ENVIRONMENT": "production", "HEDERA_SUBMIT_MODE": "pipelined",
+                        "HEDERA_MIRROR_DB": str(tmp_path / "mirror.db"), "HEDERA_RECEIPT_INTERVAL": "0.05"}.items():
+        monkeypatch.setenv(name, value)
+    monkeypatch.delenv("HEDERA_BATCH_MODE", raising=False)
+    network = FakeHcsNetwork(consensus_latency='fixed:20', max_message_bytes=4096)
+    client = HederaClient(network=network)
+    done, on_complete = collect()
+    answer = client.log_risk_analysis({"address": "0xabc", "risk": "HIGH"}, on_complete=on_complete)
+    assert answer["success"] and answer["status"] == "pending" and answer["transaction_id"].startswith("0.0.1001@")
+    assert client.pipeline.flush(timeout=10)
+    assert done[0]["sequence_number"] == 1 and done[0]["transaction_id"] == answer["transaction_id"]
+    assert client.submission_status(answer["submission_id"])["status"] == "confirmed"
+    assert json.loads(network.messages[0])["analysis"]["address"] == "0xabc"
+    client.pipeline.close()
@@ -0,0 +1,39 @@
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from server import http_session
+
+
+class FlakyHandler(BaseHTTPRequestHandler):
+    hits = 0
+
+    def do_GET(self):
+        FlakyHandler.hits += 1
+        status = 503 if FlakyHandler.hits == 1 else 200
+        self.send_response(status)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"ok")
+
+    def log_message(self, *args):
+        pass
+
+
+def test_session_is_shared_per_process(monkeypatch):
+    first = http_session.get_session()
+    assert http_session.get_session() is first
+    # Simulate a forked worker: a different pid must not reuse the parent's pool
+    monkeypatch.setattr(http_session, "_session_pid", -1)
+    assert http_session.get_session() is not first
+
+
+def test_idempotent_requests_are_retried():
+    server = HTTPServer(("127.0.0.1", 0), FlakyHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        session = http_session.build_session(backoff_factor=0)
+        response = session.get(f"http://127.0.0.1:{server.server_port}/", timeout=http_session.default_timeout(2))
+        assert response.status_code == 200
+        assert FlakyHandler.hits == 2
+    finally:
+        server.shutdown()
@@ -0,0 +1,107 @@
+import asyncio
+import random
+import time
+
+import numpy as np
+
+from server.interaction_graph import InteractionGraph
+from server.scam_detector import ScamDetector
+from server.verdict_cache import VerdictCache
+from tests.fakes import FakeHedera, FakeComput3
+from tests.test_asgi_app import load_app, call
+
+SCAM = "0x000000000000000000000000000000000000dead"
+
+
+def chain_graph(scams, **kwargs):
+    graph = InteractionGraph(is_scam=lambda address: address in scams, compact_interval=0, **kwargs)
+    for a, b in (("a", "s"), ("b", "a"), ("c", "b"), ("d", "c")):
+        graph.add_interaction(a, b)
+    return graph
+
+
+def test_distances_follow_edges_and_blocklist_additions():
+    scams = {"s"}
+    graph = chain_graph(scams)
+    assert [graph.hops_to_scam(node) for node in "sabcd"] == [0, 1, 2, 3, None]   # d is past max_hops
+    assert graph.path_to_scam("C") == ["c", "b", "a", "s"]
+
+    # A shortcut and a newly listed address only relax the nodes they bring closer
+    graph.add_interaction("d", "x")
+    scams.add("x")
+    graph.mark_scam("x")
+    assert [graph.hops_to_scam(node) for node in "abcdx"] == [1, 2, 2, 1, 0]
+
+    # Repeats refresh their edge instead of adding one
+    graph.add_interaction("s", "a")
+    assert graph.stats()["edges"] == 5
+
+    # Hubs are labelled but relay nothing
+    hubbed = chain_graph({"s"}, hub_degree=3)
+    for i in range(3):
+        hubbed.add_interaction("a", f"user-{i}")
+    hubbed.add_interaction("a", "late")
+    assert hubbed.hops_to_scam("a") == 1 and hubbed.hops_to_scam("late") is None
+    assert hubbed.describe("a")["hub"] is True
+
+
+def test_compaction_ages_evicts_and_matches_incremental_distances():
+    scams = {"s"}
+    graph = chain_graph(scams, max_edges=6)
+    graph.add_interaction("old", "s", seen=time.time() - 40 * 86400)
+    assert graph.hops_to_scam("old") == 1
+    scams.discard("s")
+    graph.rescan()
+    graph.compact()
+    assert graph.hops_to_scam("old") is None and graph.hops_to_scam("a") is None
+    assert graph.stats()["nodes"] == 5
+
+    for i in range(10):
+        graph.add_interaction(f"n{i}", f"n{i + 1}", seen=time.time() + i)
+    graph.compact()
+    assert graph.stats()["edges"] == 5                      # newest 90% of max_edges
+    assert graph.describe("a") is None and graph.describe("n5")["counterparties"] == 1
+
+    # Random traffic: the incremental distances equal a full recompute
+    rng = random.Random(3)
+    scams = {f"w{i}" for i in range(5)}
+    graph = InteractionGraph(is_scam=lambda address: address in scams, compact_interval=0, hub_degree=50)
+    for _ in range(3000):
+        graph.add_interaction(f"w{rng.randrange(400)}", f"w{rng.randrange(400)}")
+    incremental = {f"w{i}": graph.hops_to_scam(f"w{i}") for i in range(400)}
+    graph.compact()
+    assert incremental == {f"w{i}": graph.hops_to_scam(f"w{i}") for i in range(400)}
+
+    bulk = InteractionGraph(is_scam=lambda address: address == "w0", compact_interval=0)
+    bulk.load([f"w{i}" for i in range(4)], np.array([0, 1, 2, 3]), np.array([1, 2, 3, 3]))
+    assert [bulk.hops_to_scam(f"w{i}") for i in range(4)] == [0, 1, 2, 3]
+
+
+def test_detector_scores_proximity_and_exposes_it(monkeypatch, tmp_path):
+    detector = ScamDetector(FakeHedera(), FakeComput3(), cache=VerdictCache(max_size=100),
+                            stages=["blocklist", "allowlist", "graph", "local_model"])
+    mule, customer = "0x" + "ab" * 20, "0x" + "cd" * 20
+    before = detector.analyze_transaction({"chain": "ethereum", "from_address": customer, "to_address": mule, "value": 5})
+    detector.analyze_transaction({"chain": "ethereum", "from_address": mule, "to_address": SCAM, "value": 5})
+    after = detector.analyze_transaction({"chain": "ethereum", "from_address": customer, "to_address": mule, "value": 5})
+    assert "graph" not in before["details"] and "cached" not in after["details"]
+    assert after["details"]["graph"] == {"hops_to_scam": 1, "sender_hops_to_scam": 2, "score": 0.5}
+    assert after["risk_score"] > before["risk_score"] and after["details"]["model_score"] == before["risk_score"]
+    assert detector.address_reputation([mule])[mule]["hops_to_scam"] == 1
+
+    # Listing an address reaches its counterparties at once; removing it waits for compaction
+    detector.update_blocklist(added=[customer])
+    assert detector.graph.hops_to_scam(mule) == 1 and detector.graph.hops_to_scam(customer) == 0
+    detector.update_blocklist(removed=[customer, SCAM])
+    detector.graph.compact()
+    assert detector.graph.hops_to_scam(mule) is None
+
+    server = load_app(monkeypatch, tmp_path)
+    server.scam_detector.get().graph.add_interaction(mule, SCAM)
+
+    async def scenario():
+        return await asyncio.gather(call(server, "GET", f"/api/graph/{mule.upper()}"),
+                                    call(server, "GET", "/api/graph/0xnever"))
+    found, missing = asyncio.run(scenario())
+    assert found.status_code == 200 and found.json()["path"] == [mule, SCAM]
+    assert missing.status_code == 404
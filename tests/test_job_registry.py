@@ -0,0 +1,154 @@
+import asyncio
+import threading
+
+import httpx
+
+from server.compute3_client import Comput3Client
+from server.job_registry import JobRegistry
+from tests.test_asgi_app import load_app, call
+from tests.test_resilience import FakeResponse
+
+
+class FakeJobs:
+    """Bulk status endpoint: each job runs for `polls_to_finish` polls, then completes."""
+
+    def __init__(self, polls_to_finish=3, fail=False):
+        self.polls_to_finish = polls_to_finish
+        self.fail = fail
+        self.calls = []
+        self.seen = {}
+        self.lock = threading.Lock()
+
+    def __call__(self, job_ids):
+        with self.lock:
+            self.calls.append(list(job_ids))
+            if self.fail:
+                raise RuntimeError("comput3 is down")
+            answers = {}
+            for job_id in job_ids:
+                if job_id.startswith("job-"):
+                    self.seen[job_id] = self.seen.get(job_id, 0) + 1
+                    done = self.seen[job_id] >= self.polls_to_finish
+                    answers[job_id] = {"status": "succeeded" if done else "running",
+                                       "result": {"out": job_id} if done else None}
+            return answers
+
+
+def test_one_poller_follows_all_jobs_in_bulk():
+    upstream = FakeJobs()
+    registry = JobRegistry(upstream, poll_min=0.01, poll_max=0.05, batch_size=2)
+    for i in range(3):
+        assert registry.track(f"job-{i}")["status"] == "submitted"
+
+    running = registry.wait("job-0", after_version=1, timeout=2)
+    assert running["status"] == "running" and running["version"] == 2
+    done = registry.wait("job-0", after_version=running["version"], timeout=2)
+    assert done["status"] == "completed" and done["result"] == {"out": "job-0"}
+    for i in (1, 2):
+        assert registry.wait(f"job-{i}", after_version=2, timeout=2)["status"] == "completed"
+
+    # Bulk calls of at most batch_size ids, and nothing is polled once every job has finished
+    assert all(len(ids) <= 2 for ids in upstream.calls)
+    calls = len(upstream.calls)
+    assert registry.wait("job-0", after_version=99, timeout=0.1)["status"] == "completed"
+    assert len(upstream.calls) == calls and registry.stats()["outstanding"] == 0
+    registry.close()
+
+
+def test_backoff_adoption_and_retention():
+    upstream = FakeJobs(polls_to_finish=100)
+    registry = JobRegistry(upstream, poll_min=1, poll_max=4, retention=1)
+    registry.track("job-a")
+    registry.poll(["job-a"])
+    assert registry.get("job-a")["status"] == "running" and registry._schedule["job-a"][1] == 1
+    for expected in (2, 4, 4):
+        registry.poll(["job-a"])   # running, then unchanged: the interval doubles up to poll_max
+        assert registry._schedule["job-a"][1] == expected
+
+    upstream.fail = True
+    registry.poll(["job-a"])
+    assert registry.stats()["poll_failures"] == 1 and registry.get("job-a")["status"] == "running"
+
+    upstream.fail = False
+    assert registry.follow("bad id!") is None
+    assert registry.follow("stranger")["status"] == "unknown"
+    registry.poll(["stranger"])
+    # Dropped at once, and a second lookup answers from memory instead of adopting it again
+    assert registry.follow("stranger")["status"] == "not_found"
+    assert "stranger" not in registry._jobs and "stranger" not in registry._schedule
+
+    upstream.polls_to_finish = 0
+    registry.track("job-b")
+    registry.poll(["job-a"])
+    registry.poll(["job-b"])
+    registry._expire()   # only the most recently finished job is retained
+    assert registry.get("job-a") is None and registry.get("job-b")["status"] == "completed"
+    registry.close()
+
+
+def test_adopted_jobs_are_capped():
+    upstream = FakeJobs()
+    registry = JobRegistry(upstream, max_adopted=3)
+    registry._ensure_poller = lambda: None   # no poller thread: polls are driven by hand
+    assert [registry.follow(f"guess-{i}") is not None for i in range(5)] == [True] * 3 + [False] * 2
+    assert registry.follow("guess-0")["status"] == "unknown"        # already adopted: still answered
+    assert registry.track("job-own")["status"] == "submitted"        # jobs started here are never refused
+    registry.poll(["guess-0", "guess-1", "guess-2", "job-own"])
+    stats = registry.stats()
+    assert stats["adopted"] == 0 and stats["unknown"] == 3 and stats["outstanding"] == 1
+    assert registry.follow("guess-3")["status"] == "unknown"         # room again once they were dropped
+
+
+
+def test_asgi_long_poll_and_events(monkeypatch, tmp_path):
+    monkeypatch.setenv("JOB_POLL_MIN", "0.01")
+    server = load_app(monkeypatch, tmp_path)
+    server.comput3_client.client = httpx.AsyncClient(
+        transport=httpx.MockTransport(lambda request: httpx.Response(200, json={"jobId": "job-42"})))
+    upstream = FakeJobs()
+    server.jobs.status_fn = upstream
+
+    async def scenario():
+        started = await call(server, "POST", "/invoke", {"tool": "hedera_compute_job",
+                                                         "arguments": {"docker_image": "python:3.11", "command": "true"}})
+        events = await call(server, "GET", "/jobs/job-42/events")
+        final = await call(server, "GET", "/jobs/job-42?wait=2&version=1")
+        missing = await call(server, "GET", "/jobs/nope?wait=2&version=1")
+        bad = await call(server, "GET", "/jobs/job-42?wait=soon")
+        return started, events, final, missing, bad
+
+    started, events, final, missing, bad = asyncio.run(scenario())
+    assert started.json()["result"] == {"jobId": "job-42", "status": "submitted",
+                                        "status_url": "/jobs/job-42", "events_url": "/jobs/job-42/events"}
+    assert events.headers["content-type"] == "text/event-stream"
+    ids = [int(line[4:]) for line in events.text.splitlines() if line.startswith("id:")]
+    assert ids == sorted(set(ids)) and ids[-1] == 3
+    assert '"status": "completed"' in [line for line in events.text.splitlines() if line.startswith("data:")][-1]
+    assert final.json()["status"] == "completed"
+    assert missing.json()["status"] == "not_found"
+    assert bad.status_code == 400
+    server.jobs.close()
+    server.audit_queue.close()
+
+
+def test_job_status_falls_back_to_one_call_per_job():
+    class NoBulkRoute:
+        def __init__(self):
+            self.requests = []
+
+        def post(self, url, headers=None, json=None, timeout=None):
+            self.requests.append(("POST", url))
+            return FakeResponse(404, {"error": "not found"})
+
+        def get(self, url, headers=None, timeout=None):
+            self.requests.append(("GET", url))
+            job_id = url.rsplit("/", 1)[1]
+            return FakeResponse(200, {"status": "running"}) if job_id == "job-1" else FakeResponse(404, {})
+
+    session = NoBulkRoute()
+    client = Comput3Client("key", session=session)
+    assert client.job_statuses(["job-1", "gone"]) == {"job-1": {"status": "running", "jobId": "job-1"}}
+    assert [method for method, _ in session.requests] == ["POST", "GET", "GET"]
+    # The missing route is remembered: later polls go straight to the per-job route
+    client.job_statuses(["job-1"])
+    assert session.requests[-1] == ("GET", f"{client.base_url}/jobs/job-1") and len(session.requests) == 4
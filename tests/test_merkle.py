@@ -0,0 +1,43 @@
+from server.merkle import build_tree, verify_proof, MerkleBatcher
+
+
+def test_every_leaf_verifies_for_odd_and_even_trees():
+    for size in (1, 2, 3, 7, 8, 17):
+        messages = [f"hash-{i}" for i in range(size)]
+        root, proofs = build_tree(messages)
+        assert all(verify_proof(m, p, root) for m, p in zip(messages, proofs))
+        if size > 1:
+            assert not verify_proof("forged", proofs[0], root)
+            assert not verify_proof(messages[1], proofs[0], root)
+
+
+def test_batcher_anchors_one_root_per_window(tmp_path):
+    anchored = []
+
+    def anchor(message):
+        anchored.append(message)
+        return {"success": True, "transaction_id": f"anchor-{len(anchored)}"}
+
+    batcher = MerkleBatcher(anchor, store_path=str(tmp_path / "proofs.db"), window_seconds=3600, max_batch=4)
+    for i in range(6):
+        assert batcher.add(f"log-{i}")["status"] == "pending_anchor"
+    assert len(anchored) == 1  # size limit closed the first window
+    assert batcher.verify("log-5")["status"] == "pending_anchor"
+    batcher.flush()
+    assert len(anchored) == 2
+
+    result = batcher.verify("log-5")
+    assert result["verified"] is True
+    assert result["anchor"]["transaction_id"] == "anchor-2"
+    assert result["batch_size"] == 2
+    assert batcher.verify("never-logged")["status"] == "not_found"
+
+
+def test_failed_anchor_is_retried_in_next_window(tmp_path):
+    outcomes = [{"success": False, "error": "busy"}, {"success": True}]
+    batcher = MerkleBatcher(lambda m: outcomes.pop(0), store_path=str(tmp_path / "proofs.db"),
+                            window_seconds=3600, max_batch=100)
+    batcher.add("a")
+    assert batcher.flush()["success"] is False
+    assert batcher.flush()["leaves"] == 1
+    assert batcher.verify("a")["verified"] is True
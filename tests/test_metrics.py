@@ -0,0 +1,76 @@
+import os
+import asyncio
+import tempfile
+from server.metrics import Registry
+from tests.test_asgi_app import load_app, call
+
+
+def test_render_counters_and_cumulative_histograms(tmp_path):
+    registry = Registry(directory=str(tmp_path), flush_interval=0, buckets=(0.01, 0.1))
+    registry.inc("aya_http_requests_total", route="/invoke", status="200")
+    registry.inc("aya_http_requests_total", status="200", route="/invoke")
+    registry.observe("aya_tool_duration_seconds", 0.005, tool="analyze_transaction_risk")
+    registry.observe("aya_tool_duration_seconds", 0.05, tool="analyze_transaction_risk")
+    registry.observe("aya_tool_duration_seconds", 3.0, tool="analyze_transaction_risk")
+
+    text = registry.render()
+    assert '# TYPE aya_http_requests_total counter' in text
+    assert 'aya_http_requests_total{route="/invoke",status="200"} 2' in text
+    assert 'aya_tool_duration_seconds_bucket{tool="analyze_transaction_risk",le="0.01"} 1' in text
+    assert 'aya_tool_duration_seconds_bucket{tool="analyze_transaction_risk",le="0.1"} 2' in text
+    assert 'aya_tool_duration_seconds_bucket{tool="analyze_transaction_risk",le="+Inf"} 3' in text
+    assert 'aya_tool_duration_seconds_count{tool="analyze_transaction_risk"} 3' in text
+
+
+def test_scrape_aggregates_live_worker_processes(tmp_path):
+    registry = Registry(directory=str(tmp_path), flush_interval=0)
+    registry.inc("aya_tool_calls_total", tool="analyze_transaction_risk")
+    ready_r, ready_w = os.pipe()
+    done_r, done_w = os.pipe()
+
+    pid = os.fork()
+    if pid == 0:
+        # Worker: its copy starts empty, records its own calls and publishes a snapshot
+        registry.inc("aya_tool_calls_total", 2, tool="analyze_transaction_risk")
+        registry.flush()
+        os.write(ready_w, b"x")
+        os.read(done_r, 1)
+        os._exit(0)
+
+    os.read(ready_r, 1)
+    assert 'aya_tool_calls_total{tool="analyze_transaction_risk"} 3' in registry.render()
+    os.write(done_w, b"x")
+    os.waitpid(pid, 0)
+    # The exited worker's snapshot is dropped
+    assert 'aya_tool_calls_total{tool="analyze_transaction_risk"} 1' in registry.render()
+    assert os.listdir(tmp_path) == [f"{os.getpid()}.json"]
+
+
+
+def test_default_directory_is_per_process_and_clears_those_of_dead_ones(monkeypatch, tmp_path):
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+    monkeypatch.delenv("METRICS_DIR", raising=False)
+    pid = os.fork()
+    if pid == 0:
+        os._exit(0)
+    os.waitpid(pid, 0)
+    for owner in (pid, os.getppid()):
+        (tmp_path / f"aya-metrics-{owner}").mkdir()
+        (tmp_path / f"aya-metrics-{owner}" / f"{owner}.json").write_text("{}")
+    registry = Registry(flush_interval=0)
+    assert registry.directory == str(tmp_path / f"aya-metrics-{os.getpid()}")
+    # Another live deployment keeps its files; the exited one's are gone
+    assert sorted(os.listdir(tmp_path)) == [f"aya-metrics-{os.getppid()}"]
+
+def test_asgi_metrics_endpoint(monkeypatch, tmp_path):
+    server = load_app(monkeypatch, tmp_path)
+
+    async def scenario():
+        await call(server, "GET", "/tools")
+        await call(server, "GET", "/audit/abc")
+        return await call(server, "GET", "/metrics")
+
+    response = asyncio.run(scenario())
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'aya_http_requests_total{method="GET",route="/tools",status="200"}' in response.text
+    assert 'route="/audit/<audit_id>"' in response.text
@@ -0,0 +1,73 @@
+import base64
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import urlparse, parse_qs
+
+from server.mirror_sync import MirrorNodeSynchronizer, MirrorMessageStore
+
+TOPIC = "0.0.4242"
+
+
+class FakeMirror(BaseHTTPRequestHandler):
+    """Stand-in for /api/v1/topics/{id}/messages with sequencenumber=gt:N paging."""
+    messages = []
+    requests = []
+
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        query = parse_qs(parsed.query)
+        FakeMirror.requests.append(self.path)
+        after = int(query["sequencenumber"][0].split(":")[1])
+        limit = int(query["limit"][0])
+        page = [m for m in FakeMirror.messages if m["sequence_number"] > after][:limit]
+        links = {"next": None}
+        if page and page[-1]["sequence_number"] < FakeMirror.messages[-1]["sequence_number"]:
+            links["next"] = f"{parsed.path}?sequencenumber=gt:{page[-1]['sequence_number']}&limit={limit}&order=asc"
+        body = json.dumps({"messages": page, "links": links}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def publish(sequence, text):
+    FakeMirror.messages.append({
+        "topic_id": TOPIC,
+        "sequence_number": sequence,
+        "consensus_timestamp": f"17000000{sequence:02d}.000000001",
+        "message": base64.b64encode(text.encode()).decode(),
+        "running_hash": f"rh{sequence}",
+        "chunk_info": {"initial_transaction_id": {"account_id": "0.0.7", "transaction_valid_start": f"16999999{sequence:02d}.5"}},
+    })
+
+
+def test_incremental_sync_and_local_lookups(tmp_path):
+    FakeMirror.messages, FakeMirror.requests = [], []
+    for i in range(1, 8):
+        publish(i, f"log-hash-{i}")
+    server = HTTPServer(("127.0.0.1", 0), FakeMirror)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        sync = MirrorNodeSynchronizer(TOPIC, mirror_url=f"http://127.0.0.1:{server.server_port}",
+                                      store=MirrorMessageStore(str(tmp_path / "mirror.db")), page_size=3)
+        assert sync.sync_once() == 7
+        assert len(FakeMirror.requests) == 3  # followed links.next across pages
+
+        assert sync.lookup("5")["message"] == "log-hash-5"
+        assert sync.lookup("1700000003.000000001")["sequence_number"] == 3
+        assert sync.lookup("0.0.7@1699999902.5")["sequence_number"] == 2
+        assert sync.lookup("log-hash-6")["sequence_number"] == 6
+        assert sync.lookup("missing") is None
+
+        publish(8, "log-hash-8")
+        FakeMirror.requests = []
+        assert sync.sync_once() == 1
+        assert "gt:7" in FakeMirror.requests[0]
+        assert sync.lookup("log-hash-8")["running_hash"] == "rh8"
+    finally:
+        server.shutdown()
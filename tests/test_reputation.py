@@ -0,0 +1,77 @@
+import sqlite3
+
+from server.reputation import ReputationStore
+from server.scam_detector import ScamDetector
+from server.verdict_cache import VerdictCache
+from tests.fakes import FakeHedera, FakeComput3
+
+
+def test_store_merges_pending_and_flushed_evidence(tmp_path):
+    store = ReputationStore(str(tmp_path / "rep.db"), flush_interval=0)
+    store.record("ethereum", "0xABC", 0.2, seen=100)
+    store.record("ethereum", "0xabc", 0.6, ["medium_risk"], seen=200)
+    assert store.flush() == 1
+    store.record("ethereum", "0xabc", 1.0, ["high_risk"], seen=50)   # not flushed yet
+    store.record("hedera", "0xabc", 0.1, seen=300)
+
+    entries = store.lookup_many("ethereum", ["0xAbC", "0xnever"] + [f"0x{i:040x}" for i in range(2000)])
+    assert entries["0xabc"] == {"score": 0.6, "max_score": 1.0, "labels": ["high_risk", "medium_risk"],
+                                "evidence_count": 3, "first_seen": 50, "last_seen": 200}
+    assert entries["0xnever"] is None and len(entries) == 2002
+
+    store.flush()
+    reopened = ReputationStore(str(tmp_path / "rep.db"), flush_interval=0)
+    assert reopened.lookup_many("ethereum", ["0xabc"])["0xabc"]["evidence_count"] == 3
+    assert reopened.lookup_many("hedera", ["0xabc"])["0xabc"]["evidence_count"] == 1
+
+
+
+def test_bad_updates_do_not_block_the_rest(tmp_path):
+    store = ReputationStore(str(tmp_path / "rep.db"), flush_interval=0, max_retries=2)
+    store.record("ethereum", "0xnan", float("nan"))
+    store.record("ethereum", "0xinf", float("inf"))
+    store.record("ethereum", "0xgood", 0.5)
+    assert store.flush() == 1
+    # A row the schema rejects is dropped alone, not re-queued with the batch
+    store.record("ethereum", "0xgood", 0.7)
+    store._pending[("ethereum", "0xbad")] = [1, None, 0.0, 0, 1.0, 1.0]
+    assert store.flush() == 1 and store._pending == {}
+    entries = store.lookup_many("ethereum", ["0xgood", "0xbad", "0xnan"])
+    assert entries["0xgood"]["evidence_count"] == 2 and entries["0xbad"] is None and entries["0xnan"] is None
+
+    # An unavailable database keeps the batch for max_retries attempts, then gives up on it
+    real_connection = store._connection
+
+    def locked():
+        raise sqlite3.OperationalError("database is locked")
+    store._connection = locked
+    store.record("ethereum", "0xgood", 0.9)
+    assert [store.flush(), store.flush()] == [0, 0] and store._pending
+    assert store.flush() == 0 and store._pending == {}
+    store._connection = real_connection
+    store.record("ethereum", "0xgood", 0.1)
+    assert store.flush() == 1
+    assert store.lookup_many("ethereum", ["0xgood"])["0xgood"]["evidence_count"] == 3
+
+def test_detector_builds_reputation_from_verdicts(tmp_path):
+    detector = ScamDetector(FakeHedera(), FakeComput3(), cache=VerdictCache(max_size=0),
+                            reputation=ReputationStore(str(tmp_path / "rep.db"), flush_interval=0))
+    risky, calm = "0x" + "ab" * 20, "0x" + "cd" * 20
+    for tx in ({"chain": "ethereum", "to_address": risky, "value": 5000},
+               {"chain": "ethereum", "to_address": risky, "value": 9000},
+               {"chain": "ethereum", "to_address": calm, "value": 1},
+               {"chain": "ethereum", "to_address": "0x000000000000000000000000000000000000dead", "value": 1}):
+        detector.analyze_transaction(tx)
+
+    reputations = detector.address_reputation(
+        ["0x" + "AB" * 20, calm, "0x000000000000000000000000000000000000dead",
+         "0x7a250d5630b4cf539739df2c5dacb4c659f2488d", "0x" + "ef" * 20])
+    assert reputations[risky]["reputation"] == "high_risk" and reputations[risky]["evidence_count"] == 2
+    assert "high_risk" in reputations[risky]["labels"]
+    assert reputations[calm]["reputation"] == "clean"
+    dead = reputations["0x000000000000000000000000000000000000dead"]
+    assert dead["reputation"] == "scam" and dead["score"] == 1.0 and "blocklisted" in dead["labels"]
+    assert reputations["0x7a250d5630b4cf539739df2c5dacb4c659f2488d"]["reputation"] == "trusted"
+    unseen = reputations["0x" + "ef" * 20]
+    assert unseen["reputation"] == "unknown" and unseen["evidence_count"] == 0
+    assert detector.check_address(risky)["reputation"] == "high_risk"
@@ -0,0 +1,128 @@
+import time
+import threading
+import pytest
+import requests
+from server.resilience import CircuitBreaker, Deadline, DeadlineExceeded
+from server.compute3_client import Comput3Client
+from server.verdict_cache import VerdictCache
+from server.scam_detector import ScamDetector
+from tests.fakes import FakeHedera
+
+
+class FakeResponse:
+    def __init__(self, status_code, body):
+        self.status_code = status_code
+        self.body = body
+
+    def json(self):
+        return self.body
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} error")
+
+
+class ScriptedSession:
+    """Answers each POST with the next (delay_s, status, risk_score) from `script`, then repeats the last."""
+
+    def __init__(self, script):
+        self.script = list(script)
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def post(self, url, headers=None, json=None, timeout=None):
+        with self.lock:
+            delay, status, score = self.script[min(self.calls, len(self.script) - 1)]
+            self.calls += 1
+        time.sleep(delay)
+        return FakeResponse(status, {"result": {"risk_score": score}})
+
+
+def test_breaker_opens_half_opens_and_closes():
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=0.05)
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open" and not breaker.allow()
+
+    time.sleep(0.06)
+    assert breaker.allow()        # the single half-open probe
+    assert not breaker.allow()
+    breaker.record_failure()      # probe failed: straight back to open
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.stats()["transitions"] == {"closed->open": 1, "open->half_open": 2,
+                                              "half_open->open": 1, "half_open->closed": 1}
+
+
+def test_deadline_parsing():
+    assert Deadline.from_ms(None) is None
+    assert Deadline.from_ms("0") is None
+    assert 0.2 < Deadline.from_ms("250").remaining() <= 0.25
+    with pytest.raises(ValueError):
+        Deadline.from_ms("soon")
+
+
+def test_slow_first_attempt_is_hedged():
+    session = ScriptedSession([(0.5, 200, 0.1), (0.01, 200, 0.2)])
+    client = Comput3Client("key", session=session)
+    guard = client.guards["analysis"]
+    for _ in range(20):
+        guard.record_success(0.02)
+
+    started = time.monotonic()
+    result = client.analyze_transaction({"to_address": "0xabc"})
+    assert time.monotonic() - started < 0.3
+    assert result == {"risk_score": 0.2}
+    assert guard.counters["hedged"] == 1 and guard.counters["hedge_wins"] == 1
+
+
+def test_deadline_caps_the_wait_and_is_counted():
+    client = Comput3Client("key", session=ScriptedSession([(0.5, 200, 0.1)]))
+    started = time.monotonic()
+    result = client.analyze_transaction({"to_address": "0xabc"}, deadline=Deadline(0.05))
+    assert time.monotonic() - started < 0.3
+    assert result["deadline_exceeded"] is True
+    assert client.stats()["analysis"]["deadline_exceeded"] == 1
+
+
+def test_open_circuit_fails_fast_and_detector_answers_locally(monkeypatch):
+    monkeypatch.setenv("COMPUT3_BREAKER_FAILURES", "3")
+    session = ScriptedSession([(0, 503, None)])
+    client = Comput3Client("key", session=session)
+    detector = ScamDetector(FakeHedera(), client, cache=VerdictCache(max_size=0))
+    tx = {"chain": "ethereum", "to_address": "0x8ba1f109551bd432803012645ac136ddd64dba72", "value": 1}
+
+    for _ in range(3):
+        detector.analyze_transaction(tx)
+    assert session.calls == 3
+    result = detector.analyze_transaction(tx)
+    assert session.calls == 3
+    assert result["details"]["circuit_open"] is True
+    assert result["details"]["scored_by"] == "local"
+    assert result["risk_level"] == "LOW"
+    stats = detector.stats()["comput3"]["analysis"]
+    assert stats["state"] == "open" and stats["rejected"] == 1 and stats["failures"] == 3
+
+
+def test_spent_deadline_does_not_take_the_half_open_probe():
+    client = Comput3Client("key", session=ScriptedSession([(0, 200, 0.1)]))
+    breaker = client.guards["analysis"].breaker
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+    breaker._opened_at -= breaker.reset_timeout
+
+    with pytest.raises(DeadlineExceeded):
+        client._post("analysis", {}, Deadline(0.0))
+    # The probe slot is still free, so the next call with budget closes the circuit
+    assert client.analyze_transaction({"to_address": "0xabc"}) == {"risk_score": 0.1}
+    assert breaker.state == "closed"
+
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+    breaker._opened_at -= breaker.reset_timeout
+    assert breaker.allow()
+    breaker.release()             # e.g. a cancelled async call
+    assert breaker.allow() and not breaker.allow()
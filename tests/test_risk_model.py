@@ -0,0 +1,84 @@
+import json
+import pytest
+from server.risk_model import RiskModel, FEATURES, extract_features
+from server.verdict_cache import VerdictCache
+from server.scam_detector import ScamDetector
+from tests.fakes import FakeHedera, FakeComput3
+
+RANDOM_ADDRESS = "0x8ba1f109551bd432803012645ac136ddd64dba72"
+UNLIMITED_APPROVAL = "0x095ea7b3" + "00" * 12 + RANDOM_ADDRESS[2:] + "f" * 64
+
+
+class UnavailableComput3(FakeComput3):
+    def analyze_transaction(self, arguments, deadline=None):
+        super().analyze_transaction(arguments)
+        return {"error": True, "message": "Failed to connect to the AI analysis service.", "details": "timeout"}
+
+
+def test_features_are_extracted_per_row():
+    X = extract_features([
+        {"to_address": RANDOM_ADDRESS, "value": "0xde0b6b3a7640000"},
+        {"to_address": "0x00000000000000000000000000000000000000ff", "data": UNLIMITED_APPROVAL},
+        {"to_address": "0.0.1234", "from_address": "0.0.1234", "value": "bogus"},
+        {"to_address": RANDOM_ADDRESS, "value": "0x" + "f" * 400},
+        {"to_address": RANDOM_ADDRESS, "value": 10 ** 400},
+    ] + [{"to_address": RANDOM_ADDRESS, "value": v} for v in ("nan", "inf", "-inf", "1e400", float("nan"))])
+    column = {name: X[:, i] for i, name in enumerate(FEATURES)}
+    assert X.shape == (10, len(FEATURES))
+    assert column["value_log10"][0] == pytest.approx(18.0)
+    # Values too large for a float, or not finite, count as unparseable
+    assert list(column["value_log10"][2:]) == [0] * 8
+    assert list(column["approval_selector"]) == [0, 1] + [0] * 8
+    assert list(column["unlimited_amount"]) == [0, 1] + [0] * 8
+    assert column["to_leading_zeros"][1] == 38
+    assert column["to_entropy"][1] < 1.0 < column["to_entropy"][0]
+    assert list(column["self_transfer"]) == [0, 0, 1] + [0] * 7
+
+
+def test_batch_scores_match_single_scores_and_rank_approvals_higher():
+    model = RiskModel.from_env()
+    txs = [{"to_address": RANDOM_ADDRESS, "value": 10 ** 18},
+           {"to_address": RANDOM_ADDRESS, "value": 0, "data": UNLIMITED_APPROVAL}]
+    scores = model.score_batch(txs)
+    assert scores[0] == pytest.approx(model.score(txs[0]))
+    assert scores[0] < 0.3 < 0.5 < scores[1]
+
+
+def test_model_file_is_versioned_and_validated(tmp_path):
+    path = tmp_path / "model.json"
+    path.write_text(json.dumps({"format": 1, "version": "test-7", "bias": 0, "weights": {"missing_to": 2}}))
+    assert RiskModel.load(path).version == "test-7"
+
+    path.write_text(json.dumps({"format": 1, "weights": {"not_a_feature": 1}}))
+    with pytest.raises(ValueError):
+        RiskModel.load(path)
+    path.write_text(json.dumps({"format": 99, "weights": {}}))
+    with pytest.raises(ValueError):
+        RiskModel.load(path)
+
+
+def test_detector_falls_back_to_local_score_when_comput3_fails():
+    detector = ScamDetector(FakeHedera(), UnavailableComput3(), cache=VerdictCache(max_size=0))
+    result = detector.analyze_transaction({"chain": "ethereum", "to_address": RANDOM_ADDRESS,
+                                           "value": 0, "data": UNLIMITED_APPROVAL})
+    # The model alone says MEDIUM; the unlimited allowance for an unknown spender raises it
+    assert 0.5 < result["details"]["model_score"] <= 0.8
+    assert result["risk_level"] == "HIGH"
+    assert result["details"]["calldata"]["hits"][0]["rule"] == "unlimited_allowance_to_unknown_spender"
+    assert result["details"]["scored_by"] == "local"
+    assert result["details"]["model_version"] == detector.local_model.version
+    # A non-finite value scores like an unparseable one, so responses stay valid JSON
+    scores = detector.score_local_batch([{"chain": "ethereum", "to_address": RANDOM_ADDRESS, "value": v}
+                                         for v in ("nan", "inf", 0)])
+    assert scores[0] == scores[1] == scores[2]
+    json.dumps(scores, allow_nan=False)
+
+
+def test_prefilter_settles_benign_transactions_locally(monkeypatch):
+    monkeypatch.setenv("LOCAL_MODEL_TRUST_BELOW", "0.2")
+    comput3 = FakeComput3()
+    detector = ScamDetector(FakeHedera(), comput3, cache=VerdictCache(max_size=0))
+    benign = detector.analyze_transaction({"chain": "ethereum", "to_address": RANDOM_ADDRESS, "value": 10 ** 18})
+    detector.analyze_transaction({"chain": "ethereum", "to_address": RANDOM_ADDRESS, "data": UNLIMITED_APPROVAL})
+    assert benign["details"]["scored_by"] == "local"
+    assert comput3.calls == 1
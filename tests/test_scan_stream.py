@@ -0,0 +1,71 @@
+import json
+import time
+import asyncio
+import threading
+
+import httpx
+import pytest
+
+from server.scan_stream import LineSplitter, stream_verdicts
+from tests.test_asgi_app import load_app
+
+
+def lines(chunks):
+    return [json.loads(line) for line in b"".join(chunks).splitlines()]
+
+
+def test_splitter_handles_lines_across_chunks():
+    splitter = LineSplitter(limit=16)
+    assert splitter.feed(b'{"a":1}\n{"b"') == [b'{"a":1}']
+    assert splitter.feed(b':2}\n\n') == [b'{"b":2}', b'']
+    assert splitter.feed(b'{"c":3}') == []
+    assert splitter.close() == [b'{"c":3}']
+    with pytest.raises(ValueError):
+        splitter.feed(b"x" * 17)
+
+
+def test_verdicts_stream_out_of_order_with_bounded_concurrency():
+    active, peak, lock = [0], [0], threading.Lock()
+
+    def analyze(tx, deadline=None):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(tx["delay"])
+        with lock:
+            active[0] -= 1
+        return {"risk_level": "LOW", "to": tx["to_address"]}
+
+    body = [b'{"id": "slow", "to_address": "0x1", "delay": 0.2}\n{"to_address": "0x2", "del',
+            b'ay": 0}\nnot json\n'] + [b'{"to_address": "0x3", "delay": 0.01}\n'] * 6
+    records = lines(stream_verdicts(analyze, body, in_flight=3))
+
+    assert records[-1] == {"done": True, "count": 9, "errors": 1}
+    by_id = {record["id"]: record for record in records[:-1]}
+    assert by_id["slow"]["result"] == {"risk_level": "LOW", "to": "0x1"}
+    assert by_id[1]["result"]["to"] == "0x2"
+    assert "not valid JSON" in by_id[2]["error"]
+    assert records[-2]["id"] == "slow"    # the slow one finishes last
+    assert peak[0] <= 3
+
+
+def test_asgi_stream_endpoint(monkeypatch, tmp_path):
+    server = load_app(monkeypatch, tmp_path)
+
+    async def body():
+        yield b'{"id": "a", "chain": "ethereum", "to_address": "0x000000000000000000000000000000000000dead"}\n'
+        yield b'{"id": "b", "chain": "ethereum", "to_address": "0x7a250d5630b4cf539739df2c5dacb4c659f2488d"}\n'
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=server)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post("/api/scan/stream", content=body())
+
+    response = asyncio.run(scenario())
+    assert response.headers["content-type"] == "application/x-ndjson"
+    records = [json.loads(line) for line in response.text.splitlines()]
+    results = {record["id"]: record["result"] for record in records[:-1]}
+    assert results["a"]["risk_level"] == "CRITICAL"
+    assert results["b"]["details"]["stage"] == "allowlist"
+    assert records[-1] == {"done": True, "count": 2, "errors": 0}
+    server.audit_queue.close()
@@ -0,0 +1,132 @@
+import os
+import multiprocessing
+
+from server.reputation import ReputationStore
+from server.shared_cache import SharedCache, SharedTable, LocalBackend, digest, generation_index, WAYS
+from server.verdict_cache import VerdictCache
+
+ALICE, BOB = "0x" + "a1" * 20, "0x" + "b0" * 20
+
+
+def _hammer(path, worker):
+    table = SharedTable(path)
+    for i in range(200):
+        table.invalidate_address(ALICE)
+        table.put(digest("contended"), bytes([worker]) * 600, expires=4e9)
+
+
+def test_table_is_shared_and_atomic_across_processes(tmp_path):
+    path = str(tmp_path / "cache")
+    table = SharedTable(path, slots=WAYS, slot_bytes=1024)
+    before = table.generation(generation_index(ALICE))
+
+    ctx = multiprocessing.get_context("fork")
+    workers = [ctx.Process(target=_hammer, args=(path, w)) for w in range(4)]
+    for process in workers:
+        process.start()
+    torn = 0
+    while any(process.is_alive() for process in workers):
+        found = table.get(digest("contended"))
+        torn += found is not None and len(set(found[0])) != 1
+    for process in workers:
+        process.join()
+    assert all(process.exitcode == 0 for process in workers)
+    # Every read-modify-write of the counter landed, and no reader saw half of one write and half of another
+    assert table.generation(generation_index(ALICE)) == before + 800
+    assert torn == 0 and len(set(table.get(digest("contended"))[0])) == 1
+    # The file decides the geometry for everyone who maps it later
+    assert SharedTable(path, slots=1024).stats()["slots"] == WAYS
+
+    # A full bucket evicts its least recently used slot; expired entries read as misses
+    for i in range(WAYS + 3):
+        table.put(digest(f"k{i}"), b"v", expires=4e9, now=1000 + i)
+    table.get(digest("k5"), now=2000)
+    table.put(digest("late"), b"v", expires=4e9, now=2001)
+    assert table.get(digest("k5")) is not None and table.get(digest("late")) is not None
+    assert table.get(digest("k4")) is None and table.get(digest("late"), now=5e9) is None
+
+    # Values too big for a slot are compressed, or skip the tier when they still do not fit
+    shared = SharedCache(SharedTable(path))
+    shared.put("big", b"x" * 5000, ttl=60)
+    assert shared.get("big")[0] == b"x" * 5000
+    shared.put("noise", os.urandom(5000), ttl=60)
+    assert shared.get("noise") is None and shared.table.too_large == 1
+
+
+def test_verdicts_and_invalidations_reach_every_worker(tmp_path):
+    path = str(tmp_path / "cache")
+    # Two workers: separate in-process LRUs over one shared table
+    first = VerdictCache(max_size=100, shared=SharedCache(SharedTable(path)))
+    second = VerdictCache(max_size=100, shared=SharedCache(SharedTable(path)))
+    verdict = {"risk_level": "LOW", "details": {"stage": "local_model"}}
+    first.put("k1", verdict, addresses=[ALICE, BOB])
+    first.put("k2", {"risk_level": "HIGH"}, addresses=["0x" + "cc" * 20])
+    first.put("err", {"error": "upstream"}, negative=True)
+
+    assert second.get("k1") == verdict and second.stats()["shared_hits"] == 1
+    assert second.get("k1") == verdict and second.stats()["shared_hits"] == 1   # now from its own LRU
+    assert second.get("err") == {"error": "upstream"} and second.stats()["negative_hits"] == 1
+
+    # The blocklist changes in the second worker: the first one's local copy is stale too
+    assert first.get("k1") == verdict
+    second.invalidate_address(BOB.upper())
+    assert first.get("k1") is None and second.get("k1") is None
+    assert first.get("k2") == {"risk_level": "HIGH"}
+    second.clear()
+    assert first.get("k2") is None and first.get("err") is None and first.stats()["size"] == 0
+
+
+def test_remote_tier_and_reputation_read_through(tmp_path):
+    remote = LocalBackend()
+    # Two hosts with their own tables and one remote
+    host_a = SharedCache(SharedTable(str(tmp_path / "a")), remote)
+    host_b = SharedCache(SharedTable(str(tmp_path / "b")), remote)
+    host_a.put("v:1", b"verdict", ttl=60, addresses=[ALICE])
+    assert host_b.get("v:1")[0] == b"verdict" and host_b.stats()["remote"]["hits"] == 1
+    assert host_b.table.get(digest("v:1")) is not None                # copied into host b's table
+    host_a.invalidate_address(ALICE)
+    assert SharedCache(SharedTable(str(tmp_path / "c")), remote).get("v:1") is None
+    host_a.put("v:2", b"verdict", ttl=60)
+    host_b.clear()
+    assert SharedCache(None, remote).get("v:2") is None
+
+    class Down(LocalBackend):
+        def get_many(self, keys):
+            raise ConnectionError("remote down")
+
+    offline = SharedCache(None, Down())
+    offline.put("v:3", b"verdict", ttl=60)
+    assert offline.get("v:3") is None and offline.stats()["remote"]["errors"] >= 2
+
+    # Reputation rows: one database read serves every worker until a flush rewrites the row
+    db, shared = str(tmp_path / "reputation.db"), SharedCache(SharedTable(str(tmp_path / "r")))
+    writer = ReputationStore(path=db, flush_interval=0, shared=shared)
+    reader = ReputationStore(path=db, flush_interval=0, shared=shared)
+    writer.record("ethereum", ALICE, 0.9, ["high_risk"])
+    writer.flush()
+    first = reader.lookup_many("ethereum", [ALICE, BOB])
+    assert first[BOB] is None and first[ALICE]["labels"] == ["high_risk"] and shared.table.hits == 0
+    assert reader.lookup_many("ethereum", [ALICE, BOB]) == first and shared.table.hits == 2
+    writer.record("ethereum", ALICE, 0.1)
+    writer.flush()
+    assert shared.get("r:ethereum:" + ALICE) is None
+    assert reader.lookup_many("ethereum", [ALICE])[ALICE]["evidence_count"] == 2
+
+    # A flush landing between another worker's database read and its cache write must win
+    real_connection = reader._connection
+
+    class FlushAfterRead:
+        def __init__(self, conn):
+            self.conn = conn
+
+        def execute(self, *args):
+            rows = self.conn.execute(*args).fetchall()
+            writer.record("ethereum", ALICE, 0.5)
+            writer.flush()
+            return type("Rows", (), {"fetchall": lambda _: rows})()
+
+    shared.delete("r:ethereum:" + ALICE)
+    reader._connection = lambda: FlushAfterRead(real_connection())
+    assert reader.lookup_many("ethereum", [ALICE])[ALICE]["evidence_count"] == 2
+    reader._connection = real_connection
+    assert reader.lookup_many("ethereum", [ALICE])[ALICE]["evidence_count"] == 3
@@ -0,0 +1,95 @@
+import time
+import asyncio
+import threading
+import pytest
+from server.single_flight import SingleFlight
+from server.verdict_cache import VerdictCache
+from server.scam_detector import ScamDetector
+from tests.fakes import FakeHedera, FakeComput3
+
+
+class SlowComput3(FakeComput3):
+    def analyze_transaction(self, arguments, deadline=None):
+        time.sleep(0.2)
+        return super().analyze_transaction(arguments)
+
+
+def _burst(fn, count):
+    results = [None] * count
+    barrier = threading.Barrier(count)
+
+    def run(i):
+        barrier.wait()
+        try:
+            results[i] = fn()
+        except Exception as e:
+            results[i] = e
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_concurrent_analyses_share_one_upstream_call():
+    comput3 = SlowComput3()
+    # Cache disabled: only coalescing can keep the upstream call count at one
+    detector = ScamDetector(FakeHedera(), comput3, cache=VerdictCache(max_size=0))
+    tx = {"chain": "ethereum", "to_address": "0xmint", "value": 5000}
+
+    results = _burst(lambda: detector.analyze_transaction(dict(tx)), 8)
+
+    assert comput3.calls == 1
+    assert all(r["risk_level"] == "HIGH" for r in results)
+    assert sum(1 for r in results if r["details"].get("coalesced")) == 7
+    assert len({r["audit"]["audit_id"] for r in results}) == 8
+    assert detector.stats()["coalescing"] == {"in_flight": 0, "leaders": 1, "collapsed": 7}
+
+
+def test_waiters_receive_the_leaders_exception():
+    flight = SingleFlight()
+
+    def failing():
+        time.sleep(0.1)
+        raise RuntimeError("rate limited")
+
+    results = _burst(lambda: flight.do("k", failing), 4)
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert flight.stats()["collapsed"] == 3
+    # Nothing is left in flight, so the next call runs again
+    assert flight.do("k", lambda: 1) == (1, False)
+
+
+def test_async_callers_share_one_task():
+    flight = SingleFlight()
+    calls = []
+
+    async def analyse():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"risk_score": 0.2}
+
+    async def main():
+        return await asyncio.gather(*(flight.do_async("k", analyse) for _ in range(5)))
+
+    results = asyncio.run(main())
+    assert len(calls) == 1
+    assert [shared for _, shared in results].count(True) == 4
+    assert flight.stats() == {"in_flight": 0, "leaders": 1, "collapsed": 4}
+
+
+def test_async_error_is_shared():
+    flight = SingleFlight()
+
+    async def failing():
+        await asyncio.sleep(0.01)
+        raise ValueError("bad upstream")
+
+    async def main():
+        return await asyncio.gather(*(flight.do_async("k", failing) for _ in range(3)), return_exceptions=True)
+
+    assert all(isinstance(r, ValueError) for r in asyncio.run(main()))
+    with pytest.raises(ValueError):
+        asyncio.run(flight.do_async("k", failing))
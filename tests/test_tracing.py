@@ -0,0 +1,122 @@
+import os
+import time
+import asyncio
+import threading
+
+import httpx
+
+from server import metrics, tracing
+from server.tracing import Tracer
+from tests.test_asgi_app import load_app, fake_comput3
+
+ADMIN = {"X-Admin-Token": "s3cret"}
+
+
+async def request(server, method, path, payload=None, headers=None):
+    transport = httpx.ASGITransport(app=server)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        return await client.request(method, path, json=payload, headers=headers)
+
+
+def test_admin_trace_returns_spans_of_each_stage(monkeypatch, tmp_path):
+    monkeypatch.setattr(tracing, "tracer", Tracer(directory=str(tmp_path), admin_token="s3cret"))
+    server = load_app(monkeypatch, tmp_path)
+    server.comput3_client.client = httpx.AsyncClient(transport=httpx.MockTransport(fake_comput3))
+    invoke = {"tool": "analyze_transaction_risk", "arguments": {"chain": "ethereum", "to_address": "0xrisky", "value": 1}}
+
+    async def scenario():
+        plain = await request(server, "POST", "/invoke", invoke)
+        spoofed = await request(server, "POST", "/invoke", invoke, {"X-Aya-Trace": "1", "X-Admin-Token": "guess"})
+        traced = await request(server, "POST", "/invoke", invoke, {"X-Aya-Trace": "1", **ADMIN})
+        return plain, spoofed, traced
+
+    plain, spoofed, traced = asyncio.run(scenario())
+    assert "server-timing" not in plain.headers and "server-timing" not in spoofed.headers
+    assert traced.json()["result"]["risk_level"] == "HIGH"
+    names = [entry.split(";")[0] for entry in traced.headers["server-timing"].split(", ")]
+    assert {"step.json_parse", "stage.blocklist", "stage.local_model", "stage.remote", "tool.analyze_transaction_risk"} <= set(names)
+    assert names[-1] == "total"
+
+    # Only the admin's request was traced, and it is filed with its spans in order
+    traces = tracing.tracer.slowest()
+    assert len(traces) == 1 and traces[0]["route"] == "/invoke" and traces[0]["status"] == 200
+    starts = [span["start_ms"] for span in traces[0]["spans"]]
+    assert starts == sorted(starts) and traces[0]["spans"][-1]["duration_ms"] <= traces[0]["duration_ms"]
+    assert tracing.current() is None
+    server.audit_queue.close()
+
+
+def test_sampling_is_switched_on_for_every_worker_and_keeps_the_slowest(tmp_path):
+    worker = Tracer(directory=str(tmp_path), slowest=3)
+    assert worker.begin({}) is None                      # off by default: nothing is recorded
+    metrics.observe("aya_stage_duration_seconds", 0.001, stage="json_parse")
+    assert tracing.current() is None
+
+    # An admin on another worker turns sampling on through the shared control file
+    other = Tracer(directory=str(tmp_path))
+    assert other.set_sampling(1, 60)["sample_rate"] == 1
+    worker._next_check = 0
+    for duration in (0.004, 0.001, 0.003, 0.002, 0.005):
+        trace = worker.begin({})
+        metrics.observe("aya_analysis_stage_duration_seconds", duration, stage="rules")
+        trace.started -= duration
+        assert worker.end(trace, "/invoke", 200) is None      # sampled traces add no header
+    kept = worker.slowest()
+    assert [round(t["duration_ms"]) for t in kept] == [5, 4, 3]
+    assert kept[0]["spans"][0]["name"] == "stage.rules"
+
+    pid = os.fork()
+    if pid == 0:
+        trace = worker.begin({})
+        trace.started -= 1.0
+        worker.end(trace, "/api/scan/stream", 200)
+        worker._write()
+        os._exit(0)
+    os.waitpid(pid, 0)
+    # The child has exited: its file is dropped instead of reported
+    assert [t["route"] for t in worker.slowest()] == ["/invoke"] * 3
+    assert not os.path.exists(tmp_path / f"traces-{pid}.json")
+    try:
+        worker.set_sampling(2, 60)
+    except ValueError as e:
+        assert "sample_rate" in str(e)
+    else:
+        raise AssertionError("a rate above 1 must be refused")
+
+
+def busy_scoring(stop):
+    while not stop.is_set():
+        sum(i * i for i in range(1000))
+
+
+def test_profiler_writes_folded_stacks_behind_the_admin_token(monkeypatch, tmp_path):
+    monkeypatch.setattr(tracing, "tracer", Tracer(directory=str(tmp_path), admin_token="s3cret"))
+    server = load_app(monkeypatch, tmp_path)
+    stop = threading.Event()
+    threading.Thread(target=busy_scoring, args=(stop,), name="scorer-1", daemon=True).start()
+
+    async def scenario():
+        denied = await request(server, "POST", "/admin/profile", {"seconds": 0.3})
+        too_long = await request(server, "POST", "/admin/profile", {"seconds": 3600}, ADMIN)
+        started = await request(server, "POST", "/admin/profile", {"seconds": 0.3, "interval_ms": 5}, ADMIN)
+        url = started.json()["url"]
+        running = await request(server, "GET", url, headers=ADMIN)
+        await asyncio.sleep(0.5)
+        while (done := await request(server, "GET", url, headers=ADMIN)).status_code == 202:
+            await asyncio.sleep(0.2)
+        unknown = await request(server, "GET", "/admin/profile/" + "0" * 16, headers=ADMIN)
+        return denied, too_long, started, running, done, unknown
+
+    start = time.monotonic()
+    denied, too_long, started, running, done, unknown = asyncio.run(scenario())
+    stop.set()
+    assert denied.status_code == 403 and too_long.status_code == 400
+    assert started.status_code == 202 and running.status_code == 202
+    assert done.status_code == 200 and done.headers["content-type"].startswith("text/plain")
+    assert time.monotonic() - start < 10
+    stacks = dict(line.rsplit(" ", 1) for line in done.text.splitlines())
+    scorer = [stack for stack in stacks if stack.startswith("scorer;")]
+    assert scorer and any("test_tracing.py:busy_scoring" in stack for stack in scorer)
+    assert sum(int(stacks[s]) for s in scorer) >= 10
+    assert unknown.status_code == 404
+    server.audit_queue.close()
@@ -0,0 +1,50 @@
+import hashlib
+import multiprocessing
+import os
+
+from server.tx_log import TransactionLog
+
+
+def tx_hash(i, prefix="tx"):
+    return hashlib.sha256(f"{prefix}-{i}".encode()).hexdigest()
+
+
+def write_entries(directory, prefix, count):
+    log = TransactionLog(directory=directory, buffer_entries=50, flush_interval=0, segment_bytes=20000)
+    for i in range(count):
+        log.append(tx_hash(i, prefix), {"tx_hash": tx_hash(i, prefix), "n": i})
+    log.flush()
+
+
+def test_lookup_before_and_after_flush(tmp_path):
+    log = TransactionLog(directory=str(tmp_path), buffer_entries=1000, flush_interval=0, fsync="always")
+    log.append(tx_hash(1), {"tx_hash": tx_hash(1), "message": "a"})
+    assert log.get(tx_hash(1))["message"] == "a"  # still buffered
+    log.flush()
+    assert log.get(tx_hash(1))["message"] == "a"
+    assert log.get(tx_hash(2)) is None
+
+
+def test_rotation_and_index_growth(tmp_path):
+    write_entries(str(tmp_path), "solo", 3000)
+    segments = [name for name in os.listdir(tmp_path) if name.startswith("segment-")]
+    assert len(segments) > 1
+    reader = TransactionLog(directory=str(tmp_path), flush_interval=0)
+    assert all(reader.get(tx_hash(i, "solo"))["n"] == i for i in range(0, 3000, 7))
+
+
+def test_multiple_processes_share_one_log(tmp_path):
+    ctx = multiprocessing.get_context("fork")
+    workers = [ctx.Process(target=write_entries, args=(str(tmp_path), f"worker{w}", 800)) for w in range(3)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(30)
+        assert worker.exitcode == 0
+
+    reader = TransactionLog(directory=str(tmp_path), flush_interval=0)
+    for w in range(3):
+        for i in range(800):
+            assert reader.get(tx_hash(i, f"worker{w}"))["n"] == i
+    lines = sum(open(tmp_path / name).read().count("\n") for name in os.listdir(tmp_path) if name.endswith(".log"))
+    assert lines == 2400
@@ -0,0 +1,84 @@
+import random
+
+from server.risk_model import FEATURES, extract_features
+from server.scam_detector import ScamDetector
+from server.velocity import VelocityTracker, SATURATED
+from server.verdict_cache import VerdictCache
+from tests.fakes import FakeHedera, FakeComput3
+
+T0 = 1_800_000_000.0   # a multiple of 3600: every window's bucket starts here
+
+
+def test_windows_slide_and_count_distinct_counterparties():
+    tracker = VelocityTracker()
+    for i in range(40):
+        tracker.record("0xSPRAY", f"0xvictim{i}", 2.5, now=T0 + i)
+    tracker.record("0xspray", "0xvictim0", 1, now=T0 + 40)
+
+    sender = tracker.features("0xspray", None, now=T0 + 59)["sender"]
+    assert sender["1m"]["count"] == 41 and sender["1m"]["value"] == 101.0
+    assert 30 <= sender["1m"]["counterparties"] <= 50     # linear counting: about 10% error at 40
+    assert sender["1h"] == sender["10m"] == sender["1m"]
+    assert tracker.features(None, "0xvictim3", now=T0 + 59)["recipient"]["1m"]["counterparties"] == 1
+
+    # Half way through the next minute, half of the previous one still counts; two minutes on, none
+    assert tracker.features("0xspray", None, now=T0 + 90)["sender"]["1m"]["count"] == 20
+    later = tracker.features("0xspray", None, now=T0 + 130)["sender"]
+    assert later["1m"]["count"] == 0 and later["10m"]["count"] == 41
+
+    for i in range(2000):
+        tracker.record("0xhub", f"0xuser{i}", now=T0 + 10)
+    assert tracker.features(None, None, now=T0 + 10)["sender"]["1m"]["counterparties"] == 0
+    assert tracker.features("0xhub", None, now=T0 + 10)["sender"]["1m"]["counterparties"] == SATURATED
+
+
+
+def test_non_finite_values_count_without_poisoning_the_sums():
+    tracker = VelocityTracker()
+    tracker.record("0xa", "0xb", 1.5, now=T0)
+    for value in (float("nan"), float("inf"), float("-inf")):
+        tracker.record("0xa", "0xb", value, now=T0 + 1)
+    tracker.record("0xa", "0xb", 2.0, now=T0 + 2)
+    for window in tracker.features("0xa", "0xb", now=T0 + 3).values():
+        assert window["1m"]["count"] == 5 and window["1m"]["value"] == 3.5
+        assert window["1h"]["value"] == 3.5
+
+def test_memory_is_bounded_and_idle_addresses_are_recycled():
+    tracker = VelocityTracker(max_addresses=3)
+    for i in range(10):
+        tracker.record(f"0xs{i}", "0xsink", now=T0 + i)
+    assert tracker.stats()["outbound"] == {"addresses": 3, "evicted": 7, "capacity": 3}
+    assert len(tracker.outbound.last) == 3
+    assert tracker.features("0xs0", None, now=T0 + 10)["sender"]["1h"]["count"] == 0
+    assert tracker.features("0xs9", "0xsink", now=T0 + 10)["recipient"]["1m"]["count"] == 10
+
+    # Hours later the sink is idle and its slot is reused, starting from zero
+    tracker.record("0xnew", "0xother", now=T0 + 3 * 3600)
+    assert "0xs7" not in tracker.outbound.slots
+    assert tracker.features("0xnew", None, now=T0 + 3 * 3600)["sender"]["1m"]["count"] == 1
+
+
+def test_detector_scores_bursts_with_velocity_features():
+    X = extract_features([{"to_address": "0x" + "ab" * 20}, {"to_address": "0x" + "ab" * 20}],
+                         [None, {"sender": {"1m": {"count": 9}, "10m": {"counterparties": 99}},
+                                 "recipient": {"10m": {"counterparties": 0}}}])
+    column = {name: X[:, i] for i, name in enumerate(FEATURES)}
+    assert list(column["sender_fanout_10m"].round(3)) == [0.0, 4.605] and column["sender_tx_1m"][1] > 2.3
+
+    detector = ScamDetector(FakeHedera(), FakeComput3(), cache=VerdictCache(max_size=1000),
+                            stages=["blocklist", "allowlist", "velocity", "local_model"])
+    spray, rng = "0x" + "5a" * 20, random.Random(5)
+    victims = ["0x%040x" % rng.getrandbits(160) for _ in range(30)]
+    verdicts = [detector.analyze_transaction({"chain": "ethereum", "from_address": spray, "to_address": victim,
+                                              "value": 100}) for victim in victims]
+    assert verdicts[0]["details"]["velocity"]["sender"]["1m"]["count"] == 0
+    assert verdicts[-1]["details"]["velocity"]["sender"]["10m"]["counterparties"] >= 20
+    assert verdicts[-1]["risk_score"] > verdicts[0]["risk_score"] + 0.3
+
+    # A repeat of a calm transaction is served from the cache; the same one during a burst is scored again
+    calm = {"chain": "ethereum", "from_address": "0x" + "c1" * 20, "to_address": "0x" + "c2" * 20, "value": 1}
+    detector.analyze_transaction(calm)
+    assert detector.analyze_transaction(calm)["details"].get("cached") is True
+    repeat = {"chain": "ethereum", "from_address": spray, "to_address": victims[0], "value": 100}
+    assert "cached" not in detector.analyze_transaction(repeat)["details"]
+    assert detector.score_local_batch([repeat])[0] > verdicts[0]["risk_score"]
@@ -0,0 +1,46 @@
+import time
+from server.verdict_cache import VerdictCache, fingerprint
+from server.scam_detector import ScamDetector, KNOWN_SCAM_ADDRESSES
+from tests.fakes import FakeHedera, FakeComput3
+
+
+def test_fingerprint_buckets_value_and_selector():
+    base = {"chain": "ethereum", "to_address": "0xABC", "value": 120, "data": "0x095ea7b3" + "00" * 64}
+    same = {"chain": "ethereum", "to_address": "0xabc", "value": 180, "data": "0x095ea7b3" + "11" * 64}
+    other = {"chain": "ethereum", "to_address": "0xabc", "value": 1200, "data": "0x095ea7b3"}
+    assert fingerprint(base) == fingerprint(same)
+    assert fingerprint(base) != fingerprint(other)
+    # Integers too large for a float are unparseable, not a crash
+    assert fingerprint(dict(base, value=10 ** 400)) == fingerprint(dict(base, value="bogus"))
+
+
+def test_lru_eviction_and_ttl():
+    cache = VerdictCache(max_size=2, ttl=0.05, negative_ttl=0.01)
+    cache.put("a", {"risk_score": 0.1})
+    cache.put("b", {"risk_score": 0.2})
+    assert cache.get("a") is not None  # "b" is now least recently used
+    cache.put("c", {"risk_score": 0.3})
+    assert cache.get("b") is None
+    assert cache.stats()["evictions"] == 1
+    time.sleep(0.06)
+    assert cache.get("a") is None
+
+
+def test_detector_serves_repeats_from_cache_and_invalidates_on_blocklist_change():
+    comput3 = FakeComput3()
+    detector = ScamDetector(FakeHedera(), comput3, cache=VerdictCache(max_size=100, ttl=60, negative_ttl=1))
+    tx = {"chain": "ethereum", "to_address": "0xfeed", "value": 1}
+
+    first = detector.analyze_transaction(tx)
+    second = detector.analyze_transaction(tx)
+    assert comput3.calls == 1
+    assert second["details"]["cached"] is True
+    assert second["risk_level"] == first["risk_level"] == "LOW"
+
+    try:
+        detector.update_blocklist(added=["0xFEED"])
+        assert detector.analyze_transaction(tx)["risk_level"] == "CRITICAL"
+    finally:
+        detector.update_blocklist(removed=["0xfeed"])
+    assert "0xfeed" not in KNOWN_SCAM_ADDRESSES
+    assert detector.analyze_transaction(tx)["risk_level"] == "LOW"
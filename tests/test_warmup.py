@@ -0,0 +1,66 @@
+import os
+import json
+import asyncio
+
+from server.lazy import Lazy
+from server.warmup import Warmup
+from tests.test_asgi_app import load_app, call
+
+
+class Client:
+    instances = 0
+
+    def __init__(self):
+        Client.instances += 1
+        self.timeout = 1
+
+
+def test_lazy_builds_on_first_use_and_forwards_attributes():
+    Client.instances = 0
+    client = Lazy(Client, "client")
+    assert not client.built and client.peek() is None and Client.instances == 0
+    client.timeout = 5
+    assert client.timeout == 5 and client.get().timeout == 5
+    assert Client.instances == 1
+
+
+def test_warmup_reports_steps_and_reruns_after_fork():
+    calls = []
+
+    def fail():
+        raise RuntimeError("model file missing")
+
+    warmup = Warmup([("pool", lambda: calls.append(os.getpid()) or {"size": 4})])
+    warmup.start(wait=True)
+    assert warmup.ready()
+    assert warmup.status()["steps"]["pool"]["size"] == 4
+
+    r, w = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        # A forked worker starts out not ready and runs the steps again for itself
+        before = warmup.ready()
+        warmup.start(wait=True)
+        os.write(w, json.dumps([before, warmup.ready(), len(calls)]).encode())
+        os._exit(0)
+    os.waitpid(pid, 0)
+    assert json.loads(os.read(r, 100)) == [False, True, 2]
+
+    broken = Warmup([("model", fail)])
+    broken.start(wait=True)
+    assert not broken.ready()
+    step = broken.status()["steps"]["model"]
+    assert step["state"] == "failed" and step["error"] == "model file missing"
+
+
+def test_asgi_ready_endpoint(monkeypatch, tmp_path):
+    server = load_app(monkeypatch, tmp_path)
+    assert not server.scam_detector.built
+    server.warmup.start(wait=True)
+
+    response = asyncio.run(call(server, "GET", "/ready"))
+    assert response.status_code == 200
+    steps = response.json()["steps"]
+    assert steps["scam_detector"]["state"] == "done" and steps["scam_detector"]["blocklist_entries"] >= 2
+    assert server.scam_detector.built
+    server.audit_queue.close()